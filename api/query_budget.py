@@ -0,0 +1,141 @@
+"""
+Per-request query budget and N+1 detection.
+
+QueryRecorder wraps a database connection (``connection.execute_wrapper``)
+and records every statement it runs.  Statements are grouped by *shape* –
+the SQL with literals and IN/ANY lists replaced by ``?`` – so an N+1 shows up
+as one shape repeated once per row instead of hundreds of distinct queries.
+
+Two consumers:
+
+    QueryBudgetMiddleware   – settings.API_QUERY_BUDGET > 0 turns it on.  A
+                              request that runs more queries than its budget is
+                              logged as a warning with the most repeated
+                              shapes.  DRF views can override the budget with a
+                              ``query_budget`` attribute (an int, or a dict of
+                              action → int for viewsets).
+    assert_query_budget     – test helper; raises QueryBudgetExceeded (an
+                              AssertionError) with the same report.
+"""
+
+import logging
+import re
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import connections
+
+logger = logging.getLogger('dbgestor')
+
+# Shapes listed in a report.
+REPORT_SHAPES = 5
+
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r'\b\d+(?:\.\d+)?\b')
+_LIST = re.compile(r'\((?:\s*\?\s*,)+\s*\?\s*\)')
+_ARRAY = re.compile(r'ARRAY\[[^\]]*\]')
+_SPACE = re.compile(r'\s+')
+
+
+def sql_shape(sql):
+    """``sql`` with literals and value lists replaced by ``?``."""
+    shape = _STRING.sub('?', sql)
+    shape = _NUMBER.sub('?', shape)
+    shape = shape.replace('%s', '?')
+    shape = _ARRAY.sub('ARRAY[?]', shape)
+    shape = _LIST.sub('(?)', shape)
+    return _SPACE.sub(' ', shape).strip()
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+class QueryRecorder:
+    """Context manager recording the statements run on one connection."""
+
+    def __init__(self, using='default'):
+        self.connection = connections[using]
+        self.queries = []
+        self._wrapper = None
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.monotonic()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries.append((sql, time.monotonic() - started))
+
+    def __enter__(self):
+        self._wrapper = self.connection.execute_wrapper(self)
+        self._wrapper.__enter__()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._wrapper.__exit__(*exc_info)
+
+    @property
+    def count(self):
+        return len(self.queries)
+
+    def shapes(self):
+        """Counter of SQL shape → number of executions."""
+        return Counter(sql_shape(sql) for sql, _ in self.queries)
+
+    def repeated(self, min_count=2):
+        return [(shape, n) for shape, n in self.shapes().most_common() if n >= min_count]
+
+    def report(self, limit=REPORT_SHAPES):
+        total_time = sum(duration for _, duration in self.queries)
+        lines = [f'{self.count} queries in {total_time * 1000:.0f} ms']
+        for shape, n in self.repeated()[:limit]:
+            lines.append(f'  {n}× {shape[:300]}')
+        return '\n'.join(lines)
+
+
+@contextmanager
+def assert_query_budget(budget, using='default', label=''):
+    """Fail with the repeated-shape report if the block runs more than ``budget`` queries."""
+    with QueryRecorder(using) as recorder:
+        yield recorder
+    if recorder.count > budget:
+        prefix = f'{label}: ' if label else ''
+        raise QueryBudgetExceeded(f'{prefix}query budget {budget} exceeded\n{recorder.report()}')
+
+
+def view_budget(view_func, method, default):
+    """The budget a view declares for this request (``query_budget``), or ``default``."""
+    cls = getattr(view_func, 'cls', None)
+    budget = getattr(cls, 'query_budget', None)
+    if isinstance(budget, dict):
+        action = (getattr(view_func, 'actions', None) or {}).get(method.lower())
+        budget = budget.get(action)
+    return default if budget is None else budget
+
+
+class QueryBudgetMiddleware:
+    """Log requests that run more queries than their budget (settings.API_QUERY_BUDGET)."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.budget = getattr(settings, 'API_QUERY_BUDGET', 0)
+
+    def __call__(self, request):
+        if not self.budget:
+            return self.get_response(request)
+        with QueryRecorder() as recorder:
+            response = self.get_response(request)
+        budget = getattr(request, '_query_budget', self.budget)
+        if settings.DEBUG:
+            response['X-Query-Count'] = str(recorder.count)
+        if budget and recorder.count > budget:
+            logger.warning(
+                f'Query budget {budget} exceeded: {request.method} {request.path}\n{recorder.report()}'
+            )
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if self.budget:
+            request._query_budget = view_budget(view_func, request.method, self.budget)
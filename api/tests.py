@@ -1,3 +1,1088 @@
-from django.test import TestCase
+import csv
+import json
+import tempfile
+from datetime import datetime, timezone as dt_timezone
+from io import StringIO
+from pathlib import Path
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.contrib.postgres.search import SearchQuery
+from django.core.cache import caches
+from django.core.management import call_command
+from django.db import DatabaseError, transaction
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from dbgestor import adyacencias, data_version, metricas_red, search_vectors, trayectorias, vocabulario
+from dbgestor.deferred import DirtySet
+from dbgestor.models import (
+    Archivo, Calidades, Corporacion, Documento, Etonimos, Hispanizaciones, IngestJob, IngestJobRow, Lugar,
+    LugarEstadistica, Persona, PersonaAdyacencia, PersonaEsclavizada, PersonaLugarRel, PersonaNoEsclavizada,
+    PersonaRelaciones, SituacionLugar, TipoDocumental, TipoLugar, TiposInstitucion, TrayectoriaSegmento,
+)
+
+from .query_budget import (
+    QueryBudgetExceeded, QueryRecorder, assert_query_budget, sql_shape, view_budget,
+)
+
+ROWS = 6
+
+# Query budgets per (route, action) on the seeded dataset.  A change that
+# makes one of these endpoints issue more queries fails here with the most
+# repeated SQL shapes; lower a budget when an endpoint gets cheaper.
+BUDGETS = {
+    ('archivos_api_v2', 'list'): 2,
+    ('archivos_api_v2', 'detail'): 2,
+    ('documentos_api_v2', 'list'): 2,
+    ('documentos_api_v2', 'detail'): 4,
+    ('documentos_api_v2', 'search'): 2,
+    ('personas_esclavizadas_api_v2', 'list'): 8,
+    ('personas_esclavizadas_api_v2', 'detail'): 14,
+    ('personas_esclavizadas_api_v2', 'search'): 7,
+    ('personas_no_esclavizadas_api_v2', 'list'): 6,
+    ('personas_no_esclavizadas_api_v2', 'detail'): 10,
+    ('personas_no_esclavizadas_api_v2', 'search'): 6,
+    ('lugares_api_v2', 'list'): 2,
+    ('lugares_api_v2', 'detail'): 3,
+    ('lugares_api_v2', 'search'): 2,
+    ('corporaciones_api_v2', 'list'): 6,
+    ('corporaciones_api_v2', 'detail'): 7,
+    ('corporaciones_api_v2', 'search'): 2,
+    ('search_api_v2', 'all'): 20,
+    ('search_api_v2', 'personaesclavizada'): 13,
+    ('search_network_api_v2', 'expanded'): 5,
+    ('crosstab_v2', 'pivot'): 1,
+    ('crosstab_v2', 'cached'): 0,
+    ('travel_trajectories_api_v2', 'summary'): 3,
+    ('travel_trajectories_api_v2', 'summary_not_modified'): 1,
+}
+
+TEST_CACHES = {
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'tests-default'},
+    'api': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'tests-api'},
+}
+
+
+class SqlShapeTests(TestCase):
+
+    def test_literals_and_lists_collapse(self):
+        a = sql_shape('SELECT * FROM t WHERE id IN (1, 2, 3) AND name = \'x\'')
+        b = sql_shape('SELECT *  FROM t WHERE id IN (7) AND name = \'it\'\'s\'')
+        self.assertEqual(a, b)
+        self.assertEqual(a, 'SELECT * FROM t WHERE id IN (?) AND name = ?')
+
+    def test_placeholders_collapse(self):
+        self.assertEqual(
+            sql_shape('SELECT 1 FROM t WHERE a = %s AND b IN (%s, %s)'),
+            'SELECT ? FROM t WHERE a = ? AND b IN (?)',
+        )
+
+
+class QueryRecorderTests(TestCase):
+
+    def test_groups_repeated_queries(self):
+        TipoLugar.objects.create(tipo_lugar='Tipo de prueba')
+        with QueryRecorder() as recorder:
+            for pk in range(5):
+                list(TipoLugar.objects.filter(pk=pk))
+            TipoLugar.objects.count()
+        self.assertEqual(recorder.count, 6)
+        [(shape, n)] = recorder.repeated()
+        self.assertEqual(n, 5)
+        self.assertIn('5×', recorder.report())
+
+    def test_budget_exceeded_reports_shapes(self):
+        with self.assertRaises(QueryBudgetExceeded) as ctx:
+            with assert_query_budget(2, label='loop'):
+                for pk in range(3):
+                    list(TipoLugar.objects.filter(pk=pk))
+        self.assertIn('loop: query budget 2 exceeded', str(ctx.exception))
+        self.assertIn('3×', str(ctx.exception))
+
+    def test_view_budget(self):
+        class View:
+            query_budget = {'list': 12}
+
+        def view_func():
+            pass
+        view_func.cls = View
+        view_func.actions = {'get': 'list'}
+        self.assertEqual(view_budget(view_func, 'GET', 100), 12)
+        view_func.actions = {'get': 'retrieve'}
+        self.assertEqual(view_budget(view_func, 'GET', 100), 100)
+
+
+@override_settings(CACHES=TEST_CACHES)
+class ConditionalGetTests(TestCase):
+
+    def setUp(self):
+        for alias in TEST_CACHES:
+            caches[alias].clear()
+
+    def test_not_modified_until_dependency_changes(self):
+        url = reverse('vocab_calidades-list')
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('public', response['Cache-Control'])
+
+        with assert_query_budget(0, label='vocab 304'):
+            cached = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(cached.status_code, 304)
+        self.assertEqual(cached.content, b'')
+
+        # A place does not feed the vocabulary list; a new calidad does.
+        with self.captureOnCommitCallbacks(execute=True):
+            Lugar.objects.create(nombre_lugar='Lugar de prueba')
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag']).status_code, 304)
+        with self.captureOnCommitCallbacks(execute=True):
+            Calidades.objects.create(calidad='Calidad de prueba')
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag']).status_code, 200)
+
+        counts = reverse('entity_counts_v2')
+        etag = self.client.get(counts)['ETag']
+        self.assertEqual(self.client.get(counts, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+    def test_authenticated_responses_are_private(self):
+        user = User.objects.create_user('lector', password='x')
+        self.client.force_login(user)
+        response = self.client.get(reverse('crosstab_schema_v2'))
+        self.assertIn('private', response['Cache-Control'])
+
+
+@override_settings(CACHES=TEST_CACHES)
+class V2QueryBudgetTests(TestCase):
+    """Pins the query count of the v2 list, retrieve and search actions."""
+
+    @classmethod
+    def setUpTestData(cls):
+        # Search vectors and trajectory segments are written on commit.
+        with cls.captureOnCommitCallbacks(execute=True):
+            cls.seed()
+
+    @classmethod
+    def seed(cls):
+        tipo_doc, _ = TipoDocumental.objects.get_or_create(pk=1, defaults={'tipo_documental': 'Carta'})
+        tipo_lugar = TipoLugar.objects.create(tipo_lugar='Ciudad de prueba')
+        situacion = SituacionLugar.objects.create(situacion='Residencia de prueba')
+        tipo_inst = TiposInstitucion.objects.create(tipo='Cofradía de prueba')
+        calidades = [Calidades.objects.create(calidad=f'Calidad {i}') for i in range(2)]
+        etnonimos = [Etonimos.objects.create(etonimo=f'Etnonimo {i}') for i in range(2)]
+        hispanizaciones = [Hispanizaciones.objects.create(hispanizacion=f'Hispanizacion {i}') for i in range(2)]
+
+        lugares = [
+            Lugar.objects.create(nombre_lugar=f'Veracruz {i}', tipo=tipo_lugar, lat=19 + i, lon=-96 - i,
+                                 is_published=True)
+            for i in range(ROWS)
+        ]
+        archivos = [Archivo.objects.create(nombre=f'Archivo General {i}', ubicacion_archivo=lugares[i])
+                    for i in range(2)]
+        documentos = [
+            Documento.objects.create(
+                archivo=archivos[i % 2], fondo='Inquisición', unidad_documental_compuesta=f'Vol. {i}',
+                tipo_documento=tipo_doc, titulo=f'Venta de esclavos en Veracruz {i}', folio_inicial='1',
+                lugar_de_produccion=lugares[i], is_published=True,
+            )
+            for i in range(ROWS)
+        ]
+        esclavizadas = []
+        no_esclavizadas = []
+        for i in range(ROWS):
+            pe = PersonaEsclavizada.objects.create(
+                nombres=f'Juan {i}', apellidos='Veracruz', sexo='v', procedencia=lugares[(i + 1) % ROWS],
+                lugar_nacimiento=lugares[i], is_published=True,
+            )
+            pe.documentos.set(documentos[i:i + 2])
+            pe.calidades.set(calidades)
+            pe.etnonimos.set(etnonimos)
+            pe.hispanizacion.set(hispanizaciones)
+            esclavizadas.append(pe)
+
+            pn = PersonaNoEsclavizada.objects.create(nombres=f'María {i}', apellidos='Veracruz', sexo='m',
+                                                     is_published=True)
+            pn.documentos.set(documentos[i:i + 1])
+            pn.calidades.set(calidades[:1])
+            no_esclavizadas.append(pn)
+
+            rel = PersonaLugarRel.objects.create(documento=documentos[i], lugar=lugares[i],
+                                                 situacion_lugar=situacion, ordinal=1)
+            rel.personas.set([pe, pn])
+            relacion = PersonaRelaciones.objects.create(documento=documentos[i], naturaleza_relacion='sub')
+            relacion.personas.set([pe, pn])
+
+            corporacion = Corporacion.objects.create(
+                nombre_institucion=f'Cofradía de Veracruz {i}', tipo_institucion=tipo_inst,
+                lugar_corporacion=lugares[i], is_published=True,
+            )
+            corporacion.documentos.set(documentos[i:i + 1])
+            corporacion.personas_asociadas.set([pe])
+
+        cls.detail_kwargs = {
+            'archivos_api_v2': {'archivo_id': archivos[0].pk},
+            'documentos_api_v2': {'documento_id': documentos[0].pk},
+            'personas_esclavizadas_api_v2': {'persona_id': esclavizadas[0].pk},
+            'personas_no_esclavizadas_api_v2': {'persona_id': no_esclavizadas[0].pk},
+            'lugares_api_v2': {'lugar_id': lugares[0].pk},
+            'corporaciones_api_v2': {'corporacion_id': corporacion.pk},
+        }
+
+    def setUp(self):
+        # Throttling and cached facets/counts would make the counts order-dependent.
+        for alias in TEST_CACHES:
+            caches[alias].clear()
+
+    def assertWithinBudget(self, key, url, params=None):
+        budget = BUDGETS[key]
+        with assert_query_budget(budget, label=f'{key[0]} {key[1]}') as recorder:
+            response = self.client.get(url, params or {})
+        self.assertEqual(response.status_code, 200, response.content[:500])
+        return recorder
+
+    def test_list_actions(self):
+        for route in self.detail_kwargs:
+            with self.subTest(route=route):
+                self.assertWithinBudget((route, 'list'), reverse(f'{route}-list'), {'page_size': 100})
+
+    def test_retrieve_actions(self):
+        for route, kwargs in self.detail_kwargs.items():
+            with self.subTest(route=route):
+                self.assertWithinBudget((route, 'detail'), reverse(f'{route}-detail', kwargs=kwargs))
+
+    def test_search_actions(self):
+        for route in self.detail_kwargs:
+            if (route, 'search') not in BUDGETS:
+                continue
+            with self.subTest(route=route):
+                self.assertWithinBudget((route, 'search'), reverse(f'{route}-search'), {'q': 'Veracruz'})
+
+    def test_global_search(self):
+        url = reverse('search_api_v2')
+        self.assertWithinBudget(('search_api_v2', 'all'), url, {'q': 'Veracruz', 'page_size': 100})
+        self.assertWithinBudget(('search_api_v2', 'personaesclavizada'), url,
+                                {'q': 'Veracruz', 'type': 'personaesclavizada', 'page_size': 100})
+
+    def test_facet_engine_matches_per_facet_queries(self):
+        from api.v2.facets import collect_facets
+        from dbgestor.management.commands.benchmark_facets import Command, collect_facets_per_query
+
+        command = Command()
+        for q in ('', 'Veracruz'):
+            with self.subTest(q=q):
+                bases = command._base_querysets({'type': '', 'q': q})
+                with self.assertNumQueries(1):
+                    facets = collect_facets(bases)
+                self.assertEqual(len(facets['lugares']), ROWS)
+                self.assertEqual(command._normalize(facets), command._normalize(collect_facets_per_query(bases)))
+
+    def test_summary_cache_follows_data_versions(self):
+        url = reverse('search_api_v2')
+        params = {'type': 'lugar'}
+        counted = self.client.get(url, params).json()['typeCounts']['lugar']
+        self.assertEqual(counted, ROWS)
+
+        # bulk_create sends no signals: the cached count is still served.
+        Lugar.objects.bulk_create([Lugar(nombre_lugar='Xalapa')])
+        self.assertEqual(self.client.get(url, params).json()['typeCounts']['lugar'], ROWS)
+
+        version = data_version.get_versions(['lugar'])['lugar']
+        with self.captureOnCommitCallbacks(execute=True):
+            Lugar.objects.create(nombre_lugar='Orizaba')
+        self.assertGreater(data_version.get_versions(['lugar'])['lugar'], version)
+        self.assertEqual(self.client.get(url, params).json()['typeCounts']['lugar'], ROWS + 2)
+
+    def test_search_network_reads_edge_table(self):
+        url = reverse('search_network_api_v2')
+        params = {'type': 'personaesclavizada', 'scope_mode': 'expanded'}
+        self.assertWithinBudget(('search_network_api_v2', 'expanded'), url, params)
+        data = self.client.get(url, params).json()
+        # Every relation links one esclavizada with one no esclavizada.
+        self.assertEqual(data['meta']['node_count'], 2 * ROWS)
+        self.assertEqual(data['meta']['edge_count'], ROWS)
+        self.assertEqual({e['data']['relation'] for e in data['edges']}, {'sub'})
+        # Each relation is its own two-persona component.
+        node = data['nodes'][0]['data']
+        self.assertEqual((node['degree'], node['component_size'], node['betweenness']), (1, 2, 0.0))
+
+        top = self.client.get(url, {**params, 'selection': 'top_k'}).json()
+        self.assertEqual(top['meta']['selection'], 'top_k')
+        self.assertEqual(top['meta']['node_count'], 2 * ROWS)
+
+    def test_search_network_while_metrics_are_computed(self):
+        url = reverse('search_network_api_v2')
+        params = {'type': 'personaesclavizada', 'selection': 'top_k'}
+        version = data_version.get_versions(['red'])['red']
+        lock = f'{metricas_red.KEY_PREFIX}:lock:{version}'
+        caches['api'].add(lock, True)
+
+        # Another request holds the lock and nothing was computed before.
+        response = self.client.get(url, params)
+        self.assertEqual((response.status_code, response['Retry-After']), (503, '5'))
+
+        # An earlier version is served meanwhile.
+        caches['api'].set(metricas_red.LATEST_KEY, (version - 1, metricas_red.compute()))
+        self.assertEqual(self.client.get(url, params).status_code, 200)
+        self.assertEqual(caches['api'].get(metricas_red.LATEST_KEY)[0], version - 1)
+
+        caches['api'].delete(lock)
+        self.assertEqual(self.client.get(url, params).status_code, 200)
+        self.assertEqual(caches['api'].get(metricas_red.LATEST_KEY)[0], version)
+        self.assertIsNone(caches['api'].get(lock))
+
+    def test_crosstab_is_one_statement(self):
+        params = {'type': 'personaesclavizada', 'row_dim': 'lugar_trayectoria', 'col_dim': 'fecha_periodo',
+                  'period_size': 1, 'cell_op': 'avg_edad'}
+        self.assertWithinBudget(('crosstab_v2', 'pivot'), reverse('crosstab_v2'), params)
+        data = self.client.get(reverse('crosstab_v2'), params).json()
+        self.assertEqual(len(data['rows']), ROWS)
+        self.assertEqual(sum(t['count'] for t in data['row_totals']), data['grand_total']['count'])
+        self.assertEqual(data['cols'], ['Desconocido'])
+
+    def test_crosstab_m2m_totals_count_persons_once(self):
+        # Every persona has both calidades: 2 * ROWS cell entries, ROWS persons.
+        params = {'type': 'personaesclavizada', 'row_dim': 'calidades', 'col_dim': 'sexo'}
+        data = self.client.get(reverse('crosstab_v2'), params).json()
+        self.assertEqual(sum(row[0]['count'] for row in data['cells']), 2 * ROWS)
+        self.assertEqual([t['count'] for t in data['row_totals']], [ROWS, ROWS])
+        self.assertEqual(data['col_totals'], [{'count': ROWS, 'pct': 100.0}])
+        self.assertEqual(data['grand_total']['count'], ROWS)
+
+    def test_crosstab_cache_follows_dimension_tables(self):
+        url = reverse('crosstab_v2')
+        params = {'type': 'personaesclavizada', 'row_dim': 'sexo', 'col_dim': 'calidades'}
+        self.assertWithinBudget(('crosstab_v2', 'pivot'), url, params)
+        with assert_query_budget(BUDGETS[('crosstab_v2', 'cached')], label='crosstab csv'):
+            csv_response = self.client.get(url, {**params, 'export_format': 'csv'})
+        self.assertEqual(csv_response['Content-Type'], 'text/csv; charset=utf-8')
+
+        # Places are not read by this pivot; calidades are.
+        with self.captureOnCommitCallbacks(execute=True):
+            Lugar.objects.create(nombre_lugar='Lugar de prueba')
+        self.assertWithinBudget(('crosstab_v2', 'cached'), url, params)
+        with self.captureOnCommitCallbacks(execute=True):
+            Calidades.objects.create(calidad='Calidad de prueba')
+        self.assertWithinBudget(('crosstab_v2', 'pivot'), url, params)
+
+    def test_map_summary_conditional_get(self):
+        url = reverse('travel_trajectories_api_v2-all-trajectories-summary')
+        with assert_query_budget(BUDGETS[('travel_trajectories_api_v2', 'summary')], label='summary'):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['total_places'], ROWS)
+        self.assertIn('X-Data-Age', response)
+
+        with assert_query_budget(BUDGETS[('travel_trajectories_api_v2', 'summary_not_modified')],
+                                 label='summary 304'):
+            cached = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(cached.status_code, 304)
+        self.assertEqual(cached['ETag'], response['ETag'])
+
+    def test_export_streams_documento_ids(self):
+        expected = {
+            str(persona.pk): {str(pk) for pk in persona.documentos.values_list('pk', flat=True)}
+            for persona in PersonaEsclavizada.objects.all()
+        }
+        response = self.client.get(reverse('personas_esclavizadas_api_v2-export-csv'))
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        rows = list(csv.DictReader(StringIO(b''.join(response.streaming_content).decode())))
+        self.assertEqual({row['persona_id']: set(row['documento_list'].split('; ')) for row in rows}, expected)
+        self.assertNotIn('documento_list_ids', rows[0])
+
+        response = self.client.get(reverse('personas_esclavizadas_api_v2-export-jsonl'))
+        lines = [json.loads(line) for line in b''.join(response.streaming_content).decode().splitlines()]
+        self.assertEqual(len(lines), ROWS)
+        self.assertEqual({d['documento_id'] for d in lines[0]['documento_list']},
+                         {int(pk) for pk in expected[str(lines[0]['persona_id'])]})
+
+    @override_settings(API_QUERY_BUDGET=1, DEBUG=True)
+    def test_middleware_logs_requests_over_budget(self):
+        with self.assertLogs('dbgestor', level='WARNING') as logs:
+            response = self.client.get(reverse('lugares_api_v2-list'))
+        self.assertGreater(int(response['X-Query-Count']), 1)
+        self.assertIn('Query budget 1 exceeded: GET /api/v2/lugares/', logs.output[0])
+
+
+@override_settings(CACHES=TEST_CACHES)
+class KeysetPaginationTests(TestCase):
+
+    def setUp(self):
+        for alias in TEST_CACHES:
+            caches[alias].clear()
+
+    def test_pages_split_rows_with_equal_sort_keys(self):
+        # Five places share a name, so every page boundary but the first
+        # falls inside a run of equal nombre_lugar values.
+        names = ['Xalapa', 'Alvarado', 'Xalapa', 'Orizaba', 'Xalapa', 'Xalapa', 'Xalapa']
+        lugares = [Lugar.objects.create(nombre_lugar=name) for name in names]
+        expected = [lugar.pk for lugar in sorted(lugares, key=lambda lugar: (lugar.nombre_lugar, lugar.pk))]
+
+        pages, url = [], reverse('lugares_api_v2-list')
+        params = {'pagination': 'keyset', 'page_size': 2, 'count': 'exact'}
+        while url:
+            data = self.client.get(url, params).json()
+            self.assertEqual(data['count'], len(names))
+            pages.append([row['lugar_id'] for row in data['results']])
+            url, params = data['next'], None
+        self.assertEqual([pk for page in pages for pk in page], expected)
+        self.assertEqual([len(page) for page in pages], [2, 2, 2, 1])
+
+        # Walking back from the last page gives the same pages.
+        back, url = [], data['previous']
+        while url:
+            data = self.client.get(url).json()
+            back.append([row['lugar_id'] for row in data['results']])
+            url = data['previous']
+        self.assertEqual(back, pages[-2::-1])
+
+
+def ingest_sheet_row(i):
+    return {
+        'archivo_pais': 'México', 'archivo_estado': 'Veracruz', 'archivo_ciudad/pueblo': 'Xalapa',
+        'archivo_nombre': 'AGEV', 'archivo_fondo': 'Notarías', 'asunto': f'Venta {i}', 'fuente_folio': '3v',
+        'persona esclavizada_primer nombre': 'juan', 'persona esclavizada_apellido': f'pérez {i}',
+        'persona esclavizada_calidades': 'Negro, negro', 'persona esclavizada _hispanización': 'ladino',
+        'persona esclavizada_lugar_nuevo [nombre ciudad/distrito rural]': f'Orizaba {i % 2}',
+        'persona 2_primer nombre': 'pedro', 'persona 2_rol/función en el documento': 'vendedor; testigo',
+    }
+
+
+class DirtySetTests(TestCase):
+
+    def test_one_flush_per_transaction(self):
+        flushed = []
+        dirty = DirtySet('test rows', flushed.append)
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            for i in range(3):
+                dirty.add([i])
+        self.assertEqual((len(callbacks), flushed), (1, [{0, 1, 2}]))
+
+        # The savepoint rollback discards the callback; the next add registers again.
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            try:
+                with transaction.atomic():
+                    dirty.add([3])
+                    raise DatabaseError
+            except DatabaseError:
+                pass
+            dirty.add([4])
+        self.assertEqual((len(callbacks), flushed[1:]), (1, [{3, 4}]))
+
+
+@override_settings(CACHES=TEST_CACHES)
+class M2MTimestampTests(TestCase):
+
+    def test_reverse_clear_touches_the_owners(self):
+        calidad = Calidades.objects.create(calidad='mulato')
+        personas = [PersonaEsclavizada.objects.create(nombres=nombre, sexo='v') for nombre in ('Juan', 'Pedro')]
+        personas[0].calidades.add(calidad)
+        old = datetime(2000, 1, 1, tzinfo=dt_timezone.utc)
+        PersonaEsclavizada.objects.update(updated_at=old)
+
+        calidad.persona_set.clear()
+        touched = dict(PersonaEsclavizada.objects.values_list('pk', 'updated_at'))
+        self.assertGreater(touched[personas[0].pk], old)
+        self.assertEqual(touched[personas[1].pk], old)
+
+
+@override_settings(CACHES=TEST_CACHES)
+class TrayectoriaTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        TipoDocumental.objects.get_or_create(pk=1, defaults={'tipo_documental': 'Carta'})
+
+    def setUp(self):
+        vocabulario.clear()
+
+    def assertSegmentos(self, persona, expected):
+        stored = list(TrayectoriaSegmento.objects.filter(persona=persona)
+                      .order_by('step').values_list('from_lugar_id', 'to_lugar_id'))
+        self.assertEqual(stored, expected)
+        # Same rows as deriving the trajectory again from the relations.
+        TrayectoriaSegmento.objects.filter(persona=persona).delete()
+        trayectorias.refresh_segmentos([persona.pk])
+        self.assertEqual(list(TrayectoriaSegmento.objects.filter(persona=persona)
+                              .order_by('step').values_list('from_lugar_id', 'to_lugar_id')), stored)
+
+    def test_store_follows_relation_edits_and_deletes(self):
+        a, b, c, d = [Lugar.objects.create(nombre_lugar=nombre, lat=19 + i, lon=-96 - i)
+                      for i, nombre in enumerate(('Veracruz', 'Xalapa', 'Orizaba', 'Córdoba'))]
+        archivo = Archivo.objects.create(nombre='Archivo General de la Nación')
+        documento = Documento.objects.create(archivo=archivo, fondo='f', titulo='D', folio_inicial='1')
+        with self.captureOnCommitCallbacks(execute=True):
+            persona = PersonaEsclavizada.objects.create(nombres='Juan', sexo='v')
+            rels = []
+            for ordinal, lugar in enumerate((a, b, c), start=1):
+                rel = PersonaLugarRel.objects.create(documento=documento, lugar=lugar, ordinal=ordinal)
+                rel.personas.add(persona)
+                rels.append(rel)
+        self.assertSegmentos(persona, [(a.pk, b.pk), (b.pk, c.pk)])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            rels[1].lugar = d
+            rels[1].save()
+        self.assertSegmentos(persona, [(a.pk, d.pk), (d.pk, c.pk)])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            rels[2].delete()
+        self.assertSegmentos(persona, [(a.pk, d.pk)])
+
+    def test_store_follows_bulk_ordinal_reorder(self):
+        a, b, c = [Lugar.objects.create(nombre_lugar=nombre, lat=19 + i, lon=-96 - i)
+                   for i, nombre in enumerate(('Veracruz', 'Xalapa', 'Orizaba'))]
+        archivo = Archivo.objects.create(nombre='Archivo General de la Nación')
+        documento = Documento.objects.create(archivo=archivo, fondo='f', titulo='D', folio_inicial='1')
+        self.client.force_login(User.objects.create_user('catalogador', password='x'))
+        with self.captureOnCommitCallbacks(execute=True):
+            persona = PersonaEsclavizada.objects.create(nombres='Juan', sexo='v')
+            rels = []
+            for ordinal, lugar in enumerate((a, b, c), start=1):
+                rel = PersonaLugarRel.objects.create(documento=documento, lugar=lugar, ordinal=ordinal)
+                rel.personas.add(persona)
+                rels.append(rel)
+        self.assertSegmentos(persona, [(a.pk, b.pk), (b.pk, c.pk)])
+
+        body = [{'persona_x_lugares': rels[0].pk, 'ordinal': 3}, {'persona_x_lugares': rels[2].pk, 'ordinal': 1}]
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.patch(reverse('relaciones_lugares_api_v2-bulk-update-ordinal'),
+                                         body, content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        self.assertSegmentos(persona, [(c.pk, b.pk), (b.pk, a.pk)])
+
+    def test_route_detail_matches_consecutive_points(self):
+        nac, proc, a, b, dfn = [Lugar.objects.create(nombre_lugar=nombre, lat=19 + i, lon=-96 - i)
+                                for i, nombre in enumerate(('Luanda', 'Cartagena', 'Veracruz', 'Xalapa', 'Orizaba'))]
+        with self.captureOnCommitCallbacks(execute=True):
+            archivo = Archivo.objects.create(nombre='Archivo General de la Nación')
+            documento = Documento.objects.create(archivo=archivo, fondo='f', titulo='D', folio_inicial='1')
+            juan = PersonaEsclavizada.objects.create(nombres='Juan', sexo='v', edad=30, lugar_nacimiento=nac,
+                                                     procedencia=proc, lugar_defuncion=dfn)
+            juan.etnonimos.add(Etonimos.objects.create(etonimo='Congo'))
+            juan.calidades.add(Calidades.objects.create(calidad='Bozal'))
+            pedro, diego = [PersonaEsclavizada.objects.create(nombres=nombre, sexo='v') for nombre in ('Pedro', 'Diego')]
+            # Juan and Pedro go Veracruz → Xalapa, Diego the other way.
+            for persona, lugares in ((juan, (a, b)), (pedro, (a, b)), (diego, (b, a))):
+                for ordinal, lugar in enumerate(lugares, start=1):
+                    rel = PersonaLugarRel.objects.create(documento=documento, lugar=lugar, ordinal=ordinal)
+                    rel.personas.add(persona)
+
+        url = reverse('travel_trajectories_api_v2-route-detail')
+
+        def route(from_lugar, to_lugar):
+            response = self.client.get(url, {'from_lugar_id': from_lugar.pk, 'to_lugar_id': to_lugar.pk})
+            self.assertEqual(response.status_code, 200)
+            return response.json()['results']
+
+        results = route(a, b)
+        self.assertEqual({r['persona_id'] for r in results}, {juan.pk, pedro.pk})
+        row = next(r for r in results if r['persona_id'] == juan.pk)
+        self.assertEqual((row['sexo'], row['edad'], row['etnonimos'], row['calidades'], row['hispanizacion']),
+                         ('Varón', 30, ['congo'], ['bozal'], []))
+        self.assertEqual([r['persona_id'] for r in route(b, a)], [diego.pk])
+        # Birth place, procedencia and death place are trajectory points too.
+        self.assertEqual([r['persona_id'] for r in route(nac, proc)], [juan.pk])
+        self.assertEqual([r['persona_id'] for r in route(proc, a)], [juan.pk])
+        self.assertEqual([r['persona_id'] for r in route(b, dfn)], [juan.pk])
+        self.assertEqual(route(proc, b), [])
+
+
+@override_settings(CACHES=TEST_CACHES)
+class LugarEstadisticaTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        TipoDocumental.objects.get_or_create(pk=1, defaults={'tipo_documental': 'Carta'})
+
+    def setUp(self):
+        vocabulario.clear()
+
+    def counters(self, lugar):
+        return dict(LugarEstadistica.objects.filter(lugar=lugar)
+                    .values('personas_total', 'personas_trayectoria', 'personas_nacimiento',
+                            'personas_procedencia', 'filas_trayectoria').get())
+
+    def assertVerified(self):
+        out = StringIO()
+        call_command('rebuild_lugar_estadisticas', '--verify', stdout=out)
+        self.assertIn('match', out.getvalue())
+
+    def test_counters_follow_rel_fk_and_m2m_edits(self):
+        archivo = Archivo.objects.create(nombre='Archivo General de la Nación')
+        documento = Documento.objects.create(archivo=archivo, fondo='f', titulo='D', folio_inicial='1')
+        with self.captureOnCommitCallbacks(execute=True):
+            a, b, c = [Lugar.objects.create(nombre_lugar=nombre) for nombre in ('Veracruz', 'Xalapa', 'Orizaba')]
+            persona = PersonaEsclavizada.objects.create(nombres='Juan', sexo='v', lugar_nacimiento=a, procedencia=b)
+            rel = PersonaLugarRel.objects.create(documento=documento, lugar=c, ordinal=1)
+            rel.personas.add(persona)
+        self.assertEqual(self.counters(a), {'personas_total': 1, 'personas_trayectoria': 0, 'personas_nacimiento': 1,
+                                            'personas_procedencia': 0, 'filas_trayectoria': 0})
+        self.assertEqual(self.counters(c)['personas_trayectoria'], 1)
+        self.assertVerified()
+
+        # FK edit: both the old and the new birth place move.
+        with self.captureOnCommitCallbacks(execute=True):
+            persona.lugar_nacimiento = b
+            persona.save()
+        self.assertEqual(self.counters(a)['personas_total'], 0)
+        self.assertEqual(self.counters(b), {'personas_total': 1, 'personas_trayectoria': 0, 'personas_nacimiento': 1,
+                                            'personas_procedencia': 1, 'filas_trayectoria': 0})
+
+        # m2m edit: a relation without personas still counts as one row.
+        with self.captureOnCommitCallbacks(execute=True):
+            rel.personas.remove(persona)
+        self.assertEqual(self.counters(c), {'personas_total': 0, 'personas_trayectoria': 0, 'personas_nacimiento': 0,
+                                            'personas_procedencia': 0, 'filas_trayectoria': 1})
+
+        # Relation edit and deletes.
+        with self.captureOnCommitCallbacks(execute=True):
+            rel.personas.add(persona)
+            rel.lugar = a
+            rel.save()
+        self.assertEqual(self.counters(a)['personas_trayectoria'], 1)
+        self.assertEqual(self.counters(c)['filas_trayectoria'], 0)
+        with self.captureOnCommitCallbacks(execute=True):
+            rel.delete()
+            persona.delete()
+        for lugar in (a, b, c):
+            self.assertEqual(set(self.counters(lugar).values()), {0})
+        self.assertVerified()
+
+    def test_merge_lugar_moves_the_counters(self):
+        self.client.force_login(User.objects.create_user('revisor', password='x', is_staff=True))
+        archivo = Archivo.objects.create(nombre='Archivo General de la Nación')
+        documento = Documento.objects.create(archivo=archivo, fondo='f', titulo='D', folio_inicial='1')
+        with self.captureOnCommitCallbacks(execute=True):
+            canonical, duplicate = [Lugar.objects.create(nombre_lugar=nombre) for nombre in ('Veracruz', 'Vera Cruz')]
+            persona = PersonaEsclavizada.objects.create(nombres='Juan', sexo='v', procedencia=duplicate)
+            rel = PersonaLugarRel.objects.create(documento=documento, lugar=duplicate, ordinal=1)
+            rel.personas.add(persona)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(reverse('merge_execute_v2'), {
+                'entity': 'lug', 'canonical_id': canonical.pk, 'duplicate_id': duplicate.pk,
+            }, content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.counters(canonical), {'personas_total': 1, 'personas_trayectoria': 1,
+                                                    'personas_nacimiento': 0, 'personas_procedencia': 1,
+                                                    'filas_trayectoria': 1})
+        self.assertVerified()
+
+
+@override_settings(CACHES=TEST_CACHES)
+class AdyacenciaTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        # Flushes the data-version bump now; the tests compare versions.
+        with cls.captureOnCommitCallbacks(execute=True):
+            TipoDocumental.objects.get_or_create(pk=1, defaults={'tipo_documental': 'Carta'})
+
+    def setUp(self):
+        vocabulario.clear()
+
+    def test_merge_persona_moves_the_fuente_edges(self):
+        self.client.force_login(User.objects.create_user('revisor', password='x', is_staff=True))
+        archivo = Archivo.objects.create(nombre='Archivo General de la Nación')
+        documento = Documento.objects.create(archivo=archivo, fondo='f', titulo='D', folio_inicial='1')
+        with self.captureOnCommitCallbacks(execute=True):
+            juan, pedro, canonical, duplicate = [PersonaEsclavizada.objects.create(nombres=nombre, sexo='v')
+                                                 for nombre in ('Juan', 'Pedro', 'Diego', 'Diego')]
+            relacion = PersonaRelaciones.objects.create(documento=documento, naturaleza_relacion='fam',
+                                                        persona_fuente=duplicate)
+            relacion.personas.add(juan, pedro)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(reverse('merge_execute_v2'), {
+                'entity': 'pe', 'canonical_id': canonical.pk, 'duplicate_id': duplicate.pk,
+            }, content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        fuente = set(PersonaAdyacencia.objects.filter(relacion=relacion, via_fuente=True)
+                     .values_list('origen_id', 'destino_id'))
+        self.assertEqual(fuente, {(canonical.pk, juan.pk), (canonical.pk, pedro.pk)})
+        self.assertEqual(adyacencias.verify(), [])
+
+    def test_deleting_a_linked_persona_bumps_the_network_version(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            archivo = Archivo.objects.create(nombre='Archivo General de la Nación')
+            documento = Documento.objects.create(archivo=archivo, fondo='f', titulo='D', folio_inicial='1')
+            juan, pedro, diego = [PersonaEsclavizada.objects.create(nombres=nombre, sexo='v')
+                                  for nombre in ('Juan', 'Pedro', 'Diego')]
+            relacion = PersonaRelaciones.objects.create(documento=documento, naturaleza_relacion='fam')
+            relacion.personas.add(juan, pedro)
+
+        version = data_version.get_versions(['red'])['red']
+        with self.captureOnCommitCallbacks(execute=True):
+            diego.delete()
+        self.assertEqual(data_version.get_versions(['red'])['red'], version)
+        with self.captureOnCommitCallbacks(execute=True):
+            juan.delete()
+        self.assertGreater(data_version.get_versions(['red'])['red'], version)
+        self.assertFalse(PersonaAdyacencia.objects.exists())
+
+
+def read_csv_column(path, column):
+    with open(path, newline='', encoding='utf-8') as f:
+        return {row[column] for row in csv.DictReader(f)}
+
+
+@override_settings(CACHES=TEST_CACHES)
+class ExportDepositTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        TipoDocumental.objects.get_or_create(pk=1, defaults={'tipo_documental': 'Carta'})
+
+    def setUp(self):
+        vocabulario.clear()
+
+    def export(self, root, *args):
+        call_command('export_deposit', '--output', str(root), *args, stdout=StringIO())
+        return max(Path(root).iterdir(), key=lambda path: path.stat().st_mtime)
+
+    def test_since_picks_up_edits_bulk_updates_and_deletes(self):
+        archivo = Archivo.objects.create(nombre='Archivo General de la Nación')
+        documento = Documento.objects.create(archivo=archivo, fondo='f', titulo='D', folio_inicial='1')
+        canonical, duplicate, otro = [Lugar.objects.create(nombre_lugar=nombre)
+                                      for nombre in ('Veracruz', 'Vera Cruz', 'Xalapa')]
+        juan = PersonaEsclavizada.objects.create(nombres='Juan', sexo='v', procedencia=duplicate)
+        pedro, diego = [PersonaEsclavizada.objects.create(nombres=nombre, sexo='v') for nombre in ('Pedro', 'Diego')]
+        rels = []
+        for ordinal, (lugar, persona) in enumerate(((otro, juan), (duplicate, juan), (otro, pedro)), start=1):
+            rel = PersonaLugarRel.objects.create(documento=documento, lugar=lugar, ordinal=ordinal)
+            rel.personas.add(persona)
+            rels.append(rel)
+        # Everything above predates the base deposit.
+        old = datetime(2000, 1, 1, tzinfo=dt_timezone.utc)
+        for model in (Archivo, Documento, Persona, PersonaLugarRel):
+            model.objects.update(updated_at=old)
+        for model in (Lugar, PersonaEsclavizada, PersonaLugarRel):
+            model.history.update(history_date=old)
+
+        with tempfile.TemporaryDirectory() as tmp:
+            base = self.export(tmp)
+
+            self.client.force_login(User.objects.create_user('revisor', password='x', is_staff=True))
+            pedro.notas = 'Huido'
+            pedro.save()
+            response = self.client.patch(reverse('relaciones_lugares_api_v2-bulk-update-ordinal'),
+                                         [{'persona_x_lugares': rels[0].pk, 'ordinal': 5}],
+                                         content_type='application/json')
+            self.assertEqual(response.status_code, 200)
+            response = self.client.post(reverse('merge_execute_v2'), {
+                'entity': 'lug', 'canonical_id': canonical.pk, 'duplicate_id': duplicate.pk,
+            }, content_type='application/json')
+            self.assertEqual(response.status_code, 200)
+            diego_idno = PersonaEsclavizada.objects.values_list('persona_idno', flat=True).get(pk=diego.pk)
+            deleted_rel = rels[2].pk
+            diego.delete()
+            rels[2].delete()
+
+            delta = self.export(tmp, '--since', str(base))
+            self.assertNotEqual(delta, base)
+            idnos = dict(PersonaEsclavizada.objects.values_list('pk', 'persona_idno'))
+            self.assertEqual(read_csv_column(delta / 'personas_esclavizadas.csv', 'persona_idno'),
+                             {idnos[juan.pk], idnos[pedro.pk]})
+            self.assertEqual(read_csv_column(delta / 'personas_esclavizadas_deleted.csv', 'persona_idno'),
+                             {diego_idno})
+            self.assertEqual(read_csv_column(delta / 'trayectorias.csv', 'persona_x_lugares_id'),
+                             {str(rels[0].pk), str(rels[1].pk)})
+            self.assertEqual(read_csv_column(delta / 'trayectorias_deleted.csv', 'persona_x_lugares_id'),
+                             {str(deleted_rel)})
+            self.assertEqual(read_csv_column(delta / 'lugares_deleted.csv', 'lugar_id'), {str(duplicate.pk)})
+
+
+@override_settings(CACHES=TEST_CACHES)
+class ExportDepositJobsTests(TransactionTestCase):
+    """Worker processes open their own connections, so the rows must be committed."""
+
+    def test_jobs_write_the_same_deposit_as_a_serial_run(self):
+        TipoDocumental.objects.get_or_create(pk=1, defaults={'tipo_documental': 'Carta'})
+        archivo = Archivo.objects.create(nombre='Archivo General de la Nación')
+        lugares = [Lugar.objects.create(nombre_lugar=nombre) for nombre in ('Veracruz', 'Xalapa')]
+        for i in range(3):
+            documento = Documento.objects.create(archivo=archivo, fondo='f', titulo=f'D{i}', folio_inicial='1',
+                                                 lugar_de_produccion=lugares[0])
+            pe = PersonaEsclavizada.objects.create(nombres=f'Juan {i}', sexo='v', procedencia=lugares[1])
+            pn = PersonaNoEsclavizada.objects.create(nombres=f'María {i}', sexo='m')
+            pe.documentos.add(documento)
+            rel = PersonaLugarRel.objects.create(documento=documento, lugar=lugares[i % 2], ordinal=1)
+            rel.personas.add(pe, pn)
+            relacion = PersonaRelaciones.objects.create(documento=documento, naturaleza_relacion='sub')
+            relacion.personas.add(pe, pn)
+
+        with tempfile.TemporaryDirectory() as tmp:
+            call_command('export_deposit', '--output', f'{tmp}/serial', stdout=StringIO())
+            call_command('export_deposit', '--output', f'{tmp}/jobs', '--jobs', '2', stdout=StringIO())
+            serial, = Path(tmp, 'serial').iterdir()
+            jobs, = Path(tmp, 'jobs').iterdir()
+            self.assertEqual(len(read_csv_column(jobs / 'personas_esclavizadas.csv', 'persona_idno')), 3)
+            self.assertEqual(sorted(p.name for p in serial.iterdir()), sorted(p.name for p in jobs.iterdir()))
+            for path in serial.iterdir():
+                with self.subTest(file=path.name):
+                    expected = path.read_text(encoding='utf-8').splitlines()
+                    written = (jobs / path.name).read_text(encoding='utf-8').splitlines()
+                    if path.name == 'MANIFEST.txt':
+                        # Only the snapshot time may differ.
+                        expected, written = ([line for line in lines if not line.startswith('Snapshot time')]
+                                             for lines in (expected, written))
+                    self.assertEqual(written, expected)
+
+
+def lugar_matches(lugar, text):
+    query = SearchQuery(text, config=search_vectors.SEARCH_CONFIG)
+    return Lugar.objects.filter(pk=lugar.pk, search_vector=query).exists()
+
+
+@override_settings(CACHES=TEST_CACHES)
+class SearchVectorTests(TestCase):
+
+    def assertVectorCurrent(self, lugar):
+        stored, expected = (Lugar.objects.filter(pk=lugar.pk)
+                            .annotate(expected=search_vectors.search_vector_expression(Lugar))
+                            .values_list('search_vector', 'expected').get())
+        self.assertEqual(stored, expected)
+        self.assertTrue(lugar_matches(lugar, 'Orizaba'))
+
+    def test_deferred_mode_updates_at_commit(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            lugar = Lugar.objects.create(nombre_lugar='Orizaba')
+            self.assertIsNone(Lugar.objects.values_list('search_vector', flat=True).get(pk=lugar.pk))
+        self.assertVectorCurrent(lugar)
+
+    @override_settings(SEARCH_VECTOR_MODE='trigger')
+    def test_trigger_mode_sets_vector_in_the_statement(self):
+        search_vectors.install_triggers()
+        with self.captureOnCommitCallbacks() as callbacks:
+            lugar = Lugar.objects.create(nombre_lugar='Orizaba')
+            self.assertVectorCurrent(lugar)
+            Lugar.objects.filter(pk=lugar.pk).update(otros_nombres='Ahuilizapan')
+        self.assertTrue(lugar_matches(lugar, 'Ahuilizapan'))
+        self.assertNotIn(search_vectors._dirty.flush, callbacks)
+
+    def test_populate_resumes_only_null_and_rewrites_stale(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            lugares = [Lugar.objects.create(nombre_lugar=f'Orizaba {i}') for i in range(5)]
+        pks = [lugar.pk for lugar in lugares]
+        Lugar.objects.filter(pk__in=pks[:4]).update(search_vector=None)
+        Lugar.objects.filter(pk=pks[4]).update(otros_nombres='Ahuilizapan')
+
+        # A run interrupted after the batch that ended at pks[1].
+        with tempfile.TemporaryDirectory() as tmp:
+            checkpoint = Path(tmp) / 'sv.json'
+            checkpoint.write_text(json.dumps({
+                'run': {'only_null': True, 'stale': False},
+                'models': {'Lugar': {'last_pk': pks[1]}},
+            }))
+            out = StringIO()
+            call_command('populate_search_vectors', '--model', 'lugar', '--only-null', '--batch-size', '1',
+                         '--checkpoint', str(checkpoint), '--resume', stdout=out)
+            self.assertIn(f'resuming after pk {pks[1]}', out.getvalue())
+            self.assertEqual(json.loads(checkpoint.read_text())['models']['Lugar'], {'last_pk': pks[3], 'done': True})
+        vectors = dict(Lugar.objects.filter(pk__in=pks).values_list('pk', 'search_vector'))
+        self.assertEqual([vectors[pk] is None for pk in pks], [True, True, False, False, False])
+        self.assertFalse(lugar_matches(lugares[4], 'Ahuilizapan'))
+
+        out = StringIO()
+        call_command('populate_search_vectors', '--model', 'lugar', '--stale', '--batch-size', '2', stdout=out)
+        self.assertIn('Updated 3 Lugar records', out.getvalue())
+        for lugar in lugares:
+            self.assertVectorCurrent(lugar)
+        self.assertTrue(lugar_matches(lugares[4], 'Ahuilizapan'))
+
+
+@override_settings(CACHES=TEST_CACHES)
+class BulkIngestTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        # Documento.tipo_documento defaults to pk 1.
+        TipoDocumental.objects.get_or_create(pk=1, defaults={'tipo_documental': 'Carta'})
+
+    def setUp(self):
+        # Committed callbacks fill the process vocabulary cache with pks
+        # that the test rollback removes.
+        vocabulario.clear()
+
+    def test_statements_do_not_grow_with_rows(self):
+        from api.v1.bulk_ingest import ingest_rows
+
+        # On-commit work included: refreshes run once per batch, not per row.
+        with QueryRecorder() as first, self.captureOnCommitCallbacks(execute=True):
+            summary = ingest_rows([ingest_sheet_row(i) for i in range(2)])
+        self.assertEqual(summary, {'ingested': 2, 'errores': []})
+        with QueryRecorder() as second, self.captureOnCommitCallbacks(execute=True):
+            ingest_rows([ingest_sheet_row(i) for i in range(2, 8)])
+        self.assertLessEqual(second.count, first.count)
+
+        self.assertEqual(Lugar.objects.filter(nombre_lugar__startswith='Orizaba').count(), 2)
+        self.assertEqual(Archivo.objects.count(), 1)
+        persona = PersonaEsclavizada.objects.get(documentos__titulo='Venta 3')
+        self.assertEqual(persona.persona_idno, f'mx-sv-per-{persona.pk:06d}')
+        self.assertEqual(list(persona.calidades.values_list('calidad', flat=True)), ['negro'])
+        self.assertEqual(persona.p_x_l_pere.get().lugar.nombre_lugar, 'Orizaba 1')
+        self.assertEqual(persona.history.count(), 1)
+        self.assertEqual(PersonaNoEsclavizada.objects.filter(p_roles_evento__isnull=False).count(), 16)
+
+    def test_failed_rows_are_reported_one_by_one(self):
+        from api.v1.bulk_ingest import ingest_rows
+
+        rows = [ingest_sheet_row(i) for i in range(3)]
+        rows[1]['asunto'] = 'x' * 400
+        with self.captureOnCommitCallbacks(execute=True):
+            summary = ingest_rows(rows)
+        self.assertEqual(summary['ingested'], 2)
+        [error] = summary['errores']
+        self.assertTrue(error.startswith('Row 2: value too long'))
+        self.assertEqual(Documento.objects.count(), 2)
+
+    def test_persona_subclass_rows_point_at_their_persona(self):
+        from api.v1.bulk_ingest import ingest_rows
+
+        rows = [ingest_sheet_row(i) for i in range(2)]
+        rows[1]['persona esclavizada _edad'] = '30'
+        rows[1]['persona 2_honorifico'] = 'don'
+        with self.captureOnCommitCallbacks(execute=True):
+            ingest_rows(rows)
+
+        esclavizada = PersonaEsclavizada.objects.get(documentos__titulo='Venta 1')
+        self.assertEqual((esclavizada.persona_ptr_id, esclavizada.edad), (esclavizada.persona_id, 30))
+        no_esclavizada = PersonaNoEsclavizada.objects.get(documentos__titulo='Venta 1')
+        self.assertEqual((no_esclavizada.persona_ptr_id, no_esclavizada.honorifico), (no_esclavizada.persona_id, 'don'))
+        self.assertEqual(Persona.objects.non_polymorphic().count(),
+                         PersonaEsclavizada.objects.count() + PersonaNoEsclavizada.objects.count())
+        self.assertIsInstance(Persona.objects.get(pk=esclavizada.pk), PersonaEsclavizada)
+
+    def test_idno_is_set_by_the_insert(self):
+        archivo = Archivo.objects.create(nombre='Archivo General de la Nación')
+        self.assertEqual(archivo.archivo_idno, f'mx-sv-doc-{archivo.pk:06d}')
+        self.assertEqual(archivo.history.get().archivo_idno, archivo.archivo_idno)
+
+        documentos = Documento.objects.bulk_create(
+            [Documento(archivo=archivo, fondo='f', titulo=f'D{i}', folio_inicial='1') for i in range(2)]
+            + [Documento(archivo=archivo, fondo='f', titulo='D2', folio_inicial='1', documento_idno='legado-1')])
+        self.assertEqual([d.documento_idno for d in documentos],
+                         [f'mx-sv-doc-{documentos[0].pk:06d}', f'mx-sv-doc-{documentos[1].pk:06d}', 'legado-1'])
+        self.assertEqual(Documento.objects.get(pk=documentos[1].pk).documento_idno, documentos[1].documento_idno)
+
+        corporacion = Corporacion.objects.create(
+            nombre_institucion='Cofradía de San Benito', tipo_institucion=TiposInstitucion.objects.create(tipo='Cofradía'))
+        self.assertEqual(corporacion.corporacion_idno, f'mx-sv-cor-{corporacion.pk:06d}')
+
+    @override_settings(INGEST_CHUNK_ROWS=2)
+    def test_ingest_job_is_queued_and_polled(self):
+        user = User.objects.create_user('catalogador', password='x')
+        self.client.force_login(user)
+        rows = [ingest_sheet_row(i) for i in range(5)]
+        rows[3]['asunto'] = 'x' * 400
+        response = self.client.post(reverse('ingest_jobs_v2'), rows, content_type='application/json')
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(response.json()['status'], 'pending')
+        self.assertEqual(Documento.objects.count(), 0)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command('run_ingest_worker', '--once', stdout=StringIO())
+        job = self.client.get(response['Location']).json()
+        self.assertEqual((job['status'], job['processed'], job['ingested']), ('done', 5, 4))
+        self.assertEqual((len(job['errores']), job['errores_total']), (1, 1))
+        self.assertTrue(job['errores'][0].startswith('Row 4: value too long'))
+        self.assertEqual(Documento.objects.count(), 4)
+        # Rows ingested in bulk and the one retried on its own (beside the bad
+        # row) have the same history user.
+        self.assertEqual(set(Documento.history.values_list('history_user', flat=True)), {user.pk})
+        # The error is kept on its row; the job only counts it.
+        failed = IngestJobRow.objects.get(error__isnull=False)
+        self.assertEqual((failed.job_id, failed.idx, failed.job.error_count), (job['id'], 3, 1))
+        self.assertTrue(failed.error.startswith('value too long'))
+
+    def test_v1_ingest_needs_a_user_and_a_list(self):
+        from api.v1.views import BulkIngestAPIView
+        view = BulkIngestAPIView.as_view()
+        factory = APIRequestFactory()
+        request = factory.post('/api/v1/ingest/', [ingest_sheet_row(0)], format='json')
+        self.assertEqual(view(request).status_code, 403)
+
+        user = User.objects.create_user('catalogador', password='x')
+        request = factory.post('/api/v1/ingest/', ingest_sheet_row(0), format='json')
+        force_authenticate(request, user=user)
+        self.assertEqual(view(request).status_code, 400)
+        request = factory.post('/api/v1/ingest/', [ingest_sheet_row(0)], format='json')
+        force_authenticate(request, user=user)
+        response = view(request)
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(IngestJob.objects.get(pk=response.data['id']).created_by, user)
+
+
+@override_settings(CACHES=TEST_CACHES)
+class VocabularioTests(TestCase):
+
+    def setUp(self):
+        vocabulario.clear()
+
+    def test_known_terms_resolve_without_queries(self):
+        from api.v2.serializers import CalidadesWriteSerializer
+
+        with self.captureOnCommitCallbacks(execute=True):
+            ids = vocabulario.resolve(Calidades, ['negro', 'mulato'])
+        with self.assertNumQueries(0):
+            self.assertEqual(vocabulario.resolve(Calidades, ['negro']), {'negro': ids['negro']})
+            self.assertEqual([c.pk for c in vocabulario.search(Calidades, 'UL')], [ids['mulato']])
+
+        serializer = CalidadesWriteSerializer(data={'calidad': 'MULATO'})
+        self.assertTrue(serializer.is_valid(), serializer.errors)
+        self.assertEqual(serializer.save().pk, ids['mulato'])
+
+        # Renamed by another process: this one keeps its copy until the
+        # shared 'vocab' version moves.
+        Calidades.objects.filter(pk=ids['negro']).update(calidad='moreno')
+        self.assertEqual(vocabulario.resolve(Calidades, ['negro'], create=False), {'negro': ids['negro']})
+        with self.captureOnCommitCallbacks(execute=True):
+            data_version.bump('vocab')
+        with override_settings(VOCAB_CACHE_CHECK_INTERVAL=0):
+            self.assertEqual(vocabulario.resolve(Calidades, ['negro'], create=False), {})
+            self.assertEqual(vocabulario.resolve(Calidades, ['moreno'], create=False), {'moreno': ids['negro']})
+
+
+@override_settings(CACHES=TEST_CACHES)
+class PublicacionTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        TipoDocumental.objects.get_or_create(pk=1, defaults={'tipo_documental': 'Carta'})
+
+    def setUp(self):
+        vocabulario.clear()
+
+    def test_publish_cascades_and_unpublish_keeps_shared_records(self):
+        from dbgestor import publicacion
+
+        pais = Lugar.objects.create(nombre_lugar='Nueva España')
+        ciudad = Lugar.objects.create(nombre_lugar='Orizaba', es_parte_de=pais)
+        archivo = Archivo.objects.create(nombre='Archivo General de la Nación')
+        d1, d2 = [Documento.objects.create(archivo=archivo, fondo='f', titulo=titulo, folio_inicial='1',
+                                           lugar_de_produccion=ciudad) for titulo in ('D1', 'D2')]
+        compartida = PersonaEsclavizada.objects.create(nombres='Ana', sexo='m')
+        compartida.documentos.set([d1, d2])
+        sola = PersonaEsclavizada.objects.create(nombres='Juan', sexo='v')
+        sola.documentos.set([d1])
+
+        plan = publicacion.plan(publicacion.scope(archivos=[archivo.pk]))
+        self.assertEqual(plan['changes'], {
+            'documento': [d1.pk, d2.pk], 'persona': [compartida.pk, sola.pk],
+            'corporacion': [], 'lugar': [pais.pk, ciudad.pk],
+        })
+        with self.captureOnCommitCallbacks(execute=True):
+            report = publicacion.apply(plan)
+        self.assertEqual(report['history'], 6)
+        self.assertEqual(set(report['timings']), {'cascade', 'diff', 'update', 'history', 'total'})
+        latest = PersonaEsclavizada.objects.get(pk=compartida.pk).history.first()
+        self.assertEqual((latest.history_type, latest.is_published, latest.history_change_reason),
+                         ('~', True, 'Publicado'))
+
+        # d2 stays published, and so does the persona it shares with d1.
+        plan = publicacion.plan(publicacion.scope(documentos=[d1.pk]), publish=False)
+        self.assertEqual(plan['changes'], {'documento': [d1.pk], 'persona': [sola.pk], 'corporacion': []})
+        with self.captureOnCommitCallbacks(execute=True):
+            publicacion.apply(plan)
+        self.assertTrue(PersonaEsclavizada.objects.get(pk=compartida.pk).is_published)
+        self.assertFalse(PersonaEsclavizada.objects.get(pk=sola.pk).is_published)
+        self.assertTrue(Lugar.objects.get(pk=ciudad.pk).is_published)
@@ -0,0 +1,362 @@
+"""
+Set-based spreadsheet ingest.
+
+ingest_row() resolves one row with dozens of round trips: a get_or_create per
+place level, a create() and an .add() per trajectory place and per role.
+ingest_rows() loads a whole upload with a fixed number of statements per chunk
+of rows, using the same field mapping (api.v1.resolvers):
+
+    1. every row is parsed into model fields first;
+    2. lugares (level by level: pais, estado, ciudad) and archivos are looked
+       up with one query per table and level, and the misses inserted with
+       bulk_create; vocabulary terms come from the process-local cache in
+       dbgestor.vocabulario, and only new terms cost a query;
+    3. documentos, personas (their *_idno is set by the database within the
+       INSERT, see dbgestor.models.IdnoField) and the PersonaLugarRel /
+       PersonaRolEvento / through rows are inserted in bulk;
+    4. history rows are written with bulk_history_create, and the work the
+       save and m2m signals would have queued (search vectors, trajectory
+       segments, place counters, data versions) is queued explicitly.
+
+Each chunk of CHUNK_ROWS rows runs in its own transaction.  A chunk that
+fails as a whole (a value too long for its column, an ambiguous place or
+archivo name...) is rolled back and retried row by row with ingest_row(), so
+every bad row is still reported on its own; those saves record the same
+history user as the bulk path:
+
+    summary = ingest_rows(rows)
+    # {"ingested": 118, "errores": ["Row 7: ..."]}
+"""
+
+import logging
+from contextlib import contextmanager
+from types import SimpleNamespace
+
+from django.db import connection, transaction
+from simple_history.models import HistoricalRecords
+
+from dbgestor import data_version, lugar_estadisticas, search_vectors, trayectorias, vocabulario
+from dbgestor.models import (
+    Archivo, Documento, Lugar, Persona, PersonaEsclavizada, PersonaLugarRel,
+    PersonaNoEsclavizada, PersonaRolEvento, RolEvento, TipoLugar,
+)
+
+from .resolvers import (
+    ESCLAVIZADA_VOCAB, LUGAR_ARCHIVO_COLUMNS, LUGAR_PERSONA_COLUMNS, NO_ESCLAVIZADA_INDEXES,
+    NO_ESCLAVIZADA_VOCAB, archivo_nombre, documento_fields, ingest_row,
+    persona_esclavizada_fields, persona_no_esclavizada_fields, persona_no_esclavizada_roles,
+    safe_strip, split_vocab,
+)
+
+logger = logging.getLogger("dbgestor")
+
+CHUNK_ROWS = 200
+
+
+def parse_row(row):
+    """
+    The model fields of a row: {"lugares": [(nombre, tipo), ...] archivo chain,
+    "archivo", "documento", "personas": [(model, fields, {m2m field: (vocab
+    model, terms)}, roles)], "trayectoria": [(nombre, ordinal)]}.
+    """
+    personas = [(
+        PersonaEsclavizada,
+        persona_esclavizada_fields(row),
+        {field: (model, split_vocab(model, row.get(column))) for field, model, column in ESCLAVIZADA_VOCAB},
+        [],
+    )]
+    for idx in NO_ESCLAVIZADA_INDEXES:
+        fields = persona_no_esclavizada_fields(idx, row)
+        if fields is None:
+            continue
+        vocab = {
+            field: (model, split_vocab(model, row.get(f"persona {idx}_{column}")))
+            for field, model, column in NO_ESCLAVIZADA_VOCAB
+        }
+        personas.append((PersonaNoEsclavizada, fields, vocab, persona_no_esclavizada_roles(idx, row)))
+
+    return {
+        "lugares": [(safe_strip(row.get(column)), tipo) for column, tipo in LUGAR_ARCHIVO_COLUMNS],
+        "archivo": archivo_nombre(row),
+        "documento": documento_fields(row),
+        "personas": personas,
+        "trayectoria": [
+            (safe_strip(row.get(column)), ordinal)
+            for column, ordinal in LUGAR_PERSONA_COLUMNS if safe_strip(row.get(column))
+        ],
+    }
+
+
+def ingest_rows(rows, user=None, first_row=1):
+    """
+    Ingest spreadsheet rows in bulk. Returns {"ingested": n, "errores":
+    ["Row i: ..."]}, rows numbered from ``first_row``.
+    """
+    ingested, errores = ingest_indexed(rows, user=user, first_row=first_row)
+    return {
+        "ingested": ingested,
+        "errores": [f"Row {first_row + idx}: {error}" for idx, error in errores],
+    }
+
+
+def ingest_indexed(rows, user=None, first_row=1):
+    """
+    Like ingest_rows(), but returns (ingested, [(index in rows, message)])
+    with the errors in row order.  ``first_row`` only numbers the log lines.
+    """
+    ingested, errores = 0, []
+
+    parsed = []
+    for idx, row in enumerate(rows):
+        try:
+            parsed.append((idx, row, parse_row(row)))
+        except Exception as e:
+            errores.append((idx, e))
+
+    for start in range(0, len(parsed), CHUNK_ROWS):
+        chunk = parsed[start:start + CHUNK_ROWS]
+        try:
+            with transaction.atomic():
+                _ingest_chunk([plan for _, _, plan in chunk], user)
+            ingested += len(chunk)
+            continue
+        except Exception as e:
+            logger.warning(f"Bulk ingest of rows {first_row + chunk[0][0]}-{first_row + chunk[-1][0]} failed ({e}), retrying row by row")
+
+        with _history_user(user):
+            for idx, row, _ in chunk:
+                try:
+                    ingest_row(row)
+                    ingested += 1
+                except Exception as e:
+                    errores.append((idx, e))
+
+    return ingested, [(idx, str(e)) for idx, e in sorted(errores, key=lambda error: error[0])]
+
+
+# ---------------------------------------------------------------------------
+# Stages
+# ---------------------------------------------------------------------------
+
+@contextmanager
+def _history_user(user):
+    """
+    Attribute the history rows of ORM saves to ``user``.  Outside a request
+    (the ingest worker) simple_history has no user, so stand in for the
+    request HistoryRequestMiddleware would have set.
+    """
+    if user is None:
+        yield
+        return
+    context = HistoricalRecords.context
+    previous = getattr(context, "request", None)
+    context.request = SimpleNamespace(user=user)
+    try:
+        yield
+    finally:
+        if previous is None:
+            del context.request
+        else:
+            context.request = previous
+
+
+def _bulk_history(model, objs, user):
+    if objs and hasattr(model, "history"):
+        model.history.bulk_history_create(objs, default_user=user)
+
+
+def _one(model, matches, key):
+    # get_or_create() raises for an ambiguous match; so does the batch, and
+    # the row-by-row retry reports it on the rows concerned.
+    if len(matches) > 1:
+        raise model.MultipleObjectsReturned(
+            f"get() returned more than one {model.__name__} -- it returned {len(matches)}! ({key})")
+    return matches[0]
+
+
+def _resolve_lugares(tipo_id, keys, user):
+    """
+    {(nombre, es_parte_de_id): lugar_id} for places of one TipoLugar, matched
+    exactly like get_or_create_lugar(); the misses are created.
+    """
+    if not keys:
+        return {}, []
+    matches = {}
+    existing = Lugar.objects.filter(tipo_id=tipo_id, nombre_lugar__in={nombre for nombre, _ in keys})
+    for lugar_id, nombre, parent_id in existing.order_by("lugar_id").values_list("lugar_id", "nombre_lugar", "es_parte_de_id"):
+        if (nombre, parent_id) in keys:
+            matches.setdefault((nombre, parent_id), []).append(lugar_id)
+    found = {key: _one(Lugar, ids, key) for key, ids in matches.items()}
+
+    missing = [
+        Lugar(nombre_lugar=nombre, tipo_id=tipo_id, es_parte_de_id=parent_id, is_published=False)
+        for nombre, parent_id in sorted(keys - found.keys(), key=lambda key: (key[0], key[1] or 0))
+    ]
+    Lugar.objects.bulk_create(missing)
+    _bulk_history(Lugar, missing, user)
+    found.update(((lugar.nombre_lugar, lugar.es_parte_de_id), lugar.pk) for lugar in missing)
+    return found, [lugar.pk for lugar in missing]
+
+
+def _resolve_archivos(plans, ciudades, user):
+    """{nombre_abreviado: archivo_id}, new archivos located at the ciudad of their first row."""
+    nombres = {plan["archivo"] for plan in plans}
+    matches = {}
+    for archivo_id, nombre in Archivo.objects.filter(nombre_abreviado__in=nombres).values_list("archivo_id", "nombre_abreviado"):
+        matches.setdefault(nombre, []).append(archivo_id)
+    found = {nombre: _one(Archivo, ids, nombre) for nombre, ids in matches.items()}
+
+    missing = {}
+    for plan, ciudad_id in zip(plans, ciudades):
+        if plan["archivo"] not in found and plan["archivo"] not in missing:
+            missing[plan["archivo"]] = ciudad_id
+    archivos = []
+    for nombre, ciudad_id in missing.items():
+        archivo = Archivo(nombre=nombre, nombre_abreviado=nombre, ubicacion_archivo_id=ciudad_id)
+        # As Archivo.save() does.
+        if not archivo.nombre_abreviado:
+            archivo.nombre_abreviado = archivo.create_acronym(archivo.nombre)
+        archivos.append(archivo)
+    Archivo.objects.bulk_create(archivos)
+    _bulk_history(Archivo, archivos, user)
+    found.update((nombre, archivo.pk) for nombre, archivo in zip(missing, archivos))
+    return found
+
+
+def _prepare_persona(persona):
+    """What Persona.save() does before its INSERT."""
+    if persona.nombres:
+        persona.nombres = persona.capitalize_name(persona.nombres)
+    persona.apellidos = persona.capitalize_name(persona.apellidos) if persona.apellidos else ""
+    if not persona.nombre_normalizado:
+        persona.nombre_normalizado = persona.capitalize_name(f"{persona.nombres} {persona.apellidos}")
+    persona.pre_save_polymorphic()
+
+
+def _insert_children(model, objs):
+    """INSERT the rows of a multi-table child table (persona_ptr_id and its own columns)."""
+    fields = model._meta.local_concrete_fields
+    quote = connection.ops.quote_name
+    sql = "INSERT INTO {} ({}) VALUES ({})".format(
+        quote(model._meta.db_table),
+        ", ".join(quote(field.column) for field in fields),
+        ", ".join(["%s"] * len(fields)),
+    )
+    rows = [[field.get_db_prep_save(field.pre_save(obj, True), connection) for field in fields] for obj in objs]
+    with connection.cursor() as cursor:
+        cursor.executemany(sql, rows)
+
+
+def _insert_personas(personas, user):
+    """Insert Persona subclass instances."""
+    # The shared columns go in one bulk_create on Persona; bulk_create refuses
+    # multi-table children, so each subclass table gets a plain INSERT.
+    Persona._base_manager.bulk_create(personas)
+    for persona in personas:
+        persona.persona_ptr_id = persona.persona_id
+    for model in (PersonaEsclavizada, PersonaNoEsclavizada):
+        objs = [persona for persona in personas if type(persona) is model]
+        if objs:
+            _insert_children(model, objs)
+            _bulk_history(model, objs, user)
+
+
+def _through_rows(model, field, pairs):
+    """Rows of the ``model.field`` many-to-many table for (owner_id, target_id) pairs."""
+    m2m = model._meta.get_field(field)
+    through = m2m.remote_field.through
+    source = through._meta.get_field(m2m.m2m_field_name()).attname
+    target = through._meta.get_field(m2m.m2m_reverse_field_name()).attname
+    return through, [through(**{source: owner_id, target: target_id}) for owner_id, target_id in pairs]
+
+
+def _ingest_chunk(plans, user):
+    # Lugares, one TipoLugar level at a time: each level points at the one
+    # above it; the trajectory places are ciudades without a parent.
+    tipos = vocabulario.resolve(TipoLugar, [tipo for _, tipo in LUGAR_ARCHIVO_COLUMNS])
+    new_lugares = []
+    parents = [None] * len(plans)
+    for level, (_, tipo) in enumerate(LUGAR_ARCHIVO_COLUMNS):
+        keys = [(plan["lugares"][level][0], parent) for plan, parent in zip(plans, parents)]
+        wanted = {key for key in keys if key[0]}
+        if tipo == "ciudad":
+            wanted.update((nombre, None) for plan in plans for nombre, _ in plan["trayectoria"])
+        found, created = _resolve_lugares(tipos[tipo], wanted, user)
+        new_lugares += created
+        parents = [found[key] if key[0] else None for key in keys]
+    ciudades, lugares_trayectoria = parents, found
+
+    archivos = _resolve_archivos(plans, ciudades, user)
+
+    # Vocabulary terms: known ones come from the process cache, the rest
+    # take one lookup per table (see dbgestor.vocabulario).
+    terms = {}
+    for plan in plans:
+        for _, _, vocab, roles in plan["personas"]:
+            for model, values in vocab.values():
+                terms.setdefault(model, set()).update(values)
+            terms.setdefault(RolEvento, set()).update(roles)
+    vocab_ids = {model: vocabulario.resolve(model, values) for model, values in terms.items()}
+
+    # Documentos.
+    documentos = []
+    for plan, ciudad_id in zip(plans, ciudades):
+        documentos.append(Documento(
+            archivo_id=archivos[plan["archivo"]],
+            lugar_de_produccion_id=ciudad_id,
+            **plan["documento"],
+        ))
+    Documento.objects.bulk_create(documentos)
+    _bulk_history(Documento, documentos, user)
+
+    # Personas, then everything that points at them.
+    entries = [(documento, entry) for plan, documento in zip(plans, documentos) for entry in plan["personas"]]
+    personas = []
+    for _, (model, fields, _, _) in entries:
+        persona = model(**fields)
+        _prepare_persona(persona)
+        personas.append(persona)
+    _insert_personas(personas, user)
+
+    through_rows = {}
+
+    def add_through(model, field, pairs):
+        through, rows = _through_rows(model, field, pairs)
+        through_rows.setdefault(through, []).extend(rows)
+
+    add_through(Persona, "documentos", [(p.pk, d.pk) for p, (d, _) in zip(personas, entries)])
+    for persona, (_, (model, _, vocab, _)) in zip(personas, entries):
+        for field, (vocab_model, values) in vocab.items():
+            add_through(model, field, [(persona.pk, vocab_ids[vocab_model][value]) for value in values])
+
+    lugar_rels, lugar_rel_personas = [], []
+    for plan, documento, persona in zip(plans, documentos, (p for p in personas if type(p) is PersonaEsclavizada)):
+        for nombre, ordinal in plan["trayectoria"]:
+            lugar_rels.append(PersonaLugarRel(
+                documento_id=documento.pk, lugar_id=lugares_trayectoria[(nombre, None)], ordinal=ordinal))
+            lugar_rel_personas.append(persona.pk)
+    PersonaLugarRel.objects.bulk_create(lugar_rels)
+    _bulk_history(PersonaLugarRel, lugar_rels, user)
+    add_through(PersonaLugarRel, "personas", [(rel.pk, pid) for rel, pid in zip(lugar_rels, lugar_rel_personas)])
+
+    roles, rol_personas = [], []
+    for persona, (documento, (_, _, _, rol_names)) in zip(personas, entries):
+        for rol in rol_names:
+            roles.append(PersonaRolEvento(documento_id=documento.pk, rol_evento_id=vocab_ids[RolEvento][rol]))
+            rol_personas.append(persona.pk)
+    PersonaRolEvento.objects.bulk_create(roles)
+    _bulk_history(PersonaRolEvento, roles, user)
+    add_through(PersonaRolEvento, "personas", [(rol.pk, pid) for rol, pid in zip(roles, rol_personas)])
+
+    for through, rows in through_rows.items():
+        through.objects.bulk_create(rows)
+
+    # What the save / m2m_changed handlers in dbgestor.signals would queue.
+    persona_ids = [persona.pk for persona in personas]
+    if search_vectors.get_mode() == "deferred":
+        search_vectors.mark_dirty(Lugar, new_lugares)
+        search_vectors.mark_dirty(Documento, [documento.pk for documento in documentos])
+        search_vectors.mark_dirty(Persona, persona_ids)
+    trayectorias.mark_dirty(persona_ids)
+    lugar_estadisticas.mark_dirty(set(new_lugares) | {rel.lugar_id for rel in lugar_rels})
+    data_version.bump("documento", "persona", *(["lugar"] if new_lugares else []))
@@ -0,0 +1,161 @@
+"""
+Ingest jobs: spreadsheet uploads processed outside the web workers.
+
+A POST to /api/v2/ingest/jobs/ only stores the rows (enqueue(): one IngestJob
+plus its IngestJobRow rows) and answers 202 with the job id; a separate
+process runs them:
+
+    python manage.py run_ingest_worker
+
+The queue is the IngestJob table itself.  A worker claims the oldest pending
+job with SELECT ... FOR UPDATE SKIP LOCKED, so several workers can run side by
+side, and ingests it INGEST_CHUNK_ROWS rows at a time with
+api.v1.bulk_ingest.ingest_rows().  Each chunk commits together with the job's
+progress (next_row, ingested, error_count, processing time) and the error of
+each row it could not ingest (IngestJobRow.error), so the job always
+describes exactly what is in the database:
+
+    - a worker that stops (deploy, SIGTERM) hands the job back as pending and
+      the next claim resumes at next_row;
+    - a worker that dies stops sending heartbeats; once heartbeat_at is older
+      than INGEST_JOB_STALE_AFTER seconds another worker takes the job over;
+    - a job that failed (its chunk raised outside the per-row handling) keeps
+      its progress and goes back to the queue with resume().
+
+Poll GET /api/v2/ingest/jobs/<id>/ for status, rows/sec and per-row errors.
+"""
+
+import logging
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from dbgestor.models import IngestJob, IngestJobRow
+
+from .bulk_ingest import ingest_indexed
+
+logger = logging.getLogger("dbgestor")
+
+# Per-row errors included in a status payload unless all are asked for.
+ERRORS_SHOWN = 100
+
+
+def enqueue(rows, user=None):
+    """Store an upload as a pending job. ``rows`` is the list of spreadsheet row dicts."""
+    with transaction.atomic():
+        job = IngestJob.objects.create(created_by=user, total_rows=len(rows))
+        IngestJobRow.objects.bulk_create(
+            (IngestJobRow(job=job, idx=idx, data=row) for idx, row in enumerate(rows)),
+            batch_size=1000,
+        )
+    return job
+
+
+def resume(job):
+    """Queue a failed job again; it continues at its next_row. Returns False if it is not failed."""
+    return IngestJob.objects.filter(pk=job.pk, status='failed').update(
+        status='pending', error=None, finished_at=None) == 1
+
+
+def claim(worker):
+    """Take the oldest pending (or abandoned running) job for ``worker``, or None."""
+    now = timezone.now()
+    stale = now - timedelta(seconds=settings.INGEST_JOB_STALE_AFTER)
+    with transaction.atomic():
+        job = (
+            IngestJob.objects.select_for_update(skip_locked=True)
+            .filter(Q(status='pending') | Q(status='running', heartbeat_at__lt=stale))
+            .order_by('created_at', 'pk')
+            .first()
+        )
+        if job is None:
+            return None
+        if job.status == 'running':
+            logger.warning(f"Ingest job {job.pk}: worker {job.worker} stopped responding, taking over")
+        job.status, job.worker, job.heartbeat_at = 'running', worker, now
+        job.started_at = job.started_at or now
+        job.save(update_fields=['status', 'worker', 'heartbeat_at', 'started_at'])
+    return job
+
+
+def _process_chunk(job, worker):
+    """Ingest the next chunk and record it on the job, in one transaction. None if the job is no longer ours."""
+    with transaction.atomic():
+        job = IngestJob.objects.select_for_update(of=('self',)).select_related('created_by').get(pk=job.pk)
+        if job.status != 'running' or job.worker != worker:
+            return None
+
+        rows = list(
+            job.rows.filter(idx__gte=job.next_row, idx__lt=job.next_row + settings.INGEST_CHUNK_ROWS)
+            .order_by('idx').values_list('pk', 'data')
+        )
+        started = time.monotonic()
+        ingested, errores = ingest_indexed([data for _, data in rows], user=job.created_by,
+                                           first_row=job.next_row + 1)
+        IngestJobRow.objects.bulk_update(
+            [IngestJobRow(pk=rows[i][0], error=error) for i, error in errores], ['error'])
+
+        job.next_row += len(rows)
+        job.ingested += ingested
+        job.error_count += len(errores)
+        job.processing_seconds += time.monotonic() - started
+        job.heartbeat_at = timezone.now()
+        if job.next_row >= job.total_rows:
+            job.status, job.finished_at = 'done', job.heartbeat_at
+        job.save(update_fields=['next_row', 'ingested', 'error_count', 'processing_seconds',
+                                'heartbeat_at', 'status', 'finished_at'])
+    return job
+
+
+def run(job, worker, should_stop=lambda: False):
+    """Process a claimed job chunk by chunk until it is done, fails or ``should_stop()``."""
+    while job.status == 'running':
+        if should_stop():
+            IngestJob.objects.filter(pk=job.pk, worker=worker, status='running').update(status='pending')
+            job.status = 'pending'
+            logger.info(f"Ingest job {job.pk}: released at row {job.next_row}")
+            return job
+        try:
+            processed = _process_chunk(job, worker)
+        except Exception as e:
+            logger.exception(f"Ingest job {job.pk} failed at row {job.next_row}")
+            IngestJob.objects.filter(pk=job.pk, worker=worker).update(
+                status='failed', error=str(e), finished_at=timezone.now())
+            job.refresh_from_db()
+            return job
+        if processed is None:
+            logger.warning(f"Ingest job {job.pk} was taken over by another worker")
+            return job
+        job = processed
+
+    logger.info(f"Ingest job {job.pk}: {job.ingested}/{job.total_rows} rows ingested, "
+                f"{job.error_count} errors, {job.rows_per_second} rows/s")
+    return job
+
+
+def payload(job, all_errors=False):
+    """The polling representation of a job."""
+    rate = job.rows_per_second
+    remaining = job.total_rows - job.next_row
+    errores = job.rows.filter(error__isnull=False).order_by('idx').values_list('idx', 'error')
+    if not all_errors:
+        errores = errores[:ERRORS_SHOWN]
+    return {
+        'id': job.pk,
+        'status': job.status,
+        'total_rows': job.total_rows,
+        'processed': job.next_row,
+        'ingested': job.ingested,
+        'rows_per_second': rate,
+        'eta_seconds': round(remaining / rate) if rate and job.status in ('pending', 'running') else None,
+        'errores_total': job.error_count,
+        'errores': [f"Row {idx + 1}: {error}" for idx, error in errores],
+        'error': job.error,
+        'created_at': job.created_at,
+        'started_at': job.started_at,
+        'finished_at': job.finished_at,
+    }
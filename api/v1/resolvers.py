@@ -1,8 +1,9 @@
 from dbgestor.models import (
     Lugar, Archivo, Documento, PersonaEsclavizada, PersonaNoEsclavizada,
     Calidades, Actividades, Hispanizaciones, Etonimos, EstadoCivil,
-    PersonaLugarRel, PersonaRelaciones, RolEvento, PersonaRolEvento
+    PersonaLugarRel, PersonaRelaciones, RolEvento, PersonaRolEvento, TipoLugar
 )
+from dbgestor import vocabulario
 from django.db import transaction
 from django.utils.dateparse import parse_date
 import re
@@ -41,64 +42,85 @@ def fecha_nacimiento(init_date, age):
         logger.error(f"Unexpected error while parsing date: {e}")
     return None
 
+# Archivo location columns, outermost first, with the TipoLugar of each level.
+LUGAR_ARCHIVO_COLUMNS = (
+    ("archivo_pais", "pais"),
+    ("archivo_estado", "estado"),
+    ("archivo_ciudad/pueblo", "ciudad"),
+)
+
+# Trajectory columns of the persona esclavizada and their PersonaLugarRel ordinal.
+LUGAR_PERSONA_COLUMNS = (
+    ("persona esclavizada_procedencia1", -4),
+    ("persona esclavizada_procedencia2", -3),
+    ("persona esclavizada_lugar_anterior_1 [nombre ciudad/distrito rural]", -2),
+    ("persona esclavizada_lugar_anterior_2 [nombre ciudad/distrito rural]", -1),
+    ("persona esclavizada_lugar_nuevo [nombre ciudad/distrito rural]", 1),
+)
+
+# (m2m field, vocabulary model, column) of each persona kind; the columns of
+# the personas no esclavizadas follow their "persona {idx}_" prefix.
+ESCLAVIZADA_VOCAB = (
+    ("hispanizacion", Hispanizaciones, "persona esclavizada _hispanización"),
+    ("etnonimos", Etonimos, "persona esclavizada _etnónimo"),
+    ("estado_civil", EstadoCivil, "persona esclavizada_estado civil"),
+    ("calidades", Calidades, "persona esclavizada_calidades"),
+    ("ocupaciones", Actividades, "persona esclavizada_ocupación"),
+)
+NO_ESCLAVIZADA_VOCAB = (
+    ("calidades", Calidades, "calidades"),
+    ("estado_civil", EstadoCivil, "estado civil"),
+    ("ocupaciones", Actividades, "ocupación"),
+)
+NO_ESCLAVIZADA_INDEXES = range(2, 6)
+
+
+def split_vocab(model, value, sep=','):
+    """The distinct, normalized terms of a `sep`-separated cell, in order."""
+    if not value:
+        return []
+    terms = []
+    for val in str(value).split(sep):
+        val = vocabulario.normalize(model, val)
+        if val and val not in terms:
+            terms.append(val)
+    return terms
+
+def get_or_create_tipo_lugar(tipo):
+    """Pk of the TipoLugar `tipo`, created if missing."""
+    return vocabulario.resolve(TipoLugar, [tipo])[tipo]
+
 def get_or_create_lugar(nombre, tipo="ciudad", es_parte_de=None):
     if not nombre or not safe_strip(nombre):
         return None
     nombre = safe_strip(nombre)
     return Lugar.objects.get_or_create(
         nombre_lugar=nombre,
-        tipo=tipo,
+        tipo_id=get_or_create_tipo_lugar(tipo),
         es_parte_de=es_parte_de,
         defaults={"is_published": False}
     )[0]
 
 def get_or_create_vocab(model, value):
     """
-    Returns a list of model instances for the given comma-separated `value` string.
-    Handles models with non-standard field names.
+    Returns the pks of the terms of the given comma-separated `value` string,
+    creating the missing ones (see dbgestor.vocabulario).
     """
-    if not value:
-        return []
+    terms = split_vocab(model, value)
+    ids = vocabulario.resolve(model, terms)
+    return [ids[term] for term in terms]
 
-    field_map = {
-        'Calidades': 'calidad',
-        'Actividades': 'actividad',
-        'Hispanizaciones': 'hispanizacion',
-        'Etonimos': 'etonimo',
-        'EstadoCivil': 'estado_civil',
-        'RolEvento': 'rol_evento',
-    }
 
-    model_name = model.__name__
-    field_name = field_map.get(model_name)
-    if not field_name:
-        raise ValueError(f"No known field mapping for model {model_name}")
-
-    objects = []
-    for val in str(value).split(','):
-        val = val.strip()
-        if val:
-            obj, _ = model.objects.get_or_create(**{field_name: val})
-            objects.append(obj)
-    return objects
-
-
-def resolve_lugares(row):
-    pais = get_or_create_lugar(row.get("archivo_pais"), "pais")
-    estado = get_or_create_lugar(row.get("archivo_estado"), "estado", pais)
-    ciudad = get_or_create_lugar(row.get("archivo_ciudad/pueblo"), "ciudad", estado)
-    return {"pais": pais, "estado": estado, "ciudad": ciudad}
+# ---------------------------------------------------------------------------
+# Field mapping: spreadsheet row -> model fields.  Shared by ingest_row() and
+# the set-based api.v1.bulk_ingest.ingest_rows().
+# ---------------------------------------------------------------------------
 
-def resolve_archivo(row, lugares):
-    nombre = safe_strip(row.get("archivo_nombre"))
-    return Archivo.objects.get_or_create(
-        nombre_abreviado=nombre,
-        defaults={"ubicacion_archivo": lugares["ciudad"]}
-    )[0]
+def archivo_nombre(row):
+    return safe_strip(row.get("archivo_nombre"))
 
-def resolve_documento(row, archivo, lugares):
-    return Documento.objects.create(
-        archivo=archivo,
+def documento_fields(row):
+    return dict(
         fondo=row.get("archivo_fondo", ""),
         subfondo=row.get("archivo_subfondo"),
         titulo=row.get("asunto", "Documento sin título"),
@@ -107,37 +129,16 @@ def resolve_documento(row, archivo, lugares):
         evento_forma_de_pago=row.get("evento_forma_de_pago"),
         evento_total=row.get("evento_total"),
         fecha_inicial_raw=row.get("evento_fecha_completa [dd/mm/año]"),
-        lugar_de_produccion=lugares["ciudad"],
         is_published=False
     )
 
-def link_lugares_a_persona(persona, documento, row):
-    mapping = [
-        ("persona esclavizada_procedencia1", -4),
-        ("persona esclavizada_procedencia2", -3),
-        ("persona esclavizada_lugar_anterior_1 [nombre ciudad/distrito rural]", -2),
-        ("persona esclavizada_lugar_anterior_2 [nombre ciudad/distrito rural]", -1),
-        ("persona esclavizada_lugar_nuevo [nombre ciudad/distrito rural]", 1)
-    ]
-    for col, ordinal in mapping:
-        lugar_name = row.get(col)
-        if lugar_name:
-            lugar = get_or_create_lugar(lugar_name)
-            PersonaLugarRel.objects.create(
-                documento=documento,
-                lugar=lugar,
-                ordinal=ordinal
-            ).personas.add(persona)
-
-def resolve_persona_esclavizada(row, documento):
+def persona_esclavizada_fields(row):
     nombres = safe_strip(row.get("persona esclavizada_primer nombre")) or "Anónimo"
     apellidos = safe_strip(row.get("persona esclavizada_apellido"))
-    nombre_normalizado = f"{nombres} {apellidos}".strip().title()
-
-    persona = PersonaEsclavizada.objects.create(
+    return dict(
         nombres=nombres,
         apellidos=apellidos,
-        nombre_normalizado=nombre_normalizado,
+        nombre_normalizado=f"{nombres} {apellidos}".strip().title(),
         sexo="m" if "mujer" in safe_strip(row.get("persona esclavizada _sexo [varón/mujer]", "")).lower() else "v",
         edad=safe_int(row.get("persona esclavizada _edad")),
         fecha_nacimiento=fecha_nacimiento(
@@ -150,49 +151,85 @@ def resolve_persona_esclavizada(row, documento):
         ocupacion_categoria=row.get("persona esclavizada _ocupación_categoría"),
         is_published=False
     )
-    persona.documentos.add(documento)
-
-    persona.hispanizacion.set(get_or_create_vocab(Hispanizaciones, row.get("persona esclavizada _hispanización")))
-    persona.etnonimos.set(get_or_create_vocab(Etonimos, row.get("persona esclavizada _etnónimo")))
-    persona.estado_civil.set(get_or_create_vocab(EstadoCivil, row.get("persona esclavizada_estado civil")))
-    persona.calidades.set(get_or_create_vocab(Calidades, row.get("persona esclavizada_calidades")))
-    persona.ocupaciones.set(get_or_create_vocab(Actividades, row.get("persona esclavizada_ocupación")))
 
-    link_lugares_a_persona(persona, documento, row)
-    return persona
-
-def resolve_persona_no_esclavizada(idx, row, documento):
+def persona_no_esclavizada_fields(idx, row):
+    """Fields of persona `idx` (2..5), or None when the row has no name for it."""
     key_prefix = f"persona {idx}_"
     if not safe_strip(row.get(f"{key_prefix}primer nombre")):
         return None
 
     nombres = safe_strip(row.get(f"{key_prefix}primer nombre"))
     apellidos = safe_strip(row.get(f"{key_prefix}apellido"))
-    nombre_normalizado = f"{nombres} {apellidos}".strip().title()
-
-    persona = PersonaNoEsclavizada.objects.create(
+    return dict(
         nombres=nombres,
         apellidos=apellidos,
-        nombre_normalizado=nombre_normalizado,
+        nombre_normalizado=f"{nombres} {apellidos}".strip().title(),
         sexo="m" if "mujer" in safe_strip(row.get(f"{key_prefix}sexo", "")).lower() else "v",
         honorifico=row.get(f"{key_prefix}honorifico", "nan"),
         ocupacion_categoria=row.get(f"{key_prefix}ocupación_categoría"),
         is_published=False
     )
+
+def persona_no_esclavizada_roles(idx, row):
+    return split_vocab(RolEvento, row.get(f"persona {idx}_rol/función en el documento"), sep=";")
+
+
+def resolve_lugares(row):
+    lugares = {}
+    parent = None
+    for column, tipo in LUGAR_ARCHIVO_COLUMNS:
+        parent = lugares[tipo] = get_or_create_lugar(row.get(column), tipo, parent)
+    return lugares
+
+def resolve_archivo(row, lugares):
+    nombre = archivo_nombre(row)
+    return Archivo.objects.get_or_create(
+        nombre_abreviado=nombre,
+        defaults={"nombre": nombre, "ubicacion_archivo": lugares["ciudad"]}
+    )[0]
+
+def resolve_documento(row, archivo, lugares):
+    return Documento.objects.create(
+        archivo=archivo,
+        lugar_de_produccion=lugares["ciudad"],
+        **documento_fields(row)
+    )
+
+def link_lugares_a_persona(persona, documento, row):
+    for col, ordinal in LUGAR_PERSONA_COLUMNS:
+        lugar = get_or_create_lugar(row.get(col))
+        if lugar:
+            PersonaLugarRel.objects.create(
+                documento=documento,
+                lugar=lugar,
+                ordinal=ordinal
+            ).personas.add(persona)
+
+def resolve_persona_esclavizada(row, documento):
+    persona = PersonaEsclavizada.objects.create(**persona_esclavizada_fields(row))
+    persona.documentos.add(documento)
+
+    for field, model, column in ESCLAVIZADA_VOCAB:
+        getattr(persona, field).set(get_or_create_vocab(model, row.get(column)))
+
+    link_lugares_a_persona(persona, documento, row)
+    return persona
+
+def resolve_persona_no_esclavizada(idx, row, documento):
+    fields = persona_no_esclavizada_fields(idx, row)
+    if fields is None:
+        return None
+
+    persona = PersonaNoEsclavizada.objects.create(**fields)
     persona.documentos.add(documento)
 
-    persona.calidades.set(get_or_create_vocab(Calidades, row.get(f"{key_prefix}calidades")))
-    persona.estado_civil.set(get_or_create_vocab(EstadoCivil, row.get(f"{key_prefix}estado civil")))
-    persona.ocupaciones.set(get_or_create_vocab(Actividades, row.get(f"{key_prefix}ocupación")))
+    for field, model, column in NO_ESCLAVIZADA_VOCAB:
+        getattr(persona, field).set(get_or_create_vocab(model, row.get(f"persona {idx}_{column}")))
 
-    roles = row.get(f"{key_prefix}rol/función en el documento")
-    if roles:
-        for rol_text in roles.split(";"):
-            rol_text = safe_strip(rol_text)
-            if not rol_text:
-                continue
-            rol, _ = RolEvento.objects.get_or_create(rol_evento=rol_text)
-            PersonaRolEvento.objects.create(documento=documento, rol_evento=rol).personas.add(persona)
+    roles = persona_no_esclavizada_roles(idx, row)
+    rol_ids = vocabulario.resolve(RolEvento, roles)
+    for rol_text in roles:
+        PersonaRolEvento.objects.create(documento=documento, rol_evento_id=rol_ids[rol_text]).personas.add(persona)
 
     return persona
 
@@ -204,7 +241,7 @@ def ingest_row(row):
     esclavizada = resolve_persona_esclavizada(row, documento)
 
     noesclavizadas = []
-    for i in range(2, 6):
+    for i in NO_ESCLAVIZADA_INDEXES:
         p = resolve_persona_no_esclavizada(i, row, documento)
         if p:
             noesclavizadas.append(p)
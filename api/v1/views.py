@@ -19,7 +19,7 @@ from rest_framework.decorators import api_view, action, permission_classes
 from urllib.parse import urlencode
 from rest_framework.pagination import PageNumberPagination
 
-from .resolvers import ingest_row
+from . import ingest_jobs
 
 from dbgestor.models import (Documento, PersonaEsclavizada, PersonaNoEsclavizada, Corporacion,
                              PersonaLugarRel, Lugar, PersonaRelaciones, Persona)
@@ -610,15 +610,14 @@ class PersonaTravelTrajectoryViewSet(viewsets.ReadOnlyModelViewSet):
         return Response(serializer.data)
 
 class BulkIngestAPIView(APIView):
+    # Jobs are only visible to their owner (and staff) in /api/v2/ingest/jobs/.
+    permission_classes = [IsAuthenticated]
+
     def post(self, request):
+        # Rows are queued and ingested by `manage.py run_ingest_worker`;
+        # poll /api/v2/ingest/jobs/<id>/ for progress and per-row errors.
         rows = request.data
-        summary = {"ingested": 0, "errores": []}
-
-        for idx, row in enumerate(rows):
-            try:
-                ingest_row(row)
-                summary["ingested"] += 1
-            except Exception as e:
-                summary["errores"].append(f"Row {idx+1}: {str(e)}")
-
-        return Response(summary, status=status.HTTP_201_CREATED)
\ No newline at end of file
+        if not isinstance(rows, list) or not rows:
+            return Response({'error': 'Body must be a non-empty list of rows'}, status=status.HTTP_400_BAD_REQUEST)
+        job = ingest_jobs.enqueue(rows, user=request.user)
+        return Response(ingest_jobs.payload(job), status=status.HTTP_202_ACCEPTED)
\ No newline at end of file
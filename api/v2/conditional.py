@@ -0,0 +1,94 @@
+"""
+Conditional GET for read-only v2 endpoints.
+
+Payloads such as entity counts, vocabularies, the crosstab schema or the
+visualization aggregates only change when the data they are built from does.
+Their validator is a weak ETag derived from the per-entity data versions
+(dbgestor.data_version, one cache read) plus the request path, the
+negotiated format and the code version – no query runs and nothing is
+rendered to compute it.  A request whose If-None-Match matches gets an empty
+304; every response carries the ETag and a Cache-Control header:
+
+    anonymous        public, max-age=API_CONDITIONAL_MAX_AGE, must-revalidate
+    authenticated    private, max-age=0, must-revalidate
+
+Use the decorator on a GET handler (APIView.get, a viewset action or an
+@api_view function):
+
+    @conditional_get('persona', 'vocab')
+    def get(self, request): ...
+
+Handlers whose validator is not a data version (the materialized map summary)
+build their own tag with make_etag() and use not_modified() / finalize().
+"""
+
+import functools
+import hashlib
+
+from django.conf import settings
+from django.utils.cache import patch_cache_control, patch_vary_headers
+from django.utils.http import parse_etags
+from rest_framework.request import Request
+from rest_framework.response import Response
+
+from dbgestor import data_version
+from dbgestor.version import get_version
+
+
+def make_etag(request, *parts):
+    """Weak ETag for this request's representation of a payload identified by ``parts``."""
+    renderer = getattr(request, 'accepted_renderer', None)
+    key = '|'.join(str(p) for p in (
+        get_version(), request.get_full_path(), getattr(renderer, 'format', ''), *parts,
+    ))
+    return f'W/"{hashlib.md5(key.encode()).hexdigest()}"'
+
+
+def version_etag(request, entities):
+    versions = data_version.get_versions(entities) if entities else {}
+    return make_etag(request, *(f'{e}={versions[e]}' for e in sorted(versions)))
+
+
+def _weak(etag):
+    return etag.removeprefix('W/')
+
+
+def is_not_modified(request, etag):
+    # If-None-Match uses the weak comparison (RFC 9110 §13.1.2).
+    candidates = parse_etags(request.headers.get('If-None-Match', ''))
+    return '*' in candidates or _weak(etag) in {_weak(c) for c in candidates}
+
+
+def finalize(request, response, etag):
+    """Set the validator and the cache policy on a response (200 or 304)."""
+    response['ETag'] = etag
+    if request.user and request.user.is_authenticated:
+        patch_cache_control(response, private=True, max_age=0, must_revalidate=True)
+    else:
+        max_age = getattr(settings, 'API_CONDITIONAL_MAX_AGE', 0)
+        patch_cache_control(response, public=True, max_age=max_age, must_revalidate=True)
+    # Representations differ by format and the cache policy by who asks.
+    patch_vary_headers(response, ('Accept', 'Cookie', 'Authorization'))
+    return response
+
+
+def not_modified(request, etag):
+    return finalize(request, Response(status=304), etag)
+
+
+def conditional_get(*entities):
+    """Decorate a GET handler whose payload depends only on the data versions of ``entities``."""
+    def decorator(handler):
+        @functools.wraps(handler)
+        def wrapper(*args, **kwargs):
+            # (request, ...) for @api_view functions, (self, request, ...) for methods.
+            request = args[0] if isinstance(args[0], Request) else args[1]
+            etag = version_etag(request, entities)
+            if is_not_modified(request, etag):
+                return not_modified(request, etag)
+            response = handler(*args, **kwargs)
+            if 200 <= response.status_code < 300:
+                finalize(request, response, etag)
+            return response
+        return wrapper
+    return decorator
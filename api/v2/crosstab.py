@@ -2,32 +2,56 @@
 
 Rows, columns and cells mirror the SlaveVoyages "table" view concept but adapted to
 person-level data:  row dim × col dim → aggregated cell value (count / avg_edad / pct).
+
+The whole pivot is one SQL statement: the filtered queryset reduced to
+distinct (persona, row, col) triples – period dimensions bucketed in SQL as
+floor(year / size) * size – and grouped by GROUPING SETS that add the row,
+column and grand totals.  Totals count distinct persons even when a dimension
+is M2M: each triple is flagged as the persona's first within its row, its
+column and overall, and every total only aggregates the flagged triples.
+Python only maps the result rows onto the matrix.
+
+Payloads are cached in the 'api' cache under the canonical parameter set and
+the data versions (dbgestor.data_version) of the tables the two dimensions and
+the active filters read – derived from their ORM lookups – so e.g. a new place
+does not drop a sexo × calidades pivot.  JSON and CSV share the entry.
 """
 import csv
+import hashlib
 import io
+import json
 import re
 from collections import defaultdict
 
 from django.contrib.postgres.search import SearchQuery, SearchRank, TrigramSimilarity
+from django.core.cache import caches
+from django.core.exceptions import FieldDoesNotExist
+from django.db import connection
 from django.db.models import (
-    Avg, Case, Count, F, IntegerField, Min, OuterRef, Q, Subquery, Sum, Value, When,
+    Case, F, Func, IntegerField, Min, OuterRef, Q, Subquery, Value, When,
 )
 from django.db.models.functions import ExtractYear
 from django.http import StreamingHttpResponse
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
-from dbgestor.models import PersonaEsclavizada, PersonaNoEsclavizada
+from dbgestor import data_version
+from dbgestor.models import Persona, PersonaEsclavizada, PersonaNoEsclavizada
+from dbgestor.signals import VERSIONED_MODELS
+
+from .conditional import conditional_get
+from .facets import normalize_query
 
 # ── Dimension registry ────────────────────────────────────────────────────────
 # Each entry describes a grouping axis available in the pivot table.
 # Fields:
 #   label       – Human-readable Spanish label shown in selects.
 #   entities    – Which entity types support this dimension.
-#   is_period   – Derives from Min(doc_year); Python merges years into intervals.
+#   is_period   – Derives from Min(doc_year), bucketed into period_size intervals.
 #   is_m2m      – True when the ORM path traverses a M2M relation.
 #                 (totals can exceed unique-person count; UI shows a warning.)
-#   values_field – ORM lookup path used in .values().
+#   values_field – ORM lookup path used in .values(); also decides which data
+#                  versions invalidate cached pivots using the dimension.
 #   display_map – Optional DB-value → display-string mapping.
 #   null_label  – Label for NULL/missing values.
 
@@ -36,6 +60,7 @@ DIMENSIONS = {
         'label': 'Periodo de tiempo',
         'entities': ['personaesclavizada', 'personanoesclavizada'],
         'is_period': True,
+        'values_field': 'documentos__fecha_inicial',
         'null_label': 'Desconocido',
     },
     'sexo': {
@@ -295,13 +320,102 @@ def _apply_sidebar_filters(qs, type_key, request):
     return qs
 
 
+# ── Result cache ──────────────────────────────────────────────────────────────
+
+# Filter parameter → ORM lookup it filters on (see the two helpers above).
+# Only these take part in the cache key, and only when the entity has the
+# field; anything else is ignored by the pivot as well.
+FILTER_LOOKUPS = {
+    'q': 'search_vector',
+    'lugar_id': 'p_x_l_pere__lugar',
+    'archivo_id': 'documentos__archivo',
+    'year': 'documentos__fecha_inicial',
+    'etnonimo': 'etnonimos__etonimo',
+    'calidad': 'calidades__calidad',
+    'hispanizacion': 'hispanizacion__hispanizacion',
+    'ocupacion': 'ocupaciones__actividad',
+    'sexo': 'sexo',
+    'honorifico': 'honorifico',
+    'calidades__calidad__icontains': 'calidades__calidad',
+    'estado_civil': 'estado_civil__estado_civil',
+    'tipo_documental': 'documentos__tipo_documento__tipo_documental',
+    'archivo': 'documentos__archivo',
+    'trayectoria_lugar': 'p_x_l_pere__lugar',
+    'fecha_documento__gte': 'documentos__fecha_inicial',
+    'fecha_documento__lte': 'documentos__fecha_inicial',
+    'ocupaciones__actividad__icontains': 'ocupaciones__actividad',
+    'edad__gte': 'edad',
+    'edad__lte': 'edad',
+    'etnonimos__etonimo__icontains': 'etnonimos__etonimo',
+    'hispanizacion__hispanizacion__icontains': 'hispanizacion__hispanizacion',
+    'procedencia': 'procedencia',
+    **{f'{fld}__icontains': fld
+       for fld in ('altura', 'cabello', 'ojos', 'marcas_corporales', 'conducta', 'salud')},
+}
+
+PIVOT_KEY_PREFIX = 'crosstab'
+
+
+def _lookup_entities(model, lookup):
+    """Data-version entities of the models an ORM lookup path joins through."""
+    entities = set()
+    for name in lookup.split('__'):
+        field = model._meta.get_field(name)
+        if not field.is_relation:
+            break
+        model = field.related_model
+        entities.add(VERSIONED_MODELS[model])
+    return entities
+
+
+def _filter_params(params, model):
+    """Active filters as sorted (name, value) pairs, ``q`` normalized."""
+    active = []
+    for name, lookup in FILTER_LOOKUPS.items():
+        try:
+            model._meta.get_field(lookup.split('__')[0])
+        except FieldDoesNotExist:
+            continue
+        value = params.get(name, '').strip()
+        if name == 'q':
+            value = normalize_query(value)
+        if value:
+            active.append((name, value))
+    return sorted(active)
+
+
+def pivot_cache_key(entity_type, row_dim, col_dim, cell_op, period_size, filters):
+    model = _MODELS[entity_type]
+    lookups = [DIMENSIONS[row_dim]['values_field'], DIMENSIONS[col_dim]['values_field']]
+    lookups += [FILTER_LOOKUPS[name] for name, _ in filters]
+    # The persona rows themselves are always read.
+    entities = sorted({'persona'}.union(*(_lookup_entities(model, lk) for lk in lookups)))
+    versions = data_version.get_versions(entities)
+    uses_period = DIMENSIONS[row_dim].get('is_period') or DIMENSIONS[col_dim].get('is_period')
+    raw = json.dumps([
+        entity_type,
+        row_dim,
+        col_dim,
+        cell_op,
+        period_size if uses_period else None,
+        filters,
+        [versions[e] for e in entities],
+    ])
+    return f'{PIVOT_KEY_PREFIX}:{hashlib.sha1(raw.encode()).hexdigest()}'
+
+
 # ── Pivot helpers ─────────────────────────────────────────────────────────────
 
+PERIOD_SIZES = (1, 5, 10, 25, 50, 100)
+
+
 def _period_label(year, size):
     """1783 + size=50  →  '1750–1799'."""
     if year is None:
         return None
     start = (year // size) * size
+    if size == 1:
+        return str(start)
     return f"{start}–{start + size - 1}"
 
 
@@ -315,66 +429,104 @@ def _to_display(val, conf):
     return str(val)
 
 
-def _build_pivot(raw_qs, row_conf, col_conf, row_vf, col_vf, period_size, cell_op):
-    """
-    Consume the annotated queryset and build the pivot matrix.
+def _period_expression(period_size):
+    """Start year of the period of each persona's earliest document (floor(year / size) * size)."""
+    through = Persona.documentos.through
+    year = Subquery(
+        through.objects.filter(persona_id=OuterRef('pk'))
+        .order_by().values('persona_id')
+        .annotate(_yr=Min(ExtractYear('documento__fecha_inicial')))
+        .values('_yr'),
+        output_field=IntegerField(),
+    )
+    return Func(year, template=f'(FLOOR(%(expressions)s / {int(period_size)}.0) * {int(period_size)})::integer',
+                output_field=IntegerField())
+
+
+# One row per cell, per row total, per column total and the grand total; the
+# GROUPING() flags tell them apart (NULL is also a regular bucket).
+PIVOT_SQL = """
+SELECT _r, _c, GROUPING(_r) AS _g_r, GROUPING(_c) AS _g_c, {measures}
+FROM (
+    SELECT cells.*,
+           ROW_NUMBER() OVER (PARTITION BY _p, _r) = 1 AS _first_r,
+           ROW_NUMBER() OVER (PARTITION BY _p, _c) = 1 AS _first_c,
+           ROW_NUMBER() OVER (PARTITION BY _p) = 1 AS _first
+    FROM ({cells}) AS cells
+) AS cells
+GROUP BY GROUPING SETS ((_r, _c), (_r), (_c), ())
+"""
+
+# Triples each grouping set aggregates, indexed by 2 * GROUPING(_r) + GROUPING(_c):
+# the cell, the row total, the column total and the grand total.
+_SCOPES = ('TRUE', '_first_r', '_first_c', '_first')
 
-    Returns (matrix, sorted_row_keys, sorted_col_keys) where:
-        matrix[row_key][col_key] = {'count': int, 'sum_edad': int, 'n_edad': int}
+
+def _fetch_pivot(qs, row_conf, col_conf, cell_op):
     """
-    matrix = defaultdict(lambda: defaultdict(lambda: {'count': 0, 'sum_edad': 0, 'n_edad': 0}))
-
-    for row in raw_qs:
-        r_raw = row[row_vf]
-        c_raw = row[col_vf]
-
-        # Convert raw value to grouping key
-        if row_conf.get('is_period'):
-            r_key = (r_raw // period_size) * period_size if r_raw is not None else None
-        else:
-            r_key = _to_display(r_raw, row_conf)
-            if r_key is None:
-                r_key = None  # explicit null bucket
-
-        if col_conf.get('is_period'):
-            c_key = (c_raw // period_size) * period_size if c_raw is not None else None
-        else:
-            c_key = _to_display(c_raw, col_conf)
-            if c_key is None:
-                c_key = None
-
-        cell = matrix[r_key][c_key]
-        cell['count'] += row['_count']
-        cell['sum_edad'] += row.get('_sum_edad') or 0
-        cell['n_edad'] += row.get('_n_edad') or 0
-
-    def _row_total(rk):
-        return sum(c['count'] for c in matrix[rk].values())
-
-    def _col_total(ck):
-        return sum(matrix[rk].get(ck, {}).get('count', 0) for rk in matrix)
-
-    all_row_keys = list(matrix.keys())
-    all_col_keys = list({ck for rv in matrix.values() for ck in rv})
-
-    def _sort_row(k):
-        if k is None:
-            return (1, 0, '')
-        if row_conf.get('is_period'):
-            return (0, k, '')
-        return (0, -_row_total(k), str(k))
+    Run the pivot statement and map its rows onto keys.
 
-    def _sort_col(k):
+    ``qs`` yields distinct (_p, _r, _c[, _edad]) rows, _p the persona id.  Returns
+    (matrix, row_totals, col_totals, grand) where matrix[row_key][col_key] and
+    the totals are {'count': int, 'sum_edad': int, 'n_edad': int}, counted
+    over distinct persons.  Keys are period start years or display strings,
+    None for the null bucket.
+    """
+    with_edad = cell_op == 'avg_edad'
+    measures = []
+    for flag in _SCOPES:
+        measures.append(f'COUNT(*) FILTER (WHERE {flag})')
+        if with_edad:
+            measures.append(f'SUM(_edad) FILTER (WHERE {flag})')
+            measures.append(f'COUNT(_edad) FILTER (WHERE {flag})')
+    width = len(measures) // len(_SCOPES)
+    cells_sql, params = qs.query.sql_with_params()
+    sql = PIVOT_SQL.format(cells=cells_sql, measures=', '.join(measures))
+
+    def _key(raw, conf):
+        return raw if conf.get('is_period') else _to_display(raw, conf)
+
+    def _empty():
+        return {'count': 0, 'sum_edad': 0, 'n_edad': 0}
+
+    def _add(target, values):
+        # SUM over no rows is NULL.
+        target['count'] += int(values[0] or 0)
+        if len(values) > 1:
+            target['sum_edad'] += int(values[1] or 0)
+            target['n_edad'] += int(values[2] or 0)
+
+    matrix = defaultdict(lambda: defaultdict(_empty))
+    row_totals = defaultdict(_empty)
+    col_totals = defaultdict(_empty)
+    grand = _empty()
+
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        for r_raw, c_raw, g_r, g_c, *values in cursor.fetchall():
+            scope = 2 * g_r + g_c
+            values = values[scope * width:(scope + 1) * width]
+            if not g_r and not g_c:
+                _add(matrix[_key(r_raw, row_conf)][_key(c_raw, col_conf)], values)
+            elif not g_r:
+                _add(row_totals[_key(r_raw, row_conf)], values)
+            elif not g_c:
+                _add(col_totals[_key(c_raw, col_conf)], values)
+            else:
+                _add(grand, values)
+
+    return matrix, row_totals, col_totals, grand
+
+
+def _sorted_keys(totals, conf):
+    """Periods chronologically, other values by descending total then name; null last."""
+    def _sort(k):
         if k is None:
             return (1, 0, '')
-        if col_conf.get('is_period'):
+        if conf.get('is_period'):
             return (0, k, '')
-        return (0, -_col_total(k), str(k))
-
-    sorted_row_keys = sorted(all_row_keys, key=_sort_row)
-    sorted_col_keys = sorted(all_col_keys, key=_sort_col)
-
-    return matrix, sorted_row_keys, sorted_col_keys
+        return (0, -totals[k]['count'], str(k))
+    return sorted(totals, key=_sort)
 
 
 def _label_for_key(key, conf, period_size):
@@ -397,16 +549,106 @@ def _cell_value(cell, grand_count, cell_op):
     return result
 
 
-def _total_value(merged_cells, grand_count, cell_op):
-    total_count = sum(c.get('count', 0) for c in merged_cells)
-    result = {'count': total_count}
-    if cell_op in ('count', 'pct_of_total'):
-        result['pct'] = round(total_count / grand_count * 100, 1) if grand_count > 0 else 0
+def _build_payload(request, entity_type, row_dim, col_dim, cell_op, period_size):
+    """Run the pivot for validated parameters and return the response payload."""
+    row_conf = DIMENSIONS[row_dim]
+    col_conf = DIMENSIONS[col_dim]
+
+    # ── Build queryset ────────────────────────────────────────────────────
+    model = _MODELS[entity_type]
+    qs = model.objects.all()
+    qs = _apply_text_search(qs, entity_type, request)
+    qs = _apply_sidebar_filters(qs, entity_type, request)
+    qs = _apply_form_filters(qs, entity_type, request)
+
+    # ── Group keys ────────────────────────────────────────────────────────
+    # Period dims are a per-persona scalar (a correlated subquery on the
+    # document link table), so they group like any other column.
+    if row_conf.get('is_period'):
+        qs = qs.annotate(_r=_period_expression(period_size))
+    else:
+        qs = qs.annotate(_r=F(row_conf['values_field']))
+
+    if col_conf.get('is_period'):
+        qs = qs.annotate(_c=_period_expression(period_size))
+    else:
+        qs = qs.annotate(_c=F(col_conf['values_field']))
+
+    # ── Aggregation ───────────────────────────────────────────────────────
+    # One row per persona and (row, col); the pivot statement counts them.
+    qs = qs.annotate(_p=F('persona_id'))
+    fields = ['_p', '_r', '_c']
     if cell_op == 'avg_edad':
-        total_n = sum(c.get('n_edad', 0) for c in merged_cells)
-        total_s = sum(c.get('sum_edad', 0) for c in merged_cells)
-        result['avg_edad'] = round(total_s / total_n, 1) if total_n > 0 else None
-    return result
+        # Only count edad (in years) when unidad_temporal_edad is 'a' or NULL.
+        # Other units (months, days, etc.) are too small to convert reliably,
+        # so they are excluded from the average.
+        _edad_years = Case(
+            When(Q(unidad_temporal_edad='a') | Q(unidad_temporal_edad__isnull=True), then='edad'),
+            default=Value(None),
+            output_field=IntegerField(),
+        )
+        qs = qs.annotate(_edad=_edad_years)
+        fields.append('_edad')
+
+    cells_qs = qs.values(*fields).distinct().order_by()
+
+    # ── Pivot: cells and totals in one statement ──────────────────────────
+    matrix, row_total_map, col_total_map, grand = _fetch_pivot(
+        cells_qs, row_conf, col_conf, cell_op
+    )
+    sorted_row_keys = _sorted_keys(row_total_map, row_conf)
+    sorted_col_keys = _sorted_keys(col_total_map, col_conf)
+
+    rows = [_label_for_key(k, row_conf, period_size) for k in sorted_row_keys]
+    cols = [_label_for_key(k, col_conf, period_size) for k in sorted_col_keys]
+
+    grand_count = grand['count']
+
+    cells = [
+        [
+            _cell_value(matrix[rk].get(ck, {}), grand_count, cell_op)
+            for ck in sorted_col_keys
+        ]
+        for rk in sorted_row_keys
+    ]
+
+    row_totals = [_cell_value(row_total_map[rk], grand_count, cell_op) for rk in sorted_row_keys]
+    col_totals = [_cell_value(col_total_map[ck], grand_count, cell_op) for ck in sorted_col_keys]
+    grand_total = _cell_value(grand, grand_count, cell_op)
+
+    is_m2m = row_conf.get('is_m2m', False) or col_conf.get('is_m2m', False)
+
+    payload = {
+        'rows': rows,
+        'cols': cols,
+        'cells': cells,
+        'row_totals': row_totals,
+        'col_totals': col_totals,
+        'grand_total': grand_total,
+        'meta': {
+            'entity_type': entity_type,
+            'row_dim': row_dim,
+            'row_dim_label': row_conf['label'],
+            'col_dim': col_dim,
+            'col_dim_label': col_conf['label'],
+            'cell_op': cell_op,
+            'cell_op_label': CELL_OPS[cell_op]['label'],
+            'period_size': (
+                period_size
+                if row_conf.get('is_period') or col_conf.get('is_period')
+                else None
+            ),
+            'is_m2m': is_m2m,
+            'm2m_warning': (
+                'Una o ambas dimensiones son relaciones múltiples (M2M). '
+                'Una misma persona puede aparecer en varias celdas, por lo que las '
+                'celdas de una fila/columna pueden sumar más que su total; los '
+                'totales cuentan personas únicas.'
+            ) if is_m2m else None,
+            'total_personas': grand_count,
+        },
+    }
+    return payload
 
 
 # ── View ──────────────────────────────────────────────────────────────────────
@@ -419,7 +661,7 @@ class CrosstabView(APIView):
         type          personaesclavizada | personanoesclavizada
         row_dim       dimension key from DIMENSIONS
         col_dim       dimension key from DIMENSIONS (must differ from row_dim)
-        period_size   25 | 50 | 100  (only relevant when a dim is fecha_periodo)
+        period_size   1 | 5 | 10 | 25 | 50 | 100  (only relevant when a dim is fecha_periodo)
         cell_op       count | avg_edad | pct_of_total
         format        json (default) | csv
         + all standard search/filter params accepted by SearchAPIView
@@ -435,7 +677,7 @@ class CrosstabView(APIView):
 
         try:
             period_size = int(p.get('period_size', 50))
-            if period_size not in (25, 50, 100):
+            if period_size not in PERIOD_SIZES:
                 period_size = 50
         except (ValueError, TypeError):
             period_size = 50
@@ -492,123 +734,13 @@ class CrosstabView(APIView):
                 status=400,
             )
 
-        # ── Build queryset ────────────────────────────────────────────────────
-        model = _MODELS[entity_type]
-        qs = model.objects.all()
-        qs = _apply_text_search(qs, entity_type, request)
-        qs = _apply_sidebar_filters(qs, entity_type, request)
-        qs = _apply_form_filters(qs, entity_type, request)
-
-        # ── Annotate period dims with min document year ───────────────────────
-        # Use a correlated Subquery so the min-year is a per-row scalar.
-        # A plain Min(ExtractYear(...)) is an aggregate that gets collapsed
-        # by the subsequent .values().annotate() GROUP BY, producing wrong
-        # results (one row per sexo instead of one per sexo × year).
-        if row_conf.get('is_period') or col_conf.get('is_period'):
-            _year_sq = Subquery(
-                model.objects.filter(pk=OuterRef('pk')).annotate(
-                    _yr=Min(ExtractYear('documentos__fecha_inicial'))
-                ).values('_yr'),
-                output_field=IntegerField(),
-            )
-
-        if row_conf.get('is_period'):
-            qs = qs.annotate(_row_year=_year_sq)
-            row_vf = '_row_year'
-        else:
-            row_vf = row_conf['values_field']
-
-        if col_conf.get('is_period'):
-            qs = qs.annotate(_col_year=_year_sq)
-            col_vf = '_col_year'
-        else:
-            col_vf = col_conf['values_field']
-
-        # ── Aggregation ───────────────────────────────────────────────────────
-        anno = {'_count': Count('persona_id', distinct=True)}
-        if cell_op == 'avg_edad':
-            # Only count edad (in years) when unidad_temporal_edad is 'a' or NULL.
-            # Other units (months, days, etc.) are too small to convert reliably,
-            # so they are excluded from the average.
-            _edad_years = Case(
-                When(Q(unidad_temporal_edad='a') | Q(unidad_temporal_edad__isnull=True), then='edad'),
-                default=Value(None),
-                output_field=IntegerField(),
-            )
-            anno['_sum_edad'] = Sum(_edad_years)
-            anno['_n_edad'] = Count(_edad_years)  # non-null entries only
-
-        raw_qs = qs.values(row_vf, col_vf).annotate(**anno)
-
-        # ── Build pivot matrix ────────────────────────────────────────────────
-        matrix, sorted_row_keys, sorted_col_keys = _build_pivot(
-            raw_qs, row_conf, col_conf, row_vf, col_vf, period_size, cell_op
-        )
-
-        rows = [_label_for_key(k, row_conf, period_size) for k in sorted_row_keys]
-        cols = [_label_for_key(k, col_conf, period_size) for k in sorted_col_keys]
-
-        grand_count = sum(
-            matrix[rk][ck]['count']
-            for rk in sorted_row_keys for ck in matrix[rk]
-        )
-
-        cells = [
-            [
-                _cell_value(matrix[rk].get(ck, {}), grand_count, cell_op)
-                for ck in sorted_col_keys
-            ]
-            for rk in sorted_row_keys
-        ]
-
-        row_totals = [
-            _total_value(list(matrix[rk].values()), grand_count, cell_op)
-            for rk in sorted_row_keys
-        ]
-
-        col_totals = [
-            _total_value(
-                [matrix[rk].get(ck, {}) for rk in sorted_row_keys],
-                grand_count,
-                cell_op,
-            )
-            for ck in sorted_col_keys
-        ]
-
-        grand_all_cells = [matrix[rk][ck] for rk in sorted_row_keys for ck in matrix[rk]]
-        grand_total = _total_value(grand_all_cells, grand_count, cell_op)
-
-        is_m2m = row_conf.get('is_m2m', False) or col_conf.get('is_m2m', False)
-
-        payload = {
-            'rows': rows,
-            'cols': cols,
-            'cells': cells,
-            'row_totals': row_totals,
-            'col_totals': col_totals,
-            'grand_total': grand_total,
-            'meta': {
-                'entity_type': entity_type,
-                'row_dim': row_dim,
-                'row_dim_label': row_conf['label'],
-                'col_dim': col_dim,
-                'col_dim_label': col_conf['label'],
-                'cell_op': cell_op,
-                'cell_op_label': CELL_OPS[cell_op]['label'],
-                'period_size': (
-                    period_size
-                    if row_conf.get('is_period') or col_conf.get('is_period')
-                    else None
-                ),
-                'is_m2m': is_m2m,
-                'm2m_warning': (
-                    'Una o ambas dimensiones son relaciones múltiples (M2M). '
-                    'Los totales de fila/columna pueden superar el recuento total de '
-                    'personas porque una misma persona puede aparecer en varias celdas.'
-                ) if is_m2m else None,
-                'total_personas': grand_count,
-            },
-        }
+        # ── Cached pivot ──────────────────────────────────────────────────────
+        filters = _filter_params(p, _MODELS[entity_type])
+        key = pivot_cache_key(entity_type, row_dim, col_dim, cell_op, period_size, filters)
+        payload = caches['api'].get(key)
+        if payload is None:
+            payload = _build_payload(request, entity_type, row_dim, col_dim, cell_op, period_size)
+            caches['api'].set(key, payload)
 
         if fmt == 'csv':
             return _render_csv(payload, row_conf['label'], col_conf['label'], cell_op)
@@ -660,6 +792,8 @@ def _render_csv(data, row_label, col_label, cell_op):
 class CrosstabSchemaView(APIView):
     """Return available dimensions and cell operations (for the frontend selects)."""
 
+    # Static per release: the ETag only changes with the code version.
+    @conditional_get()
     def get(self, request):
         entity_type = request.query_params.get('type', '')
         dims = {
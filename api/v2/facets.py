@@ -0,0 +1,242 @@
+"""Facet engine for the unified search / browse endpoint.
+
+All requested facet buckets for all active entity types are computed in a
+single statement: one GROUP BY branch per (facet, entity type) glued together
+with UNION ALL.  In search mode every entity type's matching primary keys go
+into a MATERIALIZED CTE first, so the full-text match runs once per type.  The branches are
+still built with the ORM, only the outer WITH … UNION ALL is assembled here.
+
+Finished facet + type count payloads are cached per normalized query and data
+version (see the summary cache below and dbgestor.data_version).
+"""
+import hashlib
+import json
+
+from django.core.cache import caches
+from django.db import connection
+from django.db.models import CharField, Count, F, IntegerField, Value
+from django.db.models.expressions import RawSQL
+from django.db.models.functions import Cast, ExtractYear
+
+from dbgestor import data_version
+
+# ── Facet registry ────────────────────────────────────────────────────────────
+# facet name → {entity type → source}
+# Source fields:
+#   path    – ORM lookup path of the related row; buckets skip NULLs on it.
+#   id      – Lookup returning the bucket id (id-keyed facets only).
+#   label   – Lookup returning the bucket label.
+#   year    – Lookup of a date whose year is the bucket (the ``fechas`` facet).
+# Counts are distinct records of the entity type, as in the original per-facet
+# queries.  Facets whose source has an ``id`` merge across types by id, the
+# rest by label.
+
+_PERSON_TYPES = ('personaesclavizada', 'personanoesclavizada')
+
+
+def _for_persons(source, types=_PERSON_TYPES):
+    return {tk: source for tk in types}
+
+
+FACETS = {
+    'lugares': {
+        'documento': {'path': 'lugar_de_produccion', 'id': 'lugar_de_produccion__lugar_id',
+                      'label': 'lugar_de_produccion__nombre_lugar'},
+        **_for_persons({'path': 'p_x_l_pere__lugar', 'id': 'p_x_l_pere__lugar__lugar_id',
+                        'label': 'p_x_l_pere__lugar__nombre_lugar'}),
+    },
+    'archivos': {
+        'documento': {'path': 'archivo', 'id': 'archivo__archivo_id', 'label': 'archivo__nombre'},
+        **_for_persons({'path': 'documentos__archivo', 'id': 'documentos__archivo__archivo_id',
+                        'label': 'documentos__archivo__nombre'}),
+    },
+    'fechas': {
+        'documento': {'path': 'fecha_inicial', 'year': 'fecha_inicial'},
+        **_for_persons({'path': 'documentos__fecha_inicial', 'year': 'documentos__fecha_inicial'}),
+    },
+    'etnonimos': _for_persons({'path': 'etnonimos', 'label': 'etnonimos__etonimo'},
+                              types=('personaesclavizada',)),
+    'calidades': _for_persons({'path': 'calidades', 'label': 'calidades__calidad'}),
+    'hispanizaciones': _for_persons({'path': 'hispanizacion', 'label': 'hispanizacion__hispanizacion'},
+                                    types=('personaesclavizada',)),
+    'ocupaciones': _for_persons({'path': 'ocupaciones', 'label': 'ocupaciones__actividad'}),
+    'procedencias': _for_persons({'path': 'procedencia', 'id': 'procedencia__lugar_id',
+                                  'label': 'procedencia__nombre_lugar'},
+                                 types=('personaesclavizada',)),
+    'estados_civiles': _for_persons({'path': 'estado_civil', 'label': 'estado_civil__estado_civil'}),
+    'tipos_documentales': _for_persons({'path': 'documentos__tipo_documento',
+                                        'label': 'documentos__tipo_documento__tipo_documental'}),
+}
+
+# Response keys derived from another facet.
+FACET_ALIASES = {'year_range': 'fechas'}
+
+# Key order of the ``facets`` payload.
+PAYLOAD_KEYS = ['lugares', 'archivos', 'fechas', 'year_range', 'etnonimos', 'calidades',
+                'hispanizaciones', 'ocupaciones', 'procedencias', 'estados_civiles',
+                'tipos_documentales']
+
+# id-keyed facets expose their label under this key (kept from the original payload).
+_ID_LABEL_KEY = {'lugares': 'nombre', 'archivos': 'nombre', 'procedencias': 'label'}
+
+
+def parse_facets_param(request):
+    """
+    Return the set of facet names requested with ``?facets=a,b``.
+
+    Absent parameter → every facet (backwards compatible); ``facets=`` or
+    ``facets=none`` → no facets.  Unknown names are ignored.
+    """
+    raw = request.query_params.get('facets')
+    if raw is None:
+        return set(PAYLOAD_KEYS)
+    names = {v.strip() for v in raw.split(',') if v.strip()}
+    return names & set(PAYLOAD_KEYS)
+
+
+def _branch(model, cte_name, facet, type_key, source):
+    """One GROUP BY branch: (facet, type_key, key_id, label, c)."""
+    qs = model.objects.all()
+    if cte_name:
+        qs = qs.filter(pk__in=RawSQL(f'SELECT pk FROM {cte_name}', ()))
+    qs = qs.filter(**{f"{source['path']}__isnull": False})
+    if 'year' in source:
+        key = Cast(ExtractYear(source['year']), IntegerField())
+    elif 'id' in source:
+        key = F(source['id'])
+    else:
+        key = Value(None, output_field=IntegerField())
+    label = F(source['label']) if 'label' in source else Value(None, output_field=CharField())
+    return (qs
+            .values(facet=Value(facet, output_field=CharField()),
+                    type_key=Value(type_key, output_field=CharField()),
+                    key_id=key, label=label)
+            .annotate(c=Count('pk', distinct=True))
+            .order_by())
+
+
+def _fetch_rows(querysets_by_type, facet_names):
+    ctes, cte_params, branches = [], [], []
+    for type_key, qs in querysets_by_type.items():
+        sources = [(f, FACETS[f][type_key]) for f in sorted(facet_names) if type_key in FACETS[f]]
+        if not sources:
+            continue
+        cte_name = None
+        if qs.query.where:
+            # Filtered base (search mode): evaluate the match once.  Browse mode
+            # covers the whole table, so the branches read it directly.
+            cte_name = f'facet_base_{type_key}'
+            sql, params = qs.order_by().values('pk').query.sql_with_params()
+            ctes.append(f'{cte_name} (pk) AS MATERIALIZED ({sql})')
+            cte_params.extend(params)
+        branches.extend(_branch(qs.model, cte_name, facet, type_key, source)
+                        for facet, source in sources)
+    if not branches:
+        return []
+
+    union = branches[0].union(*branches[1:], all=True) if len(branches) > 1 else branches[0]
+    sql, params = union.query.sql_with_params()
+    with connection.cursor() as cursor:
+        if ctes:
+            sql = f"WITH {', '.join(ctes)} {sql}"
+        cursor.execute(sql, (*cte_params, *params))
+        return cursor.fetchall()
+
+
+def _years_tree(year_set):
+    """Hierarchical year tree (century → decade → year)."""
+    century_labels = {16: 'XVI', 17: 'XVII', 18: 'XVIII', 19: 'XIX', 20: 'XX'}
+    years_tree = {}
+    for y in sorted(year_set):
+        c = y // 100 + 1
+        century = f"Siglo {century_labels.get(c, str(c))}"
+        decade = (y // 10) * 10
+        years_tree.setdefault(century, {})
+        years_tree[century].setdefault(decade, [])
+        years_tree[century][decade].append(y)
+    return years_tree
+
+
+def collect_facets(querysets_by_type, requested=None):
+    """
+    Build facet buckets for the given {type_key: base queryset} mapping.
+
+    ``requested`` is a set of facet names (see parse_facets_param); None means
+    all of them.  Returns the same payload shape SearchAPIView has always
+    returned, restricted to the requested keys.
+    """
+    if requested is None:
+        requested = set(PAYLOAD_KEYS)
+    facet_names = {FACET_ALIASES.get(n, n) for n in requested}
+
+    buckets = {name: {} for name in facet_names}
+    year_set = set()
+    for facet, _type_key, key_id, label, count in _fetch_rows(querysets_by_type, facet_names):
+        if facet == 'fechas':
+            year_set.add(int(key_id))
+        elif facet in _ID_LABEL_KEY:
+            bucket = buckets[facet].setdefault(
+                key_id, {'id': key_id, _ID_LABEL_KEY[facet]: label, 'count': 0})
+            bucket['count'] += count
+        else:
+            bucket = buckets[facet].setdefault(label, {'label': label, 'count': 0})
+            bucket['count'] += count
+
+    facets = {}
+    for name in sorted(requested, key=PAYLOAD_KEYS.index):
+        if name == 'fechas':
+            facets['fechas'] = _years_tree(year_set)
+        elif name == 'year_range':
+            facets['year_range'] = {'min': min(year_set), 'max': max(year_set)} if year_set else None
+        else:
+            label_key = _ID_LABEL_KEY.get(name, 'label')
+            facets[name] = sorted(buckets[name].values(),
+                                  key=lambda x: (-x['count'], str(x[label_key])))
+    return facets
+
+
+# ── Summary cache ─────────────────────────────────────────────────────────────
+# Facets and type counts depend only on the normalized query and the entity
+# types involved (sidebar filters never narrow them), so they are cached per
+# request shape.  The key embeds the data version of every entity the
+# payload reads from; a write bumps the version and the old entry is never
+# looked up again.
+
+# entity type → data_version entities its facets / count read from.
+TYPE_DEPENDENCIES = {
+    'documento': ('documento', 'lugar', 'vocab'),
+    'personaesclavizada': ('persona', 'documento', 'lugar', 'vocab'),
+    'personanoesclavizada': ('persona', 'documento', 'lugar', 'vocab'),
+    'lugar': ('lugar', 'vocab'),
+    'corporacion': ('corporacion', 'lugar', 'vocab'),
+}
+
+SUMMARY_KEY_PREFIX = 'search-summary'
+
+
+def normalize_query(query_text):
+    """Lower-case ``q`` and collapse whitespace so equivalent queries share a key."""
+    return ' '.join(query_text.lower().split())
+
+
+def summary_cache_key(query_text, active_types, count_types, requested_facets):
+    entities = sorted({e for tk in {*active_types, *count_types} for e in TYPE_DEPENDENCIES.get(tk, ())})
+    versions = data_version.get_versions(entities)
+    raw = json.dumps([
+        normalize_query(query_text),
+        sorted(active_types),
+        sorted(count_types),
+        sorted(requested_facets),
+        [versions[e] for e in entities],
+    ])
+    return f'{SUMMARY_KEY_PREFIX}:{hashlib.sha1(raw.encode()).hexdigest()}'
+
+
+def get_cached_summary(key):
+    """Return the cached ``(facets, type_counts)`` pair or None."""
+    return caches['api'].get(key)
+
+
+def set_cached_summary(key, facets, type_counts):
+    caches['api'].set(key, (facets, type_counts))
+
@@ -0,0 +1,296 @@
+"""Keyset (seek) pagination for the v2 list endpoints and SearchAPIView.
+
+Page-number pagination makes PostgreSQL walk and discard every row before
+the requested page, and pays for a COUNT(*) on each request.  Keyset
+pagination instead remembers the sort key of the last row it returned and
+asks for the rows strictly after it, so every page costs the same.
+
+The cursor is an opaque base64 token holding the ordering it was issued for
+and the values of every ordering key plus the primary key of the boundary
+row.  Each ordering term is copied into a ``keyset_<n>`` annotation so FK
+traversals (``procedencia__nombre_lugar``) and ORDERING_ANNOTATIONS
+(``documento_count``, ``has_lugares_sort``, …) are paginated the same way.
+NULLs always sort last, which keeps the "after this row" condition simple.
+
+Counting is controlled with ``count=``:
+    exact     – COUNT(*), cached per query and data version (default)
+    estimate  – the planner's row estimate from EXPLAIN (pg statistics)
+    none      – no count at all
+"""
+import base64
+import binascii
+import datetime
+import hashlib
+import json
+
+from django.core.cache import caches
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connections
+from django.db.models import F, Q
+from rest_framework.exceptions import ValidationError
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+from dbgestor import data_version
+
+COUNT_MODES = ('exact', 'estimate', 'none')
+COUNT_KEY_PREFIX = 'keyset-count'
+
+
+def wants_keyset(request):
+    """Keyset mode is opt-in: ``?pagination=keyset`` or any ``cursor`` param."""
+    params = request.query_params
+    return params.get('pagination') == 'keyset' or 'cursor' in params
+
+
+def parse_count_mode(request):
+    mode = request.query_params.get('count', 'exact').strip().lower()
+    if mode not in COUNT_MODES:
+        raise ValidationError({'count': f"Expected one of: {', '.join(COUNT_MODES)}."})
+    return mode
+
+
+# ── cursor tokens ────────────────────────────────────────────────────────────
+
+class _CursorEncoder(DjangoJSONEncoder):
+    """DjangoJSONEncoder rounds times to milliseconds; cursors need them exact."""
+
+    def default(self, o):
+        if isinstance(o, (datetime.datetime, datetime.time)):
+            return o.isoformat()
+        return super().default(o)
+
+
+def encode_cursor(ordering, values, reverse=False):
+    payload = {'o': list(ordering), 'v': values}
+    if reverse:
+        payload['r'] = 1
+    raw = json.dumps(payload, cls=_CursorEncoder, separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(token, ordering):
+    """Return ``(values, reverse)``; the cursor must belong to ``ordering``."""
+    try:
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+        payload = json.loads(raw)
+        values, reverse = payload['v'], bool(payload.get('r'))
+        cursor_ordering = payload['o']
+    except (binascii.Error, ValueError, TypeError, KeyError):
+        raise ValidationError({'cursor': 'Invalid cursor.'})
+    if cursor_ordering != list(ordering) or not isinstance(values, list) or len(values) != len(ordering) + 1:
+        raise ValidationError({'cursor': 'Cursor does not match the current ordering.'})
+    return values, reverse
+
+
+# ── keyset queries ───────────────────────────────────────────────────────────
+
+def _keys(ordering):
+    """[(annotation name, source field, descending)] for ordering + pk."""
+    keys = []
+    for n, term in enumerate(ordering):
+        keys.append((f'keyset_{n}', term.lstrip('-'), term.startswith('-')))
+    keys.append(('pk', 'pk', False))
+    return keys
+
+
+def _annotate(qs, ordering):
+    return qs.annotate(**{name: F(source) for name, source, _ in _keys(ordering)[:-1]})
+
+
+def _order(qs, ordering, reverse):
+    # Reversing the scan flips direction *and* NULL placement.
+    nulls = {'nulls_first': True} if reverse else {'nulls_last': True}
+    terms = []
+    for name, _, desc in _keys(ordering):
+        expr = F(name)
+        terms.append(expr.desc(**nulls) if desc != reverse else expr.asc(**nulls))
+    return qs.order_by(*terms)
+
+
+def _after(name, value, desc, reverse):
+    """Rows strictly after ``value`` on one key, in scan order."""
+    lookup = 'lt' if desc != reverse else 'gt'
+    if not reverse:
+        # NULLs last: nothing follows NULL, every NULL follows a value.
+        if value is None:
+            return None
+        return Q(**{f'{name}__{lookup}': value}) | Q(**{f'{name}__isnull': True})
+    # Reversed scan puts NULLs first.
+    if value is None:
+        return Q(**{f'{name}__isnull': False})
+    return Q(**{f'{name}__{lookup}': value})
+
+
+def _equal(name, value):
+    if value is None:
+        return Q(**{f'{name}__isnull': True})
+    return Q(**{name: value})
+
+
+def _seek(qs, ordering, values, reverse):
+    """Filter ``qs`` to rows after the boundary row described by ``values``."""
+    keys = _keys(ordering)
+    annotations = qs.query.annotations
+    typed = []
+    for (name, _, _), value in zip(keys, values):
+        if value is not None:
+            field = annotations[name].output_field if name in annotations else qs.model._meta.pk
+            try:
+                value = field.to_python(value)
+            except Exception:
+                raise ValidationError({'cursor': 'Invalid cursor.'})
+        typed.append(value)
+
+    condition = Q(pk__in=[])
+    prefix = Q()
+    for (name, _, desc), value in zip(keys, typed):
+        after = _after(name, value, desc, reverse)
+        if after is not None:
+            condition |= prefix & after
+        prefix &= _equal(name, value)
+    return qs.filter(condition)
+
+
+def _row_values(obj, ordering):
+    return [getattr(obj, name) for name, _, _ in _keys(ordering)[:-1]] + [obj.pk]
+
+
+def keyset_page(qs, ordering, cursor, page_size):
+    """
+    Return ``(rows, next_cursor, previous_cursor)`` for one page.
+
+    ``ordering`` is a list of order_by strings (``'-updated_at'``,
+    ``'procedencia__nombre_lugar'``, an annotation name, …); the primary key
+    is appended as the tiebreaker.
+    """
+    ordering = [term for term in ordering if term.lstrip('-') != 'pk']
+    reverse = False
+    qs = _annotate(qs, ordering)
+    if cursor:
+        values, reverse = decode_cursor(cursor, ordering)
+        qs = _seek(qs, ordering, values, reverse)
+    rows = list(_order(qs, ordering, reverse)[:page_size + 1])
+    has_more = len(rows) > page_size
+    rows = rows[:page_size]
+    if reverse:
+        rows.reverse()
+
+    next_cursor = previous_cursor = None
+    if rows:
+        if has_more or reverse:
+            next_cursor = encode_cursor(ordering, _row_values(rows[-1], ordering))
+        if (has_more and reverse) or (cursor and not reverse):
+            previous_cursor = encode_cursor(ordering, _row_values(rows[0], ordering), reverse=True)
+    return rows, next_cursor, previous_cursor
+
+
+# ── counts ───────────────────────────────────────────────────────────────────
+
+def estimate_count(qs):
+    """Planner row estimate for ``qs`` (no scan)."""
+    qs = qs.order_by()
+    sql, params = qs.query.get_compiler(using=qs.db).as_sql()
+    with connections[qs.db].cursor() as cursor:
+        cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+        plan = cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]['Plan']['Plan Rows'])
+
+
+def cached_count(qs):
+    """Exact COUNT(*) cached under the query's SQL and the current data versions."""
+    qs = qs.order_by()
+    sql, params = qs.query.get_compiler(using=qs.db).as_sql()
+    versions = data_version.get_versions()
+    raw = json.dumps([sql, [str(p) for p in params], sorted(versions.items())])
+    key = f'{COUNT_KEY_PREFIX}:{hashlib.sha1(raw.encode()).hexdigest()}'
+    cache = caches['api']
+    count = cache.get(key)
+    if count is None:
+        count = qs.count()
+        cache.set(key, count)
+    return count
+
+
+def count_for(qs, mode):
+    if mode == 'exact':
+        return cached_count(qs)
+    if mode == 'estimate':
+        return estimate_count(qs)
+    return None
+
+
+# ── DRF paginator ────────────────────────────────────────────────────────────
+
+class KeysetPagination(BasePagination):
+    """
+    Cursor paginator for BaseV2ViewSet list endpoints.
+
+    Works with whatever ordering OrderingFilter (or the view's ``ordering``)
+    left on the queryset.  Response shape matches the page-number paginators
+    (``count``, ``next``, ``previous``, ``results``).
+    """
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 300
+    cursor_query_param = 'cursor'
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params.get(self.page_size_query_param, self.page_size))
+        except (TypeError, ValueError):
+            return self.page_size
+        return min(max(size, 1), self.max_page_size)
+
+    def get_ordering(self, queryset, view):
+        ordering = [term for term in queryset.query.order_by if isinstance(term, str)]
+        if not ordering:
+            ordering = list(getattr(view, 'ordering', None) or queryset.model._meta.ordering or [])
+        return [term for term in ordering if isinstance(term, str)]
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.count_mode = parse_count_mode(request)
+        self.count = count_for(queryset, self.count_mode)
+        rows, self.next_cursor, self.previous_cursor = keyset_page(
+            queryset,
+            self.get_ordering(queryset, view),
+            request.query_params.get(self.cursor_query_param),
+            self.get_page_size(request),
+        )
+        return rows
+
+    def _link(self, cursor):
+        if cursor is None:
+            return None
+        url = remove_query_param(self.request.build_absolute_uri(), 'page')
+        return replace_query_param(url, self.cursor_query_param, cursor)
+
+    def get_next_link(self):
+        return self._link(self.next_cursor)
+
+    def get_previous_link(self):
+        return self._link(self.previous_cursor)
+
+    def get_paginated_response(self, data):
+        return Response({
+            'count': self.count,
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'count': {'type': 'integer', 'nullable': True},
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
@@ -0,0 +1,121 @@
+"""
+Querysets for the v2 list serializers.
+
+list_queryset() adds everything a list serializer reads to the page query:
+FK joins, prefetches for the m2m lists, and annotations for the per-row
+counts and flags, so a page costs the same number of queries however many
+rows it holds:
+
+    documento_count    Archivo, Persona   correlated COUNT subquery
+    has_relaciones     Persona            EXISTS
+    has_lugares        Persona            EXISTS
+    persona_count      Lugar              stored counter (LugarEstadistica)
+    persona_lugar_rel  Lugar              ARRAY subquery of PersonaLugarRel ids
+
+The list serializers read these attributes and only fall back to one query
+per object when a queryset did not go through list_queryset().
+"""
+from django.contrib.postgres.expressions import ArraySubquery
+from django.db.models import Count, Exists, F, IntegerField, Max, Min, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+from dbgestor.models import (
+    Archivo, Corporacion, Documento, Lugar, Persona, PersonaEsclavizada,
+    PersonaLugarRel, PersonaNoEsclavizada, PersonaRelaciones,
+)
+
+
+def count_subquery(qs, column):
+    """Correlated ``SELECT COUNT(*)`` over ``qs`` grouped on ``column`` (0 when empty)."""
+    counted = qs.order_by().values(column).annotate(n=Count('*')).values('n')
+    return Coalesce(Subquery(counted, output_field=IntegerField()), Value(0))
+
+
+def persona_documento_count():
+    through = Persona.documentos.through
+    return count_subquery(through.objects.filter(persona_id=OuterRef('pk')), 'persona_id')
+
+
+def persona_has_relaciones():
+    return Exists(PersonaRelaciones.personas.through.objects.filter(persona_id=OuterRef('pk')))
+
+
+def persona_has_lugares():
+    return Exists(PersonaLugarRel.personas.through.objects.filter(persona_id=OuterRef('pk')))
+
+
+def archivo_documento_count():
+    return count_subquery(Documento.objects.filter(archivo_id=OuterRef('pk')), 'archivo_id')
+
+
+def lugar_persona_count():
+    # Distinct personas over every role, kept by dbgestor.lugar_estadisticas.
+    return Coalesce(F('estadistica__personas_total'), Value(0))
+
+
+def lugar_persona_lugar_rel():
+    return ArraySubquery(
+        PersonaLugarRel.objects.filter(lugar_id=OuterRef('pk'))
+        .order_by('persona_x_lugares').values('persona_x_lugares')
+    )
+
+
+def _persona_base(qs):
+    # PersonaListSerializer, for mixed (polymorphic) Persona lists.
+    return qs.annotate(documento_count=persona_documento_count())
+
+
+def _persona(qs):
+    return qs.prefetch_related('documentos', 'calidades', 'estado_civil').annotate(
+        documento_count=persona_documento_count(),
+        has_relaciones=persona_has_relaciones(),
+        has_lugares=persona_has_lugares(),
+    )
+
+
+def _persona_esclavizada(qs):
+    return _persona(qs).select_related('procedencia').prefetch_related(
+        'etnonimos', 'hispanizacion',
+    ).annotate(
+        earliest_doc_date=Min('documentos__fecha_inicial'),
+        latest_doc_date=Max('documentos__fecha_inicial'),
+    )
+
+
+def _persona_no_esclavizada(qs):
+    return _persona(qs).prefetch_related('ocupaciones')
+
+
+def _documento(qs):
+    return qs.select_related('archivo', 'tipo_documento', 'lugar_de_produccion')
+
+
+def _archivo(qs):
+    return qs.annotate(documento_count=archivo_documento_count())
+
+
+def _lugar(qs):
+    return qs.select_related('tipo').annotate(
+        persona_count=lugar_persona_count(),
+        persona_lugar_rel=lugar_persona_lugar_rel(),
+    )
+
+
+def _corporacion(qs):
+    return qs.select_related('tipo_institucion', 'lugar_corporacion__tipo')
+
+
+BUILDERS = {
+    Archivo: _archivo,
+    Documento: _documento,
+    Persona: _persona_base,
+    PersonaEsclavizada: _persona_esclavizada,
+    PersonaNoEsclavizada: _persona_no_esclavizada,
+    Lugar: _lugar,
+    Corporacion: _corporacion,
+}
+
+
+def list_queryset(qs):
+    """``qs`` with the joins, prefetches and annotations its list serializer reads."""
+    return BUILDERS[qs.model](qs)
@@ -3,6 +3,7 @@ from datetime import datetime
 
 from api.models import LogMessage
 from rest_framework import serializers
+from dbgestor import vocabulario
 from dbgestor.models import (Archivo, Documento, PersonaEsclavizada, PersonaNoEsclavizada, Corporacion, InstitucionRolEvento,
                              PersonaLugarRel, Lugar, PersonaRelaciones, Actividades, Persona,
                              PersonaRolEvento, Calidades, Hispanizaciones, Etonimos, EstadoCivil,
@@ -54,6 +55,14 @@ class CorporacionReferenceSerializer(serializers.ModelSerializer):
 
 
 # List Serializers - For table views and lightweight listings
+def annotated(obj, name, fallback):
+    """Value annotated by api.v2.querysets.list_queryset, else ``fallback()``."""
+    try:
+        return getattr(obj, name)
+    except AttributeError:
+        return fallback()
+
+
 class ArchivoListSerializer(serializers.ModelSerializer):
     """Archivo data for list views"""
     nombre_abreviado = serializers.CharField(read_only=True)
@@ -64,7 +73,7 @@ class ArchivoListSerializer(serializers.ModelSerializer):
         fields = ['archivo_id', 'nombre', 'nombre_abreviado', 'archivo_idno', 'documento_count', 'created_at', 'updated_at']
 
     def get_documento_count(self, obj):
-        return obj.documento_set.count()
+        return annotated(obj, 'documento_count', lambda: obj.documento_set.count())
 
 
 class DocumentoListSerializer(serializers.ModelSerializer):
@@ -92,7 +101,13 @@ class PersonaListSerializer(serializers.ModelSerializer):
                   'sexo', 'polymorphic_ctype', 'documento_count', 'created_at', 'updated_at']
 
     def get_documento_count(self, obj):
-        return obj.documentos.count()
+        return annotated(obj, 'documento_count', lambda: obj.documentos.count())
+
+    def get_has_relaciones(self, obj):
+        return annotated(obj, 'has_relaciones', lambda: obj.relaciones.exists())
+
+    def get_has_lugares(self, obj):
+        return annotated(obj, 'has_lugares', lambda: obj.p_x_l_pere.exists())
 
 
 class PersonaEsclavizadaListSerializer(PersonaListSerializer):
@@ -128,12 +143,6 @@ class PersonaEsclavizadaListSerializer(PersonaListSerializer):
     def get_hispanizacion(self, obj):
         return [str(h) for h in obj.hispanizacion.all()]
 
-    def get_has_relaciones(self, obj):
-        return obj.relaciones.exists()
-
-    def get_has_lugares(self, obj):
-        return obj.p_x_l_pere.exists()
-
     def get_documento_list(self, obj):
         return [
             {'documento_id': d.documento_id, 'documento_idno': d.documento_idno, 'titulo': d.titulo}
@@ -175,12 +184,6 @@ class PersonaNoEsclavizadaListSerializer(PersonaListSerializer):
             'ocupaciones', 'calidades', 'estado_civil',
         ]
 
-    def get_has_relaciones(self, obj):
-        return obj.relaciones.exists()
-
-    def get_has_lugares(self, obj):
-        return obj.p_x_l_pere.exists()
-
     def get_documento_list(self, obj):
         return [
             {'documento_id': d.documento_id, 'documento_idno': d.documento_idno, 'titulo': d.titulo}
@@ -210,19 +213,18 @@ class LugarListSerializer(serializers.ModelSerializer):
                   'persona_count', 'persona_lugar_rel']
 
     def get_persona_count(self, obj):
-        return Persona.objects.filter(
+        return annotated(obj, 'persona_count', lambda: Persona.objects.filter(
             Q(p_x_l_pere__lugar=obj) |
             Q(lugar_nacimiento=obj) |
             Q(lugar_defuncion=obj) |
             Q(personaesclavizada__procedencia=obj)
-        ).distinct().count()
+        ).distinct().count())
 
     def get_persona_lugar_rel(self, obj):
-        from dbgestor.models import PersonaLugarRel
-        return list(
+        return annotated(obj, 'persona_lugar_rel', lambda: list(
             PersonaLugarRel.objects.filter(lugar=obj)
-            .values_list('persona_x_lugares', flat=True)
-        )
+            .order_by('persona_x_lugares').values_list('persona_x_lugares', flat=True)
+        ))
 
 
 class CorporacionListSerializer(serializers.ModelSerializer):
@@ -858,16 +860,24 @@ class InstitucionRolEventoWriteSerializer(serializers.ModelSerializer):
 # ── Vocabulary Write Serializers (update_or_create with title-casing) ─────────
 
 class _VocabUpsertMixin:
-    """Mixin that implements update_or_create with title-casing for the main text field."""
+    """
+    Mixin that implements update_or_create with title-casing for the main text field.
+    The existing row is found through the vocabulary cache (dbgestor.vocabulario),
+    with the term normalized as the model's save() stores it.
+    """
     vocab_field: str = ''
 
     def create(self, validated_data):
-        validated_data[self.vocab_field] = validated_data[self.vocab_field].title()
-        obj, _ = self.Meta.model.objects.update_or_create(
-            **{self.vocab_field: validated_data[self.vocab_field]},
-            defaults=validated_data,
-        )
-        return obj
+        model = self.Meta.model
+        term = vocabulario.normalize(model, validated_data[self.vocab_field].title())
+        validated_data[self.vocab_field] = term
+        pk = vocabulario.resolve(model, [term], create=False).get(term)
+        instance = model.objects.filter(pk=pk).first() if pk is not None else None
+        if instance is None:
+            return super().create(validated_data)
+        if any(getattr(instance, key) != value for key, value in validated_data.items()):
+            return super().update(instance, validated_data)
+        return instance
 
     def update(self, instance, validated_data):
         validated_data[self.vocab_field] = validated_data[self.vocab_field].title()
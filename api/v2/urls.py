@@ -11,6 +11,7 @@ from .views import (
     EstadoCivilViewSet, ActividadesViewSet, SituacionLugarViewSet, RolEventoViewSet,
     TiposInstitucionViewSet, TipoLugarViewSet,
     MergeCandidatesView, MergeExecuteView, MergeSuggestView,
+    IngestJobsView, IngestJobView, IngestJobResumeView,
 )
 from .crosstab import CrosstabView, CrosstabSchemaView
 
@@ -65,4 +66,7 @@ urlpatterns = [
     path('merge/candidates/', MergeCandidatesView.as_view(), name='merge_candidates_v2'),
     path('merge/execute/', MergeExecuteView.as_view(), name='merge_execute_v2'),
     path('merge/suggest/', MergeSuggestView.as_view(), name='merge_suggest_v2'),
+    path('ingest/jobs/', IngestJobsView.as_view(), name='ingest_jobs_v2'),
+    path('ingest/jobs/<int:pk>/', IngestJobView.as_view(), name='ingest_job_v2'),
+    path('ingest/jobs/<int:pk>/resume/', IngestJobResumeView.as_view(), name='ingest_job_resume_v2'),
 ]
\ No newline at end of file
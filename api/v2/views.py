@@ -1,18 +1,22 @@
 import json
 import logging
+import os
 import re
 from collections import defaultdict
 
 from django.db import transaction
 from django.contrib.contenttypes.models import ContentType
-from django.db.models import Count, Exists, F, OuterRef, Q, Prefetch, Min, Max, Subquery
+from django.db.models import Count, Exists, F, Func, IntegerField, OuterRef, Q, Prefetch, Subquery
 from django.db.models.functions import ExtractYear
 from django.contrib.auth import authenticate, login, logout
+from django.contrib.postgres.expressions import ArraySubquery
 from django.contrib.postgres.search import SearchQuery, SearchRank, TrigramSimilarity
 from django.views.decorators.csrf import csrf_exempt, ensure_csrf_cookie
+from django.utils import timezone
 from django.utils.decorators import method_decorator
-from django.http import JsonResponse, HttpResponse
+from django.http import JsonResponse
 from django.middleware.csrf import get_token
+from django.urls import reverse
 from rest_framework.permissions import BasePermission, IsAuthenticated, AllowAny
 from rest_framework.throttling import AnonRateThrottle
 
@@ -26,21 +30,31 @@ class RegisterRateThrottle(AnonRateThrottle):
 from rest_framework import viewsets, status
 from rest_framework.views import APIView
 from rest_framework.response import Response
+from rest_framework.exceptions import APIException, ValidationError
 from rest_framework.decorators import api_view, action, permission_classes, throttle_classes
 from rest_framework.filters import SearchFilter, OrderingFilter
 from django_filters.rest_framework import DjangoFilterBackend
 import django_filters
 from urllib.parse import urlencode
 from rest_framework.pagination import PageNumberPagination
-import csv
 
+from api.v1 import ingest_jobs
+from dbgestor import adyacencias, data_version, lugar_estadisticas, mapa_resumen, metricas_red, trayectorias
 from dbgestor.models import (Archivo, Documento, PersonaEsclavizada, PersonaNoEsclavizada, Corporacion,
                              PersonaLugarRel, Lugar, PersonaRelaciones, Persona,
                              PersonaRolEvento, InstitucionRolEvento,
                              Calidades, Hispanizaciones, Etonimos, EstadoCivil,
                              Actividades as ActividadesModel, SituacionLugar, TipoDocumental,
-                             RolEvento, TiposInstitucion, TipoLugar, SugerenciaMerge)
-
+                             RolEvento, TiposInstitucion, TipoLugar, SugerenciaMerge,
+                             TrayectoriaSegmento, IngestJob)
+
+from . import conditional
+from .conditional import conditional_get
+from .export import EXPORT_FORMATS, streaming_export
+from .facets import (collect_facets, get_cached_summary, parse_facets_param, set_cached_summary,
+                     summary_cache_key)
+from .pagination import KeysetPagination, count_for, keyset_page, parse_count_mode, wants_keyset
+from .querysets import list_queryset, persona_documento_count
 from .serializers import (
     # Reference serializers
     ArchivoReferenceSerializer, DocumentoReferenceSerializer, PersonaReferenceSerializer,
@@ -92,6 +106,22 @@ def parse_search_query(raw_query):
     return raw_query, False
 
 
+class NetworkMetricsNotReady(APIException):
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = 'Network metrics are being computed, retry shortly.'
+    default_code = 'network_metrics_not_ready'
+    # Sent as Retry-After by DRF's exception handler.
+    wait = 5
+
+
+def network_metrics():
+    """metricas_red.get_metrics(), as a 503 while the first version is being computed."""
+    try:
+        return metricas_red.get_metrics()
+    except metricas_red.MetricsUnavailable:
+        raise NetworkMetricsNotReady()
+
+
 class APIPerm(BasePermission):
     """
     Custom permission for API access.
@@ -153,7 +183,12 @@ class BaseV2ViewSet(viewsets.ModelViewSet):
     ordering = ['-created_at']
 
     def get_pagination_class(self):
-        """Use BrowsePagination when client requests page_size > 100."""
+        """
+        Use KeysetPagination when the client opts in (``pagination=keyset`` or
+        a ``cursor``), BrowsePagination when it requests page_size > 100.
+        """
+        if wants_keyset(self.request):
+            return KeysetPagination
         page_size = self.request.query_params.get('page_size')
         if page_size and int(page_size) > 100:
             return BrowsePagination
@@ -181,58 +216,40 @@ class BaseV2ViewSet(viewsets.ModelViewSet):
             return getattr(self, 'detail_serializer_class', self.serializer_class)
         return self.serializer_class
 
+    # Actions that serialize with list_serializer_class and want its prefetches.
+    LIST_ACTIONS = ('list', 'export_csv', 'export_jsonl')
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.action in self.LIST_ACTIONS:
+            queryset = list_queryset(queryset)
+        return queryset
+
     @action(detail=False, methods=['get'])
     def export_csv(self, request):
         """
-        Export data as CSV - using list serializer for lightweight export
+        Stream every filtered row as CSV, using the list serializer's columns.
         """
-        queryset = self.filter_queryset(self.get_queryset())[:1000]  # Limit to prevent timeout
+        return self._export(request, 'csv')
+
+    @action(detail=False, methods=['get'])
+    def export_jsonl(self, request):
+        """
+        Stream every filtered row as JSON Lines (one list-serializer object per line).
+        """
+        return self._export(request, 'jsonl')
+
+    def _export(self, request, export_format):
+        queryset = self.filter_queryset(self.get_queryset())
         serializer_class = getattr(self, 'list_serializer_class', self.serializer_class)
-        serializer = serializer_class(queryset, many=True)
-        
-        response = HttpResponse(content_type='text/csv')
-        response['Content-Disposition'] = f'attachment; filename="{self.get_export_filename()}"'
-        
-        if serializer.data:
-            flattened_data = [self.flatten_for_csv(row) for row in serializer.data]
-            # Collect all unique fieldnames across every row to handle per-row key variation
-            all_fields = list(dict.fromkeys(k for row in flattened_data for k in row.keys()))
-            writer = csv.DictWriter(response, fieldnames=all_fields, extrasaction='ignore', restval='')
-            writer.writeheader()
-            for row in flattened_data:
-                writer.writerow(row)
-        
-        return response
+        filename = os.path.splitext(self.get_export_filename())[0]
+        return streaming_export(queryset, serializer_class, export_format, filename,
+                                context=self.get_serializer_context())
 
     def get_export_filename(self):
         """Override in subclasses to provide meaningful filenames"""
         return f"{self.__class__.__name__.lower().replace('viewset', '')}_export.csv"
 
-    def flatten_for_csv(self, row):
-        """Flatten nested objects for CSV export"""
-        flattened = {}
-        for key, value in row.items():
-            if isinstance(value, dict):
-                # For nested objects, include just the ID and name/title
-                if 'id' in value:
-                    flattened[f"{key}_id"] = value.get('id')
-                if 'nombre' in value:
-                    flattened[f"{key}_nombre"] = value.get('nombre')
-                elif 'titulo' in value:
-                    flattened[f"{key}_titulo"] = value.get('titulo')
-                elif 'nombre_lugar' in value:
-                    flattened[f"{key}_nombre"] = value.get('nombre_lugar')
-            elif isinstance(value, list):
-                # Always use _ids suffix for list-of-dicts; plain join for scalar lists
-                if not value or isinstance(value[0], dict):
-                    ids = [str(item.get('id', '')) for item in value if isinstance(item, dict) and 'id' in item]
-                    flattened[f"{key}_ids"] = '; '.join(ids)
-                else:
-                    flattened[key] = '; '.join([str(v) for v in value])
-            else:
-                flattened[key] = value
-        return flattened
-
 
 # Archivo ViewSet
 class ArchivoViewSet(BaseV2ViewSet):
@@ -250,7 +267,7 @@ class ArchivoViewSet(BaseV2ViewSet):
     def documentos(self, request, archivo_id=None):
         """Get all documents for this archivo"""
         archivo = self.get_object()
-        documentos = archivo.documento_set.all()
+        documentos = list_queryset(archivo.documento_set.all())
         page = self.paginate_queryset(documentos)
         
         if page is not None:
@@ -317,7 +334,8 @@ class DocumentoViewSet(BaseV2ViewSet):
                 '-titulo_similarity',
                 '-updated_at'
             ).distinct()
-            
+            queryset = list_queryset(queryset)
+
             page = self.paginate_queryset(queryset)
             
             if page is not None:
@@ -334,7 +352,7 @@ class DocumentoViewSet(BaseV2ViewSet):
     def personas(self, request, documento_id=None):
         """Get all personas for this documento"""
         documento = self.get_object()
-        personas = documento.persona_set.all()
+        personas = list_queryset(documento.persona_set.all())
         page = self.paginate_queryset(personas)
         
         if page is not None:
@@ -389,17 +407,7 @@ class PersonaEsclavizadaViewSet(DocumentoLinkMixin, BaseV2ViewSet):
     def get_queryset(self):
         queryset = super().get_queryset()
 
-        if self.action == 'list':
-            queryset = queryset.select_related(
-                'procedencia',
-            ).prefetch_related(
-                'etnonimos', 'hispanizacion', 'calidades', 'estado_civil',
-                'relaciones', 'p_x_l_pere',
-            ).annotate(
-                earliest_doc_date=Min('documentos__fecha_inicial'),
-                latest_doc_date=Max('documentos__fecha_inicial'),
-            )
-        elif self.action in ('retrieve', 'trajectory'):
+        if self.action in ('retrieve', 'trajectory'):
             queryset = queryset.select_related(
                 'procedencia', 'lugar_nacimiento', 'lugar_defuncion',
             ).prefetch_related(
@@ -447,7 +455,8 @@ class PersonaEsclavizadaViewSet(DocumentoLinkMixin, BaseV2ViewSet):
                 '-nombre_similarity',
                 '-updated_at'
             ).distinct()
-            
+            queryset = list_queryset(queryset)
+
             page = self.paginate_queryset(queryset)
             
             if page is not None:
@@ -499,6 +508,7 @@ class PersonaEsclavizadaViewSet(DocumentoLinkMixin, BaseV2ViewSet):
 
         from django.contrib.contenttypes.models import ContentType
         pe_ctype_id = ContentType.objects.get_for_model(PersonaEsclavizada).id
+        metrics = network_metrics()
 
         # Collect every persona that shares a relacion with the current one
         node_map = {}
@@ -516,6 +526,7 @@ class PersonaEsclavizadaViewSet(DocumentoLinkMixin, BaseV2ViewSet):
                             'label': p.nombre_normalizado or str(p.persona_id),
                             'type': 'esclavizada' if p.polymorphic_ctype_id == pe_ctype_id else 'no_esclavizada',
                             'sexo': getattr(p, 'sexo', 'i') or 'i',
+                            **metrics.get(p.persona_id),
                         }
                     }
 
@@ -687,11 +698,7 @@ class PersonaNoEsclavizadaViewSet(DocumentoLinkMixin, BaseV2ViewSet):
     def get_queryset(self):
         queryset = super().get_queryset()
 
-        if self.action == 'list':
-            queryset = queryset.prefetch_related(
-                'relaciones', 'p_x_l_pere', 'ocupaciones', 'calidades', 'estado_civil',
-            )
-        elif self.action == 'retrieve':
+        if self.action == 'retrieve':
             queryset = queryset.prefetch_related(
                 'documentos__archivo',
                 'relaciones__personas',
@@ -737,7 +744,8 @@ class PersonaNoEsclavizadaViewSet(DocumentoLinkMixin, BaseV2ViewSet):
                 '-nombre_similarity',
                 '-updated_at'
             ).distinct()
-            
+            queryset = list_queryset(queryset)
+
             page = self.paginate_queryset(queryset)
             
             if page is not None:
@@ -775,6 +783,7 @@ class PersonaNoEsclavizadaViewSet(DocumentoLinkMixin, BaseV2ViewSet):
 
         from django.contrib.contenttypes.models import ContentType
         pe_ctype_id = ContentType.objects.get_for_model(PersonaEsclavizada).id
+        metrics = network_metrics()
 
         node_map = {}
         edges = []
@@ -791,6 +800,7 @@ class PersonaNoEsclavizadaViewSet(DocumentoLinkMixin, BaseV2ViewSet):
                             'label': p.nombre_normalizado or str(p.persona_id),
                             'type': 'esclavizada' if p.polymorphic_ctype_id == pe_ctype_id else 'no_esclavizada',
                             'sexo': getattr(p, 'sexo', 'i') or 'i',
+                            **metrics.get(p.persona_id),
                         }
                     }
 
@@ -882,7 +892,8 @@ class LugarViewSet(BaseV2ViewSet):
                 '-search_rank',
                 '-nombre_similarity'
             ).distinct()
-            
+            queryset = list_queryset(queryset)
+
             page = self.paginate_queryset(queryset)
             
             if page is not None:
@@ -917,7 +928,7 @@ class LugarViewSet(BaseV2ViewSet):
     def procedencia(self, request, lugar_id=None):
         """Get PersonaEsclavizada whose procedencia is this lugar."""
         lugar = self.get_object()
-        personas = lugar.procedencia_persona_esclavizada.select_related().all()
+        personas = lugar.procedencia_persona_esclavizada.annotate(documento_count=persona_documento_count())
         page = self.paginate_queryset(personas)
         if page is not None:
             serializer = PersonaListSerializer(page, many=True)
@@ -977,7 +988,8 @@ class CorporacionViewSet(DocumentoLinkMixin, BaseV2ViewSet):
                 '-nombre_similarity',
                 '-updated_at'
             ).distinct()
-            
+            queryset = list_queryset(queryset)
+
             page = self.paginate_queryset(queryset)
             
             if page is not None:
@@ -1065,6 +1077,7 @@ class PersonaLugarRelViewSet(viewsets.ModelViewSet):
         if not isinstance(items, list):
             return Response({'error': 'Expected a list.'}, status=status.HTTP_400_BAD_REQUEST)
         errors = []
+        updated = []
         for item in items:
             pk = item.get('persona_x_lugares')
             ordinal = item.get('ordinal')
@@ -1075,9 +1088,14 @@ class PersonaLugarRelViewSet(viewsets.ModelViewSet):
                 errors.append({'item': item, 'error': '0 no es un valor permitido para el ordinal.'})
                 continue
             try:
-                PersonaLugarRel.objects.filter(persona_x_lugares=pk).update(ordinal=ordinal)
+                PersonaLugarRel.objects.filter(persona_x_lugares=pk).update(ordinal=ordinal, updated_at=timezone.now())
+                updated.append(pk)
             except Exception as e:
                 errors.append({'item': item, 'error': str(e)})
+        if updated:
+            # QuerySet.update() sends no signals: queue the reordered trajectories by hand
+            trayectorias.mark_dirty(Persona.objects.filter(p_x_l_pere__in=updated).values_list('pk', flat=True))
+            data_version.bump('persona')
         if errors:
             return Response({'errors': errors}, status=status.HTTP_400_BAD_REQUEST)
         return Response({'status': 'updated'})
@@ -1103,6 +1121,14 @@ class VocabBaseViewSet(viewsets.ModelViewSet):
             return getattr(self, 'write_serializer_class', self.serializer_class)
         return self.serializer_class
 
+    @conditional_get('vocab')
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+
+    @conditional_get('vocab')
+    def retrieve(self, request, *args, **kwargs):
+        return super().retrieve(request, *args, **kwargs)
+
 
 class TipoDocumentalViewSet(VocabBaseViewSet):
     from dbgestor.models import TipoDocumental as _TipoDocumental
@@ -1194,6 +1220,15 @@ class SearchAPIView(APIView):
         page_size       – results per page (default: 30, max: 300)
         ordering        – field name, prefix with ``-`` for descending
         search          – simple text filter (icontains) for browse mode
+        facets          – comma-separated facet keys to compute (default: all;
+                          empty or ``none`` skips facets)
+        pagination      – ``keyset`` switches a single-type request to cursor
+                          pagination (``next``/``previous`` carry a ``cursor``)
+        cursor          – opaque keyset cursor from a previous response
+        count           – keyset mode only: exact (cached, default), estimate
+                          (planner estimate) or none
+        export_format   – ``csv`` or ``jsonl`` streams every matching row of a
+                          single entity type instead of a page
 
     Filter params (comma-separated):
         lugar_id, archivo_id, year, etnonimo, calidad, hispanizacion, ocupacion
@@ -1506,171 +1541,19 @@ class SearchAPIView(APIView):
 
     # ── facets ─────────────────────────────────────────────────────────
 
-    def _collect_facets(self, querysets_by_type):
+    def _collect_facets(self, querysets_by_type, requested=None):
         """
         Build facet buckets from the *full* (unfiltered-by-sidebar) querysets
-        so the user always sees what is available.
+        so the user always sees what is available.  See facets.py.
         """
-        lugar_counts = {}
-        archivo_counts = {}
-        year_set = set()
-        etnonimo_counts = {}
-        calidad_counts = {}
-        hispanizacion_counts = {}
-        ocupacion_counts = {}
-        procedencia_counts = {}
-        estado_civil_counts = {}
-        tipo_documental_counts = {}
-
-        for type_key, qs in querysets_by_type.items():
-            # ── Lugares ───
-            if type_key == 'documento':
-                for row in qs.filter(lugar_de_produccion__isnull=False).values(
-                        'lugar_de_produccion__lugar_id', 'lugar_de_produccion__nombre_lugar'
-                ).annotate(c=Count('documento_id')):
-                    lid = row['lugar_de_produccion__lugar_id']
-                    lugar_counts.setdefault(lid, {'id': lid, 'nombre': row['lugar_de_produccion__nombre_lugar'], 'count': 0})
-                    lugar_counts[lid]['count'] += row['c']
-            elif type_key in ('personaesclavizada', 'personanoesclavizada'):
-                for row in qs.filter(p_x_l_pere__lugar__isnull=False).values(
-                        'p_x_l_pere__lugar__lugar_id', 'p_x_l_pere__lugar__nombre_lugar'
-                ).annotate(c=Count('persona_id', distinct=True)):
-                    lid = row['p_x_l_pere__lugar__lugar_id']
-                    lugar_counts.setdefault(lid, {'id': lid, 'nombre': row['p_x_l_pere__lugar__nombre_lugar'], 'count': 0})
-                    lugar_counts[lid]['count'] += row['c']
-
-            # ── Archivos ──
-            if type_key == 'documento':
-                for row in qs.values('archivo__archivo_id', 'archivo__nombre').annotate(c=Count('documento_id')):
-                    aid = row['archivo__archivo_id']
-                    archivo_counts.setdefault(aid, {'id': aid, 'nombre': row['archivo__nombre'], 'count': 0})
-                    archivo_counts[aid]['count'] += row['c']
-            elif type_key in ('personaesclavizada', 'personanoesclavizada'):
-                for row in qs.filter(documentos__isnull=False).values(
-                        'documentos__archivo__archivo_id', 'documentos__archivo__nombre'
-                ).annotate(c=Count('persona_id', distinct=True)):
-                    aid = row['documentos__archivo__archivo_id']
-                    if aid:
-                        archivo_counts.setdefault(aid, {'id': aid, 'nombre': row['documentos__archivo__nombre'], 'count': 0})
-                        archivo_counts[aid]['count'] += row['c']
-
-            # ── Años ──
-            if type_key == 'documento':
-                for row in qs.filter(fecha_inicial__isnull=False).annotate(
-                        y=ExtractYear('fecha_inicial')).values('y').annotate(c=Count('documento_id')):
-                    year_set.add(row['y'])
-            elif type_key in ('personaesclavizada', 'personanoesclavizada'):
-                for row in qs.filter(documentos__fecha_inicial__isnull=False).annotate(
-                        y=ExtractYear('documentos__fecha_inicial')).values('y').annotate(
-                        c=Count('persona_id', distinct=True)):
-                    year_set.add(row['y'])
-
-            # ── Persona-specific facets ──
-            if type_key in ('personaesclavizada', 'personanoesclavizada'):
-                for row in qs.filter(calidades__isnull=False).values(
-                        'calidades__calidad').annotate(c=Count('persona_id', distinct=True)):
-                    label = row['calidades__calidad']
-                    calidad_counts[label] = calidad_counts.get(label, 0) + row['c']
-
-                for row in qs.filter(ocupaciones__isnull=False).values(
-                        'ocupaciones__actividad').annotate(c=Count('persona_id', distinct=True)):
-                    label = row['ocupaciones__actividad']
-                    ocupacion_counts[label] = ocupacion_counts.get(label, 0) + row['c']
-
-                for row in qs.filter(estado_civil__isnull=False).values(
-                        'estado_civil__estado_civil').annotate(c=Count('persona_id', distinct=True)):
-                    label = row['estado_civil__estado_civil']
-                    estado_civil_counts[label] = estado_civil_counts.get(label, 0) + row['c']
-
-                for row in qs.filter(documentos__tipo_documento__isnull=False).values(
-                        'documentos__tipo_documento__tipo_documental').annotate(c=Count('persona_id', distinct=True)):
-                    label = row['documentos__tipo_documento__tipo_documental']
-                    tipo_documental_counts[label] = tipo_documental_counts.get(label, 0) + row['c']
-
-            if type_key == 'personaesclavizada':
-                for row in qs.filter(etnonimos__isnull=False).values(
-                        'etnonimos__etonimo').annotate(c=Count('persona_id', distinct=True)):
-                    label = row['etnonimos__etonimo']
-                    etnonimo_counts[label] = etnonimo_counts.get(label, 0) + row['c']
-
-                for row in qs.filter(hispanizacion__isnull=False).values(
-                        'hispanizacion__hispanizacion').annotate(c=Count('persona_id', distinct=True)):
-                    label = row['hispanizacion__hispanizacion']
-                    hispanizacion_counts[label] = hispanizacion_counts.get(label, 0) + row['c']
-
-                for row in qs.filter(procedencia__isnull=False).values(
-                        'procedencia__lugar_id', 'procedencia__nombre_lugar'
-                ).annotate(c=Count('persona_id', distinct=True)):
-                    lid = row['procedencia__lugar_id']
-                    procedencia_counts.setdefault(lid, {'id': lid, 'label': row['procedencia__nombre_lugar'], 'count': 0})
-                    procedencia_counts[lid]['count'] += row['c']
-
-        # ── Build hierarchical year tree (century → decade → year) ────
-        century_labels = {16: 'XVI', 17: 'XVII', 18: 'XVIII', 19: 'XIX', 20: 'XX'}
-        years_tree = {}
-        for y in sorted(year_set):
-            c = y // 100 + 1
-            century = f"Siglo {century_labels.get(c, str(c))}"
-            decade = (y // 10) * 10
-            years_tree.setdefault(century, {})
-            years_tree[century].setdefault(decade, [])
-            years_tree[century][decade].append(y)
-
-        return {
-            'lugares': sorted(lugar_counts.values(), key=lambda x: -x['count']),
-            'archivos': sorted(archivo_counts.values(), key=lambda x: -x['count']),
-            'fechas': years_tree,
-            'year_range': {'min': min(year_set), 'max': max(year_set)} if year_set else None,
-            'etnonimos': sorted(
-                [{'label': k, 'count': v} for k, v in etnonimo_counts.items()],
-                key=lambda x: -x['count']),
-            'calidades': sorted(
-                [{'label': k, 'count': v} for k, v in calidad_counts.items()],
-                key=lambda x: -x['count']),
-            'hispanizaciones': sorted(
-                [{'label': k, 'count': v} for k, v in hispanizacion_counts.items()],
-                key=lambda x: -x['count']),
-            'ocupaciones': sorted(
-                [{'label': k, 'count': v} for k, v in ocupacion_counts.items()],
-                key=lambda x: -x['count']),
-            'procedencias': sorted(procedencia_counts.values(), key=lambda x: -x['count']),
-            'estados_civiles': sorted(
-                [{'label': k, 'count': v} for k, v in estado_civil_counts.items()],
-                key=lambda x: -x['count']),
-            'tipos_documentales': sorted(
-                [{'label': k, 'count': v} for k, v in tipo_documental_counts.items()],
-                key=lambda x: -x['count']),
-        }
+        return collect_facets(querysets_by_type, requested)
 
-    # ── CSV export helper ─────────────────────────────────────────────
-
-    CSV_MAX_ROWS = 5000
-
-    def _export_csv(self, qs, serializer_cls, type_key):
-        """Stream the filtered queryset as a CSV download."""
-        qs = qs[:self.CSV_MAX_ROWS]
-        serializer = serializer_cls(qs, many=True)
-
-        filename = f"{type_key}_export.csv"
-        response = HttpResponse(content_type='text/csv')
-        response['Content-Disposition'] = f'attachment; filename="{filename}"'
-
-        if serializer.data:
-            flattened_data = [
-                BaseV2ViewSet.flatten_for_csv(None, row) for row in serializer.data
-            ]
-            all_fields = list(dict.fromkeys(
-                k for row in flattened_data for k in row.keys()
-            ))
-            writer = csv.DictWriter(
-                response, fieldnames=all_fields,
-                extrasaction='ignore', restval='',
-            )
-            writer.writeheader()
-            for row in flattened_data:
-                writer.writerow(row)
+    # ── export helper ─────────────────────────────────────────────────
 
-        return response
+    def _export(self, qs, serializer_cls, type_key, export_format):
+        """Stream the whole filtered queryset as a CSV / JSON Lines download."""
+        return streaming_export(qs, serializer_cls, export_format, f"{type_key}_export",
+                                context={'request': self.request})
 
     # ── main handler ──────────────────────────────────────────────────
 
@@ -1700,6 +1583,12 @@ class SearchAPIView(APIView):
                 else list(self.TYPE_CONFIGS.keys())
             )
 
+            # Keyset pagination only applies to a single entity type; the
+            # multi-type merge below keeps page numbers.
+            keyset = wants_keyset(request) and len(active_types) == 1
+            count_mode = parse_count_mode(request) if keyset else 'exact'
+            next_cursor = previous_cursor = None
+
             # Parse sidebar filter params
             filters = {
                 'lugar_id': self._csv_ints(request, 'lugar_id'),
@@ -1728,31 +1617,27 @@ class SearchAPIView(APIView):
                 for tk, (model, _, _) in self.TYPE_CONFIGS.items():
                     base_querysets[tk] = model.objects.all()
 
-            # ── Prefetch for list serializer fields ──────────────
-            if 'personaesclavizada' in base_querysets:
-                base_querysets['personaesclavizada'] = base_querysets['personaesclavizada'].select_related(
-                    'procedencia',
-                ).prefetch_related(
-                    'documentos', 'etnonimos', 'hispanizacion', 'calidades', 'estado_civil',
-                    'relaciones', 'p_x_l_pere',
-                ).annotate(
-                    earliest_doc_date=Min('documentos__fecha_inicial'),
-                    latest_doc_date=Max('documentos__fecha_inicial'),
-                )
-            if 'personanoesclavizada' in base_querysets:
-                base_querysets['personanoesclavizada'] = base_querysets['personanoesclavizada'].prefetch_related(
-                    'documentos', 'relaciones', 'p_x_l_pere', 'ocupaciones', 'calidades', 'estado_civil',
-                )
-
-            # ── Facets (from unfiltered base querysets) ────────────
-            facets = self._collect_facets(
-                {tk: qs for tk, qs in base_querysets.items() if tk in active_types})
-
-            # ── Type counts (unfiltered) ──────────────────────────
+            # ── Facets + type counts (unfiltered, cached) ──────────
+            # Both come from the unfiltered base querysets, so they only
+            # depend on q, the types involved and the requested facets.
             # In search mode, return counts for ALL entity types so the
             # frontend can show badges like enslaved.org does.
+            requested_facets = parse_facets_param(request)
             count_types = list(self.TYPE_CONFIGS.keys()) if is_search else active_types
-            type_counts = {tk: base_querysets[tk].count() for tk in count_types}
+            summary_key = summary_cache_key(query_text, active_types, count_types, requested_facets)
+            summary = get_cached_summary(summary_key)
+            if summary is None:
+                facets = self._collect_facets(
+                    {tk: qs for tk, qs in base_querysets.items() if tk in active_types},
+                    requested_facets,
+                ) if requested_facets else {}
+                type_counts = {tk: base_querysets[tk].count() for tk in count_types}
+                set_cached_summary(summary_key, facets, type_counts)
+            else:
+                facets, type_counts = summary
+
+            # ── Joins, prefetches and annotations for the list serializers ──
+            base_querysets = {tk: list_queryset(qs) for tk, qs in base_querysets.items()}
 
             # ── Apply all filters per entity type + paginate ──────
             # In unified mode we query one entity type at a time (the
@@ -1779,28 +1664,28 @@ class SearchAPIView(APIView):
                     qs = self._apply_simple_search(qs, tk, search_text)
 
                 # Ordering
-                if is_search:
-                    if ordering_param:
-                        order_by, annotations = self._resolve_ordering(ordering_param, tk)
-                        if annotations:
-                            qs = qs.annotate(**annotations)
-                        qs = qs.order_by(order_by)
-                    else:
-                        qs = qs.order_by('-search_rank', '-name_similarity')
+                if is_search and not ordering_param:
+                    ordering = ['-search_rank', '-name_similarity']
                 else:
                     order_by, annotations = self._resolve_ordering(ordering_param, tk)
                     if annotations:
                         qs = qs.annotate(**annotations)
-                    qs = qs.order_by(order_by)
+                    ordering = [order_by]
+                qs = qs.order_by(*ordering)
 
-                # ── CSV export shortcut ────────────────────────────
-                if export_format == 'csv':
-                    return self._export_csv(qs, serializer_cls, tk)
+                # ── Export shortcut (csv / jsonl) ──────────────────
+                if export_format in EXPORT_FORMATS:
+                    return self._export(qs, serializer_cls, tk, export_format)
 
-                total_count = qs.count()
-                start = (page_number - 1) * page_size
-                end = start + page_size
-                page_qs = qs[start:end]
+                if keyset:
+                    total_count = count_for(qs, count_mode)
+                    page_qs, next_cursor, previous_cursor = keyset_page(
+                        qs, ordering, request.query_params.get('cursor'), page_size)
+                else:
+                    total_count = qs.count()
+                    start = (page_number - 1) * page_size
+                    end = start + page_size
+                    page_qs = qs[start:end]
 
                 results_data = [
                     {'type': tk, 'source': serializer_cls(obj).data}
@@ -1851,7 +1736,6 @@ class SearchAPIView(APIView):
                 ]
 
             # ── Build pagination URLs ─────────────────────────────
-            total_pages = max((total_count + page_size - 1) // page_size, 1)
             base_url = request.build_absolute_uri().split('?')[0]
             params = request.query_params.copy()
 
@@ -1859,17 +1743,35 @@ class SearchAPIView(APIView):
                 params['page'] = p
                 return f"{base_url}?{urlencode(params)}"
 
+            def build_cursor_url(cursor):
+                params.pop('page', None)
+                params['cursor'] = cursor
+                return f"{base_url}?{urlencode(params)}"
+
+            if keyset:
+                total_pages = (
+                    max((total_count + page_size - 1) // page_size, 1) if total_count is not None else None
+                )
+                next_url = build_cursor_url(next_cursor) if next_cursor else None
+                previous_url = build_cursor_url(previous_cursor) if previous_cursor else None
+            else:
+                total_pages = max((total_count + page_size - 1) // page_size, 1)
+                next_url = build_page_url(page_number + 1) if page_number < total_pages else None
+                previous_url = build_page_url(page_number - 1) if page_number > 1 else None
+
             return Response({
                 'count': total_count,
                 'page_size': page_size,
                 'total_pages': total_pages,
-                'next': build_page_url(page_number + 1) if page_number < total_pages else None,
-                'previous': build_page_url(page_number - 1) if page_number > 1 else None,
+                'next': next_url,
+                'previous': previous_url,
                 'typeCounts': type_counts,
                 'facets': facets,
                 'results': results_data,
             })
 
+        except ValidationError as e:
+            return Response(e.detail, status=400)
         except Exception as e:
             logger.error(f"Error in search/browse: {str(e)}")
             return Response({'error': 'An error occurred during the search'}, status=500)
@@ -1879,6 +1781,9 @@ class SearchNetworkAPIView(SearchAPIView):
     """Build a Cytoscape-ready people network from the current Search filters."""
 
     PERSON_TYPES = {'personaesclavizada', 'personanoesclavizada'}
+    # 'id' keeps the lowest persona_ids when truncating, 'top_k' the most
+    # central personas (see dbgestor.metricas_red).
+    SELECTIONS = {'id', 'top_k'}
     MAX_NODES = 700
     MAX_EDGES = 3500
 
@@ -1938,6 +1843,10 @@ class SearchNetworkAPIView(SearchAPIView):
         if scope_mode not in {'strict', 'expanded'}:
             scope_mode = 'strict'
 
+        selection = request.query_params.get('selection', 'id').strip().lower()
+        if selection not in self.SELECTIONS:
+            selection = 'id'
+
         try:
             base_qs = self._build_filtered_person_queryset(request, type_key)
             strict_node_ids = set(base_qs.values_list('persona_id', flat=True))
@@ -1948,6 +1857,7 @@ class SearchNetworkAPIView(SearchAPIView):
                     'edges': [],
                     'meta': {
                         'scope_mode': scope_mode,
+                        'selection': selection,
                         'node_count': 0,
                         'edge_count': 0,
                         'result_count': 0,
@@ -1955,83 +1865,43 @@ class SearchNetworkAPIView(SearchAPIView):
                     },
                 })
 
-            relaciones = PersonaRelaciones.objects.filter(
-                personas__persona_id__in=strict_node_ids,
-            ).prefetch_related('personas').select_related('persona_fuente').distinct()
+            metrics = network_metrics()
+            importance = metrics.importance if selection == 'top_k' else None
 
-            node_ids = set(strict_node_ids)
-            if scope_mode == 'expanded':
-                for rel in relaciones:
-                    for persona in rel.personas.all():
-                        node_ids.add(persona.persona_id)
-
-            truncated = False
-
-            if len(node_ids) > self.MAX_NODES:
-                strict_sorted = sorted(strict_node_ids)
-                if scope_mode == 'strict' or len(strict_sorted) >= self.MAX_NODES:
-                    node_ids = set(strict_sorted[:self.MAX_NODES])
+            # Results first, then their neighbours, each by persona_id or by importance.
+            node_ids = sorted(strict_node_ids, key=importance)[:self.MAX_NODES]
+            truncated = len(strict_node_ids) > self.MAX_NODES
+            if scope_mode == 'expanded' and not truncated:
+                keep_neighbors = self.MAX_NODES - len(node_ids)
+                if importance:
+                    neighbor_ids = sorted(adyacencias.neighbours(node_ids, limit=None), key=importance)
                 else:
-                    neighbor_ids = sorted(node_ids - strict_node_ids)
-                    keep_neighbors = self.MAX_NODES - len(strict_sorted)
-                    node_ids = set(strict_sorted + neighbor_ids[:keep_neighbors])
+                    neighbor_ids = adyacencias.neighbours(node_ids, limit=keep_neighbors + 1)
+                truncated = len(neighbor_ids) > keep_neighbors
+                node_ids += neighbor_ids[:keep_neighbors]
+
+            edge_rows = adyacencias.edges(
+                node_ids,
+                limit=self.MAX_EDGES + 1,
+                result_ids=strict_node_ids if scope_mode == 'expanded' else None,
+            )
+            if len(edge_rows) > self.MAX_EDGES:
+                edge_rows = edge_rows[:self.MAX_EDGES]
                 truncated = True
 
             edge_records = []
-            edge_keys = set()
-
-            for rel in relaciones:
-                rel_type = self._map_relation_type(rel.naturaleza_relacion)
-                rel_personas = [p for p in rel.personas.all() if p.persona_id in node_ids]
-                rel_persona_ids = [p.persona_id for p in rel_personas]
-
-                if len(rel_persona_ids) < 2:
-                    continue
-
-                if rel.persona_fuente_id and rel.persona_fuente_id in node_ids:
-                    sujeto_id = rel.persona_fuente_id
-                    for pid in rel_persona_ids:
-                        if pid == sujeto_id:
-                            continue
-                        source_id = f'p{sujeto_id}'
-                        target_id = f'p{pid}'
-                        edge_key = (source_id, target_id, rel_type, rel.persona_relacion_id)
-                        if edge_key in edge_keys:
-                            continue
-                        edge_keys.add(edge_key)
-                        edge_records.append({
-                            'data': {
-                                'id': f'e{rel.persona_relacion_id}-{source_id}-{target_id}',
-                                'source': source_id,
-                                'target': target_id,
-                                'relation': rel_type,
-                                'label': rel.descripcion_relacion or (rel.naturaleza_relacion or ''),
-                            }
-                        })
-                else:
-                    ordered_ids = sorted(rel_persona_ids)
-                    for idx, pid_a in enumerate(ordered_ids):
-                        for pid_b in ordered_ids[idx + 1:]:
-                            source_id = f'p{pid_a}'
-                            target_id = f'p{pid_b}'
-                            edge_key = (source_id, target_id, rel_type, rel.persona_relacion_id)
-                            if edge_key in edge_keys:
-                                continue
-                            edge_keys.add(edge_key)
-                            edge_records.append({
-                                'data': {
-                                    'id': f'e{rel.persona_relacion_id}-{source_id}-{target_id}',
-                                    'source': source_id,
-                                    'target': target_id,
-                                    'relation': rel_type,
-                                    'label': rel.descripcion_relacion or (rel.naturaleza_relacion or ''),
-                                }
-                            })
-
-            edge_records.sort(key=lambda e: (e['data']['source'], e['data']['target'], e['data']['relation']))
-            if len(edge_records) > self.MAX_EDGES:
-                edge_records = edge_records[:self.MAX_EDGES]
-                truncated = True
+            for relacion_id, origen_id, destino_id, naturaleza, descripcion in edge_rows:
+                source_id = f'p{origen_id}'
+                target_id = f'p{destino_id}'
+                edge_records.append({
+                    'data': {
+                        'id': f'e{relacion_id}-{source_id}-{target_id}',
+                        'source': source_id,
+                        'target': target_id,
+                        'relation': self._map_relation_type(naturaleza),
+                        'label': descripcion or (naturaleza or ''),
+                    }
+                })
 
             degree_count = defaultdict(int)
             for edge in edge_records:
@@ -2040,7 +1910,8 @@ class SearchNetworkAPIView(SearchAPIView):
                 degree_count[src] += 1
                 degree_count[tgt] += 1
 
-            persons = Persona.objects.filter(persona_id__in=node_ids).only(
+            # Base rows only: the subclass is told apart by polymorphic_ctype_id.
+            persons = Persona.objects.non_polymorphic().filter(persona_id__in=node_ids).only(
                 'persona_id', 'nombre_normalizado', 'sexo', 'polymorphic_ctype_id'
             )
 
@@ -2060,6 +1931,7 @@ class SearchNetworkAPIView(SearchAPIView):
                         'sexo': getattr(person, 'sexo', 'i') or 'i',
                         'in_results': person.persona_id in strict_node_ids,
                         'centrality': (degree / max_degree) if max_degree else 0,
+                        **metrics.get(person.persona_id),
                     }
                 })
 
@@ -2068,17 +1940,30 @@ class SearchNetworkAPIView(SearchAPIView):
                 'edges': edge_records,
                 'meta': {
                     'scope_mode': scope_mode,
+                    'selection': selection,
                     'node_count': len(nodes),
                     'edge_count': len(edge_records),
                     'result_count': len(strict_node_ids),
                     'truncated': truncated,
                 },
             })
+        except NetworkMetricsNotReady:
+            raise
         except Exception as e:
             logger.error(f"Error in search network: {str(e)}")
             return Response({'error': 'An error occurred while building the network'}, status=500)
 
 
+def _count_subquery(qs, field, distinct=False):
+    """Correlated COUNT over qs as a single value, usable in annotate()."""
+    template = 'COUNT(DISTINCT %(expressions)s)' if distinct else 'COUNT(%(expressions)s)'
+    return Subquery(
+        qs.order_by().annotate(
+            _count=Func(F(field), template=template, output_field=IntegerField())
+        ).values('_count')
+    )
+
+
 # Travel Trajectory ViewSet
 class PersonaTravelTrajectoryViewSet(viewsets.ReadOnlyModelViewSet):
     """
@@ -2117,72 +2002,23 @@ class PersonaTravelTrajectoryViewSet(viewsets.ReadOnlyModelViewSet):
     @action(detail=False, methods=['get'])
     def all_trajectories_summary(self, request):
         """Get summary of all trajectories for map overview, including FK places."""
-        # Build a dict of lugar_id → aggregated counts
-        place_map = {}
-
-        def _add_place(lugar_id, nombre, tipo, lat, lon, traj_count, pers_count):
-            if lat is None or lon is None:
-                return
-            if lugar_id in place_map:
-                place_map[lugar_id]['trajectory_count'] += traj_count
-                place_map[lugar_id]['persona_count'] += pers_count
-            else:
-                place_map[lugar_id] = {
-                    'lugar__lugar_id': lugar_id,
-                    'lugar__nombre_lugar': nombre,
-                    'lugar__tipo': tipo,
-                    'lugar__lat': lat,
-                    'lugar__lon': lon,
-                    'trajectory_count': traj_count,
-                    'persona_count': pers_count,
-                }
-
-        # 1) PersonaLugarRel places (existing)
-        pxl_places = PersonaLugarRel.objects.select_related('lugar').values(
-            'lugar__lugar_id', 'lugar__nombre_lugar', 'lugar__tipo__tipo_lugar', 'lugar__lat', 'lugar__lon'
-        ).annotate(
-            trajectory_count=Count('persona_x_lugares'),
-            persona_count=Count('personas', distinct=True)
-        ).filter(lugar__lat__isnull=False, lugar__lon__isnull=False)
-
-        for row in pxl_places:
-            _add_place(row['lugar__lugar_id'], row['lugar__nombre_lugar'], row['lugar__tipo__tipo_lugar'],
-                       row['lugar__lat'], row['lugar__lon'], row['trajectory_count'], row['persona_count'])
-
-        # 2) Procedencia places (PersonaEsclavizada only)
-        proc_places = (PersonaEsclavizada.objects
-                       .filter(procedencia__isnull=False, procedencia__lat__isnull=False, procedencia__lon__isnull=False)
-                       .values('procedencia__lugar_id', 'procedencia__nombre_lugar', 'procedencia__tipo__tipo_lugar',
-                               'procedencia__lat', 'procedencia__lon')
-                       .annotate(persona_count=Count('persona_id', distinct=True)))
-        for row in proc_places:
-            _add_place(row['procedencia__lugar_id'], row['procedencia__nombre_lugar'], row['procedencia__tipo__tipo_lugar'],
-                       row['procedencia__lat'], row['procedencia__lon'], 0, row['persona_count'])
-
-        # 3) lugar_nacimiento places
-        nac_places = (Persona.objects
-                      .filter(lugar_nacimiento__isnull=False, lugar_nacimiento__lat__isnull=False, lugar_nacimiento__lon__isnull=False)
-                      .values('lugar_nacimiento__lugar_id', 'lugar_nacimiento__nombre_lugar', 'lugar_nacimiento__tipo__tipo_lugar',
-                              'lugar_nacimiento__lat', 'lugar_nacimiento__lon')
-                      .annotate(persona_count=Count('persona_id', distinct=True)))
-        for row in nac_places:
-            _add_place(row['lugar_nacimiento__lugar_id'], row['lugar_nacimiento__nombre_lugar'], row['lugar_nacimiento__tipo__tipo_lugar'],
-                       row['lugar_nacimiento__lat'], row['lugar_nacimiento__lon'], 0, row['persona_count'])
-
-        # 4) lugar_defuncion places
-        def_places = (Persona.objects
-                      .filter(lugar_defuncion__isnull=False, lugar_defuncion__lat__isnull=False, lugar_defuncion__lon__isnull=False)
-                      .values('lugar_defuncion__lugar_id', 'lugar_defuncion__nombre_lugar', 'lugar_defuncion__tipo__tipo_lugar',
-                              'lugar_defuncion__lat', 'lugar_defuncion__lon')
-                      .annotate(persona_count=Count('persona_id', distinct=True)))
-        for row in def_places:
-            _add_place(row['lugar_defuncion__lugar_id'], row['lugar_defuncion__nombre_lugar'], row['lugar_defuncion__tipo__tipo_lugar'],
-                       row['lugar_defuncion__lat'], row['lugar_defuncion__lon'], 0, row['persona_count'])
-
-        return Response({
-            'total_places': len(place_map),
-            'places': list(place_map.values())
-        })
+        # Served from the dbgestor_mapa_resumen materialized view (see
+        # dbgestor.mapa_resumen); the ETag changes with every refresh.
+        mapa_resumen.refresh_if_stale()
+        refreshed_at, places_count = mapa_resumen.state()
+        etag = conditional.make_etag(request, 'mapa', refreshed_at, places_count)
+
+        if conditional.is_not_modified(request, etag):
+            response = conditional.not_modified(request, etag)
+        else:
+            places = mapa_resumen.rows()
+            response = conditional.finalize(request, Response({
+                'total_places': len(places),
+                'places': places,
+            }), etag)
+        if refreshed_at is not None:
+            response['X-Data-Age'] = str(max(0, int((timezone.now() - refreshed_at).total_seconds())))
+        return response
 
     # ------------------------------------------------------------------
     # Helpers for aggregated / route_detail
@@ -2216,43 +2052,9 @@ class PersonaTravelTrajectoryViewSet(viewsets.ReadOnlyModelViewSet):
             qs = qs.filter(documentos__fecha_inicial__lte=fecha_fin)
         return qs.distinct()
 
-    def _build_persona_points(self, persona):
-        """Return sorted list of trajectory dicts for one persona."""
-        rels = (persona.p_x_l_pere
-                .select_related('lugar', 'documento')
-                .order_by('ordinal'))
-        rel_points = []
-        for rel in rels:
-            lug = rel.lugar
-            if lug and lug.lat and lug.lon:
-                rel_points.append({
-                    'lugar_id': lug.lugar_id,
-                    'nombre': lug.nombre_lugar,
-                    'lat': float(lug.lat),
-                    'lon': float(lug.lon),
-                    'ordinal': rel.ordinal,
-                })
-
-        min_ord = min((p['ordinal'] for p in rel_points), default=1)
-        max_ord = max((p['ordinal'] for p in rel_points), default=0)
-
-        fk_points = []
-        seen = set()
-        nac = getattr(persona, 'lugar_nacimiento', None)
-        if nac and nac.lat and nac.lon:
-            fk_points.append({'lugar_id': nac.lugar_id, 'nombre': nac.nombre_lugar,
-                              'lat': float(nac.lat), 'lon': float(nac.lon), 'ordinal': min_ord - 2})
-            seen.add(nac.lugar_id)
-        proc = getattr(persona, 'procedencia', None) if hasattr(persona, 'procedencia') else None
-        if proc and proc.lat and proc.lon and proc.lugar_id not in seen:
-            fk_points.append({'lugar_id': proc.lugar_id, 'nombre': proc.nombre_lugar,
-                              'lat': float(proc.lat), 'lon': float(proc.lon), 'ordinal': min_ord - 1})
-        defn = getattr(persona, 'lugar_defuncion', None)
-        if defn and defn.lat and defn.lon:
-            fk_points.append({'lugar_id': defn.lugar_id, 'nombre': defn.nombre_lugar,
-                              'lat': float(defn.lat), 'lon': float(defn.lon), 'ordinal': max_ord + 1})
-
-        return sorted(fk_points + rel_points, key=lambda p: p['ordinal'])
+    def _filtered_segmentos(self, qs):
+        """Stored trajectory segments of the personas in qs (semi-join)."""
+        return TrayectoriaSegmento.objects.filter(persona_id__in=qs.values('persona_id'))
 
     # ------------------------------------------------------------------
     # Aggregated trajectories
@@ -2267,9 +2069,7 @@ class PersonaTravelTrajectoryViewSet(viewsets.ReadOnlyModelViewSet):
         hispanizacion, edad__gte, edad__lte, fecha_inicial__gte,
         fecha_inicial__lte.
         """
-        qs = PersonaEsclavizada.objects.select_related(
-            'procedencia', 'lugar_nacimiento', 'lugar_defuncion'
-        ).prefetch_related('p_x_l_pere__lugar', 'p_x_l_pere__documento')
+        qs = PersonaEsclavizada.objects.all()
 
         # Full-text / trigram search
         raw_q = request.query_params.get('q', '').strip()
@@ -2297,86 +2097,56 @@ class PersonaTravelTrajectoryViewSet(viewsets.ReadOnlyModelViewSet):
         # Legacy param names (sexo, etnonimo, calidad, etc.) for backward compat
         qs = self._apply_persona_filters(qs, request.query_params)
 
-        # Only personas with at least some place data
-        qs = qs.filter(
-            Q(p_x_l_pere__isnull=False) |
-            Q(lugar_nacimiento__isnull=False) |
-            Q(lugar_defuncion__isnull=False) |
-            Q(procedencia__isnull=False)
-        ).distinct()
-
-        route_map = defaultdict(lambda: {'persona_ids': set()})
-        place_map = {}
-
-        def _touch_place(pt):
-            pid = pt['lugar_id']
-            if pid not in place_map:
-                place_map[pid] = {
-                    'lugar_id': pid,
-                    'nombre': pt['nombre'],
-                    'lat': pt['lat'],
-                    'lon': pt['lon'],
-                    'incoming': 0,
-                    'outgoing': 0,
-                    'persona_ids': set(),
-                }
-            return pid
-
-        for persona in qs.iterator(chunk_size=200):
-            points = self._build_persona_points(persona)
-            if len(points) < 2:
-                # Still register single-point personas
-                if len(points) == 1:
-                    _touch_place(points[0])
-                    place_map[points[0]['lugar_id']]['persona_ids'].add(persona.persona_id)
-                continue
-
-            for i in range(len(points) - 1):
-                fr, to = points[i], points[i + 1]
-                if fr['lugar_id'] == to['lugar_id']:
-                    continue  # skip self-loops
-                fid = _touch_place(fr)
-                tid = _touch_place(to)
-                place_map[fid]['outgoing'] += 1
-                place_map[fid]['persona_ids'].add(persona.persona_id)
-                place_map[tid]['incoming'] += 1
-                place_map[tid]['persona_ids'].add(persona.persona_id)
-                key = (fid, tid)
-                route_map[key]['persona_ids'].add(persona.persona_id)
-
-        routes = []
-        for (fid, tid), info in route_map.items():
-            fp = place_map[fid]
-            tp = place_map[tid]
-            routes.append({
-                'from_lugar_id': fid,
-                'from_nombre': fp['nombre'],
-                'from_lat': fp['lat'],
-                'from_lon': fp['lon'],
-                'to_lugar_id': tid,
-                'to_nombre': tp['nombre'],
-                'to_lat': tp['lat'],
-                'to_lon': tp['lon'],
-                'count': len(info['persona_ids']),
-            })
-
-        places = []
-        for pid, info in place_map.items():
-            places.append({
-                'lugar_id': info['lugar_id'],
-                'nombre': info['nombre'],
-                'lat': info['lat'],
-                'lon': info['lon'],
-                'incoming': info['incoming'],
-                'outgoing': info['outgoing'],
-                'persona_count': len(info['persona_ids']),
-            })
+        # Trajectories come from the precomputed segment store: one row per
+        # consecutive pair of points, single-point personas have no to_lugar.
+        # Self-loops (same place twice in a row) are not routes.
+        segmentos = self._filtered_segmentos(qs).exclude(from_lugar=F('to_lugar'))
+        moving = segmentos.filter(to_lugar__isnull=False)
+
+        route_rows = (moving
+                      .values('from_lugar_id', 'from_lugar__nombre_lugar', 'from_lugar__lat', 'from_lugar__lon',
+                              'to_lugar_id', 'to_lugar__nombre_lugar', 'to_lugar__lat', 'to_lugar__lon')
+                      .annotate(count=Count('persona_id', distinct=True))
+                      .order_by('-count', 'from_lugar_id', 'to_lugar_id'))
+        routes = [{
+            'from_lugar_id': r['from_lugar_id'],
+            'from_nombre': r['from_lugar__nombre_lugar'],
+            'from_lat': float(r['from_lugar__lat']),
+            'from_lon': float(r['from_lugar__lon']),
+            'to_lugar_id': r['to_lugar_id'],
+            'to_nombre': r['to_lugar__nombre_lugar'],
+            'to_lat': float(r['to_lugar__lat']),
+            'to_lon': float(r['to_lugar__lon']),
+            'count': r['count'],
+        } for r in route_rows]
+
+        place_rows = (Lugar.objects
+                      .filter(Q(pk__in=segmentos.values('from_lugar_id')) |
+                              Q(pk__in=moving.values('to_lugar_id')))
+                      .annotate(
+                          incoming=_count_subquery(moving.filter(to_lugar=OuterRef('pk')), 'id'),
+                          outgoing=_count_subquery(moving.filter(from_lugar=OuterRef('pk')), 'id'),
+                          persona_count=_count_subquery(
+                              segmentos.filter(Q(from_lugar=OuterRef('pk')) | Q(to_lugar=OuterRef('pk'))),
+                              'persona_id', distinct=True),
+                      )
+                      .values('lugar_id', 'nombre_lugar', 'lat', 'lon', 'incoming', 'outgoing', 'persona_count')
+                      .order_by('-persona_count', 'lugar_id'))
+        places = [{
+            'lugar_id': p['lugar_id'],
+            'nombre': p['nombre_lugar'],
+            'lat': float(p['lat']),
+            'lon': float(p['lon']),
+            'incoming': p['incoming'],
+            'outgoing': p['outgoing'],
+            'persona_count': p['persona_count'],
+        } for p in place_rows]
 
         return Response({
             'total_routes': len(routes),
             'total_places': len(places),
-            'routes': sorted(routes, key=lambda r: r['count'], reverse=True),
-            'places': sorted(places, key=lambda p: p['persona_count'], reverse=True),
+            'routes': routes,
+            'places': places,
         })
 
     # ------------------------------------------------------------------
@@ -2401,32 +2171,24 @@ class PersonaTravelTrajectoryViewSet(viewsets.ReadOnlyModelViewSet):
         except (ValueError, TypeError):
             return Response({'detail': 'Invalid lugar IDs.'}, status=status.HTTP_400_BAD_REQUEST)
 
-        qs = PersonaEsclavizada.objects.select_related(
-            'procedencia', 'lugar_nacimiento', 'lugar_defuncion'
-        ).prefetch_related(
-            'p_x_l_pere__lugar', 'p_x_l_pere__documento',
-            'etnonimos', 'calidades', 'hispanizacion'
-        )
-        qs = self._apply_persona_filters(qs, request.query_params)
-        qs = qs.filter(
-            Q(p_x_l_pere__isnull=False) |
-            Q(lugar_nacimiento__isnull=False) |
-            Q(lugar_defuncion__isnull=False) |
-            Q(procedencia__isnull=False)
-        ).distinct()
-
-        matching_ids = []
-        for persona in qs.iterator(chunk_size=200):
-            points = self._build_persona_points(persona)
-            for i in range(len(points) - 1):
-                if points[i]['lugar_id'] == from_id and points[i + 1]['lugar_id'] == to_id:
-                    matching_ids.append(persona.persona_id)
-                    break
-
-        # Re-query matched personas with pagination
-        result_qs = PersonaEsclavizada.objects.filter(
-            persona_id__in=matching_ids
-        ).prefetch_related('etnonimos', 'calidades', 'hispanizacion').order_by('nombre_normalizado')
+        # Match and paginate in one query: the (from, to) pair is an indexed
+        # lookup on the segment store and the vocab lists are aggregated per row.
+        on_route = TrayectoriaSegmento.objects.filter(
+            persona_id=OuterRef('persona_id'), from_lugar_id=from_id, to_lugar_id=to_id)
+
+        def _labels(m2m, owner, field):
+            return ArraySubquery(
+                m2m.through.objects.filter(**{owner: OuterRef('pk')}).order_by('id').values(field))
+
+        result_qs = (self._apply_persona_filters(PersonaEsclavizada.objects.all(), request.query_params)
+                     .filter(Exists(on_route))
+                     .annotate(
+                         etnonimos_list=_labels(PersonaEsclavizada.etnonimos, 'personaesclavizada', 'etonimos__etonimo'),
+                         calidades_list=_labels(Persona.calidades, 'persona', 'calidades__calidad'),
+                         hispanizacion_list=_labels(PersonaEsclavizada.hispanizacion, 'personaesclavizada',
+                                                    'hispanizaciones__hispanizacion'),
+                     )
+                     .order_by('nombre_normalizado', 'persona_id'))
 
         page = self.paginate_queryset(result_qs)
         data = []
@@ -2436,9 +2198,9 @@ class PersonaTravelTrajectoryViewSet(viewsets.ReadOnlyModelViewSet):
                 'nombre_normalizado': p.nombre_normalizado,
                 'sexo': p.get_sexo_display() if p.sexo else None,
                 'edad': p.edad,
-                'etnonimos': [str(e) for e in p.etnonimos.all()],
-                'calidades': [str(c) for c in p.calidades.all()],
-                'hispanizacion': [str(h) for h in p.hispanizacion.all()],
+                'etnonimos': p.etnonimos_list,
+                'calidades': p.calidades_list,
+                'hispanizacion': p.hispanizacion_list,
             })
 
         if page is not None:
@@ -2452,6 +2214,7 @@ class EntityCountsView(APIView):
     """Lightweight endpoint returning record counts for all entity types."""
     permission_classes = [APIPerm]
 
+    @conditional_get('persona', 'documento', 'lugar', 'corporacion')
     def get(self, request):
         return Response({
             'personaesclavizada': PersonaEsclavizada.objects.count(),
@@ -2742,6 +2505,7 @@ def log_message(request):
 # ── Data Visualization endpoints ──────────────────────────────────────
 
 @api_view(['GET'])
+@conditional_get('persona', 'vocab')
 def gender_status_distribution(request):
     data = (
         PersonaEsclavizada.objects
@@ -2753,6 +2517,7 @@ def gender_status_distribution(request):
 
 
 class PlacesPeopleDistribution(APIView):
+    @conditional_get('persona', 'documento', 'lugar', 'vocab')
     def get(self, request):
         data = (
             PersonaEsclavizada.objects
@@ -2910,8 +2675,15 @@ def _merge_persona(canonical, duplicate):
         pr.personas.add(canonical)
         pr.personas.remove(duplicate)
 
-    # PersonaRelaciones.persona_fuente FK (nullable)
-    PersonaRelaciones.objects.filter(persona_fuente=duplicate).update(persona_fuente=canonical)
+    # PersonaRelaciones.persona_fuente FK (nullable); QuerySet.update() sends
+    # no signals and writes no history, so queue the relations' edges and
+    # record the change (delta deposits read it from history) by hand
+    fuente_de = list(PersonaRelaciones.objects.filter(persona_fuente=duplicate))
+    adyacencias.mark_dirty(pr.pk for pr in fuente_de)
+    PersonaRelaciones.objects.filter(pk__in=[pr.pk for pr in fuente_de]).update(persona_fuente=canonical)
+    for pr in fuente_de:
+        pr.persona_fuente = canonical
+    PersonaRelaciones.history.bulk_history_create(fuente_de, update=True)
 
     # PersonaRolEvento.personas M2M
     for pre in duplicate.p_roles_evento.all():
@@ -2928,23 +2700,88 @@ def _merge_persona(canonical, duplicate):
 
 def _merge_lugar(canonical, duplicate):
     """Re-point all FK references from duplicate Lugar → canonical Lugar."""
+    # QuerySet.update() sends no signals: queue the affected trajectories and
+    # the canonical place's counters by hand
+    trayectorias.mark_dirty(trayectorias.personas_en_lugar(duplicate.pk))
+    lugar_estadisticas.mark_dirty([canonical.pk])
+    data_version.bump('persona', 'lugar')
+    # ...and move updated_at, which delta deposits (export_deposit --since) read
+    now = timezone.now()
+
     # PersonaLugarRel.lugar FK
-    PersonaLugarRel.objects.filter(lugar=duplicate).update(lugar=canonical)
+    PersonaLugarRel.objects.filter(lugar=duplicate).update(lugar=canonical, updated_at=now)
 
     # Lugar.es_parte_de self-FK
     Lugar.objects.filter(es_parte_de=duplicate).update(es_parte_de=canonical)
 
-    # Archivo.lugar_archivo FK (if it exists)
-    from dbgestor.models import Archivo
-    Archivo.objects.filter(lugar_archivo=duplicate).update(lugar_archivo=canonical)
+    # Archivo.ubicacion_archivo FK
+    Archivo.objects.filter(ubicacion_archivo=duplicate).update(ubicacion_archivo=canonical, updated_at=now)
 
     # PersonaEsclavizada FK places
-    PersonaEsclavizada.objects.filter(procedencia=duplicate).update(procedencia=canonical)
-    PersonaEsclavizada.objects.filter(lugar_nacimiento=duplicate).update(lugar_nacimiento=canonical)
-    PersonaEsclavizada.objects.filter(lugar_defuncion=duplicate).update(lugar_defuncion=canonical)
+    PersonaEsclavizada.objects.filter(procedencia=duplicate).update(procedencia=canonical, updated_at=now)
+    PersonaEsclavizada.objects.filter(lugar_nacimiento=duplicate).update(lugar_nacimiento=canonical, updated_at=now)
+    PersonaEsclavizada.objects.filter(lugar_defuncion=duplicate).update(lugar_defuncion=canonical, updated_at=now)
 
     # PersonaNoEsclavizada FK places
-    PersonaNoEsclavizada.objects.filter(lugar_nacimiento=duplicate).update(lugar_nacimiento=canonical)
-    PersonaNoEsclavizada.objects.filter(lugar_defuncion=duplicate).update(lugar_defuncion=canonical)
+    PersonaNoEsclavizada.objects.filter(lugar_nacimiento=duplicate).update(lugar_nacimiento=canonical, updated_at=now)
+    PersonaNoEsclavizada.objects.filter(lugar_defuncion=duplicate).update(lugar_defuncion=canonical, updated_at=now)
 
     duplicate.delete()
+
+
+def _ingest_jobs_for(user):
+    return IngestJob.objects.all() if user.is_staff else user.ingest_jobs.all()
+
+
+class IngestJobsView(APIView):
+    """POST /api/v2/ingest/jobs/
+    Body: [ {spreadsheet row}, ... ]
+    Queues the rows as an ingest job and answers 202 with its status; the
+    rows are ingested by ``manage.py run_ingest_worker`` (api.v1.ingest_jobs).
+    GET lists the user's latest jobs (every user's for staff).
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        return Response([ingest_jobs.payload(job) for job in _ingest_jobs_for(request.user)[:20]])
+
+    def post(self, request):
+        rows = request.data
+        if not isinstance(rows, list) or not rows:
+            return Response({'error': 'Body must be a non-empty list of rows'}, status=400)
+        job = ingest_jobs.enqueue(rows, user=request.user)
+        return Response(
+            ingest_jobs.payload(job), status=status.HTTP_202_ACCEPTED,
+            headers={'Location': reverse('ingest_job_v2', args=[job.pk])},
+        )
+
+
+class IngestJobView(APIView):
+    """GET /api/v2/ingest/jobs/<id>/?errores=all
+    Progress of an ingest job: status, processed/ingested rows, rows/sec,
+    ETA and per-row errors (the first 100 unless errores=all).
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, pk):
+        job = _ingest_jobs_for(request.user).filter(pk=pk).first()
+        if job is None:
+            return Response({'error': 'Job not found'}, status=404)
+        return Response(ingest_jobs.payload(job, all_errors=request.query_params.get('errores') == 'all'))
+
+
+class IngestJobResumeView(APIView):
+    """POST /api/v2/ingest/jobs/<id>/resume/
+    Queues a failed ingest job again; it continues after its last committed
+    chunk.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request, pk):
+        job = _ingest_jobs_for(request.user).filter(pk=pk).first()
+        if job is None:
+            return Response({'error': 'Job not found'}, status=404)
+        if not ingest_jobs.resume(job):
+            return Response({'error': f'Only failed jobs can be resumed (status: {job.status})'}, status=409)
+        job.refresh_from_db()
+        return Response(ingest_jobs.payload(job), status=status.HTTP_202_ACCEPTED)
@@ -13,6 +13,7 @@ from .models import Calidades, Actividades, Hispanizaciones, Etonimos
 from .models import SituacionLugar, TipoDocumental, TipoLugar, TiposInstitucion
 from .models import PersonaEsclavizada, PersonaNoEsclavizada, Corporacion
 from .models import PersonaRelaciones, PersonaLugarRel, RolEvento, SugerenciaMerge
+from .models import IngestJob
     
 
 class SituacionLugarAdmin(ImportExportModelAdmin):
@@ -40,4 +41,4 @@ admin.site.register(TiposInstitucion, TipoInstitucionAdmin)
 admin.site.register(Corporacion, ImportExportModelAdmin)
 admin.site.register(PersonaRolEvento, ImportExportModelAdmin)
 admin.site.register(SugerenciaMerge)
-
+admin.site.register(IngestJob)
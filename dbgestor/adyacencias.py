@@ -0,0 +1,201 @@
+"""
+Person-to-person adjacency of the relations network.
+
+PersonaAdyacencia stores the edges of every PersonaRelaciones: one per pair
+of its personas and, when the relation names a persona_fuente, one from the
+fuente to each other persona.  The search network endpoint selects nodes and
+edges from it with indexed SQL (neighbours(), edges()) instead of loading the
+relations with their personas and expanding them in Python.
+
+The edges are kept like the place counters: the signal handlers in
+dbgestor.signals collect the affected relations in a per-thread dirty set,
+and their edges are rewritten once the surrounding transaction commits.
+Deleting a relation or a persona removes its edges through the cascade.
+A refresh bumps the 'red' data version once the edges are written; the
+signal handlers bump it for a persona whose edges go with it.
+Rebuild or check everything with:
+    python manage.py rebuild_adyacencias
+    python manage.py rebuild_adyacencias --verify
+"""
+
+from django.db import connection, transaction
+from django.db.models import Q
+
+from . import data_version
+from .deferred import DirtySet
+from .models import PersonaAdyacencia, PersonaRelaciones
+
+CHUNK_SIZE = 500
+
+
+def _table(model):
+    return connection.ops.quote_name(model._meta.db_table)
+
+
+def _tables():
+    return {
+        'adyacencia': _table(PersonaAdyacencia),
+        'relacion': _table(PersonaRelaciones),
+        'through': _table(PersonaRelaciones.personas.through),
+    }
+
+
+# Edges of the selected relations: (relacion_id, origen_id, destino_id, via_fuente).
+ARISTAS_SQL = """
+SELECT a.personarelaciones_id, a.persona_id, b.persona_id, FALSE
+FROM {through} a
+JOIN {through} b ON b.personarelaciones_id = a.personarelaciones_id AND b.persona_id > a.persona_id
+WHERE {where_a}
+UNION ALL
+SELECT r.persona_relacion_id, r.persona_fuente_id, t.persona_id, TRUE
+FROM {relacion} r
+JOIN {through} t ON t.personarelaciones_id = r.persona_relacion_id
+WHERE r.persona_fuente_id IS NOT NULL AND t.persona_id <> r.persona_fuente_id AND {where_r}
+"""
+
+INSERT_SQL = """
+INSERT INTO {adyacencia} (relacion_id, origen_id, destino_id, via_fuente)
+{select}
+ON CONFLICT DO NOTHING
+"""
+
+# Stored edges missing from or extra to what ARISTAS_SQL computes now.
+VERIFY_SQL = """
+SELECT relacion_id FROM (
+    (SELECT * FROM ({select}) AS c EXCEPT SELECT relacion_id, origen_id, destino_id, via_fuente FROM {adyacencia})
+    UNION ALL
+    (SELECT relacion_id, origen_id, destino_id, via_fuente FROM {adyacencia} EXCEPT SELECT * FROM ({select}) AS c)
+) AS diff (relacion_id, origen_id, destino_id, via_fuente)
+GROUP BY relacion_id
+ORDER BY relacion_id
+"""
+
+# Personas sharing a relation with any of %(ids)s, outside %(ids)s.
+NEIGHBOURS_SQL = """
+SELECT vecino FROM (
+    SELECT destino_id AS vecino FROM {adyacencia} WHERE NOT via_fuente AND origen_id = ANY(%(ids)s)
+    UNION
+    SELECT origen_id FROM {adyacencia} WHERE NOT via_fuente AND destino_id = ANY(%(ids)s)
+) AS v
+WHERE NOT vecino = ANY(%(ids)s)
+ORDER BY vecino
+LIMIT %(limit)s
+"""
+
+# Edges between %(nodes)s: the fuente edges of a relation when its fuente is a
+# node and at least two of its personas are, its pair edges otherwise.  With
+# %(results)s only relations with a persona among them count.
+EDGES_SQL = """
+SELECT a.relacion_id, a.origen_id, a.destino_id, r.naturaleza_relacion, r.descripcion_relacion
+FROM {adyacencia} a
+JOIN {relacion} r ON r.persona_relacion_id = a.relacion_id
+WHERE a.origen_id = ANY(%(nodes)s) AND a.destino_id = ANY(%(nodes)s)
+  AND CASE WHEN a.via_fuente
+      THEN (SELECT COUNT(*) FROM {through} t
+            WHERE t.personarelaciones_id = a.relacion_id AND t.persona_id = ANY(%(nodes)s)) >= 2
+      ELSE r.persona_fuente_id IS NULL OR NOT r.persona_fuente_id = ANY(%(nodes)s)
+  END
+  AND (%(results)s::integer[] IS NULL OR EXISTS (
+      SELECT 1 FROM {through} t
+      WHERE t.personarelaciones_id = a.relacion_id AND t.persona_id = ANY(%(results)s)))
+ORDER BY a.origen_id, a.destino_id,
+         CASE r.naturaleza_relacion WHEN 'fam' THEN 'fam' WHEN 'sub' THEN 'sub' ELSE 'tmp' END,
+         a.relacion_id
+LIMIT %(limit)s
+"""
+
+
+def _aristas_sql(ids=True):
+    return ARISTAS_SQL.format(
+        where_a='a.personarelaciones_id = ANY(%(ids)s)' if ids else 'TRUE',
+        where_r='r.persona_relacion_id = ANY(%(ids)s)' if ids else 'TRUE',
+        **_tables(),
+    )
+
+
+def refresh(relacion_ids):
+    """Rewrite the edges of the given relations. Returns edges written."""
+    ids = sorted({rid for rid in relacion_ids if rid is not None})
+    insert = INSERT_SQL.format(select=_aristas_sql(), **_tables())
+    written = 0
+
+    for start in range(0, len(ids), CHUNK_SIZE):
+        chunk = {'ids': ids[start:start + CHUNK_SIZE]}
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {_table(PersonaAdyacencia)} WHERE relacion_id = ANY(%(ids)s)", chunk)
+            cursor.execute(insert, chunk)
+            written += cursor.rowcount
+
+    return written
+
+
+def rebuild_all():
+    """Rebuild the whole edge table in one statement. Returns edges written."""
+    with transaction.atomic():
+        PersonaAdyacencia.objects.all().delete()
+        with connection.cursor() as cursor:
+            cursor.execute(INSERT_SQL.format(select=_aristas_sql(ids=False), **_tables()))
+            return cursor.rowcount
+
+
+def verify():
+    """Ids of the relations whose stored edges are wrong or missing."""
+    sql = VERIFY_SQL.format(select=_aristas_sql(ids=False), **_tables())
+    with connection.cursor() as cursor:
+        cursor.execute(sql)
+        return [row[0] for row in cursor.fetchall()]
+
+
+# ---------------------------------------------------------------------------
+# Network queries
+# ---------------------------------------------------------------------------
+
+def neighbours(persona_ids, limit):
+    """Up to ``limit`` (None: all) personas related to ``persona_ids`` (not among them), by id."""
+    with connection.cursor() as cursor:
+        cursor.execute(NEIGHBOURS_SQL.format(**_tables()), {'ids': list(persona_ids), 'limit': limit})
+        return [row[0] for row in cursor.fetchall()]
+
+
+def edges(node_ids, limit, result_ids=None):
+    """
+    Up to ``limit`` edges between ``node_ids``, ordered by (origen, destino, type).
+
+    Returns (relacion_id, origen_id, destino_id, naturaleza_relacion,
+    descripcion_relacion) rows.  ``result_ids`` restricts them to relations
+    with a persona among those ids.
+    """
+    params = {
+        'nodes': list(node_ids),
+        'results': None if result_ids is None else list(result_ids),
+        'limit': limit,
+    }
+    with connection.cursor() as cursor:
+        cursor.execute(EDGES_SQL.format(**_tables()), params)
+        return cursor.fetchall()
+
+
+# ---------------------------------------------------------------------------
+# Relations touched by an edit
+# ---------------------------------------------------------------------------
+
+def persona_relaciones(persona_id):
+    return set(PersonaRelaciones.objects.filter(personas=persona_id).values_list('pk', flat=True))
+
+
+def persona_tiene_aristas(persona_id):
+    return PersonaAdyacencia.objects.filter(Q(origen=persona_id) | Q(destino=persona_id)).exists()
+
+
+def _refresh_and_bump(ids):
+    refresh(ids)
+    # Network metrics (dbgestor.metricas_red) are cached per 'red' version.
+    data_version.bump('red')
+
+
+_dirty = DirtySet('network edges', _refresh_and_bump)
+
+
+def mark_dirty(relacion_ids):
+    """Queue relations for an edge refresh once the current transaction commits."""
+    _dirty.add(rid for rid in relacion_ids if rid is not None)
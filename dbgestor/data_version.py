@@ -0,0 +1,69 @@
+"""
+Per-entity data versions.
+
+Derived payloads (search facets, type counts, …) are cached under keys that
+include the current version of every entity they depend on.  Any write to an
+entity bumps its version, so stale entries are simply never read again and
+expire on their own.  The signal handlers in dbgestor.signals bump versions;
+code that writes with QuerySet.update() should call bump() itself.
+'red' is the relations network as stored in PersonaAdyacencia; it is bumped
+by dbgestor.adyacencias after the edges are rewritten.
+
+Versions live in the 'api' cache as time-based values (microseconds).  A
+missing version (first use, eviction, cache flush) is re-seeded and a bump
+writes a fresh one, so a version never repeats a value that was used before.
+"""
+
+import time
+
+from django.core.cache import caches
+
+from .deferred import DirtySet
+
+ENTITIES = ('persona', 'documento', 'lugar', 'corporacion', 'vocab', 'red')
+
+
+def _cache():
+    return caches['api']
+
+
+def _key(entity):
+    return f'data-version:{entity}'
+
+
+def _seed():
+    return time.time_ns() // 1000
+
+
+def get_versions(entities=ENTITIES):
+    """Return {entity: version} for the given entities (one cache round trip)."""
+    cache = _cache()
+    keys = {_key(e): e for e in entities}
+    found = cache.get_many(list(keys))
+    versions = {}
+    for key, entity in keys.items():
+        if key in found:
+            versions[entity] = found[key]
+        else:
+            cache.add(key, _seed(), timeout=None)
+            versions[entity] = cache.get(key)
+    return versions
+
+
+def _bump_now(entities):
+    # Not cache.incr(): DatabaseCache reads and writes back in two steps, so
+    # two commits could both move N to N+1.  A fresh time-based value differs
+    # from the one any concurrent bump writes; +1 keeps it moving forward if
+    # the clock does not.
+    cache = _cache()
+    keys = [_key(e) for e in entities]
+    current = cache.get_many(keys)
+    cache.set_many({key: max(_seed(), current.get(key, 0) + 1) for key in keys}, timeout=None)
+
+
+def bump(*entities):
+    """Bump entity versions once the current transaction commits."""
+    _dirty.add(entities)
+
+
+_dirty = DirtySet('data versions', _bump_now)
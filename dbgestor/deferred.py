@@ -0,0 +1,70 @@
+"""
+Per-thread dirty sets flushed once the surrounding transaction commits.
+
+The derived stores (trajectory segments, place counters, network edges,
+search vectors) and the data versions are refreshed from what a transaction
+touched, not row by row: writers add ids to a DirtySet and its flush function
+gets them all at once after the commit.
+
+    segmentos = DirtySet('trajectory segments', refresh_segmentos)
+    segmentos.add(persona_ids)
+
+A set registers one on_commit callback per transaction.  Django replaces
+connection.run_on_commit whenever it runs or discards callbacks (commit,
+rollback, savepoint rollback), so a set remembers the list it registered on
+and registers again once that list is no longer current.  Outside a
+transaction on_commit runs at once, so every add() flushes.  Items left over
+by a rollback, or whose flush raised, stay queued for the next flush.
+
+In a TestCase the transaction never commits: captureOnCommitCallbacks() only
+runs the callbacks registered inside its block, so make the writes there.
+"""
+
+import logging
+import threading
+
+from django.db import transaction
+
+logger = logging.getLogger('dbgestor')
+
+
+class DirtySet:
+
+    def __init__(self, name, flush):
+        self.name = name
+        self._flush = flush
+        self._local = threading.local()
+
+    def _state(self):
+        local = self._local
+        if not hasattr(local, 'items'):
+            local.items = set()
+            local.hooks = None
+        return local
+
+    def add(self, items):
+        """Queue ``items`` for the flush that follows the current transaction."""
+        items = set(items)
+        if not items:
+            return
+        state = self._state()
+        state.items.update(items)
+        connection = transaction.get_connection()
+        if connection.in_atomic_block:
+            if state.hooks is connection.run_on_commit:
+                return
+            state.hooks = connection.run_on_commit
+        transaction.on_commit(self.flush)
+
+    def flush(self):
+        state = self._state()
+        state.hooks = None
+        if not state.items:
+            return
+        items = set(state.items)
+        state.items.clear()
+        try:
+            self._flush(items)
+        except Exception:
+            state.items.update(items)
+            logger.exception(f"Could not refresh {self.name} for {len(items)} queued rows")
@@ -796,7 +796,7 @@ class CorporacionForm(forms.ModelForm):
     
     class Meta:
         model = Corporacion
-        fields = '__all__'
+        exclude = ['corporacion_idno']
         
     documentos = forms.ModelMultipleChoiceField(
         queryset=Documento.objects.all(),
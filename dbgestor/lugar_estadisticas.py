@@ -0,0 +1,201 @@
+"""
+Per-place usage counters.
+
+LugarEstadistica holds, for every Lugar, the number of personas that point at
+it in each role – trajectory (PersonaLugarRel), birth (lugar_nacimiento),
+death (lugar_defuncion) and procedencia – the distinct personas over all
+roles, and the trajectory rows (PersonaLugarRel entries, one per linked
+persona; a relation without personas counts once).  Place lists and the map
+overview read these instead of a multi-join DISTINCT per place.
+
+The counters are kept like the trajectory segments: the signal handlers in
+dbgestor.signals collect the affected places in a per-thread dirty set, and
+their rows are recomputed with one INSERT ... ON CONFLICT per batch once the
+surrounding transaction commits.  Rebuild or check everything with:
+    python manage.py rebuild_lugar_estadisticas
+    python manage.py rebuild_lugar_estadisticas --verify
+"""
+
+from django.db import connection, transaction
+
+from .deferred import DirtySet
+from .models import Lugar, LugarEstadistica, Persona, PersonaEsclavizada, PersonaLugarRel
+
+CHUNK_SIZE = 500
+
+COUNTERS = ('personas_total', 'personas_trayectoria', 'personas_nacimiento', 'personas_defuncion',
+            'personas_procedencia', 'filas_trayectoria')
+
+
+def _table(model):
+    return connection.ops.quote_name(model._meta.db_table)
+
+
+# Counters of the places in "target".  Every (place, persona, role) pair goes
+# through one UNION ALL so the distinct total and the per-role counts come out
+# of a single GROUP BY.
+ESTADISTICAS_SQL = """
+WITH target AS (
+    SELECT lugar_id FROM {lugar} {where}
+),
+rel AS (
+    SELECT r.lugar_id, t.persona_id
+    FROM {rel} r
+    LEFT JOIN {through} t ON t.personalugarrel_id = r.persona_x_lugares
+    WHERE r.lugar_id IN (SELECT lugar_id FROM target)
+),
+roles AS (
+    SELECT lugar_id, persona_id, 't' AS rol FROM rel WHERE persona_id IS NOT NULL
+    UNION ALL
+    SELECT lugar_nacimiento_id, persona_id, 'n' FROM {persona}
+    WHERE lugar_nacimiento_id IN (SELECT lugar_id FROM target)
+    UNION ALL
+    SELECT lugar_defuncion_id, persona_id, 'd' FROM {persona}
+    WHERE lugar_defuncion_id IN (SELECT lugar_id FROM target)
+    UNION ALL
+    SELECT procedencia_id, persona_ptr_id, 'p' FROM {esclavizada}
+    WHERE procedencia_id IN (SELECT lugar_id FROM target)
+),
+personas AS (
+    SELECT lugar_id,
+           COUNT(DISTINCT persona_id) AS total,
+           COUNT(DISTINCT persona_id) FILTER (WHERE rol = 't') AS trayectoria,
+           COUNT(*) FILTER (WHERE rol = 'n') AS nacimiento,
+           COUNT(*) FILTER (WHERE rol = 'd') AS defuncion,
+           COUNT(*) FILTER (WHERE rol = 'p') AS procedencia
+    FROM roles
+    GROUP BY lugar_id
+),
+filas AS (
+    SELECT lugar_id, COUNT(*) AS filas FROM rel GROUP BY lugar_id
+)
+SELECT target.lugar_id,
+       COALESCE(p.total, 0) AS personas_total,
+       COALESCE(p.trayectoria, 0) AS personas_trayectoria,
+       COALESCE(p.nacimiento, 0) AS personas_nacimiento,
+       COALESCE(p.defuncion, 0) AS personas_defuncion,
+       COALESCE(p.procedencia, 0) AS personas_procedencia,
+       COALESCE(f.filas, 0) AS filas_trayectoria
+FROM target
+LEFT JOIN personas p ON p.lugar_id = target.lugar_id
+LEFT JOIN filas f ON f.lugar_id = target.lugar_id
+"""
+
+UPSERT_SQL = """
+INSERT INTO {estadistica} (lugar_id, {columns})
+{select}
+ON CONFLICT (lugar_id) DO UPDATE SET {updates}
+"""
+
+# Stored rows that differ from what ESTADISTICAS_SQL computes now, including
+# places without a row and rows whose place is gone.
+VERIFY_SQL = """
+SELECT COALESCE(c.lugar_id, e.lugar_id), {stored}, {expected}
+FROM ({select}) c
+FULL JOIN {estadistica} e ON e.lugar_id = c.lugar_id
+WHERE ({stored}) IS DISTINCT FROM ({expected})
+ORDER BY 1
+"""
+
+
+def _estadisticas_sql(ids=True):
+    return ESTADISTICAS_SQL.format(
+        lugar=_table(Lugar),
+        where='WHERE lugar_id = ANY(%(ids)s)' if ids else '',
+        rel=_table(PersonaLugarRel),
+        through=_table(PersonaLugarRel.personas.through),
+        persona=_table(Persona),
+        esclavizada=_table(PersonaEsclavizada),
+    )
+
+
+def _upsert_sql(ids=True):
+    return UPSERT_SQL.format(
+        estadistica=_table(LugarEstadistica),
+        columns=', '.join(COUNTERS),
+        select=_estadisticas_sql(ids),
+        updates=', '.join(f'{c} = EXCLUDED.{c}' for c in COUNTERS),
+    )
+
+
+def refresh(lugar_ids):
+    """Recompute the counters of the given places. Returns rows written."""
+    ids = sorted({lid for lid in lugar_ids if lid is not None})
+    sql = _upsert_sql()
+    written = 0
+
+    for start in range(0, len(ids), CHUNK_SIZE):
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(sql, {'ids': ids[start:start + CHUNK_SIZE]})
+            written += cursor.rowcount
+
+    return written
+
+
+def rebuild_all():
+    """Rebuild the whole counter table in one statement. Returns rows written."""
+    with transaction.atomic():
+        LugarEstadistica.objects.all().delete()
+        with connection.cursor() as cursor:
+            cursor.execute(_upsert_sql(ids=False))
+            return cursor.rowcount
+
+
+def verify():
+    """
+    Places whose stored counters are wrong or missing.
+
+    Returns a list of (lugar_id, stored, expected) with the counters as dicts
+    (None for a missing row on either side).
+    """
+    sql = VERIFY_SQL.format(
+        select=_estadisticas_sql(ids=False),
+        estadistica=_table(LugarEstadistica),
+        stored=', '.join(f'e.{c}' for c in COUNTERS),
+        expected=', '.join(f'c.{c}' for c in COUNTERS),
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql)
+        rows = cursor.fetchall()
+
+    n = len(COUNTERS)
+    mismatches = []
+    for row in rows:
+        stored, expected = row[1:1 + n], row[1 + n:]
+        mismatches.append((
+            row[0],
+            None if all(v is None for v in stored) else dict(zip(COUNTERS, stored)),
+            None if all(v is None for v in expected) else dict(zip(COUNTERS, expected)),
+        ))
+    return mismatches
+
+
+# ---------------------------------------------------------------------------
+# Places touched by an edit
+# ---------------------------------------------------------------------------
+
+def persona_fk_lugares(persona_id):
+    """(nacimiento, defuncion, procedencia) place ids currently stored for a persona."""
+    row = (Persona._base_manager.filter(pk=persona_id)
+           .values_list('lugar_nacimiento_id', 'lugar_defuncion_id', 'personaesclavizada__procedencia_id')
+           .first())
+    return row or (None, None, None)
+
+
+def persona_lugares(persona_id):
+    """Every place a persona counts towards: its FK places and its relations' places."""
+    ids = set(persona_fk_lugares(persona_id))
+    ids.update(PersonaLugarRel.objects.filter(personas=persona_id).values_list('lugar_id', flat=True))
+    return ids
+
+
+def rel_lugares(rel_ids):
+    return set(PersonaLugarRel.objects.filter(pk__in=rel_ids).values_list('lugar_id', flat=True))
+
+
+_dirty = DirtySet('place usage counters', refresh)
+
+
+def mark_dirty(lugar_ids):
+    """Queue places for a counter refresh once the current transaction commits."""
+    _dirty.add(lid for lid in lugar_ids if lid is not None)
@@ -0,0 +1,273 @@
+"""
+Management command comparing the search facet engine with the previous
+one-query-per-facet implementation.
+
+Runs both against the current database (or a synthetic corpus created with
+--seed inside a transaction that is rolled back afterwards), checks that they
+return the same buckets and reports query count and wall time:
+    python manage.py benchmark_facets
+    python manage.py benchmark_facets --seed 2000 --repeat 5
+    python manage.py benchmark_facets --q "maría" --type personaesclavizada
+"""
+
+import random
+import statistics
+import time
+from datetime import date
+
+from django.contrib.postgres.search import SearchQuery
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.db.models import Count
+from django.db.models.functions import ExtractYear
+from django.test.utils import CaptureQueriesContext
+
+from api.v2.facets import _years_tree, collect_facets
+from api.v2.views import SearchAPIView, parse_search_query
+from dbgestor.models import (Archivo, Calidades, Documento, Etonimos, Hispanizaciones, Lugar,
+                             PersonaEsclavizada, PersonaLugarRel, PersonaNoEsclavizada)
+
+
+def collect_facets_per_query(querysets_by_type):
+    """
+    The implementation the facet engine replaced: one GROUP BY query per facet
+    and entity type.  Kept here as the reference the engine is checked against.
+    """
+    lugar_counts = {}
+    archivo_counts = {}
+    year_set = set()
+    etnonimo_counts = {}
+    calidad_counts = {}
+    hispanizacion_counts = {}
+    ocupacion_counts = {}
+    procedencia_counts = {}
+    estado_civil_counts = {}
+    tipo_documental_counts = {}
+
+    for type_key, qs in querysets_by_type.items():
+        # ── Lugares ───
+        if type_key == 'documento':
+            for row in qs.filter(lugar_de_produccion__isnull=False).values(
+                    'lugar_de_produccion__lugar_id', 'lugar_de_produccion__nombre_lugar'
+            ).annotate(c=Count('documento_id')):
+                lid = row['lugar_de_produccion__lugar_id']
+                lugar_counts.setdefault(lid, {'id': lid, 'nombre': row['lugar_de_produccion__nombre_lugar'], 'count': 0})
+                lugar_counts[lid]['count'] += row['c']
+        elif type_key in ('personaesclavizada', 'personanoesclavizada'):
+            for row in qs.filter(p_x_l_pere__lugar__isnull=False).values(
+                    'p_x_l_pere__lugar__lugar_id', 'p_x_l_pere__lugar__nombre_lugar'
+            ).annotate(c=Count('persona_id', distinct=True)):
+                lid = row['p_x_l_pere__lugar__lugar_id']
+                lugar_counts.setdefault(lid, {'id': lid, 'nombre': row['p_x_l_pere__lugar__nombre_lugar'], 'count': 0})
+                lugar_counts[lid]['count'] += row['c']
+
+        # ── Archivos ──
+        if type_key == 'documento':
+            for row in qs.values('archivo__archivo_id', 'archivo__nombre').annotate(c=Count('documento_id')):
+                aid = row['archivo__archivo_id']
+                archivo_counts.setdefault(aid, {'id': aid, 'nombre': row['archivo__nombre'], 'count': 0})
+                archivo_counts[aid]['count'] += row['c']
+        elif type_key in ('personaesclavizada', 'personanoesclavizada'):
+            for row in qs.filter(documentos__isnull=False).values(
+                    'documentos__archivo__archivo_id', 'documentos__archivo__nombre'
+            ).annotate(c=Count('persona_id', distinct=True)):
+                aid = row['documentos__archivo__archivo_id']
+                if aid:
+                    archivo_counts.setdefault(aid, {'id': aid, 'nombre': row['documentos__archivo__nombre'], 'count': 0})
+                    archivo_counts[aid]['count'] += row['c']
+
+        # ── Años ──
+        if type_key == 'documento':
+            for row in qs.filter(fecha_inicial__isnull=False).annotate(
+                    y=ExtractYear('fecha_inicial')).values('y').annotate(c=Count('documento_id')):
+                year_set.add(row['y'])
+        elif type_key in ('personaesclavizada', 'personanoesclavizada'):
+            for row in qs.filter(documentos__fecha_inicial__isnull=False).annotate(
+                    y=ExtractYear('documentos__fecha_inicial')).values('y').annotate(
+                    c=Count('persona_id', distinct=True)):
+                year_set.add(row['y'])
+
+        # ── Persona-specific facets ──
+        if type_key in ('personaesclavizada', 'personanoesclavizada'):
+            for row in qs.filter(calidades__isnull=False).values(
+                    'calidades__calidad').annotate(c=Count('persona_id', distinct=True)):
+                label = row['calidades__calidad']
+                calidad_counts[label] = calidad_counts.get(label, 0) + row['c']
+
+            for row in qs.filter(ocupaciones__isnull=False).values(
+                    'ocupaciones__actividad').annotate(c=Count('persona_id', distinct=True)):
+                label = row['ocupaciones__actividad']
+                ocupacion_counts[label] = ocupacion_counts.get(label, 0) + row['c']
+
+            for row in qs.filter(estado_civil__isnull=False).values(
+                    'estado_civil__estado_civil').annotate(c=Count('persona_id', distinct=True)):
+                label = row['estado_civil__estado_civil']
+                estado_civil_counts[label] = estado_civil_counts.get(label, 0) + row['c']
+
+            for row in qs.filter(documentos__tipo_documento__isnull=False).values(
+                    'documentos__tipo_documento__tipo_documental').annotate(c=Count('persona_id', distinct=True)):
+                label = row['documentos__tipo_documento__tipo_documental']
+                tipo_documental_counts[label] = tipo_documental_counts.get(label, 0) + row['c']
+
+        if type_key == 'personaesclavizada':
+            for row in qs.filter(etnonimos__isnull=False).values(
+                    'etnonimos__etonimo').annotate(c=Count('persona_id', distinct=True)):
+                label = row['etnonimos__etonimo']
+                etnonimo_counts[label] = etnonimo_counts.get(label, 0) + row['c']
+
+            for row in qs.filter(hispanizacion__isnull=False).values(
+                    'hispanizacion__hispanizacion').annotate(c=Count('persona_id', distinct=True)):
+                label = row['hispanizacion__hispanizacion']
+                hispanizacion_counts[label] = hispanizacion_counts.get(label, 0) + row['c']
+
+            for row in qs.filter(procedencia__isnull=False).values(
+                    'procedencia__lugar_id', 'procedencia__nombre_lugar'
+            ).annotate(c=Count('persona_id', distinct=True)):
+                lid = row['procedencia__lugar_id']
+                procedencia_counts.setdefault(lid, {'id': lid, 'label': row['procedencia__nombre_lugar'], 'count': 0})
+                procedencia_counts[lid]['count'] += row['c']
+
+    return {
+        'lugares': sorted(lugar_counts.values(), key=lambda x: -x['count']),
+        'archivos': sorted(archivo_counts.values(), key=lambda x: -x['count']),
+        'fechas': _years_tree(year_set),
+        'year_range': {'min': min(year_set), 'max': max(year_set)} if year_set else None,
+        'etnonimos': sorted(
+            [{'label': k, 'count': v} for k, v in etnonimo_counts.items()],
+            key=lambda x: -x['count']),
+        'calidades': sorted(
+            [{'label': k, 'count': v} for k, v in calidad_counts.items()],
+            key=lambda x: -x['count']),
+        'hispanizaciones': sorted(
+            [{'label': k, 'count': v} for k, v in hispanizacion_counts.items()],
+            key=lambda x: -x['count']),
+        'ocupaciones': sorted(
+            [{'label': k, 'count': v} for k, v in ocupacion_counts.items()],
+            key=lambda x: -x['count']),
+        'procedencias': sorted(procedencia_counts.values(), key=lambda x: -x['count']),
+        'estados_civiles': sorted(
+            [{'label': k, 'count': v} for k, v in estado_civil_counts.items()],
+            key=lambda x: -x['count']),
+        'tipos_documentales': sorted(
+            [{'label': k, 'count': v} for k, v in tipo_documental_counts.items()],
+            key=lambda x: -x['count']),
+    }
+
+
+class _Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = 'Benchmark the search facet engine against the per-facet queries it replaced'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--seed', type=int, default=0,
+                            help='Create this many synthetic personas first (rolled back at the end).')
+        parser.add_argument('--repeat', type=int, default=3, help='Runs per implementation (default: 3).')
+        parser.add_argument('--q', type=str, default='', help='Benchmark search mode with this query.')
+        parser.add_argument('--type', type=str, default='all',
+                            help='Entity types, comma-separated (default: all).')
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                if options['seed']:
+                    self._seed(options['seed'])
+                self._run(options)
+                raise _Rollback
+        except _Rollback:
+            pass
+
+    # ── corpus ────────────────────────────────────────────────────────
+
+    def _seed(self, n):
+        self.stdout.write(f'Seeding {n} synthetic personas...')
+        rnd = random.Random(42)
+        archivo = Archivo.objects.create(nombre='Archivo de prueba (benchmark)')
+        lugares = [Lugar.objects.create(nombre_lugar=f'Lugar benchmark {i}') for i in range(60)]
+        documentos = [
+            Documento.objects.create(
+                archivo=archivo, fondo='Benchmark', unidad_documental_compuesta='1',
+                titulo=f'Documento benchmark {i}', folio_inicial='1', tipo_documento=None,
+                lugar_de_produccion=rnd.choice(lugares),
+                fecha_inicial=date(rnd.randint(1600, 1820), 1, 1),
+            )
+            for i in range(max(n // 10, 1))
+        ]
+        calidades = [Calidades.objects.get_or_create(calidad=f'calidad benchmark {i}')[0] for i in range(8)]
+        etnonimos = [Etonimos.objects.get_or_create(etonimo=f'etnonimo benchmark {i}')[0] for i in range(12)]
+        hispanizaciones = [Hispanizaciones.objects.get_or_create(hispanizacion=f'hispanizacion benchmark {i}')[0]
+                           for i in range(3)]
+        for i in range(n):
+            if i % 4:
+                persona = PersonaEsclavizada.objects.create(
+                    nombres=f'Persona {i}', sexo=rnd.choice('vm'), edad=rnd.randint(1, 70),
+                    procedencia=rnd.choice(lugares))
+                persona.etnonimos.add(*rnd.sample(etnonimos, rnd.randint(0, 2)))
+                persona.hispanizacion.add(*rnd.sample(hispanizaciones, rnd.randint(0, 1)))
+            else:
+                persona = PersonaNoEsclavizada.objects.create(nombres=f'Persona {i}', sexo=rnd.choice('vm'))
+            persona.documentos.add(*rnd.sample(documentos, min(len(documentos), rnd.randint(1, 3))))
+            persona.calidades.add(*rnd.sample(calidades, rnd.randint(0, 2)))
+            for ordinal in range(rnd.randint(0, 3)):
+                rel = PersonaLugarRel.objects.create(
+                    documento=rnd.choice(documentos), lugar=rnd.choice(lugares), ordinal=ordinal)
+                rel.personas.add(persona)
+
+    # ── benchmark ─────────────────────────────────────────────────────
+
+    def _base_querysets(self, options):
+        view = SearchAPIView()
+        types = [t.strip() for t in options['type'].split(',') if t.strip() in view.TYPE_CONFIGS]
+        types = types or list(view.TYPE_CONFIGS)
+        bases = {}
+        for tk in types:
+            model, sim_field, _ = view.TYPE_CONFIGS[tk]
+            if options['q']:
+                clean, is_exact = parse_search_query(options['q'])
+                sq = SearchQuery(clean, config='spanish', search_type='phrase' if is_exact else 'plain')
+                bases[tk] = view._text_match(model, sq, sim_field, clean, is_exact)
+            else:
+                bases[tk] = model.objects.all()
+        return bases
+
+    def _measure(self, fn, bases, repeat):
+        timings, queries, result = [], 0, None
+        for _ in range(repeat):
+            with CaptureQueriesContext(connection) as ctx:
+                start = time.perf_counter()
+                result = fn(bases)
+                timings.append((time.perf_counter() - start) * 1000)
+            queries = len(ctx.captured_queries)
+        return result, queries, timings
+
+    @staticmethod
+    def _normalize(facets):
+        out = {}
+        for key, value in facets.items():
+            if isinstance(value, list):
+                out[key] = sorted(tuple(sorted(item.items(), key=str)) for item in value)
+            else:
+                out[key] = value
+        return out
+
+    def _run(self, options):
+        bases = self._base_querysets(options)
+        repeat = max(options['repeat'], 1)
+        self.stdout.write(f"Entity types: {', '.join(bases)}; q={options['q']!r}; {repeat} runs each")
+
+        rows = []
+        results = {}
+        for name, fn in (('per-facet queries', collect_facets_per_query), ('facet engine', collect_facets)):
+            results[name], queries, timings = self._measure(fn, bases, repeat)
+            rows.append((name, queries, statistics.median(timings), min(timings)))
+
+        self.stdout.write(f"{'implementation':<20} {'queries':>8} {'median ms':>10} {'best ms':>10}")
+        for name, queries, median, best in rows:
+            self.stdout.write(f'{name:<20} {queries:>8} {median:>10.1f} {best:>10.1f}')
+
+        if self._normalize(results['per-facet queries']) == self._normalize(results['facet engine']):
+            self.stdout.write(self.style.SUCCESS('✓ Both implementations return the same facets'))
+        else:
+            self.stdout.write(self.style.ERROR('✗ Facet payloads differ'))
@@ -1,10 +1,18 @@
 import csv
+import io
 import itertools
 import json
-from datetime import date, datetime
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, datetime, time, timedelta
 from pathlib import Path
 
+import django
+from django.contrib.postgres.aggregates import BoolOr
+from django.core.exceptions import FieldDoesNotExist
 from django.core.management.base import BaseCommand, CommandError
+from django.db import connections, models
+from django.db.models import Count, ExpressionWrapper, Q
+from django.utils import timezone
 
 from dbgestor.version import get_schema_version
 from dbgestor.models import (
@@ -20,6 +28,21 @@ PIPE = "|"
 FIELD_MAP_PATH = Path(__file__).parent / "deposit_field_map.json"
 METADATA_ELEMENTS_PATH = Path(__file__).parents[3] / "metadata_elements.csv"
 
+# Independent table exports, in manifest / metadata order.  Each one can run
+# in its own worker process (--jobs).
+EXPORTS = [
+    "_export_personas_esclavizadas",
+    "_export_personas_no_esclavizadas",
+    "_export_documentos",
+    "_export_lugares",
+    "_export_corporaciones",
+    "_export_trayectorias",
+    "_export_relaciones_personas",
+    "_export_roles_evento_personas",
+    "_export_roles_evento_instituciones",
+    "_export_codelists",
+]
+
 
 def _load_field_map():
     """Load the optional field/file rename mapping."""
@@ -40,24 +63,118 @@ def _rename_row(row, col_map):
     return {col_map.get(k, k): v for k, v in row.items()}
 
 
-def _write_csv(path, fieldnames, rows, col_map=None):
-    all_rows = list(rows)
-    if all_rows:
-        non_empty = {f for row in all_rows for f, v in row.items() if v is not None and v != ""}
-        active = [f for f in fieldnames if f in non_empty]
-    else:
-        active = fieldnames
+def _resolve_path(model, path):
+    """Return (field, crosses_many) for an ORM lookup path, or (None, False)."""
+    many = False
+    field = None
+    for name in path.split("__"):
+        try:
+            field = model._meta.pk if name == "pk" else model._meta.get_field(name)
+        except FieldDoesNotExist:
+            return None, False
+        if field.many_to_many or field.one_to_many:
+            many = True
+        if field.is_relation:
+            model = field.related_model
+    if field is not None and field.is_relation:
+        field = model._meta.pk
+    return field, many
+
+
+def _probes(fields, paths):
+    """Map every output column to its source path (default: the column name)."""
+    return {f: paths.get(f, f) for f in fields}
+
+
+def _non_empty_fields(qs, probes):
+    """
+    First pass: the output columns that have at least one non-empty value.
+
+    ``probes`` maps each output column to the ORM path its value comes from;
+    a value is empty when NULL (or '' for text).  Single-valued paths are
+    checked together in one aggregate query, multi-valued ones with one
+    EXISTS query each so their joins never multiply.  Returns None when
+    ``qs`` has no rows, which keeps every column, as before.
+    """
+    if not qs.exists():
+        return None
+    qs = qs.order_by()
+    scalar, multi = {}, {}
+    for column, path in probes.items():
+        field, many = _resolve_path(qs.model, path)
+        if field is None:
+            continue
+        condition = Q(**{f"{path}__isnull": False})
+        if isinstance(field, (models.CharField, models.TextField)):
+            condition &= ~Q(**{path: ""})
+        (multi if many else scalar)[column] = condition
+
+    found = set()
+    if scalar:
+        aliases = {f"probe_{n}": column for n, column in enumerate(scalar)}
+        flags = qs.aggregate(**{
+            alias: BoolOr(ExpressionWrapper(scalar[column], output_field=models.BooleanField()))
+            for alias, column in aliases.items()
+        })
+        found.update(column for alias, column in aliases.items() if flags[alias])
+    for column, condition in multi.items():
+        if qs.filter(condition).exists():
+            found.add(column)
+    return found
+
+
+def _write_csv(path, fieldnames, rows, col_map=None, non_empty=None):
+    """Stream ``rows`` to ``path``, keeping only the ``non_empty`` columns."""
+    active = fieldnames if non_empty is None else [f for f in fieldnames if f in non_empty]
     out_fields = _rename_fields(active, col_map) if col_map else active
+    count = 0
     with open(path, "w", newline="", encoding="utf-8") as f:
         writer = csv.DictWriter(f, fieldnames=out_fields, extrasaction="ignore")
         writer.writeheader()
-        for row in all_rows:
+        for row in rows:
             writer.writerow(_rename_row(row, col_map) if col_map else row)
-    return len(all_rows), out_fields
+            count += 1
+    return count, out_fields
+
+
+# Delta deposits: the column that identifies the rows of each data file.
+# Entity files are upserted by key; relational files replace every row
+# sharing the key.  Codelists are always exported in full.
+DELTA_KEYS = {
+    "personas_esclavizadas.csv": "persona_idno",
+    "personas_no_esclavizadas.csv": "persona_idno",
+    "documentos.csv": "documento_idno",
+    "lugares.csv": "lugar_id",
+    "corporaciones.csv": "corporacion_idno",
+    "trayectorias.csv": "persona_x_lugares_id",
+    "relaciones_personas.csv": "persona_relacion_id",
+    "roles_evento_personas.csv": "documento_idno",
+    "roles_evento_instituciones.csv": "documento_idno",
+}
+
+
+def _init_worker():
+    django.setup()
+
+
+def _run_export(method_name, out_dir, cutoff, since, col_map, file_map):
+    """Worker entry point: run one table export on this process's own connection."""
+    buf = io.StringIO()
+    command = Command(stdout=buf)
+    command.since = since
+    command.col_map = col_map
+    command.file_map = file_map
+    command.written_columns = {}
+    try:
+        manifest = getattr(command, method_name)(out_dir, cutoff)
+    finally:
+        connections.close_all()
+    return manifest, command.written_columns, buf.getvalue()
 
 
 class Command(BaseCommand):
     help = "Exports a versioned deposit package (CSV files) to an output directory."
+    since = None  # delta mode: export rows changed at or after this datetime
 
     def add_arguments(self, parser):
         parser.add_argument(
@@ -73,13 +190,31 @@ class Command(BaseCommand):
             metavar="DATE",
             help="Export only records updated on or before this date (YYYY-MM-DD or DD-MM-YYYY). Default: all records.",
         )
+        parser.add_argument(
+            "--jobs",
+            type=int,
+            default=1,
+            metavar="N",
+            help="Export tables in N parallel worker processes, each with its own DB connection (default: 1).",
+        )
+        parser.add_argument(
+            "--since",
+            type=str,
+            default=None,
+            metavar="MANIFEST",
+            help="Delta export: only rows changed since the deposit described by this MANIFEST.txt "
+                 "(or its directory), plus *_deleted.csv tombstones.",
+        )
 
     def handle(self, *args, **options):
+        # Rows changed after this instant belong to the next delta.
+        snapshot = timezone.now().replace(microsecond=0)
         today = date.today().isoformat()
-        out_dir = Path(options["output"]) / today
-        out_dir.mkdir(parents=True, exist_ok=True)
-
         cutoff = self._parse_until(options["until"])
+        self.since, base = self._read_base_manifest(options["since"]) if options["since"] else (None, None)
+
+        out_dir = Path(options["output"]) / (f"{today}-delta" if self.since else today)
+        out_dir.mkdir(parents=True, exist_ok=True)
 
         col_map, file_map = _load_field_map()
         self.col_map = col_map
@@ -92,22 +227,33 @@ class Command(BaseCommand):
         if cutoff:
             self.stdout.write(f"  Cutoff date      : {cutoff.isoformat()} (records updated on or before this date)")
 
-        self.stdout.write(f"Exporting deposit to {out_dir} ...")
+        if self.since:
+            self.stdout.write(f"  Changes since    : {self.since.isoformat()} (base deposit {base})")
+
+        jobs = max(options["jobs"], 1)
+        self.stdout.write(f"Exporting deposit to {out_dir} ..." + (f" ({jobs} jobs)" if jobs > 1 else ""))
         manifest = {}
 
-        manifest.update(self._export_personas_esclavizadas(out_dir, cutoff))
-        manifest.update(self._export_personas_no_esclavizadas(out_dir, cutoff))
-        manifest.update(self._export_documentos(out_dir, cutoff))
-        manifest.update(self._export_lugares(out_dir))
-        manifest.update(self._export_corporaciones(out_dir, cutoff))
-        manifest.update(self._export_trayectorias(out_dir, cutoff))
-        manifest.update(self._export_relaciones_personas(out_dir, cutoff))
-        manifest.update(self._export_roles_evento_personas(out_dir, cutoff))
-        manifest.update(self._export_roles_evento_instituciones(out_dir, cutoff))
-        manifest.update(self._export_codelists(out_dir))
+        if jobs > 1:
+            # Workers open their own connections; never share the parent's.
+            connections.close_all()
+            with ProcessPoolExecutor(max_workers=jobs, initializer=_init_worker) as pool:
+                futures = [
+                    pool.submit(_run_export, name, out_dir, cutoff, self.since, col_map, file_map)
+                    for name in EXPORTS
+                ]
+                # Collect in EXPORTS order so the manifest and metadata match a serial run.
+                for future in futures:
+                    part, written, log = future.result()
+                    manifest.update(part)
+                    self.written_columns.update(written)
+                    self.stdout.write(log, ending="")
+        else:
+            for name in EXPORTS:
+                manifest.update(getattr(self, name)(out_dir, cutoff))
 
         self._write_metadata_elements(out_dir)
-        self._write_manifest(out_dir, manifest, today, cutoff)
+        self._write_manifest(out_dir, manifest, today, cutoff, snapshot, base)
         self.stdout.write(self.style.SUCCESS(f"Done. {len(manifest)} files written to {out_dir}"))
 
     def _parse_until(self, raw):
@@ -120,6 +266,61 @@ class Command(BaseCommand):
                 continue
         raise CommandError(f"Invalid --until date: {raw!r}. Use YYYY-MM-DD or DD-MM-YYYY.")
 
+    def _read_base_manifest(self, raw):
+        """
+        Return (since, base label) from a previous deposit's MANIFEST.txt.
+
+        Deposits record their snapshot time; older manifests fall back to the
+        day after their cutoff or the start of their export date, which can
+        only re-export rows, never skip them.
+        """
+        path = Path(raw)
+        if path.is_dir():
+            path = path / "MANIFEST.txt"
+        if not path.exists():
+            raise CommandError(f"Base manifest not found: {path}")
+
+        header = {}
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                label, sep, value = line.partition(":")
+                if sep:
+                    header.setdefault(label.strip(), value.strip())
+
+        try:
+            if "Snapshot time" in header:
+                since = datetime.fromisoformat(header["Snapshot time"])
+            elif "Cutoff date" in header:
+                day = date.fromisoformat(header["Cutoff date"].split()[0]) + timedelta(days=1)
+                since = timezone.make_aware(datetime.combine(day, time.min))
+            else:
+                since = timezone.make_aware(datetime.combine(date.fromisoformat(header["Export date"]), time.min))
+        except (KeyError, ValueError):
+            raise CommandError(f"Cannot read the snapshot time of base manifest {path}")
+        return since, f"{header.get('Export date', '?')} ({path.parent.name})"
+
+    def _write_table(self, out_dir, filename, fields, rows, row_qs, probes):
+        """Probe ``row_qs`` for non-empty columns, then stream ``rows`` to disk."""
+        fname = self.file_map.get(filename, filename)
+        non_empty = _non_empty_fields(row_qs, probes)
+        count, written_fields = _write_csv(out_dir / fname, fields, rows, self.col_map, non_empty)
+        self.written_columns[filename] = written_fields
+        self.stdout.write(f"  {fname} — {count} rows")
+        return {fname: count}
+
+    def _write_tombstones(self, out_dir, filename, model, source, column):
+        """Delta mode: ``column`` values of rows deleted since the base deposit (from history)."""
+        if not self.since:
+            return {}
+        fname = f"{Path(self.file_map.get(filename, filename)).stem}_deleted.csv"
+        ids = (
+            model.history.filter(history_type="-", history_date__gte=self.since)
+            .order_by(source).values_list(source, flat=True).distinct()
+        )
+        count, _ = _write_csv(out_dir / fname, [column], ({column: v} for v in ids.iterator()), self.col_map)
+        self.stdout.write(f"  {fname} — {count} rows")
+        return {fname: count}
+
     # -------------------------------------------------------------------------
     # Entity tables
     # -------------------------------------------------------------------------
@@ -138,13 +339,28 @@ class Command(BaseCommand):
             "documentos", "notas",
         ]
 
+        qs = PersonaEsclavizada.objects.prefetch_related(
+            "calidades", "hispanizacion", "etnonimos",
+            "ocupaciones", "estado_civil", "documentos",
+        ).select_related("procedencia", "lugar_nacimiento", "lugar_defuncion")
+        if cutoff:
+            qs = qs.filter(updated_at__date__lte=cutoff)
+        if self.since:
+            qs = qs.filter(updated_at__gte=self.since)
+
+        probes = _probes(fields, {
+            "calidades": "calidades__calidad",
+            "hispanizacion": "hispanizacion__hispanizacion",
+            "etnonimos": "etnonimos__etonimo",
+            "procedencia_lugar_id": "procedencia",
+            "ocupaciones": "ocupaciones__actividad",
+            "estado_civil": "estado_civil__estado_civil",
+            "lugar_nacimiento_id": "lugar_nacimiento",
+            "lugar_defuncion_id": "lugar_defuncion",
+            "documentos": "documentos__documento_idno",
+        })
+
         def rows():
-            qs = PersonaEsclavizada.objects.prefetch_related(
-                "calidades", "hispanizacion", "etnonimos",
-                "ocupaciones", "estado_civil", "documentos",
-            ).select_related("procedencia", "lugar_nacimiento", "lugar_defuncion")
-            if cutoff:
-                qs = qs.filter(updated_at__date__lte=cutoff)
             for p in qs.iterator(chunk_size=2000):
                 yield {
                     "persona_idno": p.persona_idno,
@@ -157,17 +373,17 @@ class Command(BaseCommand):
                     "altura": p.altura,
                     "cabello": p.cabello,
                     "ojos": p.ojos,
-                    "calidades": PIPE.join(p.calidades.values_list("calidad", flat=True)),
-                    "hispanizacion": PIPE.join(p.hispanizacion.values_list("hispanizacion", flat=True)),
-                    "etnonimos": PIPE.join(p.etnonimos.values_list("etonimo", flat=True)),
+                    "calidades": PIPE.join(v.calidad for v in p.calidades.all()),
+                    "hispanizacion": PIPE.join(v.hispanizacion for v in p.hispanizacion.all()),
+                    "etnonimos": PIPE.join(v.etonimo for v in p.etnonimos.all()),
                     "procedencia_lugar_id": p.procedencia_id,
                     "procedencia_adicional": p.procedencia_adicional,
                     "marcas_corporales": p.marcas_corporales,
                     "conducta": p.conducta,
                     "salud": p.salud,
-                    "ocupaciones": PIPE.join(p.ocupaciones.values_list("actividad", flat=True)),
+                    "ocupaciones": PIPE.join(v.actividad for v in p.ocupaciones.all()),
                     "ocupacion_categoria": p.ocupacion_categoria,
-                    "estado_civil": PIPE.join(p.estado_civil.values_list("estado_civil", flat=True)),
+                    "estado_civil": PIPE.join(v.estado_civil for v in p.estado_civil.all()),
                     "lugar_nacimiento_id": p.lugar_nacimiento_id,
                     "fecha_nacimiento": p.fecha_nacimiento,
                     "fecha_nacimiento_raw": p.fecha_nacimiento_raw,
@@ -176,16 +392,13 @@ class Command(BaseCommand):
                     "fecha_defuncion": p.fecha_defuncion,
                     "fecha_defuncion_raw": p.fecha_defuncion_raw,
                     "fecha_defuncion_factual": p.fecha_defuncion_factual,
-                    "documentos": PIPE.join(p.documentos.values_list("documento_idno", flat=True)),
+                    "documentos": PIPE.join(v.documento_idno for v in p.documentos.all()),
                     "notas": p.notas,
                 }
 
-        fname = self.file_map.get("personas_esclavizadas.csv", "personas_esclavizadas.csv")
-        path = out_dir / fname
-        count, written_fields = _write_csv(path, fields, rows(), self.col_map)
-        self.written_columns["personas_esclavizadas.csv"] = written_fields
-        self.stdout.write(f"  {fname} — {count} rows")
-        return {fname: count}
+        manifest = self._write_table(out_dir, "personas_esclavizadas.csv", fields, rows(), qs, probes)
+        manifest.update(self._write_tombstones(out_dir, "personas_esclavizadas.csv", PersonaEsclavizada, "persona_idno", "persona_idno"))
+        return manifest
 
     def _export_personas_no_esclavizadas(self, out_dir, cutoff=None):
         fields = [
@@ -198,13 +411,25 @@ class Command(BaseCommand):
             "documentos", "notas",
         ]
 
+        qs = PersonaNoEsclavizada.objects.prefetch_related(
+            "calidades", "ocupaciones", "estado_civil",
+            "documentos",
+        ).select_related("lugar_nacimiento", "lugar_defuncion")
+        if cutoff:
+            qs = qs.filter(updated_at__date__lte=cutoff)
+        if self.since:
+            qs = qs.filter(updated_at__gte=self.since)
+
+        probes = _probes(fields, {
+            "calidades": "calidades__calidad",
+            "ocupaciones": "ocupaciones__actividad",
+            "estado_civil": "estado_civil__estado_civil",
+            "lugar_nacimiento_id": "lugar_nacimiento",
+            "lugar_defuncion_id": "lugar_defuncion",
+            "documentos": "documentos__documento_idno",
+        })
+
         def rows():
-            qs = PersonaNoEsclavizada.objects.prefetch_related(
-                "calidades", "ocupaciones", "estado_civil",
-                "documentos",
-            ).select_related("lugar_nacimiento", "lugar_defuncion")
-            if cutoff:
-                qs = qs.filter(updated_at__date__lte=cutoff)
             for p in qs.iterator(chunk_size=2000):
                 yield {
                     "persona_idno": p.persona_idno,
@@ -213,10 +438,10 @@ class Command(BaseCommand):
                     "nombre_normalizado": p.nombre_normalizado,
                     "sexo": p.sexo,
                     "honorifico": p.honorifico,
-                    "calidades": PIPE.join(p.calidades.values_list("calidad", flat=True)),
-                    "ocupaciones": PIPE.join(p.ocupaciones.values_list("actividad", flat=True)),
+                    "calidades": PIPE.join(v.calidad for v in p.calidades.all()),
+                    "ocupaciones": PIPE.join(v.actividad for v in p.ocupaciones.all()),
                     "ocupacion_categoria": p.ocupacion_categoria,
-                    "estado_civil": PIPE.join(p.estado_civil.values_list("estado_civil", flat=True)),
+                    "estado_civil": PIPE.join(v.estado_civil for v in p.estado_civil.all()),
                     "entidad_asociada": p.entidad_asociada,
                     "lugar_nacimiento_id": p.lugar_nacimiento_id,
                     "fecha_nacimiento": p.fecha_nacimiento,
@@ -226,16 +451,13 @@ class Command(BaseCommand):
                     "fecha_defuncion": p.fecha_defuncion,
                     "fecha_defuncion_raw": p.fecha_defuncion_raw,
                     "fecha_defuncion_factual": p.fecha_defuncion_factual,
-                    "documentos": PIPE.join(p.documentos.values_list("documento_idno", flat=True)),
+                    "documentos": PIPE.join(v.documento_idno for v in p.documentos.all()),
                     "notas": p.notas,
                 }
 
-        fname = self.file_map.get("personas_no_esclavizadas.csv", "personas_no_esclavizadas.csv")
-        path = out_dir / fname
-        count, written_fields = _write_csv(path, fields, rows(), self.col_map)
-        self.written_columns["personas_no_esclavizadas.csv"] = written_fields
-        self.stdout.write(f"  {fname} — {count} rows")
-        return {fname: count}
+        manifest = self._write_table(out_dir, "personas_no_esclavizadas.csv", fields, rows(), qs, probes)
+        manifest.update(self._write_tombstones(out_dir, "personas_no_esclavizadas.csv", PersonaNoEsclavizada, "persona_idno", "persona_idno"))
+        return manifest
 
     def _export_documentos(self, out_dir, cutoff=None):
         fields = [
@@ -252,13 +474,25 @@ class Command(BaseCommand):
             "notas",
         ]
 
+        qs = Documento.objects.select_related(
+            "archivo", "archivo__ubicacion_archivo",
+            "tipo_documento", "lugar_de_produccion",
+        )
+        if cutoff:
+            qs = qs.filter(updated_at__date__lte=cutoff)
+        if self.since:
+            qs = qs.filter(updated_at__gte=self.since)
+
+        probes = _probes(fields, {
+            "archivo_idno": "archivo__archivo_idno",
+            "archivo_nombre": "archivo__nombre",
+            "archivo_nombre_abreviado": "archivo__nombre_abreviado",
+            "archivo_ubicacion_lugar_id": "archivo__ubicacion_archivo",
+            "tipo_documento": "tipo_documento__tipo_documental",
+            "lugar_de_produccion_id": "lugar_de_produccion",
+        })
+
         def rows():
-            qs = Documento.objects.select_related(
-                "archivo", "archivo__ubicacion_archivo",
-                "tipo_documento", "lugar_de_produccion",
-            )
-            if cutoff:
-                qs = qs.filter(updated_at__date__lte=cutoff)
             for d in qs.iterator(chunk_size=2000):
                 yield {
                     "documento_idno": d.documento_idno,
@@ -292,21 +526,25 @@ class Command(BaseCommand):
                     "notas": d.notas,
                 }
 
-        fname = self.file_map.get("documentos.csv", "documentos.csv")
-        path = out_dir / fname
-        count, written_fields = _write_csv(path, fields, rows(), self.col_map)
-        self.written_columns["documentos.csv"] = written_fields
-        self.stdout.write(f"  {fname} — {count} rows")
-        return {fname: count}
+        manifest = self._write_table(out_dir, "documentos.csv", fields, rows(), qs, probes)
+        manifest.update(self._write_tombstones(out_dir, "documentos.csv", Documento, "documento_idno", "documento_idno"))
+        return manifest
 
-    def _export_lugares(self, out_dir):
+    def _export_lugares(self, out_dir, cutoff=None):
+        """Places are always exported in full (no --until cutoff)."""
         fields = [
             "lugar_id", "nombre_lugar", "otros_nombres", "tipo",
             "es_parte_de_lugar_id", "lat", "lon",
         ]
 
+        qs = Lugar.objects.select_related("tipo")
+        if self.since:
+            # No updated_at: changed places show up in history.
+            qs = qs.filter(lugar_id__in=Lugar.history.filter(history_date__gte=self.since).values("lugar_id"))
+        probes = _probes(fields, {"tipo": "tipo__tipo_lugar", "es_parte_de_lugar_id": "es_parte_de"})
+
         def rows():
-            for l in Lugar.objects.iterator(chunk_size=2000):
+            for l in qs.iterator(chunk_size=2000):
                 yield {
                     "lugar_id": l.lugar_id,
                     "nombre_lugar": l.nombre_lugar,
@@ -317,12 +555,9 @@ class Command(BaseCommand):
                     "lon": l.lon,
                 }
 
-        fname = self.file_map.get("lugares.csv", "lugares.csv")
-        path = out_dir / fname
-        count, written_fields = _write_csv(path, fields, rows(), self.col_map)
-        self.written_columns["lugares.csv"] = written_fields
-        self.stdout.write(f"  {fname} — {count} rows")
-        return {fname: count}
+        manifest = self._write_table(out_dir, "lugares.csv", fields, rows(), qs, probes)
+        manifest.update(self._write_tombstones(out_dir, "lugares.csv", Lugar, "lugar_id", "lugar_id"))
+        return manifest
 
     def _export_corporaciones(self, out_dir, cutoff=None):
         fields = [
@@ -331,12 +566,22 @@ class Command(BaseCommand):
             "personas_asociadas", "documentos", "notas",
         ]
 
+        qs = Corporacion.objects.prefetch_related(
+            "personas_asociadas", "documentos",
+        ).select_related("tipo_institucion", "lugar_corporacion")
+        if cutoff:
+            qs = qs.filter(updated_at__date__lte=cutoff)
+        if self.since:
+            qs = qs.filter(updated_at__gte=self.since)
+
+        probes = _probes(fields, {
+            "tipo_institucion": "tipo_institucion__tipo",
+            "lugar_corporacion_id": "lugar_corporacion",
+            "personas_asociadas": "personas_asociadas__persona_idno",
+            "documentos": "documentos__documento_idno",
+        })
+
         def rows():
-            qs = Corporacion.objects.prefetch_related(
-                "personas_asociadas", "documentos",
-            ).select_related("tipo_institucion", "lugar_corporacion")
-            if cutoff:
-                qs = qs.filter(updated_at__date__lte=cutoff)
             for c in qs.iterator(chunk_size=2000):
                 yield {
                     "corporacion_idno": c.corporacion_idno,
@@ -345,20 +590,17 @@ class Command(BaseCommand):
                     "tipo_institucion": c.tipo_institucion.tipo,
                     "lugar_corporacion_id": c.lugar_corporacion_id,
                     "personas_asociadas": PIPE.join(
-                        c.personas_asociadas.values_list("persona_idno", flat=True)
+                        v.persona_idno for v in c.personas_asociadas.all()
                     ),
                     "documentos": PIPE.join(
-                        c.documentos.values_list("documento_idno", flat=True)
+                        v.documento_idno for v in c.documentos.all()
                     ),
                     "notas": c.notas,
                 }
 
-        fname = self.file_map.get("corporaciones.csv", "corporaciones.csv")
-        path = out_dir / fname
-        count, written_fields = _write_csv(path, fields, rows(), self.col_map)
-        self.written_columns["corporaciones.csv"] = written_fields
-        self.stdout.write(f"  {fname} — {count} rows")
-        return {fname: count}
+        manifest = self._write_table(out_dir, "corporaciones.csv", fields, rows(), qs, probes)
+        manifest.update(self._write_tombstones(out_dir, "corporaciones.csv", Corporacion, "corporacion_idno", "corporacion_idno"))
+        return manifest
 
     # -------------------------------------------------------------------------
     # Relational tables
@@ -373,12 +615,25 @@ class Command(BaseCommand):
             "notas",
         ]
 
+        qs = PersonaLugarRel.objects.prefetch_related("personas").select_related(
+            "documento", "lugar", "situacion_lugar"
+        )
+        if cutoff:
+            qs = qs.filter(updated_at__date__lte=cutoff)
+        if self.since:
+            qs = qs.filter(updated_at__gte=self.since)
+
+        # Rows only come from relations that have personas.
+        row_qs = qs.filter(personas__isnull=False)
+        probes = _probes(fields, {
+            "persona_idno": "personas__persona_idno",
+            "persona_x_lugares_id": "pk",
+            "documento_idno": "documento__documento_idno",
+            "lugar_id": "lugar",
+            "situacion_lugar": "situacion_lugar__situacion",
+        })
+
         def rows():
-            qs = PersonaLugarRel.objects.prefetch_related("personas").select_related(
-                "documento", "lugar", "situacion_lugar"
-            )
-            if cutoff:
-                qs = qs.filter(updated_at__date__lte=cutoff)
             for rel in qs.iterator(chunk_size=2000):
                 doc_idno = rel.documento.documento_idno
                 situacion = rel.situacion_lugar.situacion if rel.situacion_lugar else None
@@ -399,12 +654,9 @@ class Command(BaseCommand):
                         "notas": rel.notas,
                     }
 
-        fname = self.file_map.get("trayectorias.csv", "trayectorias.csv")
-        path = out_dir / fname
-        count, written_fields = _write_csv(path, fields, rows(), self.col_map)
-        self.written_columns["trayectorias.csv"] = written_fields
-        self.stdout.write(f"  {fname} — {count} rows")
-        return {fname: count}
+        manifest = self._write_table(out_dir, "trayectorias.csv", fields, rows(), row_qs, probes)
+        manifest.update(self._write_tombstones(out_dir, "trayectorias.csv", PersonaLugarRel, "persona_x_lugares", "persona_x_lugares_id"))
+        return manifest
 
     def _export_relaciones_personas(self, out_dir, cutoff=None):
         """Long/pairwise: one row per C(N,2) pair per PersonaRelaciones record."""
@@ -418,12 +670,31 @@ class Command(BaseCommand):
             "notas",
         ]
 
-        def rows():
-            qs = PersonaRelaciones.objects.prefetch_related("personas").select_related(
-                "documento", "persona_fuente"
+        qs = PersonaRelaciones.objects.prefetch_related("personas").select_related(
+            "documento", "persona_fuente"
+        )
+        if cutoff:
+            qs = qs.filter(documento__updated_at__date__lte=cutoff)
+        if self.since:
+            # No updated_at: saved relations show up in history.
+            qs = qs.filter(
+                Q(persona_relacion_id__in=PersonaRelaciones.history.filter(
+                    history_date__gte=self.since).values("persona_relacion_id"))
+                | Q(documento__updated_at__gte=self.since)
             )
-            if cutoff:
-                qs = qs.filter(documento__updated_at__date__lte=cutoff)
+
+        # Rows only come from relations with at least one pair of personas.
+        row_qs = qs.filter(
+            pk__in=PersonaRelaciones.objects.annotate(n=Count("personas")).filter(n__gte=2).values("pk")
+        )
+        probes = _probes(fields, {
+            "persona_idno_1": "personas__persona_idno",
+            "persona_idno_2": "personas__persona_idno",
+            "documento_idno": "documento__documento_idno",
+            "persona_fuente_idno": "persona_fuente__persona_idno",
+        })
+
+        def rows():
             for rel in qs.iterator(chunk_size=2000):
                 personas = list(rel.personas.all())
                 doc_idno = rel.documento.documento_idno
@@ -446,22 +717,31 @@ class Command(BaseCommand):
                         "notas": rel.notas,
                     }
 
-        fname = self.file_map.get("relaciones_personas.csv", "relaciones_personas.csv")
-        path = out_dir / fname
-        count, written_fields = _write_csv(path, fields, rows(), self.col_map)
-        self.written_columns["relaciones_personas.csv"] = written_fields
-        self.stdout.write(f"  {fname} — {count} rows")
-        return {fname: count}
+        manifest = self._write_table(out_dir, "relaciones_personas.csv", fields, rows(), row_qs, probes)
+        manifest.update(self._write_tombstones(out_dir, "relaciones_personas.csv", PersonaRelaciones, "persona_relacion_id", "persona_relacion_id"))
+        return manifest
 
     def _export_roles_evento_personas(self, out_dir, cutoff=None):
         fields = ["persona_idno", "documento_idno", "rol_evento"]
 
+        qs = PersonaRolEvento.objects.prefetch_related("personas").select_related(
+            "documento", "rol_evento"
+        )
+        if cutoff:
+            qs = qs.filter(documento__updated_at__date__lte=cutoff)
+        if self.since:
+            # No timestamps or history: roles follow their documento.
+            qs = qs.filter(documento__updated_at__gte=self.since)
+
+        # Rows only come from roles that have personas.
+        row_qs = qs.filter(personas__isnull=False)
+        probes = _probes(fields, {
+            "persona_idno": "personas__persona_idno",
+            "documento_idno": "documento__documento_idno",
+            "rol_evento": "rol_evento__rol_evento",
+        })
+
         def rows():
-            qs = PersonaRolEvento.objects.prefetch_related("personas").select_related(
-                "documento", "rol_evento"
-            )
-            if cutoff:
-                qs = qs.filter(documento__updated_at__date__lte=cutoff)
             for rol in qs.iterator(chunk_size=2000):
                 doc_idno = rol.documento.documento_idno
                 rol_nombre = rol.rol_evento.rol_evento
@@ -472,22 +752,29 @@ class Command(BaseCommand):
                         "rol_evento": rol_nombre,
                     }
 
-        fname = self.file_map.get("roles_evento_personas.csv", "roles_evento_personas.csv")
-        path = out_dir / fname
-        count, written_fields = _write_csv(path, fields, rows(), self.col_map)
-        self.written_columns["roles_evento_personas.csv"] = written_fields
-        self.stdout.write(f"  {fname} — {count} rows")
-        return {fname: count}
+        return self._write_table(out_dir, "roles_evento_personas.csv", fields, rows(), row_qs, probes)
 
     def _export_roles_evento_instituciones(self, out_dir, cutoff=None):
         fields = ["corporacion_idno", "documento_idno", "rol_evento"]
 
+        qs = InstitucionRolEvento.objects.prefetch_related("corporaciones").select_related(
+            "documento", "rol_evento"
+        )
+        if cutoff:
+            qs = qs.filter(documento__updated_at__date__lte=cutoff)
+        if self.since:
+            # No timestamps or history: roles follow their documento.
+            qs = qs.filter(documento__updated_at__gte=self.since)
+
+        # Rows only come from roles that have corporaciones.
+        row_qs = qs.filter(corporaciones__isnull=False)
+        probes = _probes(fields, {
+            "corporacion_idno": "corporaciones__corporacion_idno",
+            "documento_idno": "documento__documento_idno",
+            "rol_evento": "rol_evento__rol_evento",
+        })
+
         def rows():
-            qs = InstitucionRolEvento.objects.prefetch_related("corporaciones").select_related(
-                "documento", "rol_evento"
-            )
-            if cutoff:
-                qs = qs.filter(documento__updated_at__date__lte=cutoff)
             for rol in qs.iterator(chunk_size=2000):
                 doc_idno = rol.documento.documento_idno
                 rol_nombre = rol.rol_evento.rol_evento
@@ -498,18 +785,14 @@ class Command(BaseCommand):
                         "rol_evento": rol_nombre,
                     }
 
-        fname = self.file_map.get("roles_evento_instituciones.csv", "roles_evento_instituciones.csv")
-        path = out_dir / fname
-        count, written_fields = _write_csv(path, fields, rows(), self.col_map)
-        self.written_columns["roles_evento_instituciones.csv"] = written_fields
-        self.stdout.write(f"  {fname} — {count} rows")
-        return {fname: count}
+        return self._write_table(out_dir, "roles_evento_instituciones.csv", fields, rows(), row_qs, probes)
 
     # -------------------------------------------------------------------------
     # Controlled vocabulary codelists
     # -------------------------------------------------------------------------
 
-    def _export_codelists(self, out_dir):
+    def _export_codelists(self, out_dir, cutoff=None):
+        """Codelists are always exported in full (no --until cutoff)."""
         manifest = {}
 
         simple = [
@@ -529,12 +812,10 @@ class Command(BaseCommand):
                 for obj in m.objects.iterator(chunk_size=2000):
                     yield {f: getattr(obj, f, None) for f in fn}
 
-            fname = self.file_map.get(filename, filename)
-            path = out_dir / fname
-            count, written_fields = _write_csv(path, fieldnames, make_rows(model, fieldnames), self.col_map)
-            self.written_columns[filename] = written_fields
-            self.stdout.write(f"  {fname} — {count} rows")
-            manifest[fname] = count
+            manifest.update(self._write_table(
+                out_dir, filename, fieldnames, make_rows(model, fieldnames),
+                model.objects.all(), _probes(fieldnames, {}),
+            ))
 
         # cv_tipos_lugar derives from model choices (not a DB table)
         lugar_fields = ["tipo", "etiqueta"]
@@ -590,7 +871,7 @@ class Command(BaseCommand):
     # Manifest
     # -------------------------------------------------------------------------
 
-    def _write_manifest(self, out_dir, manifest, today, cutoff=None):
+    def _write_manifest(self, out_dir, manifest, today, cutoff=None, snapshot=None, base=None):
         schema_version = get_schema_version()
         manifest_path = out_dir / "MANIFEST.txt"
         with open(manifest_path, "w", encoding="utf-8") as f:
@@ -598,10 +879,29 @@ class Command(BaseCommand):
             f.write(f"Export date    : {today}\n")
             if cutoff:
                 f.write(f"Cutoff date    : {cutoff.isoformat()} (records updated on or before this date)\n")
+            if snapshot:
+                f.write(f"Snapshot time  : {snapshot.isoformat()}\n")
+            f.write(f"Deposit type   : {'delta' if self.since else 'full'}\n")
+            if self.since:
+                f.write(f"Base deposit   : {base}\n")
+                f.write(f"Changes since  : {self.since.isoformat()}\n")
             f.write(f"Schema version : {schema_version}\n")
             f.write(f"License        : CC BY-NC 4.0\n")
             f.write(f"\nNote: 'Export date' is the data snapshot date. ")
             f.write(f"Schema version tracks structural changes to the CSV layout.\n")
+            if self.since:
+                f.write(
+                    "Delta: apply deposits in order, each on top of its base deposit. Per file, first drop "
+                    "the rows listed in <file>_deleted.csv, then replace every row sharing the key below "
+                    "with the rows in <file>. Rows of any file that reference a deleted persona or documento "
+                    "are dropped as well. Codelists are complete. Relaciones changed only by adding or "
+                    "removing personas, and deleted roles, are picked up when their documento changes.\n"
+                )
+                f.write(f"{'File':<45} {'Key':<24}\n")
+                f.write(f"{'-'*45} {'-'*24}\n")
+                for filename, key in DELTA_KEYS.items():
+                    f.write(f"{self.file_map.get(filename, filename):<45} {self.col_map.get(key, key):<24}\n")
+                f.write("\n")
             f.write(f"{'File':<45} {'Rows':>8}\n")
             f.write(f"{'-'*45} {'-'*8}\n")
             for filename, count in sorted(manifest.items()):
@@ -9,13 +9,41 @@ This command updates the search_vector field for all existing records in:
 - Documento
 - Persona (and subclasses)
 - Corporacion
+
+Saves keep search_vector current (see dbgestor.search_vectors); this is the
+full rebuild, e.g. after loaddata or bulk QuerySet.update() calls.
+
+Rows are walked in primary-key order and updated in batches, one committed
+transaction per batch, so the rebuild never holds a long transaction or a
+table-wide lock and can be stopped at any point:
+    python manage.py populate_search_vectors --batch-size 2000 --sleep 0.5
+    python manage.py populate_search_vectors --only-null
+    python manage.py populate_search_vectors --stale
+    python manage.py populate_search_vectors --checkpoint sv.json
+    python manage.py populate_search_vectors --checkpoint sv.json --resume
+
+--stale rewrites only the vectors that differ from what the current columns
+produce (the vector itself carries no timestamp to compare with updated_at).
+--batch-size 0 runs the previous single UPDATE per model.
 """
 
-from django.core.management.base import BaseCommand
-from django.contrib.postgres.search import SearchVector
-from django.db.models import Count
+import json
+import time
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import BooleanField, F, Func, Q
 
 from dbgestor.models import Lugar, Documento, Persona, Corporacion
+from dbgestor.search_vectors import search_vector_expression
+
+MODELS = {
+    'lugar': Lugar,
+    'documento': Documento,
+    'persona': Persona,
+    'corporacion': Corporacion,
+}
 
 
 class Command(BaseCommand):
@@ -25,91 +53,142 @@ class Command(BaseCommand):
         parser.add_argument(
             '--model',
             type=str,
-            choices=['lugar', 'documento', 'persona', 'corporacion', 'all'],
+            choices=[*MODELS, 'all'],
             default='all',
             help='Which model to update (default: all)',
         )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=5000,
+            help='Rows per committed batch (default: 5000). 0 updates each model in one statement.',
+        )
+        parser.add_argument(
+            '--sleep',
+            type=float,
+            default=0,
+            help='Seconds to pause between batches, e.g. to let replicas catch up (default: 0).',
+        )
+        only = parser.add_mutually_exclusive_group()
+        only.add_argument(
+            '--only-null',
+            action='store_true',
+            help='Only fill rows whose search_vector is empty.',
+        )
+        only.add_argument(
+            '--stale',
+            action='store_true',
+            help='Only rewrite vectors that differ from the current column values.',
+        )
+        parser.add_argument(
+            '--checkpoint',
+            type=str,
+            default=None,
+            help='JSON file recording the last committed primary key per model.',
+        )
+        parser.add_argument(
+            '--resume',
+            action='store_true',
+            help='Continue from --checkpoint instead of starting over.',
+        )
 
     def handle(self, *args, **options):
         model_name = options['model']
+        if options['batch_size'] < 0:
+            raise CommandError('--batch-size must be 0 or greater')
+        if options['resume'] and not options['checkpoint']:
+            raise CommandError('--resume needs --checkpoint')
+
+        self.checkpoint_path = Path(options['checkpoint']) if options['checkpoint'] else None
+        self.checkpoint = self._load_checkpoint(options)
 
-        if model_name in ['lugar', 'all']:
-            self.update_lugar()
-        
-        if model_name in ['documento', 'all']:
-            self.update_documento()
-        
-        if model_name in ['persona', 'all']:
-            self.update_persona()
-        
-        if model_name in ['corporacion', 'all']:
-            self.update_corporacion()
+        for name, model in MODELS.items():
+            if model_name in [name, 'all']:
+                self.update_model(model, options)
 
         self.stdout.write(self.style.SUCCESS('✓ Search vectors updated successfully'))
 
-    def update_lugar(self):
-        """Update search_vector for all Lugar records."""
-        self.stdout.write('Updating Lugar search vectors...')
-        
-        count = Lugar.objects.count()
-        
-        Lugar.objects.update(
-            search_vector=(
-                SearchVector('nombre_lugar', weight='A', config='spanish') +
-                SearchVector('otros_nombres', weight='B', config='spanish') +
-                SearchVector('tipo', weight='C', config='spanish')
-            )
-        )
-        
-        self.stdout.write(self.style.SUCCESS(f'  ✓ Updated {count} Lugar records'))
-
-    def update_documento(self):
-        """Update search_vector for all Documento records."""
-        self.stdout.write('Updating Documento search vectors...')
-        
-        count = Documento.objects.count()
-        
-        Documento.objects.update(
-            search_vector=(
-                SearchVector('titulo', weight='A', config='spanish') +
-                SearchVector('descripcion', weight='B', config='spanish') +
-                SearchVector('notas', weight='C', config='spanish') +
-                SearchVector('sigla_documento', weight='D', config='spanish')
-            )
-        )
-        
-        self.stdout.write(self.style.SUCCESS(f'  ✓ Updated {count} Documento records'))
-
-    def update_persona(self):
-        """Update search_vector for all Persona records."""
-        self.stdout.write('Updating Persona search vectors...')
-        
-        count = Persona.objects.count()
-        
-        Persona.objects.update(
-            search_vector=(
-                SearchVector('nombre_normalizado', weight='A', config='spanish') +
-                SearchVector('nombres', weight='A', config='spanish') +
-                SearchVector('apellidos', weight='A', config='spanish') +
-                SearchVector('notas', weight='C', config='spanish') +
-                SearchVector('ocupacion_categoria', weight='D', config='spanish')
-            )
-        )
-        
-        self.stdout.write(self.style.SUCCESS(f'  ✓ Updated {count} Persona records'))
-
-    def update_corporacion(self):
-        """Update search_vector for all Corporacion records."""
-        self.stdout.write('Updating Corporacion search vectors...')
-        
-        count = Corporacion.objects.count()
-        
-        Corporacion.objects.update(
-            search_vector=(
-                SearchVector('nombre_institucion', weight='A', config='spanish') +
-                SearchVector('nombres_alternativos', weight='B', config='spanish') +
-                SearchVector('notas', weight='C', config='spanish')
+    def _scope(self, model, options):
+        """Rows this run has to look at, and the extra filter for rows it rewrites."""
+        qs = model._base_manager.all()
+        if options['only_null']:
+            return qs.filter(search_vector__isnull=True), Q()
+        if options['stale']:
+            # search_vector=... would be a full-text match (@@), not equality.
+            qs = qs.annotate(search_vector_current=Func(
+                F('search_vector'), search_vector_expression(model),
+                template='(%(expressions)s)', arg_joiner=' IS NOT DISTINCT FROM ',
+                output_field=BooleanField(),
+            ))
+            return qs, Q(search_vector_current=False)
+        return qs, Q()
+
+    def update_model(self, model, options):
+        """Update search_vector for one model, batch by batch."""
+        label = model.__name__
+        self.stdout.write(f'Updating {label} search vectors...')
+        expression = search_vector_expression(model)
+        scope, rewrite = self._scope(model, options)
+
+        if options['batch_size'] == 0:
+            count = scope.filter(rewrite).update(search_vector=expression)
+            self.stdout.write(self.style.SUCCESS(f'  ✓ Updated {count} {label} records'))
+            return
+
+        state = self.checkpoint['models'].get(label, {})
+        if state.get('done'):
+            self.stdout.write(f'  {label} already done in {self.checkpoint_path}, skipping')
+            return
+        last_pk = state.get('last_pk')
+        if last_pk is not None:
+            self.stdout.write(f'  resuming after pk {last_pk}')
+            scope = scope.filter(pk__gt=last_pk)
+
+        total = scope.count()
+        scanned = updated = 0
+        started = time.monotonic()
+        while True:
+            pks = list(scope.order_by('pk').values_list('pk', flat=True)[:options['batch_size']])
+            if not pks:
+                break
+            with transaction.atomic():
+                updated += scope.filter(pk__lte=pks[-1]).filter(rewrite).update(search_vector=expression)
+            # Written after the commit: a crash in between only redoes one batch.
+            self._save_checkpoint(label, last_pk=pks[-1])
+            scope = scope.filter(pk__gt=pks[-1])
+            scanned += len(pks)
+
+            elapsed = time.monotonic() - started
+            rate = scanned / elapsed if elapsed else 0
+            self.stdout.write(f'  {scanned}/{total} rows, {updated} updated ({rate:.0f} rows/s)')
+            if options['sleep'] and len(pks) == options['batch_size']:
+                time.sleep(options['sleep'])
+
+        self._save_checkpoint(label, done=True)
+        self.stdout.write(self.style.SUCCESS(f'  ✓ Updated {updated} {label} records'))
+
+    # ── checkpoint file ──────────────────────────────────────────────────────
+
+    def _load_checkpoint(self, options):
+        run = {'only_null': options['only_null'], 'stale': options['stale']}
+        if not options['resume']:
+            return {'run': run, 'models': {}}
+        try:
+            checkpoint = json.loads(self.checkpoint_path.read_text(encoding='utf-8'))
+        except FileNotFoundError:
+            raise CommandError(f'Checkpoint not found: {self.checkpoint_path}')
+        except ValueError:
+            raise CommandError(f'Checkpoint is not valid JSON: {self.checkpoint_path}')
+        if checkpoint.get('run') != run:
+            raise CommandError(
+                f'Checkpoint was written with {checkpoint.get("run")}; resume with the same options'
             )
-        )
-        
-        self.stdout.write(self.style.SUCCESS(f'  ✓ Updated {count} Corporacion records'))
+        return checkpoint
+
+    def _save_checkpoint(self, label, **state):
+        self.checkpoint['models'].setdefault(label, {}).update(state)
+        if self.checkpoint_path is None:
+            return
+        tmp = self.checkpoint_path.with_suffix(self.checkpoint_path.suffix + '.tmp')
+        tmp.write_text(json.dumps(self.checkpoint, indent=2), encoding='utf-8')
+        tmp.replace(self.checkpoint_path)
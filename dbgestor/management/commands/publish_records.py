@@ -1,13 +1,40 @@
-from django.core.management.base import BaseCommand
+"""
+Management command to publish or unpublish records (see dbgestor.publicacion).
+
+Scope it by archivo (id or nombre_abreviado), documento id or fecha_inicial;
+the documentos bring along their personas, corporaciones and lugares:
+    python manage.py publish_records --archivo AGN --dry-run -v 2
+    python manage.py publish_records --archivo 3 --desde 1700-01-01 --hasta 1750-12-31
+    python manage.py publish_records --documento_id 12 40 --unpublish --user editor
+    python manage.py publish_records --documento_id 12 --no-cascade
+
+or flip whole tables as before, without cascade:
+    python manage.py publish_records --models documento persona
+
+--dry-run prints what would change (with -v 2, every row) and writes
+nothing.  Each run reports the time spent per stage.
+"""
+
 from django.apps import apps
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Q
 
+from dbgestor import publicacion
+from dbgestor.models import Archivo
+
+# --models key -> (publicacion entity, model).
 PUBLISHABLE_MODELS = {
-    "documento": "dbgestor.Documento",
-    "persona": "dbgestor.Persona",
-    "personaesclavizada": "dbgestor.PersonaEsclavizada",
-    "personanoesclavizada": "dbgestor.PersonaNoEsclavizada",
-    "lugar": "dbgestor.Lugar",
-    "corporacion": "dbgestor.Corporacion",
+    "documento": ("documento", "dbgestor.Documento"),
+    "persona": ("persona", "dbgestor.Persona"),
+    "personaesclavizada": ("persona", "dbgestor.PersonaEsclavizada"),
+    "personanoesclavizada": ("persona", "dbgestor.PersonaNoEsclavizada"),
+    "lugar": ("lugar", "dbgestor.Lugar"),
+    "corporacion": ("corporacion", "dbgestor.Corporacion"),
+}
+
+# Historical tables flipped in place with --models, as this command always did.
+HISTORICAL_MODELS = {
     "historicaldocumento": "dbgestor.HistoricalDocumento",
     "historicalpersona": "dbgestor.HistoricalPersona",
     "historicalpersonaesclavizada": "dbgestor.HistoricalPersonaEsclavizada",
@@ -18,41 +45,127 @@ PUBLISHABLE_MODELS = {
 
 
 class Command(BaseCommand):
-    help = "Publish records for specified models by setting is_published = True"
+    help = "Publish (or unpublish) documentos and their linked records, or whole models"
 
     def add_arguments(self, parser):
+        parser.add_argument(
+            '--archivo',
+            nargs='+',
+            type=str,
+            help='Documentos of these archivos (archivo_id or nombre_abreviado).'
+        )
+        parser.add_argument(
+            '--documento_id',
+            nargs='+',
+            type=int,
+            help='These documentos.'
+        )
+        parser.add_argument('--desde', type=str, help='Documentos with fecha_inicial on or after this date (YYYY-MM-DD).')
+        parser.add_argument('--hasta', type=str, help='Documentos with fecha_inicial on or before this date (YYYY-MM-DD).')
+        parser.add_argument(
+            '--no-cascade',
+            action='store_true',
+            help='Only the documentos, not their personas, corporaciones and lugares.'
+        )
         parser.add_argument(
             '--models',
             nargs='+',
             type=str,
-            help='List of model keys to publish (e.g., documento persona)'
+            help='List of model keys to publish entirely (e.g., documento persona)'
+        )
+        parser.add_argument(
+            '--unpublish',
+            action='store_true',
+            help='Set is_published = False instead.'
         )
+        parser.add_argument('--user', type=str, help='Username recorded on the history rows.')
         parser.add_argument(
             '--dry-run',
             action='store_true',
-            help='Show how many records would be published without making changes.'
+            help='Show what would be published without making changes.'
         )
 
     def handle(self, *args, **options):
-        models = options['models']
-        dry_run = options['dry_run']
+        publish = not options['unpublish']
+        scoped = any(options[key] for key in ('archivo', 'documento_id', 'desde', 'hasta'))
+
+        if options['models'] and scoped:
+            raise CommandError("Use either --models or the documento scope (--archivo, --documento_id, --desde, --hasta).")
+        if options['models']:
+            plan = self._plan_models(options['models'], publish, options['dry_run'])
+        elif scoped:
+            documentos = publicacion.scope(
+                archivos=self._archivos(options['archivo']),
+                documentos=options['documento_id'],
+                desde=options['desde'],
+                hasta=options['hasta'],
+            )
+            plan = publicacion.plan(documentos, publish=publish, cascade=not options['no_cascade'])
+        else:
+            self.stdout.write(self.style.ERROR(
+                "No scope specified. Use --archivo, --documento_id, --desde/--hasta or --models."))
+            return
 
-        if not models:
-            self.stdout.write(self.style.ERROR("No models specified. Use --models to provide a list."))
+        action = 'published' if publish else 'unpublished'
+        if options['dry_run']:
+            rows = publicacion.diff(plan) if options['verbosity'] > 1 else {}
+            for entity, pks in plan['changes'].items():
+                self.stdout.write(self.style.WARNING(f"{entity}: {len(pks)} records would be {action} (dry run)."))
+                for pk, label in rows.get(entity, []):
+                    self.stdout.write(f"  {pk}  {label}")
+            self._timings(plan['timings'])
             return
 
-        for model_key in models:
-            model_path = PUBLISHABLE_MODELS.get(model_key.lower())
-            if not model_path:
+        report = publicacion.apply(plan, user=self._user(options['user']))
+        for entity, count in report['counts'].items():
+            self.stdout.write(self.style.SUCCESS(f"{entity}: {count} records {action}."))
+        self.stdout.write(f"{report['history']} history rows written")
+        self._timings(report['timings'])
+
+    def _plan_models(self, keys, publish, dry_run):
+        querysets = {}
+        for model_key in keys:
+            key = model_key.lower()
+            if key in HISTORICAL_MODELS:
+                queryset = apps.get_model(HISTORICAL_MODELS[key]).objects.exclude(is_published=publish)
+                if dry_run:
+                    self.stdout.write(self.style.WARNING(f"{model_key}: {queryset.count()} records would be updated (dry run)."))
+                else:
+                    self.stdout.write(self.style.SUCCESS(f"{model_key}: {queryset.update(is_published=publish)} records updated."))
+                continue
+            if key not in PUBLISHABLE_MODELS:
                 self.stdout.write(self.style.WARNING(f"Model key '{model_key}' is not recognized. Skipping."))
                 continue
+            entity, model_path = PUBLISHABLE_MODELS[key]
+            queryset = apps.get_model(model_path).objects.all()
+            if entity in querysets:
+                # persona plus one of its subclasses: either table's rows.
+                queryset = publicacion.ENTITIES[entity].objects.filter(
+                    Q(pk__in=querysets[entity].values('pk')) | Q(pk__in=queryset.values('pk')))
+            querysets[entity] = queryset
+        return publicacion.plan_tables(querysets, publish=publish)
+
+    def _archivos(self, values):
+        if not values:
+            return None
+        ids = set()
+        for value in values:
+            lookup = Q(nombre_abreviado=value)
+            if value.isdigit():
+                lookup |= Q(pk=int(value))
+            found = list(Archivo.objects.filter(lookup).values_list('pk', flat=True))
+            if not found:
+                raise CommandError(f"Archivo '{value}' not found.")
+            ids.update(found)
+        return sorted(ids)
 
-            model = apps.get_model(model_path)
-            queryset = model.objects.filter(is_published=False)
-            count = queryset.count()
+    def _user(self, username):
+        if not username:
+            return None
+        try:
+            return get_user_model().objects.get(username=username)
+        except get_user_model().DoesNotExist:
+            raise CommandError(f"User '{username}' not found.")
 
-            if dry_run:
-                self.stdout.write(self.style.WARNING(f"{model_key}: {count} records would be published (dry run)."))
-            else:
-                updated = queryset.update(is_published=True)
-                self.stdout.write(self.style.SUCCESS(f"{model_key}: {updated} records published."))
+    def _timings(self, timings):
+        self.stdout.write("Timings: " + ", ".join(f"{stage} {seconds:.3f}s" for stage, seconds in timings.items()))
@@ -0,0 +1,86 @@
+"""
+Management command to rebuild or verify the relations network edges.
+
+The signal handlers keep PersonaAdyacencia current for normal edits; run this
+after the initial migration, after loaddata/fixtures (raw saves skip the
+signals) or after bulk QuerySet.update() calls on relations:
+    python manage.py rebuild_adyacencias
+    python manage.py rebuild_adyacencias --relacion_id 12 40
+    python manage.py rebuild_adyacencias --verify
+    python manage.py rebuild_adyacencias --verify --repair
+
+--verify recomputes every edge, lists the relations whose stored edges are
+wrong or missing and exits with an error if there are any; --repair rewrites
+just those relations.
+"""
+
+from django.core.management.base import BaseCommand, CommandError
+
+from dbgestor.adyacencias import rebuild_all, refresh, verify
+from dbgestor.models import PersonaAdyacencia
+
+# Mismatches printed by --verify.
+SHOW = 20
+
+
+class Command(BaseCommand):
+    help = 'Rebuild or verify the relations network edges (PersonaAdyacencia)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--relacion_id',
+            type=int,
+            nargs='+',
+            default=None,
+            help='Refresh only these relation IDs. Omit to rebuild every relation.',
+        )
+        parser.add_argument(
+            '--verify',
+            action='store_true',
+            help='Compare the stored edges with freshly computed ones instead of rebuilding.',
+        )
+        parser.add_argument(
+            '--repair',
+            action='store_true',
+            help='With --verify, refresh the relations that do not match.',
+        )
+        parser.add_argument(
+            '--if-empty',
+            action='store_true',
+            help='Do nothing when the edge table already has rows (used by the Docker entrypoint).',
+        )
+
+    def handle(self, *args, **options):
+        if options['repair'] and not options['verify']:
+            raise CommandError('--repair needs --verify')
+        if options['verify']:
+            return self.verify(options['repair'])
+
+        if options['if_empty'] and PersonaAdyacencia.objects.exists():
+            self.stdout.write('Network edges already built, skipping.')
+            return
+
+        relacion_ids = options['relacion_id']
+        if relacion_ids:
+            written = refresh(relacion_ids)
+            self.stdout.write(self.style.SUCCESS(f'✓ Wrote {written} edges'))
+            return
+
+        self.stdout.write('Rebuilding network edges...')
+        written = rebuild_all()
+        self.stdout.write(self.style.SUCCESS(f'✓ Rebuilt {written} edges'))
+
+    def verify(self, repair):
+        mismatches = verify()
+        if not mismatches:
+            self.stdout.write(self.style.SUCCESS('✓ Network edges match'))
+            return
+
+        shown = ', '.join(str(rid) for rid in mismatches[:SHOW])
+        more = f' ... and {len(mismatches) - SHOW} more' if len(mismatches) > SHOW else ''
+        self.stdout.write(f'{len(mismatches)} relations do not match: {shown}{more}')
+
+        if not repair:
+            raise CommandError('Network edges are out of date; run with --repair or rebuild')
+        written = refresh(mismatches)
+        self.stdout.write(self.style.SUCCESS(f'✓ Wrote {written} edges'))
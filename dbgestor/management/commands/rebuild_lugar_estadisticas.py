@@ -0,0 +1,90 @@
+"""
+Management command to rebuild or verify the per-place usage counters.
+
+The signal handlers keep LugarEstadistica current for normal edits; run this
+after the initial migration, after loaddata/fixtures (raw saves skip the
+signals) or after bulk QuerySet.update() calls on places, personas or
+relations:
+    python manage.py rebuild_lugar_estadisticas
+    python manage.py rebuild_lugar_estadisticas --lugar_id 12 40
+    python manage.py rebuild_lugar_estadisticas --verify
+    python manage.py rebuild_lugar_estadisticas --verify --repair
+
+--verify recomputes every counter, lists the places whose stored row is wrong
+or missing and exits with an error if there are any; --repair refreshes just
+those places.
+"""
+
+from django.core.management.base import BaseCommand, CommandError
+
+from dbgestor.lugar_estadisticas import rebuild_all, refresh, verify
+from dbgestor.models import LugarEstadistica
+
+# Mismatches printed by --verify.
+SHOW = 20
+
+
+class Command(BaseCommand):
+    help = 'Rebuild or verify the per-place usage counters (LugarEstadistica)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--lugar_id',
+            type=int,
+            nargs='+',
+            default=None,
+            help='Refresh only these lugar IDs. Omit to rebuild every place.',
+        )
+        parser.add_argument(
+            '--verify',
+            action='store_true',
+            help='Compare the stored counters with freshly computed ones instead of rebuilding.',
+        )
+        parser.add_argument(
+            '--repair',
+            action='store_true',
+            help='With --verify, refresh the places that do not match.',
+        )
+        parser.add_argument(
+            '--if-empty',
+            action='store_true',
+            help='Do nothing when the counter table already has rows (used by the Docker entrypoint).',
+        )
+
+    def handle(self, *args, **options):
+        if options['repair'] and not options['verify']:
+            raise CommandError('--repair needs --verify')
+        if options['verify']:
+            return self.verify(options['repair'])
+
+        if options['if_empty'] and LugarEstadistica.objects.exists():
+            self.stdout.write('Place usage counters already built, skipping.')
+            return
+
+        lugar_ids = options['lugar_id']
+        if lugar_ids:
+            written = refresh(lugar_ids)
+            self.stdout.write(self.style.SUCCESS(f'✓ Refreshed counters of {written} places'))
+            return
+
+        self.stdout.write('Rebuilding place usage counters...')
+        written = rebuild_all()
+        self.stdout.write(self.style.SUCCESS(f'✓ Rebuilt counters for {written} places'))
+
+    def verify(self, repair):
+        mismatches = verify()
+        if not mismatches:
+            self.stdout.write(self.style.SUCCESS('✓ Place usage counters match'))
+            return
+
+        self.stdout.write(f'{len(mismatches)} places do not match:')
+        for lugar_id, stored, expected in mismatches[:SHOW]:
+            self.stdout.write(f'  {lugar_id}: stored {stored}, expected {expected}')
+        if len(mismatches) > SHOW:
+            self.stdout.write(f'  ... and {len(mismatches) - SHOW} more')
+
+        if not repair:
+            raise CommandError('Place usage counters are out of date; run with --repair or rebuild')
+        # Places that no longer exist lose their row through the cascade.
+        written = refresh(lugar_id for lugar_id, _, _ in mismatches)
+        self.stdout.write(self.style.SUCCESS(f'✓ Refreshed counters of {written} places'))
@@ -0,0 +1,48 @@
+"""
+Management command to rebuild the precomputed trajectory segments.
+
+The signal handlers keep TrayectoriaSegmento current for normal edits; run
+this after the initial migration, after loaddata/fixtures (raw saves skip the
+signals) or after bulk QuerySet.update() calls on places or personas:
+    python manage.py rebuild_trayectorias
+    python manage.py rebuild_trayectorias --persona_id 42
+"""
+
+from django.core.management.base import BaseCommand
+
+from dbgestor.models import TrayectoriaSegmento
+from dbgestor.trayectorias import rebuild_all, refresh_segmentos
+
+
+class Command(BaseCommand):
+    help = 'Rebuild precomputed trajectory segments (TrayectoriaSegmento)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--persona_id',
+            type=int,
+            nargs='+',
+            default=None,
+            help='Refresh only these persona IDs. Omit to rebuild every trajectory.',
+        )
+        parser.add_argument(
+            '--if-empty',
+            action='store_true',
+            help='Do nothing when the segment table already has rows (used by the Docker entrypoint).',
+        )
+
+    def handle(self, *args, **options):
+        if options['if_empty'] and TrayectoriaSegmento.objects.exists():
+            self.stdout.write('Trajectory segments already built, skipping.')
+            return
+
+        persona_ids = options['persona_id']
+        if persona_ids:
+            written = refresh_segmentos(persona_ids)
+            self.stdout.write(self.style.SUCCESS(
+                f'✓ Refreshed {len(persona_ids)} personas ({written} segments)'))
+            return
+
+        self.stdout.write('Rebuilding trajectory segments...')
+        personas, written = rebuild_all()
+        self.stdout.write(self.style.SUCCESS(f'✓ Rebuilt {written} segments for {personas} personas'))
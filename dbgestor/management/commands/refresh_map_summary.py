@@ -0,0 +1,61 @@
+"""
+Management command to refresh the materialized map summary.
+
+all_trajectories_summary reads the dbgestor_mapa_resumen view (see
+dbgestor.mapa_resumen).  Reads refresh a stale view at most once every
+MAP_SUMMARY_REFRESH_INTERVAL seconds; run this from cron, after bulk loads or
+with the interval set to 0:
+    python manage.py refresh_map_summary
+    python manage.py refresh_map_summary --if-stale
+    python manage.py refresh_map_summary --status
+
+Counters are read from LugarEstadistica, so rebuild those first after raw
+loads (rebuild_lugar_estadisticas).
+"""
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from dbgestor import mapa_resumen
+
+
+class Command(BaseCommand):
+    help = 'Refresh the materialized map summary (dbgestor_mapa_resumen)'
+
+    def add_arguments(self, parser):
+        action = parser.add_mutually_exclusive_group()
+        action.add_argument(
+            '--if-stale',
+            action='store_true',
+            help='Only refresh when places or personas changed since the last refresh.',
+        )
+        action.add_argument(
+            '--status',
+            action='store_true',
+            help='Only report the age of the stored summary.',
+        )
+        parser.add_argument(
+            '--blocking',
+            action='store_true',
+            help='Plain REFRESH (locks out readers; faster on a large rebuild).',
+        )
+
+    def handle(self, *args, **options):
+        if options['status']:
+            return self.status()
+        if options['if_stale'] and not mapa_resumen.is_stale():
+            self.stdout.write('Map summary is current, skipping.')
+            return
+
+        mapa_resumen.refresh(concurrently=not options['blocking'])
+        self.stdout.write(self.style.SUCCESS('✓ Map summary refreshed'))
+        self.status()
+
+    def status(self):
+        refreshed_at, places = mapa_resumen.state()
+        if refreshed_at is None:
+            self.stdout.write('  empty')
+        else:
+            age = (timezone.now() - refreshed_at).total_seconds()
+            self.stdout.write(f'  {places} places, refreshed {age:.0f} s ago')
+        self.stdout.write(f'  stale: {"yes" if mapa_resumen.is_stale() else "no"}')
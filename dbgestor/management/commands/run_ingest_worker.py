@@ -0,0 +1,63 @@
+"""
+Management command that runs queued ingest jobs (see api.v1.ingest_jobs).
+
+Run it as its own process next to the web workers, e.g. a second container
+from the same image:
+    python manage.py run_ingest_worker
+    python manage.py run_ingest_worker --once
+
+It claims pending jobs one at a time and ingests them INGEST_CHUNK_ROWS rows
+per committed chunk, sleeping INGEST_WORKER_POLL seconds when the queue is
+empty.  SIGTERM/SIGINT finish the current chunk and hand the job back to the
+queue, so a restart resumes it where it stopped.  --once drains the queue and
+exits (cron, tests).
+"""
+
+import os
+import signal
+import socket
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from api.v1 import ingest_jobs
+
+
+class Command(BaseCommand):
+    help = 'Process queued spreadsheet ingest jobs (IngestJob)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Exit when no job is pending instead of polling.',
+        )
+
+    def handle(self, *args, **options):
+        worker = f'{socket.gethostname()}:{os.getpid()}'
+        self.stopping = False
+        for signum in (signal.SIGTERM, signal.SIGINT):
+            signal.signal(signum, self.stop)
+
+        self.stdout.write(f'Ingest worker {worker} started')
+        while not self.stopping:
+            job = ingest_jobs.claim(worker)
+            if job is None:
+                if options['once']:
+                    break
+                time.sleep(settings.INGEST_WORKER_POLL)
+                continue
+
+            self.stdout.write(f'Job {job.pk}: {job.total_rows} rows, starting at row {job.next_row + 1}')
+            job = ingest_jobs.run(job, worker, should_stop=lambda: self.stopping)
+            if job.status == 'done':
+                self.stdout.write(self.style.SUCCESS(
+                    f'✓ Job {job.pk}: {job.ingested} rows ingested, {job.error_count} errors, '
+                    f'{job.rows_per_second} rows/s'))
+            else:
+                self.stdout.write(f'Job {job.pk}: {job.status} at row {job.next_row + 1}')
+
+    def stop(self, signum, frame):
+        self.stdout.write('Stopping after the current chunk...')
+        self.stopping = True
@@ -0,0 +1,40 @@
+"""
+Management command to install or drop the PostgreSQL search_vector triggers.
+
+With SEARCH_VECTOR_MODE=trigger the database keeps search_vector current on
+its own and the post_save handlers skip the deferred update.  Install the
+triggers before switching the setting, drop them after switching back:
+    python manage.py search_vector_triggers
+    python manage.py search_vector_triggers --drop
+    python manage.py search_vector_triggers --status
+
+Existing rows are not touched; run populate_search_vectors for a full rebuild.
+"""
+
+from django.core.management.base import BaseCommand
+
+from dbgestor import search_vectors
+
+
+class Command(BaseCommand):
+    help = 'Install or drop the PostgreSQL triggers that maintain search_vector'
+
+    def add_arguments(self, parser):
+        action = parser.add_mutually_exclusive_group()
+        action.add_argument('--drop', action='store_true', help='Remove the triggers and their functions.')
+        action.add_argument('--status', action='store_true', help='Only report which triggers are installed.')
+
+    def handle(self, *args, **options):
+        if options['drop']:
+            search_vectors.drop_triggers()
+            self.stdout.write(self.style.SUCCESS('✓ Search vector triggers dropped'))
+        elif not options['status']:
+            search_vectors.install_triggers()
+            self.stdout.write(self.style.SUCCESS('✓ Search vector triggers installed'))
+
+        installed = search_vectors.installed_triggers()
+        for model in search_vectors.SEARCH_FIELDS:
+            name = search_vectors.trigger_name(model)
+            state = 'installed' if name in installed else 'not installed'
+            self.stdout.write(f'  {model.__name__}: {name} ({state})')
+        self.stdout.write(f'SEARCH_VECTOR_MODE = {search_vectors.get_mode()}')
@@ -0,0 +1,102 @@
+"""
+Materialized map summary.
+
+The travel-trajectories map overview (all_trajectories_summary) is read from
+the dbgestor_mapa_resumen materialized view: one row per georeferenced place
+with trajectory rows or personas, built from the LugarEstadistica counters
+(see dbgestor.lugar_estadisticas).  Every row carries the time of the refresh
+that produced it, which the endpoint sends as X-Data-Age and folds into its
+ETag.
+
+The view is refreshed with REFRESH MATERIALIZED VIEW CONCURRENTLY, so readers
+are never blocked.  It is stale when the 'persona', 'lugar' or 'vocab' data
+version (dbgestor.data_version) moved since the last refresh; a read of a
+stale summary refreshes it, at most once every
+settings.MAP_SUMMARY_REFRESH_INTERVAL seconds, so a burst of writes costs one
+refresh.  With the interval at 0 only the command refreshes it, e.g. from
+cron:
+    python manage.py refresh_map_summary --if-stale
+
+The view selects columns of dbgestor_lugar, dbgestor_tipolugar and
+dbgestor_lugarestadistica; a migration altering those columns has to drop the
+view first and recreate it afterwards (see migration 0015).
+"""
+
+import logging
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import connection
+
+from . import data_version
+
+logger = logging.getLogger('dbgestor')
+
+VIEW = 'dbgestor_mapa_resumen'
+
+# Data versions the summary is built from.
+ENTITIES = ('persona', 'lugar', 'vocab')
+
+COLUMNS = ('lugar__lugar_id', 'lugar__nombre_lugar', 'lugar__tipo', 'lugar__lat', 'lugar__lon',
+           'trajectory_count', 'persona_count')
+
+_VERSIONS_KEY = 'mapa-resumen:versions'
+_LOCK_KEY = 'mapa-resumen:refreshing'
+_CHECKED_KEY = 'mapa-resumen:checked'
+
+
+def _cache():
+    return caches['api']
+
+
+def refresh(concurrently=True):
+    """Refresh the view and remember the data versions it reflects."""
+    # Read before refreshing: a write landing meanwhile leaves it stale.
+    versions = data_version.get_versions(ENTITIES)
+    started = time.monotonic()
+    with connection.cursor() as cursor:
+        cursor.execute(f'REFRESH MATERIALIZED VIEW {"CONCURRENTLY " if concurrently else ""}{VIEW}')
+    _cache().set(_VERSIONS_KEY, versions, timeout=None)
+    logger.info(f"Refreshed {VIEW} in {time.monotonic() - started:.2f} s")
+
+
+def is_stale():
+    return _cache().get(_VERSIONS_KEY) != data_version.get_versions(ENTITIES)
+
+
+def refresh_if_stale():
+    """Refresh a stale summary unless it was checked less than the refresh interval ago."""
+    interval = getattr(settings, 'MAP_SUMMARY_REFRESH_INTERVAL', 0)
+    if not interval:
+        return False
+    cache = _cache()
+    # Both keys are set with add(): one request per interval looks, and one
+    # process at a time refreshes.
+    if not cache.add(_CHECKED_KEY, 1, timeout=interval):
+        return False
+    if not is_stale() or not cache.add(_LOCK_KEY, 1, timeout=300):
+        return False
+    try:
+        refresh()
+    except Exception:
+        logger.exception(f"Could not refresh {VIEW}")
+        return False
+    finally:
+        cache.delete(_LOCK_KEY)
+    return True
+
+
+def state():
+    """(refreshed_at, places) of the stored summary; refreshed_at is None when it is empty."""
+    with connection.cursor() as cursor:
+        cursor.execute(f'SELECT MAX(refreshed_at), COUNT(*) FROM {VIEW}')
+        return cursor.fetchone()
+
+
+def rows():
+    """The summary places, as the endpoint returns them."""
+    with connection.cursor() as cursor:
+        cursor.execute(f'SELECT lugar_id, nombre_lugar, tipo_lugar, lat, lon, trajectory_count, persona_count '
+                       f'FROM {VIEW} ORDER BY lugar_id')
+        return [dict(zip(COLUMNS, row)) for row in cursor.fetchall()]
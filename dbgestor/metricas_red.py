@@ -0,0 +1,310 @@
+"""
+Graph metrics of the relations network.
+
+The whole network – the PersonaAdyacencia edges as the network views draw
+them, see dbgestor.adyacencias – is loaded into a compact CSR adjacency
+(stdlib arrays: row offsets, neighbour indexes, edge weights) and measured
+in one pass per metric:
+
+    degree            distinct personas related to the node
+    weighted_degree   edges to them, one per relation
+    betweenness       Brandes betweenness, approximated from
+                      settings.NETWORK_METRICS_SAMPLES BFS sources and
+                      normalized to 0..1
+    component         smallest persona_id of the connected component
+    component_size    personas in it
+    community         label propagation community (a member persona_id)
+
+The result is cached in the 'api' cache per 'red' data version, which the
+edge refreshes bump once the edges are written, so it is computed at most
+once per change to the relations.  Only one process computes a new version
+at a time (a cache.add() lock); meanwhile the others get the previous
+version's metrics, or MetricsUnavailable when nothing was computed yet:
+
+    from dbgestor import metricas_red
+    metricas_red.get_metrics().get(persona_id)
+"""
+
+import logging
+import time
+from array import array
+from bisect import bisect_left
+from collections import deque
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import connection
+
+from . import data_version
+from .models import PersonaAdyacencia, PersonaRelaciones
+
+logger = logging.getLogger('dbgestor')
+
+KEY_PREFIX = 'metricas-red'
+# (version, Metrics) of the last computed version.
+LATEST_KEY = f'{KEY_PREFIX}:latest'
+
+# Label propagation rounds; it usually settles within a handful.
+COMMUNITY_ROUNDS = 30
+
+
+def _table(model):
+    return connection.ops.quote_name(model._meta.db_table)
+
+
+# Undirected edges with their multiplicity: the fuente edges of a relation
+# with a persona_fuente (and at least two personas), its pair edges otherwise.
+EDGES_SQL = """
+SELECT LEAST(a.origen_id, a.destino_id), GREATEST(a.origen_id, a.destino_id), COUNT(*)
+FROM {adyacencia} a
+JOIN {relacion} r ON r.persona_relacion_id = a.relacion_id
+WHERE CASE WHEN r.persona_fuente_id IS NULL THEN NOT a.via_fuente
+      ELSE a.via_fuente AND (SELECT COUNT(*) FROM {through} t
+                             WHERE t.personarelaciones_id = a.relacion_id) >= 2
+  END
+GROUP BY 1, 2
+ORDER BY 1, 2
+"""
+
+
+class Graph:
+    """Undirected graph in CSR form; node i is persona ids[i]."""
+
+    def __init__(self, ids, indptr, indices, weights):
+        self.ids = ids
+        self.indptr = indptr
+        self.indices = indices
+        self.weights = weights
+
+    def __len__(self):
+        return len(self.ids)
+
+    def neighbours(self, i):
+        return self.indices[self.indptr[i]:self.indptr[i + 1]]
+
+    @classmethod
+    def from_edges(cls, edges):
+        """Build from (persona_a, persona_b, weight) rows, each pair listed once."""
+        edges = list(edges)
+        ids = array('q', sorted({p for a, b, _ in edges for p in (a, b)}))
+        index = {pid: i for i, pid in enumerate(ids)}
+
+        counts = [0] * len(ids)
+        for a, b, _ in edges:
+            counts[index[a]] += 1
+            counts[index[b]] += 1
+        indptr = array('q', [0])
+        for count in counts:
+            indptr.append(indptr[-1] + count)
+
+        fill = array('q', indptr[:-1])
+        indices = array('q', bytes(8 * indptr[-1]))
+        weights = array('q', bytes(8 * indptr[-1]))
+        for a, b, w in edges:
+            i, j = index[a], index[b]
+            indices[fill[i]], weights[fill[i]] = j, w
+            indices[fill[j]], weights[fill[j]] = i, w
+            fill[i] += 1
+            fill[j] += 1
+        return cls(ids, indptr, indices, weights)
+
+
+def load_graph():
+    sql = EDGES_SQL.format(
+        adyacencia=_table(PersonaAdyacencia),
+        relacion=_table(PersonaRelaciones),
+        through=_table(PersonaRelaciones.personas.through),
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql)
+        return Graph.from_edges(cursor.fetchall())
+
+
+# ---------------------------------------------------------------------------
+# Metrics
+# ---------------------------------------------------------------------------
+
+def degrees(graph):
+    degree = array('q', (graph.indptr[i + 1] - graph.indptr[i] for i in range(len(graph))))
+    weighted = array('q', (sum(graph.weights[graph.indptr[i]:graph.indptr[i + 1]]) for i in range(len(graph))))
+    return degree, weighted
+
+
+def components(graph):
+    """(component, component_size): per node, the smallest member persona_id and the member count."""
+    n = len(graph)
+    label = array('q', [-1]) * n
+    size = array('q', [0]) * n
+    for start in range(n):
+        if label[start] != -1:
+            continue
+        # Nodes are in persona_id order, so the first unlabelled node is the smallest.
+        label[start] = graph.ids[start]
+        members = [start]
+        queue = deque(members)
+        while queue:
+            v = queue.popleft()
+            for w in graph.neighbours(v):
+                if label[w] == -1:
+                    label[w] = graph.ids[start]
+                    members.append(w)
+                    queue.append(w)
+        for v in members:
+            size[v] = len(members)
+    return label, size
+
+
+def communities(graph, rounds=COMMUNITY_ROUNDS):
+    """
+    Label propagation, deterministic: nodes in persona_id order, a tie
+    between labels goes to the smallest persona_id.  An edge counts its
+    weight times one plus the neighbours both ends share, so labels spread
+    inside dense groups rather than across the bridges between them.
+    """
+    n = len(graph)
+    neighbour_sets = [set(graph.neighbours(v)) for v in range(n)]
+    strength = array('q', graph.weights)
+    for v in range(n):
+        for k in range(graph.indptr[v], graph.indptr[v + 1]):
+            strength[k] *= 1 + len(neighbour_sets[v] & neighbour_sets[graph.indices[k]])
+
+    label = array('q', graph.ids)
+    for _ in range(rounds):
+        changed = False
+        for v in range(n):
+            start, end = graph.indptr[v], graph.indptr[v + 1]
+            if start == end:
+                continue
+            score = {}
+            for k in range(start, end):
+                lw = label[graph.indices[k]]
+                score[lw] = score.get(lw, 0) + strength[k]
+            best = max(score.values())
+            # The current label stays on a tie, so labels do not oscillate.
+            if score.get(label[v], 0) < best:
+                label[v] = min(lw for lw, s in score.items() if s == best)
+                changed = True
+        if not changed:
+            break
+    return label
+
+
+def betweenness(graph, samples):
+    """
+    Brandes betweenness from ``samples`` evenly spread BFS sources (every
+    node when samples is 0 or >= nodes), extrapolated and normalized like
+    networkx.betweenness_centrality(normalized=True).
+    """
+    n = len(graph)
+    bc = [0.0] * n
+    if n < 3:
+        return array('d', bc)
+    k = min(samples, n) if samples > 0 else n
+    sources = sorted({i * n // k for i in range(k)})
+    adjacency = [graph.neighbours(v).tolist() for v in range(n)]
+
+    for s in sources:
+        # Forward BFS counting shortest paths; predecessors are found again
+        # from the distances on the way back instead of being stored.
+        dist = [-1] * n
+        sigma = [0] * n
+        dist[s], sigma[s] = 0, 1
+        order = [s]
+        for v in order:
+            next_dist, paths = dist[v] + 1, sigma[v]
+            for w in adjacency[v]:
+                if dist[w] < 0:
+                    dist[w] = next_dist
+                    order.append(w)
+                if dist[w] == next_dist:
+                    sigma[w] += paths
+        delta = [0.0] * n
+        for w in reversed(order):
+            prev_dist, share = dist[w] - 1, (1 + delta[w]) / sigma[w]
+            for v in adjacency[w]:
+                if dist[v] == prev_dist:
+                    delta[v] += sigma[v] * share
+            if w != s:
+                bc[w] += delta[w]
+
+    scale = n / len(sources) / ((n - 1) * (n - 2))
+    return array('d', (value * scale for value in bc))
+
+
+class Metrics:
+    """Per-node metric arrays, looked up by persona_id."""
+
+    def __init__(self, graph, samples):
+        self.ids = graph.ids
+        self.degree, self.weighted_degree = degrees(graph)
+        self.component, self.component_size = components(graph)
+        self.community = communities(graph)
+        self.betweenness = betweenness(graph, samples)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def index(self, persona_id):
+        i = bisect_left(self.ids, persona_id)
+        return i if i < len(self.ids) and self.ids[i] == persona_id else None
+
+    def get(self, persona_id):
+        """Metrics of a persona; isolated personas (no relations) get zeros and themselves as labels."""
+        i = self.index(persona_id)
+        if i is None:
+            return {
+                'degree': 0, 'weighted_degree': 0, 'betweenness': 0.0,
+                'component': persona_id, 'component_size': 1, 'community': persona_id,
+            }
+        return {
+            'degree': self.degree[i],
+            'weighted_degree': self.weighted_degree[i],
+            'betweenness': round(self.betweenness[i], 6),
+            'component': self.component[i],
+            'component_size': self.component_size[i],
+            'community': self.community[i],
+        }
+
+    def importance(self, persona_id):
+        """Sort key for top_k selection: most central first, then most connected, then by id."""
+        i = self.index(persona_id)
+        if i is None:
+            return (0.0, 0, 0, persona_id)
+        return (-self.betweenness[i], -self.degree[i], -self.weighted_degree[i], persona_id)
+
+
+def compute():
+    started = time.monotonic()
+    graph = load_graph()
+    metrics = Metrics(graph, getattr(settings, 'NETWORK_METRICS_SAMPLES', 64))
+    logger.info(f"Computed network metrics for {len(graph)} personas in {time.monotonic() - started:.2f} s")
+    return metrics
+
+
+class MetricsUnavailable(Exception):
+    """Another process is computing the metrics and no earlier version is cached."""
+
+
+def get_metrics():
+    """Metrics of the current network, computed once per 'red' data version."""
+    cache = caches['api']
+    version = data_version.get_versions(['red'])['red']
+    latest = cache.get(LATEST_KEY)
+    if latest is not None and latest[0] == version:
+        return latest[1]
+
+    lock = f'{KEY_PREFIX}:lock:{version}'
+    if not cache.add(lock, True, timeout=settings.NETWORK_METRICS_LOCK_TIMEOUT):
+        if latest is None:
+            raise MetricsUnavailable
+        return latest[1]
+    try:
+        # The process that held the lock before may have just stored it.
+        latest = cache.get(LATEST_KEY)
+        if latest is not None and latest[0] == version:
+            return latest[1]
+        metrics = compute()
+        cache.set(LATEST_KEY, (version, metrics), timeout=None)
+    finally:
+        cache.delete(lock)
+    return metrics
@@ -0,0 +1,29 @@
+# Generated by Django 5.1 on 2026-10-17 22:54
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dbgestor', '0012_sugerenciamerge'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TrayectoriaSegmento',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('step', models.SmallIntegerField()),
+                ('ordinal', models.SmallIntegerField()),
+                ('from_lugar', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='segmentos_salida', to='dbgestor.lugar')),
+                ('persona', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='segmentos_trayectoria', to='dbgestor.persona')),
+                ('to_lugar', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='segmentos_llegada', to='dbgestor.lugar')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['from_lugar', 'to_lugar'], name='trayectoria_seg_ruta_idx')],
+                'constraints': [models.UniqueConstraint(fields=('persona', 'step'), name='trayectoria_segmento_step_uniq')],
+            },
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 5.1 on 2026-10-17 23:36
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dbgestor', '0013_trayectoriasegmento'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LugarEstadistica',
+            fields=[
+                ('lugar', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='estadistica', serialize=False, to='dbgestor.lugar')),
+                ('personas_total', models.IntegerField(default=0)),
+                ('personas_trayectoria', models.IntegerField(default=0)),
+                ('personas_nacimiento', models.IntegerField(default=0)),
+                ('personas_defuncion', models.IntegerField(default=0)),
+                ('personas_procedencia', models.IntegerField(default=0)),
+                ('filas_trayectoria', models.IntegerField(default=0)),
+            ],
+        ),
+    ]
@@ -0,0 +1,38 @@
+from django.db import migrations
+
+# Materialized map summary, see dbgestor/mapa_resumen.py.  persona_count adds
+# up the roles a persona has at the place, as all_trajectories_summary always
+# did.  The unique index is what REFRESH ... CONCURRENTLY requires.
+CREATE_SQL = """
+CREATE MATERIALIZED VIEW dbgestor_mapa_resumen AS
+SELECT l.lugar_id,
+       l.nombre_lugar,
+       t.tipo_lugar,
+       l.lat,
+       l.lon,
+       e.filas_trayectoria AS trajectory_count,
+       e.personas_trayectoria + e.personas_procedencia
+         + e.personas_nacimiento + e.personas_defuncion AS persona_count,
+       now() AS refreshed_at
+FROM dbgestor_lugarestadistica e
+JOIN dbgestor_lugar l ON l.lugar_id = e.lugar_id
+LEFT JOIN dbgestor_tipolugar t ON t.id = l.tipo_id
+WHERE l.lat IS NOT NULL AND l.lon IS NOT NULL
+  AND (e.filas_trayectoria > 0 OR e.personas_procedencia > 0
+       OR e.personas_nacimiento > 0 OR e.personas_defuncion > 0);
+
+CREATE UNIQUE INDEX dbgestor_mapa_resumen_lugar_uniq ON dbgestor_mapa_resumen (lugar_id);
+"""
+
+DROP_SQL = 'DROP MATERIALIZED VIEW IF EXISTS dbgestor_mapa_resumen;'
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dbgestor', '0014_lugarestadistica'),
+    ]
+
+    operations = [
+        migrations.RunSQL(CREATE_SQL, DROP_SQL),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.1 on 2026-10-17 23:52
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dbgestor', '0015_mapa_resumen'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PersonaAdyacencia',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('via_fuente', models.BooleanField(default=False)),
+                ('destino', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='dbgestor.persona')),
+                ('origen', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='dbgestor.persona')),
+                ('relacion', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='aristas', to='dbgestor.personarelaciones')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['origen', 'destino'], name='persona_ady_origen_idx'), models.Index(fields=['destino', 'origen'], name='persona_ady_destino_idx')],
+                'constraints': [models.UniqueConstraint(fields=('relacion', 'origen', 'destino', 'via_fuente'), name='persona_adyacencia_uniq')],
+            },
+        ),
+    ]
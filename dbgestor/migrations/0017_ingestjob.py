@@ -0,0 +1,55 @@
+# Generated by Django 5.1 on 2026-10-18 00:07
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dbgestor', '0016_personaadyacencia'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IngestJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(choices=[('pending', 'Pendiente'), ('running', 'En proceso'), ('done', 'Terminado'), ('failed', 'Fallido')], default='pending', max_length=10)),
+                ('total_rows', models.PositiveIntegerField(default=0)),
+                ('next_row', models.PositiveIntegerField(default=0, help_text='Index of the first row not processed yet')),
+                ('ingested', models.PositiveIntegerField(default=0)),
+                ('errores', models.JSONField(blank=True, default=list, help_text='Per-row errors, "Row N: ..."')),
+                ('error', models.TextField(blank=True, help_text='Why the job failed, if it did', null=True)),
+                ('processing_seconds', models.FloatField(default=0, help_text='Time spent processing chunks')),
+                ('worker', models.CharField(blank=True, max_length=100)),
+                ('heartbeat_at', models.DateTimeField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('started_at', models.DateTimeField(blank=True, null=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('created_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='ingest_jobs', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.CreateModel(
+            name='IngestJobRow',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('idx', models.PositiveIntegerField()),
+                ('data', models.JSONField()),
+                ('job', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='rows', to='dbgestor.ingestjob')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='ingestjob',
+            index=models.Index(fields=['status', 'created_at'], name='ingest_job_status_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='ingestjobrow',
+            constraint=models.UniqueConstraint(fields=('job', 'idx'), name='ingest_job_row_uniq'),
+        ),
+    ]
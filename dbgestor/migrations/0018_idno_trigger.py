@@ -0,0 +1,146 @@
+# Generated by Django 5.1 on 2026-10-18 00:17
+
+import logging
+
+import dbgestor.models
+from django.db import migrations
+
+logger = logging.getLogger('dbgestor')
+
+# (table, idno column, pk column, prefix) of every IdnoField.  The trigger
+# fills a blank idno from the pk the INSERT is writing, so no second UPDATE is
+# needed and multi-row INSERTs (bulk_create) get their idnos too.
+IDNOS = (
+    ('dbgestor_archivo', 'archivo_idno', 'archivo_id', 'mx-sv-doc-'),
+    ('dbgestor_documento', 'documento_idno', 'documento_id', 'mx-sv-doc-'),
+    ('dbgestor_persona', 'persona_idno', 'persona_id', 'mx-sv-per-'),
+    ('dbgestor_corporacion', 'corporacion_idno', 'corporacion_id', 'mx-sv-cor-'),
+)
+
+# str(pk).zfill(6): lpad() would cut pks longer than 6 digits.
+IDNO_SQL = "'{prefix}' || repeat('0', 6 - length({pk}::text)) || {pk}::text"
+
+CREATE_SQL = """
+CREATE FUNCTION {table}_set_idno() RETURNS trigger LANGUAGE plpgsql AS $$
+BEGIN
+    IF NEW.{idno} IS NULL OR NEW.{idno} = '' THEN
+        NEW.{idno} := {new_value};
+    END IF;
+    RETURN NEW;
+END
+$$;
+
+CREATE TRIGGER {table}_idno BEFORE INSERT OR UPDATE OF {idno} ON {table}
+    FOR EACH ROW EXECUTE FUNCTION {table}_set_idno();
+"""
+
+DROP_SQL = """
+DROP TRIGGER IF EXISTS {table}_idno ON {table};
+DROP FUNCTION IF EXISTS {table}_set_idno();
+"""
+
+BACKFILL_SQL = "UPDATE {table} SET {idno} = {value} WHERE {idno} IS NULL OR {idno} = ''"
+
+# Rows whose idno is missing, differs from the pk-derived value or is shared.
+VERIFY_SQL = """
+SELECT
+    count(*) FILTER (WHERE {idno} IS NULL OR {idno} = ''),
+    count(*) FILTER (WHERE {idno} <> {value}),
+    count(*) - count(DISTINCT {idno})
+FROM {table}
+"""
+
+
+def _sql(template, table, idno, pk, prefix):
+    return template.format(
+        table=table, idno=idno, pk=pk,
+        value=IDNO_SQL.format(prefix=prefix, pk=pk),
+        new_value=IDNO_SQL.format(prefix=prefix, pk=f'NEW.{pk}'),
+    )
+
+
+def backfill_idnos(apps, schema_editor):
+    with schema_editor.connection.cursor() as cursor:
+        for spec in IDNOS:
+            cursor.execute(_sql(BACKFILL_SQL, *spec))
+            if cursor.rowcount:
+                logger.info(f"{spec[0]}: {cursor.rowcount} missing {spec[1]} filled in")
+
+
+def verify_idnos(apps, schema_editor):
+    """Fail if an idno is still missing; report the ones that differ from their pk or repeat."""
+    with schema_editor.connection.cursor() as cursor:
+        for spec in IDNOS:
+            cursor.execute(_sql(VERIFY_SQL, *spec))
+            missing, other, repeated = cursor.fetchone()
+            if missing:
+                raise RuntimeError(f"{spec[0]}: {missing} rows still without {spec[1]}")
+            if other or repeated:
+                logger.warning(f"{spec[0]}: {other} {spec[1]} not derived from {spec[2]}, "
+                               f"{repeated} repeated (left as they are)")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dbgestor', '0017_ingestjob'),
+    ]
+
+    operations = [
+        *(
+            migrations.RunSQL(_sql(CREATE_SQL, *spec), _sql(DROP_SQL, *spec))
+            for spec in IDNOS
+        ),
+        migrations.RunPython(backfill_idnos, reverse_code=migrations.RunPython.noop),
+        migrations.RunPython(verify_idnos, reverse_code=migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='archivo',
+            name='archivo_idno',
+            field=dbgestor.models.IdnoField(blank=True, max_length=50, null=True),
+        ),
+        migrations.AlterField(
+            model_name='corporacion',
+            name='corporacion_idno',
+            field=dbgestor.models.IdnoField(blank=True, max_length=50, null=True),
+        ),
+        migrations.AlterField(
+            model_name='documento',
+            name='documento_idno',
+            field=dbgestor.models.IdnoField(blank=True, max_length=50, null=True),
+        ),
+        migrations.AlterField(
+            model_name='historicalarchivo',
+            name='archivo_idno',
+            field=dbgestor.models.IdnoField(blank=True, max_length=50, null=True),
+        ),
+        migrations.AlterField(
+            model_name='historicalcorporacion',
+            name='corporacion_idno',
+            field=dbgestor.models.IdnoField(blank=True, max_length=50, null=True),
+        ),
+        migrations.AlterField(
+            model_name='historicaldocumento',
+            name='documento_idno',
+            field=dbgestor.models.IdnoField(blank=True, max_length=50, null=True),
+        ),
+        migrations.AlterField(
+            model_name='historicalpersona',
+            name='persona_idno',
+            field=dbgestor.models.IdnoField(blank=True, max_length=50, null=True),
+        ),
+        migrations.AlterField(
+            model_name='historicalpersonaesclavizada',
+            name='persona_idno',
+            field=dbgestor.models.IdnoField(blank=True, max_length=50, null=True),
+        ),
+        migrations.AlterField(
+            model_name='historicalpersonanoesclavizada',
+            name='persona_idno',
+            field=dbgestor.models.IdnoField(blank=True, max_length=50, null=True),
+        ),
+        migrations.AlterField(
+            model_name='persona',
+            name='persona_idno',
+            field=dbgestor.models.IdnoField(blank=True, max_length=50, null=True),
+        ),
+    ]
@@ -0,0 +1,58 @@
+# Generated by Django 5.1 on 2026-10-18 00:45
+
+import re
+
+from django.db import migrations, models
+
+# IngestJob.errores entries: "Row N: message", N counted from 1.
+ROW_ERROR = re.compile(r'Row (\d+): (.*)', re.DOTALL)
+
+
+def move_errores_to_rows(apps, schema_editor):
+    IngestJob = apps.get_model('dbgestor', 'IngestJob')
+    IngestJobRow = apps.get_model('dbgestor', 'IngestJobRow')
+    for job in IngestJob.objects.exclude(errores=[]).iterator():
+        errors = {}
+        for entry in job.errores:
+            match = ROW_ERROR.match(entry)
+            if match:
+                errors[int(match.group(1)) - 1] = match.group(2)
+        rows = list(IngestJobRow.objects.filter(job=job, idx__in=errors))
+        for row in rows:
+            row.error = errors[row.idx]
+        IngestJobRow.objects.bulk_update(rows, ['error'], batch_size=1000)
+        IngestJob.objects.filter(pk=job.pk).update(error_count=len(job.errores))
+
+
+def move_errors_to_jobs(apps, schema_editor):
+    IngestJob = apps.get_model('dbgestor', 'IngestJob')
+    IngestJobRow = apps.get_model('dbgestor', 'IngestJobRow')
+    for job in IngestJob.objects.filter(error_count__gt=0).iterator():
+        rows = IngestJobRow.objects.filter(job=job, error__isnull=False).order_by('idx')
+        job.errores = [f"Row {idx + 1}: {error}" for idx, error in rows.values_list('idx', 'error')]
+        job.save(update_fields=['errores'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dbgestor', '0018_idno_trigger'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ingestjob',
+            name='error_count',
+            field=models.PositiveIntegerField(default=0, help_text='Rows that could not be ingested (IngestJobRow.error)'),
+        ),
+        migrations.AddField(
+            model_name='ingestjobrow',
+            name='error',
+            field=models.TextField(blank=True, help_text='Why the row could not be ingested', null=True),
+        ),
+        migrations.RunPython(move_errores_to_rows, move_errors_to_jobs),
+        migrations.RemoveField(
+            model_name='ingestjob',
+            name='errores',
+        ),
+    ]
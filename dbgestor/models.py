@@ -53,6 +53,16 @@ PLACE_TYPE_CHOICES = (
 )
 
 
+class IdnoField(models.CharField):
+    """
+    A *_idno column filled in by the database.  A trigger (migration 0018)
+    sets a blank value to '<prefix><pk, zero-padded to 6 digits>' within the
+    INSERT itself, and the value comes back with the inserted row (RETURNING),
+    for save() and bulk_create() alike.
+    """
+    db_returning = True
+
+
 ###############
 # Vocabularies
 # Not so strict as controlled vocabularies, but a little more controled than a simple charfield.
@@ -144,7 +154,7 @@ class Archivo(models.Model):
 
     archivo_id = models.AutoField(primary_key=True)
 
-    archivo_idno = models.CharField(max_length=50, null=True, blank=True)
+    archivo_idno = IdnoField(max_length=50, null=True, blank=True)
 
     nombre = models.CharField(max_length=255, unique=True)
     nombre_abreviado = models.CharField(max_length=50, null=True, blank=True)
@@ -172,17 +182,11 @@ class Archivo(models.Model):
         return acronym
 
     def save(self, *args, **kwargs):
-        creating = self.pk is None
-
         if not self.nombre_abreviado:
             self.nombre_abreviado = self.create_acronym(self.nombre)
             
         super().save(*args, **kwargs)
 
-        if creating and not self.archivo_idno:
-            self.archivo_idno = f"mx-sv-doc-{str(self.archivo_id).zfill(6)}"
-            super().save(update_fields=["archivo_idno"])
-
     def __str__(self) -> str:
         return f'[{self.nombre_abreviado}] {self.nombre}'
 
@@ -191,7 +195,7 @@ class Documento(models.Model):
 
     documento_id = models.AutoField(primary_key=True)
 
-    documento_idno = models.CharField(max_length=50, null=True, blank=True)
+    documento_idno = IdnoField(max_length=50, null=True, blank=True)
 
     archivo = models.ForeignKey(Archivo, on_delete=models.CASCADE)
     fondo = models.CharField(max_length=200)
@@ -251,14 +255,6 @@ class Documento(models.Model):
     def short_id(self):
         return f'D{self.documento_id}'
 
-    def save(self, *args, **kwargs):
-        super().save(*args, **kwargs)
-        
-        if not self.documento_idno:
-            expected_idno = f"mx-sv-doc-{str(self.documento_id).zfill(6)}"
-            Documento.objects.filter(pk=self.documento_id).update(documento_idno=expected_idno)
-            self.documento_idno = expected_idno
-
     def type_to_string(self):
         if self.tipo_udc == 'exp':
             return 'Expediente'
@@ -374,7 +370,7 @@ class Persona(PolymorphicModel):
 
     persona_id = models.AutoField(primary_key=True)
 
-    persona_idno = models.CharField(max_length=50, null=True, blank=True)
+    persona_idno = IdnoField(max_length=50, null=True, blank=True)
 
     documentos = models.ManyToManyField(Documento)
 
@@ -477,13 +473,6 @@ class Persona(PolymorphicModel):
 
         super().save(*args, **kwargs)
 
-        if not self.persona_idno:
-            expected_idno = f"mx-sv-per-{str(self.persona_id).zfill(6)}"
-            self.__class__.objects.filter(
-                persona_id=self.persona_id
-            ).update(persona_idno=expected_idno)
-            self.persona_idno = expected_idno
-
     def type_to_string(self):
         if self.sexo == 'v':
             return 'Varón'
@@ -614,6 +603,62 @@ class PersonaLugarRel(models.Model):
         return ', '.join([persona.nombre_normalizado for persona in self.personas.all()]) + f" - ({self.ordinal}){self.lugar}"
 
 
+class TrayectoriaSegmento(models.Model):
+    """
+    Precomputed step of a persona's trajectory (derived data, not edited by hand).
+
+    One row per consecutive pair of georeferenced points, built from
+    PersonaLugarRel plus lugar_nacimiento / procedencia / lugar_defuncion.
+    Personas with a single point get one row with an empty to_lugar.
+    Maintained by dbgestor.trayectorias; rebuild with
+    ``python manage.py rebuild_trayectorias``.
+    """
+
+    persona = models.ForeignKey(
+        Persona, on_delete=models.CASCADE, related_name='segmentos_trayectoria')
+    step = models.SmallIntegerField()
+    from_lugar = models.ForeignKey(
+        Lugar, on_delete=models.CASCADE, related_name='segmentos_salida')
+    to_lugar = models.ForeignKey(
+        Lugar, on_delete=models.CASCADE, null=True, blank=True, related_name='segmentos_llegada')
+    ordinal = models.SmallIntegerField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['persona', 'step'], name='trayectoria_segmento_step_uniq'),
+        ]
+        indexes = [
+            models.Index(fields=['from_lugar', 'to_lugar'], name='trayectoria_seg_ruta_idx'),
+        ]
+
+    def __str__(self) -> str:
+        return f'{self.persona_id} #{self.step}: {self.from_lugar_id} → {self.to_lugar_id}'
+
+
+class LugarEstadistica(models.Model):
+    """
+    Usage counters of a place (derived data, not edited by hand).
+
+    Personas pointing at the place per role – trajectory (PersonaLugarRel),
+    birth, death, procedencia – plus the distinct personas over all roles and
+    the trajectory rows (PersonaLugarRel entries, one per linked persona).
+    Maintained by dbgestor.lugar_estadisticas; rebuild or verify with
+    ``python manage.py rebuild_lugar_estadisticas``.
+    """
+
+    lugar = models.OneToOneField(
+        Lugar, on_delete=models.CASCADE, primary_key=True, related_name='estadistica')
+    personas_total = models.IntegerField(default=0)
+    personas_trayectoria = models.IntegerField(default=0)
+    personas_nacimiento = models.IntegerField(default=0)
+    personas_defuncion = models.IntegerField(default=0)
+    personas_procedencia = models.IntegerField(default=0)
+    filas_trayectoria = models.IntegerField(default=0)
+
+    def __str__(self) -> str:
+        return f'{self.lugar_id}: {self.personas_total} personas'
+
+
 class PersonaRelaciones(models.Model):
 
     RELACIONES = (
@@ -666,6 +711,40 @@ class PersonaRelaciones(models.Model):
         return ', '.join([persona.nombre_normalizado for persona in self.personas.all()]) + f" - {self.get_naturaleza_relacion_display()}"
 
 
+class PersonaAdyacencia(models.Model):
+    """
+    Person-to-person edge of a PersonaRelaciones (derived data, not edited by hand).
+
+    Every relation gives one edge per pair of its personas (origen < destino)
+    and, when it has a persona_fuente, one edge from the fuente to each other
+    persona (via_fuente).  Network views draw the fuente edges when the fuente
+    is on the graph and the pair edges otherwise.  Maintained by
+    dbgestor.adyacencias; rebuild or verify with
+    ``python manage.py rebuild_adyacencias``.
+    """
+
+    relacion = models.ForeignKey(
+        PersonaRelaciones, on_delete=models.CASCADE, related_name='aristas')
+    origen = models.ForeignKey(
+        Persona, on_delete=models.CASCADE, related_name='+', db_index=False)
+    destino = models.ForeignKey(
+        Persona, on_delete=models.CASCADE, related_name='+', db_index=False)
+    via_fuente = models.BooleanField(default=False)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['relacion', 'origen', 'destino', 'via_fuente'],
+                                    name='persona_adyacencia_uniq'),
+        ]
+        indexes = [
+            models.Index(fields=['origen', 'destino'], name='persona_ady_origen_idx'),
+            models.Index(fields=['destino', 'origen'], name='persona_ady_destino_idx'),
+        ]
+
+    def __str__(self) -> str:
+        return f'{self.relacion_id}: {self.origen_id} → {self.destino_id}'
+
+
 class PersonaRolEvento(models.Model):
 
     documento = models.ForeignKey(
@@ -697,7 +776,7 @@ class Corporacion(PolymorphicModel):
 
     corporacion_id = models.AutoField(primary_key=True)
 
-    corporacion_idno = models.CharField(max_length=50, null=True, blank=True)
+    corporacion_idno = IdnoField(max_length=50, null=True, blank=True)
 
     documentos = models.ManyToManyField(Documento)
 
@@ -742,15 +821,6 @@ class Corporacion(PolymorphicModel):
     def short_id(self):
         return f'C{self.corporacion_id}'
 
-    def save(self, *args, **kwargs):
-
-        if not self.pk:
-            super(Corporacion, self).save(*args, **kwargs)
-
-        self.corporacion_idno = f"mx-sv-cor-{str(self.corporacion_id).zfill(6)}"
-
-        super(Corporacion, self).save(*args, **kwargs)
-
     def __str__(self) -> str:
         return f"{self.nombre_institucion}"
 
@@ -808,3 +878,72 @@ class SugerenciaMerge(models.Model):
 
     def __str__(self) -> str:
         return f"{self.get_entity_type_display()} canonical={self.canonical_id} dup={self.duplicate_id} [{self.status}]"
+
+
+class IngestJob(models.Model):
+    """
+    A spreadsheet upload queued for the ingest worker.
+
+    The rows are stored in IngestJobRow and processed in committed chunks by
+    ``python manage.py run_ingest_worker`` (see api.v1.ingest_jobs);
+    next_row is the resume point, so a stopped worker or a failed job picks
+    up where the last committed chunk ended.
+    """
+
+    STATUS_CHOICES = (
+        ('pending', 'Pendiente'),
+        ('running', 'En proceso'),
+        ('done',    'Terminado'),
+        ('failed',  'Fallido'),
+    )
+
+    status     = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
+    created_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        null=True, blank=True,
+        related_name='ingest_jobs',
+    )
+    total_rows = models.PositiveIntegerField(default=0)
+    next_row   = models.PositiveIntegerField(default=0, help_text='Index of the first row not processed yet')
+    ingested   = models.PositiveIntegerField(default=0)
+    error_count = models.PositiveIntegerField(default=0, help_text='Rows that could not be ingested (IngestJobRow.error)')
+    error      = models.TextField(blank=True, null=True, help_text='Why the job failed, if it did')
+    processing_seconds = models.FloatField(default=0, help_text='Time spent processing chunks')
+    worker       = models.CharField(max_length=100, blank=True)
+    heartbeat_at = models.DateTimeField(null=True, blank=True)
+    created_at   = models.DateTimeField(auto_now_add=True)
+    started_at   = models.DateTimeField(null=True, blank=True)
+    finished_at  = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['status', 'created_at'], name='ingest_job_status_idx'),
+        ]
+
+    @property
+    def rows_per_second(self):
+        if not self.processing_seconds:
+            return None
+        return round(self.next_row / self.processing_seconds, 1)
+
+    def __str__(self) -> str:
+        return f"Ingest job {self.pk} [{self.status}] {self.next_row}/{self.total_rows}"
+
+
+class IngestJobRow(models.Model):
+    """One spreadsheet row of an IngestJob, as uploaded."""
+
+    job   = models.ForeignKey(IngestJob, on_delete=models.CASCADE, related_name='rows')
+    idx   = models.PositiveIntegerField()
+    data  = models.JSONField()
+    error = models.TextField(null=True, blank=True, help_text='Why the row could not be ingested')
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['job', 'idx'], name='ingest_job_row_uniq'),
+        ]
+
+    def __str__(self) -> str:
+        return f'{self.job_id}: {self.idx}'
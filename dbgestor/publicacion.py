@@ -0,0 +1,227 @@
+"""
+Set-based publication of documentos and the entities they link to.
+
+plan() takes a scope of documentos (scope(): by archivo, id or fecha_inicial)
+and, with cascade, brings along:
+
+    - the personas linked to them (Persona.documentos);
+    - the corporaciones linked to them (Corporacion.documentos or an
+      InstitucionRolEvento of the documento);
+    - the lugares they point at: lugar_de_produccion, the PersonaLugarRel
+      places of the documentos, the personas' lugar_nacimiento /
+      lugar_defuncion / procedencia, the corporaciones' lugar_corporacion,
+      and every place above those (es_parte_de).
+
+Unpublishing cascades to the personas and corporaciones left without any
+published documento; lugares are shared by everything and stay as they are.
+
+A plan only holds the rows whose is_published actually changes, so it is
+also the dry-run diff (diff()).  apply() writes it in one transaction: one
+UPDATE per table (is_published, and updated_at where the model has it), the
+history rows through bulk_history_create (bulk_create on the Historical*
+models, history_type '~'), and a bump of the affected data versions.  There
+is no per-row save and no save signal: search vectors, trajectories and
+place counters do not depend on is_published.  Every stage is timed:
+
+    plan = publicacion.plan(publicacion.scope(archivos=[3]))
+    report = publicacion.apply(plan, user=request.user)
+    # {'publish': True, 'counts': {'documento': 120, ...}, 'history': 371,
+    #  'timings': {'cascade': 0.02, 'diff': 0.01, 'update': 0.05, 'history': 0.3, 'total': 0.38}}
+"""
+
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+
+from django.db import connection, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from . import data_version
+from .models import Corporacion, Documento, Lugar, Persona, PersonaEsclavizada, PersonaLugarRel
+
+CHUNK_SIZE = 500
+
+ENTITIES = {
+    'documento': Documento,
+    'persona': Persona,
+    'lugar': Lugar,
+    'corporacion': Corporacion,
+}
+
+# Column shown for a row in diff().
+LABELS = {
+    'documento': 'documento_idno',
+    'persona': 'persona_idno',
+    'lugar': 'nombre_lugar',
+    'corporacion': 'corporacion_idno',
+}
+
+# The given places and every place above them.
+ANCESTROS_SQL = """
+WITH RECURSIVE arriba (lugar_id, es_parte_de_id) AS (
+    SELECT lugar_id, es_parte_de_id FROM {lugar} WHERE lugar_id = ANY(%s)
+    UNION
+    SELECT l.lugar_id, l.es_parte_de_id FROM {lugar} l JOIN arriba a ON l.lugar_id = a.es_parte_de_id
+)
+SELECT lugar_id FROM arriba
+"""
+
+
+@contextmanager
+def _timed(timings, stage):
+    started = time.monotonic()
+    try:
+        yield
+    finally:
+        timings[stage] = round(timings.get(stage, 0) + time.monotonic() - started, 4)
+
+
+def scope(archivos=None, documentos=None, desde=None, hasta=None):
+    """Documentos of the given archivo ids and documento ids, with fecha_inicial in [desde, hasta]."""
+    qs = Documento.objects.all()
+    if archivos:
+        qs = qs.filter(archivo_id__in=archivos)
+    if documentos:
+        qs = qs.filter(pk__in=documentos)
+    if desde:
+        qs = qs.filter(fecha_inicial__gte=desde)
+    if hasta:
+        qs = qs.filter(fecha_inicial__lte=hasta)
+    return qs
+
+
+def _lugares(documentos, personas, corporaciones):
+    """Ids of the places the selection points at, with their ancestors."""
+    directos = (
+        Documento.objects.filter(pk__in=documentos).values_list('lugar_de_produccion')
+        .union(
+            PersonaLugarRel.objects.filter(documento__in=documentos).values_list('lugar'),
+            Persona.objects.filter(pk__in=personas).values_list('lugar_nacimiento'),
+            Persona.objects.filter(pk__in=personas).values_list('lugar_defuncion'),
+            PersonaEsclavizada.objects.filter(pk__in=personas).values_list('procedencia'),
+            Corporacion.objects.filter(pk__in=corporaciones).values_list('lugar_corporacion'),
+        )
+    )
+    ids = [lugar_id for (lugar_id,) in directos if lugar_id is not None]
+    if not ids:
+        return []
+    with connection.cursor() as cursor:
+        cursor.execute(ANCESTROS_SQL.format(lugar=connection.ops.quote_name(Lugar._meta.db_table)), [ids])
+        return [row[0] for row in cursor.fetchall()]
+
+
+def _cascade(documentos, publish):
+    """{entity: pk subquery or list} of the entities that follow ``documentos``."""
+    if publish:
+        personas = Persona.objects.filter(documentos__in=documentos).values('pk')
+        corporaciones = Corporacion.objects.filter(
+            Q(documentos__in=documentos) | Q(p_roles_evento__documento__in=documentos)).values('pk')
+        return {
+            'persona': personas,
+            'corporacion': corporaciones,
+            'lugar': _lugares(documentos, personas, corporaciones),
+        }
+
+    # Documentos that stay published once the scope is unpublished.
+    quedan = Documento.objects.filter(is_published=True).exclude(pk__in=documentos)
+    return {
+        'persona': Persona.objects.filter(documentos__in=documentos).exclude(documentos__in=quedan).values('pk'),
+        'corporacion': (
+            Corporacion.objects.filter(Q(documentos__in=documentos) | Q(p_roles_evento__documento__in=documentos))
+            .exclude(documentos__in=quedan)
+            .exclude(p_roles_evento__documento__in=quedan)
+            .values('pk')
+        ),
+    }
+
+
+def _changes(selection, publish):
+    return {
+        entity: list(
+            ENTITIES[entity]._base_manager.filter(pk__in=pks).exclude(is_published=publish)
+            .order_by('pk').values_list('pk', flat=True)
+        )
+        for entity, pks in selection.items()
+    }
+
+
+def plan(documentos, publish=True, cascade=True):
+    """
+    What publishing (or unpublishing) the ``documentos`` queryset changes:
+    {'publish', 'changes': {entity: [pk, ...]}, 'timings': {stage: seconds}}.
+    """
+    timings = {}
+    documentos = documentos.values('pk')
+    selection = {'documento': documentos}
+    if cascade:
+        with _timed(timings, 'cascade'):
+            selection.update(_cascade(documentos, publish))
+    with _timed(timings, 'diff'):
+        changes = _changes(selection, publish)
+    return {'publish': publish, 'changes': changes, 'timings': timings}
+
+
+def plan_tables(querysets, publish=True):
+    """Like plan() for whole querysets per entity ({entity: queryset}), without cascade."""
+    timings = {}
+    with _timed(timings, 'diff'):
+        changes = _changes({entity: qs.values('pk') for entity, qs in querysets.items()}, publish)
+    return {'publish': publish, 'changes': changes, 'timings': timings}
+
+
+def diff(plan, limit=None):
+    """{entity: [(pk, idno or name), ...]} of the rows a plan changes, up to ``limit`` per entity."""
+    rows = {}
+    for entity, pks in plan['changes'].items():
+        pks = pks[:limit] if limit else pks
+        labels = {}
+        for start in range(0, len(pks), CHUNK_SIZE):
+            labels.update(ENTITIES[entity]._base_manager.filter(pk__in=pks[start:start + CHUNK_SIZE])
+                          .values_list('pk', LABELS[entity]))
+        rows[entity] = [(pk, labels.get(pk)) for pk in pks]
+    return rows
+
+
+def _history(model, pks, user, reason):
+    """One history row per changed row, in the Historical* table of its concrete class."""
+    written = 0
+    for start in range(0, len(pks), CHUNK_SIZE):
+        by_model = defaultdict(list)
+        for obj in model.objects.filter(pk__in=pks[start:start + CHUNK_SIZE]):
+            by_model[type(obj)].append(obj)
+        for concrete, objs in by_model.items():
+            concrete.history.bulk_history_create(
+                objs, update=True, default_user=user, default_change_reason=reason)
+            written += len(objs)
+    return written
+
+
+def apply(plan, user=None, reason=None):
+    """
+    Write a plan. Returns {'publish', 'counts': {entity: rows updated},
+    'history': rows written, 'timings': {stage: seconds}}.
+    """
+    publish = plan['publish']
+    reason = reason or ('Publicado' if publish else 'Despublicado')
+    timings = dict(plan['timings'])
+    counts, history = {}, 0
+    now = timezone.now()
+
+    with transaction.atomic():
+        with _timed(timings, 'update'):
+            for entity, pks in plan['changes'].items():
+                model = ENTITIES[entity]
+                values = {'is_published': publish}
+                if any(field.name == 'updated_at' for field in model._meta.concrete_fields):
+                    values['updated_at'] = now
+                counts[entity] = 0
+                for start in range(0, len(pks), CHUNK_SIZE):
+                    counts[entity] += model._base_manager.filter(pk__in=pks[start:start + CHUNK_SIZE]).update(**values)
+        with _timed(timings, 'history'):
+            for entity, pks in plan['changes'].items():
+                history += _history(ENTITIES[entity], pks, user, reason)
+        data_version.bump(*(entity for entity, count in counts.items() if count))
+
+    timings['total'] = round(sum(timings.values()), 4)
+    return {'publish': publish, 'counts': counts, 'history': history, 'timings': timings}
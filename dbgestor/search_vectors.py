@@ -0,0 +1,170 @@
+"""
+search_vector maintenance for Lugar, Documento, Persona and Corporacion.
+
+Every model keeps a weighted PostgreSQL tsvector built from the columns in
+SEARCH_FIELDS.  How it is kept current depends on settings.SEARCH_VECTOR_MODE:
+
+    deferred  – (default) the post_save handler in dbgestor.signals queues the
+                saved pk; once the surrounding transaction commits, each model
+                gets one ``UPDATE ... WHERE pk IN (...)`` per CHUNK_SIZE queued
+                rows, so a bulk ingest or a merge no longer pays an extra
+                UPDATE for every save.
+    trigger   – PostgreSQL computes the vector itself in a BEFORE INSERT/UPDATE
+                trigger and the signal handler does nothing.  Install the
+                triggers with ``python manage.py search_vector_triggers``.
+
+Both paths and the full rebuild (``python manage.py populate_search_vectors``)
+use the same column list, so they produce identical vectors.
+"""
+
+from django.conf import settings
+from django.contrib.postgres.search import SearchVector
+from django.db import connection, transaction
+
+from .deferred import DirtySet
+from .models import Corporacion, Documento, Lugar, Persona
+
+SEARCH_CONFIG = 'spanish'
+MODES = ('deferred', 'trigger')
+CHUNK_SIZE = 1000
+
+# Model → (field, weight) pairs, in concatenation order.
+SEARCH_FIELDS = {
+    Lugar: (
+        ('nombre_lugar', 'A'),
+        ('otros_nombres', 'B'),
+        ('tipo', 'C'),
+    ),
+    Documento: (
+        ('titulo', 'A'),
+        ('descripcion', 'B'),
+        ('notas', 'C'),
+        ('sigla_documento', 'D'),
+    ),
+    Persona: (
+        ('nombre_normalizado', 'A'),
+        ('nombres', 'A'),
+        ('apellidos', 'A'),
+        ('notas', 'C'),
+        ('ocupacion_categoria', 'D'),
+    ),
+    Corporacion: (
+        ('nombre_institucion', 'A'),
+        ('nombres_alternativos', 'B'),
+        ('notas', 'C'),
+    ),
+}
+
+
+def get_mode():
+    mode = getattr(settings, 'SEARCH_VECTOR_MODE', 'deferred')
+    if mode not in MODES:
+        raise ValueError(f"SEARCH_VECTOR_MODE must be one of {', '.join(MODES)}, got {mode!r}")
+    return mode
+
+
+def vector_model(model):
+    """The model whose table holds search_vector (Persona for its subclasses)."""
+    return model._meta.get_field('search_vector').model
+
+
+def search_vector_expression(model):
+    """The SearchVector expression for ``model``, for QuerySet.update()."""
+    model = vector_model(model)
+    expression = None
+    for field, weight in SEARCH_FIELDS[model]:
+        term = SearchVector(field, weight=weight, config=SEARCH_CONFIG)
+        expression = term if expression is None else expression + term
+    return expression
+
+
+def update_vectors(model, pks):
+    """Recompute search_vector for the given pks. Returns rows updated."""
+    model = vector_model(model)
+    ids = sorted({pk for pk in pks if pk is not None})
+    expression = search_vector_expression(model)
+    updated = 0
+    for start in range(0, len(ids), CHUNK_SIZE):
+        chunk = ids[start:start + CHUNK_SIZE]
+        updated += model._base_manager.filter(pk__in=chunk).update(search_vector=expression)
+    return updated
+
+
+def mark_dirty(model, pks):
+    """Queue rows for a search_vector refresh once the current transaction commits."""
+    model = vector_model(model)
+    _dirty.add((model, pk) for pk in pks if pk is not None)
+
+
+def _update_queued(items):
+    batches = {}
+    for model, pk in items:
+        batches.setdefault(model, set()).add(pk)
+    for model, ids in batches.items():
+        update_vectors(model, ids)
+
+
+_dirty = DirtySet('search vectors', _update_queued)
+
+
+# ── PostgreSQL triggers (SEARCH_VECTOR_MODE = 'trigger') ──────────────────────
+
+def trigger_name(model):
+    return f'{vector_model(model)._meta.db_table}_search_vector'
+
+
+def _trigger_sql(model):
+    model = vector_model(model)
+    quote = connection.ops.quote_name
+    table = quote(model._meta.db_table)
+    name = trigger_name(model)
+    columns = [model._meta.get_field(field).column for field, _ in SEARCH_FIELDS[model]]
+    # Same shape as the SQL Django generates for SearchVector(..., weight=, config=).
+    vector = ' || '.join(
+        f"setweight(to_tsvector('{SEARCH_CONFIG}'::regconfig, COALESCE(NEW.{quote(column)}::text, '')), '{weight}')"
+        for column, (_, weight) in zip(columns, SEARCH_FIELDS[model])
+    )
+    watched = ', '.join(dict.fromkeys(quote(column) for column in columns))
+    return [
+        f"""
+        CREATE OR REPLACE FUNCTION {quote(name)}() RETURNS trigger AS $$
+        BEGIN
+            NEW.search_vector := {vector};
+            RETURN NEW;
+        END
+        $$ LANGUAGE plpgsql
+        """,
+        f'DROP TRIGGER IF EXISTS {quote(name)} ON {table}',
+        f"""
+        CREATE TRIGGER {quote(name)}
+        BEFORE INSERT OR UPDATE OF {watched} ON {table}
+        FOR EACH ROW EXECUTE FUNCTION {quote(name)}()
+        """,
+    ]
+
+
+def install_triggers():
+    """Create (or replace) the search_vector trigger on every model's table."""
+    with transaction.atomic(), connection.cursor() as cursor:
+        for model in SEARCH_FIELDS:
+            for statement in _trigger_sql(model):
+                cursor.execute(statement)
+
+
+def drop_triggers():
+    quote = connection.ops.quote_name
+    with transaction.atomic(), connection.cursor() as cursor:
+        for model in SEARCH_FIELDS:
+            name = quote(trigger_name(model))
+            cursor.execute(f'DROP TRIGGER IF EXISTS {name} ON {quote(model._meta.db_table)}')
+            cursor.execute(f'DROP FUNCTION IF EXISTS {name}()')
+
+
+def installed_triggers():
+    """Names of the search_vector triggers currently present in the database."""
+    names = [trigger_name(model) for model in SEARCH_FIELDS]
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT tgname FROM pg_trigger WHERE NOT tgisinternal AND tgname = ANY(%s)', [names]
+        )
+        return {row[0] for row in cursor.fetchall()}
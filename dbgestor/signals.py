@@ -1,67 +1,338 @@
 """
-PostgreSQL full-text search signal handlers.
+Model signal handlers.
 
-Auto-update search_vector fields on model save.
-Skips raw saves (loaddata/fixtures) — use populate_search_vectors command instead.
+- PostgreSQL full-text search: queue saved rows for a batched search_vector
+  update at commit (see dbgestor.search_vectors).
+- Trajectory segments: queue affected personas for a TrayectoriaSegmento
+  refresh (see dbgestor.trayectorias).
+- Place usage counters: queue affected places for a LugarEstadistica refresh
+  (see dbgestor.lugar_estadisticas).
+- Network edges: queue affected relations for a PersonaAdyacencia refresh
+  (see dbgestor.adyacencias).
+- Data versions: bump the per-entity version that invalidates cached API
+  payloads (see dbgestor.data_version).
+- Vocabulary cache: drop this process's copy of an edited vocabulary table
+  (see dbgestor.vocabulario); other processes follow the 'vocab' version.
+- updated_at: many-to-many edits touch the owning rows, so delta deposits
+  (export_deposit --since) see them.
+
+Search vectors, trajectories, place counters and network edges skip raw saves (loaddata/fixtures) —
+use the populate_search_vectors, rebuild_trayectorias, rebuild_lugar_estadisticas and
+rebuild_adyacencias commands instead.
 """
 
-from django.contrib.postgres.search import SearchVector
-from django.db.models.signals import post_save
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete, pre_save
 from django.dispatch import receiver
+from django.utils import timezone
+
+from . import adyacencias, data_version, lugar_estadisticas, search_vectors, trayectorias, vocabulario
+from .models import (Lugar, Documento, Persona, PersonaEsclavizada, PersonaNoEsclavizada,
+                     PersonaLugarRel, Corporacion, Archivo, PersonaRelaciones, PersonaRolEvento,
+                     InstitucionRolEvento, Calidades, Actividades, Hispanizaciones, Etonimos,
+                     EstadoCivil, SituacionLugar, TipoDocumental, RolEvento, TipoLugar,
+                     TiposInstitucion)
 
-from .models import Lugar, Documento, Persona, Corporacion
 
+# ---------------------------------------------------------------------------
+# Search vectors
+# ---------------------------------------------------------------------------
 
+# post_save is sent with the concrete class, so each Persona subclass is listed.
 @receiver(post_save, sender=Lugar)
-def update_lugar_search_vector(sender, instance, raw=False, **kwargs):
-    if raw:
+@receiver(post_save, sender=Documento)
+@receiver(post_save, sender=Persona)
+@receiver(post_save, sender=PersonaEsclavizada)
+@receiver(post_save, sender=PersonaNoEsclavizada)
+@receiver(post_save, sender=Corporacion)
+def queue_search_vector(sender, instance, raw=False, **kwargs):
+    if raw or search_vectors.get_mode() != 'deferred':
         return
-    Lugar.objects.filter(pk=instance.pk).update(
-        search_vector=(
-            SearchVector('nombre_lugar', weight='A', config='spanish') +
-            SearchVector('otros_nombres', weight='B', config='spanish') +
-            SearchVector('tipo', weight='C', config='spanish')
-        )
-    )
+    search_vectors.mark_dirty(sender, [instance.pk])
 
 
-@receiver(post_save, sender=Documento)
-def update_documento_search_vector(sender, instance, raw=False, **kwargs):
+# ---------------------------------------------------------------------------
+# Trajectory segments
+# ---------------------------------------------------------------------------
+
+# post_save is sent with the concrete class, so each Persona subclass is listed.
+@receiver(post_save, sender=Persona)
+@receiver(post_save, sender=PersonaEsclavizada)
+@receiver(post_save, sender=PersonaNoEsclavizada)
+def queue_persona_trayectoria(sender, instance, raw=False, **kwargs):
     if raw:
         return
-    Documento.objects.filter(pk=instance.pk).update(
-        search_vector=(
-            SearchVector('titulo', weight='A', config='spanish') +
-            SearchVector('descripcion', weight='B', config='spanish') +
-            SearchVector('notas', weight='C', config='spanish') +
-            SearchVector('sigla_documento', weight='D', config='spanish')
-        )
-    )
+    trayectorias.mark_dirty([instance.pk])
+
+
+@receiver(post_save, sender=PersonaLugarRel)
+def queue_persona_lugar_rel_trayectoria(sender, instance, created=False, raw=False, **kwargs):
+    # A new relation has no personas yet; m2m_changed covers it.
+    if raw or created:
+        return
+    trayectorias.mark_dirty(instance.personas.values_list('persona_id', flat=True))
+
+
+@receiver(pre_delete, sender=PersonaLugarRel)
+def queue_deleted_persona_lugar_rel_trayectoria(sender, instance, **kwargs):
+    trayectorias.mark_dirty(list(instance.personas.values_list('persona_id', flat=True)))
+
+
+@receiver(m2m_changed, sender=PersonaLugarRel.personas.through)
+def queue_persona_lugar_rel_personas_trayectoria(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'pre_clear'):
+        return
+    if reverse:
+        # persona.p_x_l_pere.add(...) / remove(...) / clear()
+        trayectorias.mark_dirty([instance.pk])
+    elif action == 'pre_clear':
+        trayectorias.mark_dirty(list(instance.personas.values_list('persona_id', flat=True)))
+    else:
+        trayectorias.mark_dirty(pk_set or [])
+
+
+@receiver(pre_save, sender=Lugar)
+def remember_lugar_coords(sender, instance, raw=False, **kwargs):
+    if raw or instance.pk is None:
+        return
+    instance._had_coords = Lugar.objects.filter(
+        pk=instance.pk, lat__isnull=False, lon__isnull=False
+    ).exclude(lat=0).exclude(lon=0).exists()
+
+
+@receiver(post_save, sender=Lugar)
+def queue_lugar_trayectorias(sender, instance, created=False, raw=False, **kwargs):
+    # Only the presence of usable coordinates changes which points are kept.
+    if raw or created:
+        return
+    had_coords = getattr(instance, '_had_coords', None)
+    if had_coords is None or had_coords == bool(instance.lat and instance.lon):
+        return
+    trayectorias.mark_dirty(trayectorias.personas_en_lugar(instance.pk))
+
+
+@receiver(pre_delete, sender=Lugar)
+def queue_deleted_lugar_trayectorias(sender, instance, **kwargs):
+    trayectorias.mark_dirty(trayectorias.personas_en_lugar(instance.pk))
+
+
+# ---------------------------------------------------------------------------
+# Place usage counters
+# ---------------------------------------------------------------------------
+
+@receiver(pre_save, sender=Persona)
+@receiver(pre_save, sender=PersonaEsclavizada)
+@receiver(pre_save, sender=PersonaNoEsclavizada)
+def remember_persona_lugares(sender, instance, raw=False, **kwargs):
+    if raw or instance.pk is None:
+        return
+    instance._fk_lugares = lugar_estadisticas.persona_fk_lugares(instance.pk)
 
 
 @receiver(post_save, sender=Persona)
-def update_persona_search_vector(sender, instance, raw=False, **kwargs):
+@receiver(post_save, sender=PersonaEsclavizada)
+@receiver(post_save, sender=PersonaNoEsclavizada)
+def queue_persona_lugar_estadisticas(sender, instance, raw=False, **kwargs):
     if raw:
         return
-    instance.__class__.objects.filter(pk=instance.pk).update(
-        search_vector=(
-            SearchVector('nombre_normalizado', weight='A', config='spanish') +
-            SearchVector('nombres', weight='A', config='spanish') +
-            SearchVector('apellidos', weight='A', config='spanish') +
-            SearchVector('notas', weight='C', config='spanish') +
-            SearchVector('ocupacion_categoria', weight='D', config='spanish')
-        )
+    new = (instance.lugar_nacimiento_id, instance.lugar_defuncion_id, getattr(instance, 'procedencia_id', None))
+    old = getattr(instance, '_fk_lugares', (None, None, None))
+    # Only the roles whose place changed; both the old and the new place move.
+    lugar_estadisticas.mark_dirty(
+        lugar_id for before, after in zip(old, new) if before != after for lugar_id in (before, after)
     )
 
 
-@receiver(post_save, sender=Corporacion)
-def update_corporacion_search_vector(sender, instance, raw=False, **kwargs):
+@receiver(pre_delete, sender=Persona)
+@receiver(pre_delete, sender=PersonaEsclavizada)
+@receiver(pre_delete, sender=PersonaNoEsclavizada)
+def queue_deleted_persona_lugar_estadisticas(sender, instance, **kwargs):
+    # Its PersonaLugarRel links go with it without an m2m_changed signal.
+    lugar_estadisticas.mark_dirty(lugar_estadisticas.persona_lugares(instance.pk))
+
+
+@receiver(pre_save, sender=PersonaLugarRel)
+def remember_persona_lugar_rel_lugar(sender, instance, raw=False, **kwargs):
+    if raw or instance.pk is None:
+        return
+    instance._old_lugar_id = (PersonaLugarRel.objects.filter(pk=instance.pk)
+                              .values_list('lugar_id', flat=True).first())
+
+
+@receiver(post_save, sender=PersonaLugarRel)
+def queue_persona_lugar_rel_estadisticas(sender, instance, created=False, raw=False, **kwargs):
     if raw:
         return
-    instance.__class__.objects.filter(pk=instance.pk).update(
-        search_vector=(
-            SearchVector('nombre_institucion', weight='A', config='spanish') +
-            SearchVector('nombres_alternativos', weight='B', config='spanish') +
-            SearchVector('notas', weight='C', config='spanish')
-        )
-    )
+    old_lugar_id = getattr(instance, '_old_lugar_id', None)
+    # A new relation counts as a trajectory row before it has personas.
+    if created or old_lugar_id != instance.lugar_id:
+        lugar_estadisticas.mark_dirty([old_lugar_id, instance.lugar_id])
+
+
+@receiver(pre_delete, sender=PersonaLugarRel)
+def queue_deleted_persona_lugar_rel_estadisticas(sender, instance, **kwargs):
+    lugar_estadisticas.mark_dirty([instance.lugar_id])
+
+
+@receiver(m2m_changed, sender=PersonaLugarRel.personas.through)
+def queue_persona_lugar_rel_personas_estadisticas(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'pre_clear'):
+        return
+    if not reverse:
+        lugar_estadisticas.mark_dirty([instance.lugar_id])
+    elif action == 'pre_clear':
+        # persona.p_x_l_pere.clear()
+        lugar_estadisticas.mark_dirty(instance.p_x_l_pere.values_list('lugar_id', flat=True))
+    else:
+        # persona.p_x_l_pere.add(...) / remove(...)
+        lugar_estadisticas.mark_dirty(lugar_estadisticas.rel_lugares(pk_set or []))
+
+
+@receiver(post_save, sender=Lugar)
+def queue_new_lugar_estadisticas(sender, instance, created=False, raw=False, **kwargs):
+    # Gives the place its (empty) counter row; deleting it cascades.
+    if raw or not created:
+        return
+    lugar_estadisticas.mark_dirty([instance.pk])
+
+
+# ---------------------------------------------------------------------------
+# Network edges
+# ---------------------------------------------------------------------------
+
+@receiver(post_save, sender=PersonaRelaciones)
+def queue_persona_relaciones_adyacencias(sender, instance, created=False, raw=False, **kwargs):
+    # A new relation has no personas yet; m2m_changed covers it.  Deleting
+    # a relation or a persona cascades to its edges.
+    if raw or created:
+        return
+    adyacencias.mark_dirty([instance.pk])
+
+
+@receiver(m2m_changed, sender=PersonaRelaciones.personas.through)
+def queue_persona_relaciones_personas_adyacencias(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'pre_clear'):
+        return
+    if not reverse:
+        adyacencias.mark_dirty([instance.pk])
+    elif action == 'pre_clear':
+        # persona.relaciones.clear()
+        adyacencias.mark_dirty(adyacencias.persona_relaciones(instance.pk))
+    else:
+        # persona.relaciones.add(...) / remove(...)
+        adyacencias.mark_dirty(pk_set or [])
+
+
+@receiver(pre_delete, sender=Persona)
+@receiver(pre_delete, sender=PersonaEsclavizada)
+@receiver(pre_delete, sender=PersonaNoEsclavizada)
+def bump_deleted_persona_red(sender, instance, **kwargs):
+    # Its edges go through the cascade without a refresh; the network
+    # metrics (dbgestor.metricas_red) are cached per 'red' version.
+    if adyacencias.persona_tiene_aristas(instance.pk):
+        data_version.bump('red')
+
+
+# ---------------------------------------------------------------------------
+# Data versions
+# ---------------------------------------------------------------------------
+
+# Model → entity whose version a write to it bumps.  Relations count towards
+# the entity they describe; Archivo towards documento (archive facets).
+VERSIONED_MODELS = {
+    Persona: 'persona',
+    PersonaEsclavizada: 'persona',
+    PersonaNoEsclavizada: 'persona',
+    PersonaLugarRel: 'persona',
+    PersonaRelaciones: 'persona',
+    PersonaRolEvento: 'persona',
+    Documento: 'documento',
+    Archivo: 'documento',
+    Lugar: 'lugar',
+    Corporacion: 'corporacion',
+    InstitucionRolEvento: 'corporacion',
+    Calidades: 'vocab',
+    Actividades: 'vocab',
+    Hispanizaciones: 'vocab',
+    Etonimos: 'vocab',
+    EstadoCivil: 'vocab',
+    SituacionLugar: 'vocab',
+    TipoDocumental: 'vocab',
+    RolEvento: 'vocab',
+    TipoLugar: 'vocab',
+    TiposInstitucion: 'vocab',
+}
+
+
+def bump_data_version(sender, **kwargs):
+    data_version.bump(VERSIONED_MODELS[sender])
+
+
+def bump_m2m_data_version(sender, action, **kwargs):
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        data_version.bump(_M2M_ENTITIES[sender])
+
+
+_M2M_ENTITIES = {}
+for _model, _entity in VERSIONED_MODELS.items():
+    post_save.connect(bump_data_version, sender=_model, dispatch_uid=f'data_version_save_{_model.__name__}')
+    post_delete.connect(bump_data_version, sender=_model, dispatch_uid=f'data_version_delete_{_model.__name__}')
+    for _field in _model._meta.local_many_to_many:
+        _M2M_ENTITIES[_field.remote_field.through] = _entity
+
+for _through in _M2M_ENTITIES:
+    m2m_changed.connect(bump_m2m_data_version, sender=_through,
+                        dispatch_uid=f'data_version_m2m_{_through._meta.label}')
+
+
+# ---------------------------------------------------------------------------
+# Vocabulary cache
+# ---------------------------------------------------------------------------
+
+def forget_vocabulario(sender, **kwargs):
+    vocabulario.forget(sender)
+
+
+for _model in vocabulario.VOCAB_FIELDS:
+    post_save.connect(forget_vocabulario, sender=_model, dispatch_uid=f'vocabulario_save_{_model.__name__}')
+    post_delete.connect(forget_vocabulario, sender=_model, dispatch_uid=f'vocabulario_delete_{_model.__name__}')
+
+
+# ---------------------------------------------------------------------------
+# updated_at on many-to-many edits
+# ---------------------------------------------------------------------------
+
+# Models whose updated_at should move when one of their own m2m sets changes.
+TIMESTAMPED_M2M_OWNERS = (Persona, PersonaEsclavizada, PersonaNoEsclavizada, Documento, Corporacion,
+                          PersonaLugarRel)
+
+
+# through model -> the owner's ManyToManyField.
+_TIMESTAMPED_M2M_FIELDS = {}
+
+
+def touch_m2m_owner(sender, instance, action, reverse, model, pk_set, **kwargs):
+    if reverse and action == 'pre_clear':
+        # related.<owners>.clear() sends no pk_set: note the owners before the
+        # rows go, for post_clear.
+        field = _TIMESTAMPED_M2M_FIELDS[sender]
+        owners = set(model._base_manager.filter(**{field.name: instance.pk}).values_list('pk', flat=True))
+        instance.__dict__.setdefault('_m2m_clear_owners', {})[sender] = owners
+        return
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if reverse:
+        # instance is the related object; pk_set holds the owner pks.
+        owner = model
+        pks = instance.__dict__.get('_m2m_clear_owners', {}).pop(sender, None) if action == 'post_clear' else pk_set
+    else:
+        owner, pks = type(instance), {instance.pk}
+    if pks:
+        # QuerySet.update: no save signals, no history rows, no search-vector work.
+        owner._base_manager.filter(pk__in=pks).update(updated_at=timezone.now())
+
+
+for _owner in TIMESTAMPED_M2M_OWNERS:
+    for _field in _owner._meta.local_many_to_many:
+        _TIMESTAMPED_M2M_FIELDS[_field.remote_field.through] = _field
+        m2m_changed.connect(touch_m2m_owner, sender=_field.remote_field.through,
+                            dispatch_uid=f'touch_m2m_owner_{_field.remote_field.through._meta.label}')
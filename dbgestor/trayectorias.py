@@ -0,0 +1,145 @@
+"""
+Precomputed trajectory segments.
+
+A persona's trajectory is the ordered list of georeferenced places taken from
+PersonaLugarRel (by ordinal) plus the lugar_nacimiento / procedencia /
+lugar_defuncion foreign keys.  TrayectoriaSegmento keeps one row per
+consecutive pair of points so the map endpoints can aggregate routes with a
+GROUP BY instead of rebuilding every trajectory in Python.  The segments
+themselves are derived in PostgreSQL (LEAD over the ordered points), one
+INSERT ... SELECT per batch of personas.
+
+Rows are refreshed by the signal handlers in dbgestor.signals.  Changes are
+collected in a per-thread dirty set (dbgestor.deferred) and recomputed once the surrounding
+transaction commits, so a form that saves a persona and several relations
+only refreshes that persona once.  Rebuild everything with:
+    python manage.py rebuild_trayectorias
+"""
+
+from django.db import connection, transaction
+from django.db.models import Q
+
+from .deferred import DirtySet
+from .models import Lugar, Persona, PersonaEsclavizada, PersonaLugarRel, TrayectoriaSegmento
+
+CHUNK_SIZE = 500
+
+
+def _table(model):
+    return connection.ops.quote_name(model._meta.db_table)
+
+
+# Trajectory points of a set of personas, numbered with ROW_NUMBER and paired
+# with the next point through LEAD.  Points without usable coordinates (NULL
+# or 0) are skipped.  Birth place goes two steps before the first relation,
+# procedencia one step before (unless it repeats the birth place) and death
+# place one step after the last relation; on equal ordinals the FK points come
+# first, in that order, followed by the relations by primary key.
+SEGMENTOS_SQL = """
+WITH rel AS (
+    SELECT t.persona_id, r.lugar_id, r.ordinal, r.persona_x_lugares AS tiebreak
+    FROM {through} t
+    JOIN {rel} r ON r.persona_x_lugares = t.personalugarrel_id
+    JOIN {lugar} l ON l.lugar_id = r.lugar_id
+    WHERE t.persona_id = ANY(%(ids)s)
+      AND l.lat <> 0 AND l.lon <> 0
+),
+fk AS (
+    SELECT p.persona_id,
+           COALESCE(b.min_ord, 1) AS min_ord,
+           COALESCE(b.max_ord, 0) AS max_ord,
+           CASE WHEN ln.lat <> 0 AND ln.lon <> 0 THEN ln.lugar_id END AS nac_id,
+           CASE WHEN lp.lat <> 0 AND lp.lon <> 0 THEN lp.lugar_id END AS proc_id,
+           CASE WHEN ld.lat <> 0 AND ld.lon <> 0 THEN ld.lugar_id END AS def_id
+    FROM {persona} p
+    LEFT JOIN (SELECT persona_id, MIN(ordinal) AS min_ord, MAX(ordinal) AS max_ord
+               FROM rel GROUP BY persona_id) b ON b.persona_id = p.persona_id
+    LEFT JOIN {esclavizada} pe ON pe.persona_ptr_id = p.persona_id
+    LEFT JOIN {lugar} ln ON ln.lugar_id = p.lugar_nacimiento_id
+    LEFT JOIN {lugar} lp ON lp.lugar_id = pe.procedencia_id
+    LEFT JOIN {lugar} ld ON ld.lugar_id = p.lugar_defuncion_id
+    WHERE p.persona_id = ANY(%(ids)s)
+),
+points AS (
+    SELECT persona_id, nac_id AS lugar_id, min_ord - 2 AS ordinal, 0 AS src, 0 AS tiebreak
+    FROM fk WHERE nac_id IS NOT NULL
+    UNION ALL
+    SELECT persona_id, proc_id, min_ord - 1, 1, 0
+    FROM fk WHERE proc_id IS NOT NULL AND proc_id IS DISTINCT FROM nac_id
+    UNION ALL
+    SELECT persona_id, def_id, max_ord + 1, 2, 0
+    FROM fk WHERE def_id IS NOT NULL
+    UNION ALL
+    SELECT persona_id, lugar_id, ordinal, 3, tiebreak FROM rel
+),
+seq AS (
+    SELECT persona_id, lugar_id, ordinal,
+           ROW_NUMBER() OVER w - 1 AS step,
+           LEAD(lugar_id) OVER w AS next_lugar_id,
+           COUNT(*) OVER (PARTITION BY persona_id) AS n_points
+    FROM points
+    WINDOW w AS (PARTITION BY persona_id ORDER BY ordinal, src, tiebreak)
+)
+INSERT INTO {segmento} (persona_id, step, from_lugar_id, to_lugar_id, ordinal)
+SELECT persona_id, step, lugar_id, next_lugar_id, ordinal
+FROM seq
+WHERE next_lugar_id IS NOT NULL OR n_points = 1
+"""
+
+
+def _segmentos_sql():
+    return SEGMENTOS_SQL.format(
+        through=_table(PersonaLugarRel.personas.through),
+        rel=_table(PersonaLugarRel),
+        lugar=_table(Lugar),
+        persona=_table(Persona),
+        esclavizada=_table(PersonaEsclavizada),
+        segmento=_table(TrayectoriaSegmento),
+    )
+
+
+def refresh_segmentos(persona_ids):
+    """Recompute the stored segments of the given personas. Returns rows written."""
+    ids = sorted({pid for pid in persona_ids if pid is not None})
+    sql = _segmentos_sql()
+    written = 0
+
+    for start in range(0, len(ids), CHUNK_SIZE):
+        chunk = ids[start:start + CHUNK_SIZE]
+        with transaction.atomic():
+            TrayectoriaSegmento.objects.filter(persona_id__in=chunk).delete()
+            with connection.cursor() as cursor:
+                cursor.execute(sql, {'ids': chunk})
+                written += cursor.rowcount
+
+    return written
+
+
+def rebuild_all():
+    """Rebuild the whole segment table. Returns (personas, rows written)."""
+    ids = list(Persona.objects.order_by('persona_id').values_list('persona_id', flat=True))
+    with transaction.atomic():
+        TrayectoriaSegmento.objects.all().delete()
+        written = refresh_segmentos(ids)
+    return len(ids), written
+
+
+def personas_en_lugar(lugar_id):
+    """IDs of every persona whose trajectory can include the given Lugar."""
+    through = PersonaLugarRel.personas.through
+    ids = set(through.objects.filter(personalugarrel__lugar_id=lugar_id)
+              .values_list('persona_id', flat=True))
+    ids.update(Persona.objects.filter(
+        Q(lugar_nacimiento_id=lugar_id) |
+        Q(lugar_defuncion_id=lugar_id) |
+        Q(personaesclavizada__procedencia_id=lugar_id)
+    ).values_list('persona_id', flat=True))
+    return ids
+
+
+_dirty = DirtySet('trajectory segments', refresh_segmentos)
+
+
+def mark_dirty(persona_ids):
+    """Queue personas for a segment refresh once the current transaction commits."""
+    _dirty.add(pid for pid in persona_ids if pid is not None)
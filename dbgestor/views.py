@@ -6,6 +6,7 @@ from django.http import JsonResponse
 from django.views.generic import (ListView, DetailView, CreateView, UpdateView, DeleteView, TemplateView)
 
 from .view_mixin import DeleteNextUrlMixin
+from . import vocabulario
 
 from collections import defaultdict
 
@@ -148,14 +149,13 @@ class FondoAutocomplete(autocomplete.Select2QuerySetView):
     def get_context_data(self, **kwargs):
         pass
     
-class CalidadesAutocomplete(autocomplete.Select2QuerySetView):
+class VocabAutocompleteView(autocomplete.Select2QuerySetView):
+    """Autocomplete over a vocabulary table, served from the process cache (dbgestor.vocabulario)."""
     def get_queryset(self):
-        qs = Calidades.objects.all().order_by('calidad')
+        return vocabulario.search(self.model, self.q)
 
-        if self.q:
-            qs = qs.filter(calidad__icontains=self.q)
-            
-        return qs
+class CalidadesAutocomplete(VocabAutocompleteView):
+    model = Calidades
     
 class CalidadesPersonaEsclavizadaAutocomplete(autocomplete.Select2QuerySetView):
     def get_queryset(self):
@@ -183,63 +183,30 @@ class CalidadesPersonasNoEsclavizadasAutocomplete(autocomplete.Select2QuerySetVi
 
         return qs
 
-class HispanizacionesAutocomplete(autocomplete.Select2QuerySetView):
-    def get_queryset(self):
-        qs = Hispanizaciones.objects.all().order_by('hispanizacion')
-        if self.q:
-            qs = qs.filter(hispanizacion__icontains=self.q)
-        return qs
+class HispanizacionesAutocomplete(VocabAutocompleteView):
+    model = Hispanizaciones
 
-class EtnonimosAutocomplete(autocomplete.Select2QuerySetView):
-    def get_queryset(self):
-        qs = Etonimos.objects.all().order_by('etonimo')
-        if self.q:
-            qs = qs.filter(etonimo__icontains=self.q)
-        return qs
+class EtnonimosAutocomplete(VocabAutocompleteView):
+    model = Etonimos
     
-class EstadoCivilAutocomplete(autocomplete.Select2QuerySetView):
-    def get_queryset(self):
-        qs = EstadoCivil.objects.all().order_by('estado_civil')
-        if self.q:
-            qs = qs.filter(estado_civil__icontains=self.q)
-        return qs
-
-class OcupacionesAutocomplete(autocomplete.Select2QuerySetView):
-    def get_queryset(self):
-        qs = Actividades.objects.all().order_by('actividad')
+class EstadoCivilAutocomplete(VocabAutocompleteView):
+    model = EstadoCivil
 
-        if self.q:
-            qs = qs.filter(actividad__icontains=self.q)
-        return qs
+class OcupacionesAutocomplete(VocabAutocompleteView):
+    model = Actividades
 
 
-class SituacionLugarAutocomplete(autocomplete.Select2QuerySetView):
-    def get_queryset(self):
-        qs = SituacionLugar.objects.all().order_by('situacion')
-        if self.q:
-            qs = qs.filter(situacion__icontains=self.q)
-        return qs
+class SituacionLugarAutocomplete(VocabAutocompleteView):
+    model = SituacionLugar
 
-class TipoDocumentalAutocomplete(autocomplete.Select2QuerySetView):
-    def get_queryset(self):
-        qs = TipoDocumental.objects.all().order_by('tipo_documental')
-        if self.q:
-            qs = qs.filter(tipo_documental__icontains=self.q)
-        return qs
+class TipoDocumentalAutocomplete(VocabAutocompleteView):
+    model = TipoDocumental
 
-class RolEventoAutocomplete(autocomplete.Select2QuerySetView):
-    def get_queryset(self):
-        qs = RolEvento.objects.all().order_by('rol_evento')
-        if self.q:
-            qs = qs.filter(rol_evento__icontains=self.q)
-        return qs
+class RolEventoAutocomplete(VocabAutocompleteView):
+    model = RolEvento
 
-class TipoLugarAutocomplete(autocomplete.Select2QuerySetView):
-    def get_queryset(self):
-        qs = TipoLugar.objects.all().order_by('tipo_lugar')
-        if self.q:
-            qs = qs.filter(tipo_lugar__icontains=self.q)
-        return qs
+class TipoLugarAutocomplete(VocabAutocompleteView):
+    model = TipoLugar
 
 class TiposInstitucionAutocomplete(autocomplete.Select2QuerySetView):
     def get_queryset(self):
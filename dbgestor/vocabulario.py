@@ -0,0 +1,167 @@
+"""
+Process-local cache of the vocabulary tables.
+
+Ingest, the v2 vocabulary write serializers and the select2 autocompletes
+look up the same few hundred terms (calidades, etnónimos, ocupaciones...)
+over and over.  Each process keeps, per vocabulary model, the normalized term
+-> pk of every row and the labels for the autocompletes, so a known term is
+resolved without a query:
+
+    ids = vocabulario.resolve(Calidades, {'negro', 'mulato'})   # {term: pk}
+
+Terms are normalized like the models store them: stripped, and lowercased
+for the models whose save() lowercases (Calidades, Hispanizaciones,
+Etonimos).  Only terms missing from the table go to the database; with
+create=True the ones still missing there are inserted with bulk_create.
+
+A table is loaded with one query the first time a process needs it and is
+stamped with the 'vocab' data version (dbgestor.data_version).  Every vocab
+write bumps that version, so the other processes reload their tables lazily;
+each process reads the shared version at most once per
+VOCAB_CACHE_CHECK_INTERVAL seconds.  What a transaction loads or creates is
+only kept once it commits, so a rollback never leaves a pk in the cache.
+"""
+
+import threading
+import time
+from functools import partial
+
+from django.conf import settings
+from django.db import transaction
+
+from . import data_version
+from .models import (
+    Actividades, Calidades, EstadoCivil, Etonimos, Hispanizaciones, RolEvento,
+    SituacionLugar, TipoDocumental, TipoLugar,
+)
+
+# Term column of each cached vocabulary model.
+VOCAB_FIELDS = {
+    Calidades: 'calidad',
+    Actividades: 'actividad',
+    Hispanizaciones: 'hispanizacion',
+    Etonimos: 'etonimo',
+    EstadoCivil: 'estado_civil',
+    RolEvento: 'rol_evento',
+    TipoLugar: 'tipo_lugar',
+    SituacionLugar: 'situacion',
+    TipoDocumental: 'tipo_documental',
+}
+
+# Models whose save() lowercases the term.
+LOWERCASE_VOCAB = {Calidades, Hispanizaciones, Etonimos}
+
+_tables = {}
+_shared = {'version': None, 'checked_at': None}
+_lock = threading.Lock()
+
+
+class _Table:
+    def __init__(self, model, version, rows):
+        self.version = version
+        self.ids = {}
+        for pk, label in rows:
+            # Rows that only differ in case or padding: the oldest one wins.
+            self.ids.setdefault(normalize(model, label), pk)
+        self.labels = sorted((label.casefold(), pk, label) for pk, label in rows)
+
+    def add(self, pk, term):
+        self.ids[term] = pk
+        self.labels = sorted(self.labels + [(term.casefold(), pk, term)])
+
+
+def field(model):
+    try:
+        return VOCAB_FIELDS[model]
+    except KeyError:
+        raise ValueError(f"No known field mapping for model {model.__name__}") from None
+
+
+def normalize(model, value):
+    value = value.strip()
+    return value.lower() if model in LOWERCASE_VOCAB else value
+
+
+def _shared_version():
+    now = time.monotonic()
+    with _lock:
+        checked_at = _shared['checked_at']
+        if checked_at is not None and now - checked_at < settings.VOCAB_CACHE_CHECK_INTERVAL:
+            return _shared['version']
+    version = data_version.get_versions(['vocab'])['vocab']
+    with _lock:
+        _shared.update(version=version, checked_at=now)
+    return version
+
+
+def _table(model):
+    version = _shared_version()
+    table = _tables.get(model)
+    if table is not None and table.version == version:
+        return table
+    table = _Table(model, version, list(model.objects.order_by('pk').values_list('pk', field(model))))
+    transaction.on_commit(partial(_tables.__setitem__, model, table))
+    return table
+
+
+def _remember(model, found):
+    table = _tables.get(model)
+    if table is None:
+        return
+    for term, pk in found.items():
+        if term not in table.ids:
+            table.add(pk, term)
+
+
+def resolve(model, terms, create=True):
+    """
+    {term: pk} for normalized ``terms``.  Terms not in the cached table are
+    looked up; with ``create`` the ones that do not exist yet are inserted.
+    """
+    terms = set(terms)
+    if not terms:
+        return {}
+    table = _table(model)
+    found = {term: table.ids[term] for term in terms if term in table.ids}
+    missing = terms - found.keys()
+    if not missing:
+        return found
+
+    name = field(model)
+    fetched = dict(model.objects.filter(**{f'{name}__in': missing}).values_list(name, 'pk'))
+    new = missing - fetched.keys()
+    if new and create:
+        # Another process may be inserting the same terms: skip those and
+        # read every new pk back.
+        model.objects.bulk_create([model(**{name: term}) for term in sorted(new)], ignore_conflicts=True)
+        fetched.update(model.objects.filter(**{f'{name}__in': new}).values_list(name, 'pk'))
+        data_version.bump('vocab')
+    transaction.on_commit(partial(_remember, model, fetched))
+    found.update(fetched)
+    return found
+
+
+def search(model, q=''):
+    """
+    Rows whose term contains ``q`` (case-insensitive), ordered by term, as
+    unsaved instances carrying only the pk and the term.
+    """
+    q = (q or '').casefold()
+    name, pk_name = field(model), model._meta.pk.attname
+    return [
+        model(**{pk_name: pk, name: label})
+        for folded, pk, label in _table(model).labels
+        if q in folded
+    ]
+
+
+def forget(model):
+    """Drop the cached table of ``model``, now and again when the current transaction commits."""
+    _tables.pop(model, None)
+    transaction.on_commit(partial(_tables.pop, model, None))
+
+
+def clear():
+    _tables.clear()
+    with _lock:
+        _shared.update(version=None, checked_at=None)
@@ -28,6 +28,19 @@ echo "✓ Migrations complete"
 echo "Setting up cache table..."
 python manage.py createcachetable 2>/dev/null || echo "Cache table already exists"
 
+# Build trajectory segments on first start (kept current by signals afterwards)
+echo "Checking trajectory segments..."
+python manage.py rebuild_trayectorias --if-empty
+
+# Build place usage counters on first start (kept current by signals afterwards)
+echo "Checking place usage counters..."
+python manage.py rebuild_lugar_estadisticas --if-empty
+python manage.py refresh_map_summary
+
+# Build relations network edges on first start (kept current by signals afterwards)
+echo "Checking network edges..."
+python manage.py rebuild_adyacencias --if-empty
+
 # Collect static files
 echo "Collecting static files..."
 python manage.py collectstatic --noinput
@@ -69,6 +69,7 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'api.query_budget.QueryBudgetMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.locale.LocaleMiddleware',
@@ -117,6 +118,91 @@ DATABASES = {
 }
 
 
+# Cache
+# 'default' stays process-local (sessions, throttling).  'api' holds derived
+# API payloads (search facets, counts) and the per-entity data versions that
+# invalidate them; the database backend uses the table created by
+# `createcachetable` in the entrypoint and is shared by all gunicorn workers.
+# API_CACHE_BACKEND=locmem keeps it per process (local development).
+
+API_CACHE_BACKEND = os.getenv('API_CACHE_BACKEND', 'database')
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'api': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'mdb-api',
+        'TIMEOUT': int(os.getenv('API_CACHE_TIMEOUT') or 600),
+        'OPTIONS': {'MAX_ENTRIES': 5000},
+    } if API_CACHE_BACKEND == 'locmem' else {
+        'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+        'LOCATION': 'mdb_api_cache',
+        'TIMEOUT': int(os.getenv('API_CACHE_TIMEOUT') or 600),
+        'OPTIONS': {'MAX_ENTRIES': 5000},
+    },
+}
+
+# Full-text search
+# search_vector is recomputed in one batched UPDATE per model when the saving
+# transaction commits ('deferred'), or by PostgreSQL triggers ('trigger';
+# install them with `manage.py search_vector_triggers`).  See
+# dbgestor/search_vectors.py.
+
+SEARCH_VECTOR_MODE = os.getenv('SEARCH_VECTOR_MODE') or 'deferred'
+
+# Query budget
+# Requests running more queries than this are logged with their most repeated
+# SQL shapes (N+1 detection, see api/query_budget.py).  0 disables the check;
+# with DEBUG on every response also carries X-Query-Count.
+
+API_QUERY_BUDGET = int(os.getenv('API_QUERY_BUDGET') or (100 if DEBUG else 0))
+
+# Map summary
+# all_trajectories_summary reads a materialized view.  A read of a stale view
+# refreshes it at most once per this many seconds; 0 leaves refreshing to
+# `manage.py refresh_map_summary` (cron).  See dbgestor/mapa_resumen.py.
+
+MAP_SUMMARY_REFRESH_INTERVAL = int(os.getenv('MAP_SUMMARY_REFRESH_INTERVAL') or 60)
+
+# Conditional GET
+# Read-only v2 endpoints send an ETag and answer If-None-Match with 304 (see
+# api/v2/conditional.py).  Anonymous responses may be reused by browsers and
+# proxies for this many seconds before revalidating; authenticated ones are
+# private and always revalidated.
+
+API_CONDITIONAL_MAX_AGE = int(os.getenv('API_CONDITIONAL_MAX_AGE') or 0)
+
+# Network metrics
+# Betweenness centrality of the relations network is approximated from this
+# many BFS sources (0 = exact, every persona).  The metrics are computed once
+# per data version, by one request at a time: the others get the previous
+# version's metrics (or a 503 until there are any).  A lock is considered
+# abandoned after NETWORK_METRICS_LOCK_TIMEOUT seconds; see dbgestor/metricas_red.py.
+
+NETWORK_METRICS_SAMPLES = int(os.getenv('NETWORK_METRICS_SAMPLES') or 64)
+NETWORK_METRICS_LOCK_TIMEOUT = int(os.getenv('NETWORK_METRICS_LOCK_TIMEOUT') or 300)
+
+# Ingest jobs
+# Spreadsheet uploads are queued and run by `python manage.py run_ingest_worker`,
+# INGEST_CHUNK_ROWS rows per committed chunk.  The worker polls an empty queue
+# every INGEST_WORKER_POLL seconds; a running job whose worker has not reported
+# for INGEST_JOB_STALE_AFTER seconds is taken over.  See api/v1/ingest_jobs.py.
+
+INGEST_CHUNK_ROWS = int(os.getenv('INGEST_CHUNK_ROWS') or 200)
+INGEST_WORKER_POLL = int(os.getenv('INGEST_WORKER_POLL') or 5)
+INGEST_JOB_STALE_AFTER = int(os.getenv('INGEST_JOB_STALE_AFTER') or 300)
+
+# Vocabulary cache
+# Each process keeps the vocabulary tables (calidades, etnónimos, ocupaciones...)
+# in memory and reloads one when the shared 'vocab' data version moves.  The
+# version is read at most once per this many seconds, so an edit made by another
+# process shows up within that delay.  See dbgestor/vocabulario.py.
+
+VOCAB_CACHE_CHECK_INTERVAL = int(os.getenv('VOCAB_CACHE_CHECK_INTERVAL') or 5)
+
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.0/ref/settings/#auth-password-validators